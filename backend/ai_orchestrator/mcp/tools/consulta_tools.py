@@ -64,24 +64,17 @@ async def buscar_platos(args: Dict[str, Any], core_api_url: str) -> Dict[str, An
     
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
-            # Intentar buscar en el API
-            response = await client.get(
-                f"{core_api_url}/platos/",
-                params={"search": query} if query else {}
-            )
+            # El Core API filtra con su índice del catálogo: solo viajan los platos que coinciden
+            params = {}
+            if query:
+                params["search"] = query
+            if categoria:
+                params["categoria"] = categoria
+            response = await client.get(f"{core_api_url}/platos/", params=params)
             
             if response.status_code == 200:
                 platos = response.json()
                 
-                # Filtrar por categoría si se especifica
-                if categoria:
-                    platos = [p for p in platos if categoria.lower() in p.get("categoria", "").lower()]
-                
-                # Filtrar por query
-                if query:
-                    platos = [p for p in platos if query.lower() in p.get("nombre", "").lower() 
-                              or query.lower() in p.get("descripcion", "").lower()]
-                
                 return {
                     "success": True,
                     "count": len(platos),
@@ -0,0 +1,408 @@
+"""
+Persistencia SQLite del Core API
+Repositorios por entidad sobre SQLite en modo WAL con pool de conexiones
+
+Las listas en memoria de cada router siguen siendo la caché de lectura;
+cada escritura se persiste aquí y al arrancar se recargan desde la base.
+
+Con varios workers (WEB_CONCURRENCY > 1) cada escritura anota además una
+fila en la bitácora de cambios, en la misma transacción; el relay de cada
+worker la lee y aplica los cambios ajenos a su caché (utils/relay.py).
+Las operaciones que validan contra la caché antes de escribir (conflictos
+de reservas, duplicados, asignación de mesas) corren dentro de
+transaccion(), que toma el lock de escritura y pone la caché al día.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.relay import RelayWorkers
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/restaurant.db")
+POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+RELAY_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+
+# Identifica a este proceso en la bitácora (para no aplicarse sus propios cambios)
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Tabla reservada de la bitácora para eventos en tiempo real (no son datos)
+TABLA_EVENTOS = "_eventos"
+
+# Duración del turno del worker que corre los barridos (vencimientos, poda)
+LIDER_SEGUNDOS = float(os.getenv("WORKER_LIDER_SEGUNDOS", "15"))
+
+
+class RegistroDuplicado(Exception):
+    """El alta choca con un registro existente (clave primaria o índice único)"""
+
+
+def ruta_sqlite(url: str) -> str:
+    """Extrae la ruta del archivo de una URL sqlite:///ruta"""
+    if not url.startswith("sqlite:///"):
+        raise ValueError(f"Solo se soporta SQLite, se recibió: {url}")
+    return url[len("sqlite:///"):]
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones SQLite
+
+    Cada conexión se abre en modo WAL (lectores no bloquean al escritor)
+    con busy_timeout, así varios workers pueden escribir sobre el mismo
+    archivo sin errores de 'database is locked'.
+    """
+
+    def __init__(self, ruta: str, tamano: int = POOL_SIZE):
+        # Conexión de la transacción en curso (la comparten las escrituras anidadas)
+        self._actual: ContextVar[Optional[sqlite3.Connection]] = ContextVar(f"transaccion_{id(self)}", default=None)
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._ruta = ruta
+        self._tamano = tamano
+        self._libres: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._creadas = 0
+        self._lock = threading.Lock()
+
+    def _abrir(self) -> sqlite3.Connection:
+        conexion = sqlite3.connect(self._ruta, timeout=5.0, check_same_thread=False)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.execute("PRAGMA busy_timeout=5000")
+        return conexion
+
+    @contextmanager
+    def conexion(self):
+        """
+        Toma una conexión del pool; commit al salir o rollback si hay error.
+        Dentro de transaccion() devuelve la conexión de esa transacción.
+        """
+        actual = self._actual.get()
+        if actual is not None:
+            yield actual
+            return
+        try:
+            conexion = self._libres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                crear = self._creadas < self._tamano
+                if crear:
+                    self._creadas += 1
+            conexion = self._abrir() if crear else self._libres.get()
+
+        try:
+            yield conexion
+            conexion.commit()
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
+            self._libres.put(conexion)
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Transacción con el lock de escritura tomado desde el inicio (BEGIN
+        IMMEDIATE): entre la lectura y la escritura ningún otro worker puede
+        escribir. No debe contener awaits.
+        """
+        if self._actual.get() is not None:
+            yield self._actual.get()
+            return
+        with self.conexion() as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            token = self._actual.set(conexion)
+            try:
+                yield conexion
+            finally:
+                self._actual.reset(token)
+
+    def cerrar(self):
+        """Cierra las conexiones ociosas del pool"""
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._creadas = 0
+
+
+class BitacoraCambios:
+    """
+    Bitácora append-only de cambios compartida por los workers
+
+    Cada fila dice qué registro cambió (tabla, clave) y su nuevo contenido
+    JSON (NULL si se eliminó). La base sigue siendo la única fuente de
+    verdad; la bitácora solo avisa a los demás workers qué releer.
+    """
+
+    def __init__(self, pool: PoolConexiones, origen: str = WORKER_ID):
+        self._pool = pool
+        self.origen = origen
+        with self._pool.conexion() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS cambios (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "origen TEXT NOT NULL, tabla TEXT NOT NULL, clave, data TEXT, creado REAL NOT NULL)"
+            )
+
+    def anotar(self, conexion: sqlite3.Connection, tabla: str, filas: List[tuple]):
+        """Anota (clave, data JSON o None) dentro de la transacción del que escribe"""
+        ahora = time.time()
+        conexion.executemany(
+            "INSERT INTO cambios (origen, tabla, clave, data, creado) VALUES (?, ?, ?, ?, ?)",
+            [(self.origen, tabla, clave, data, ahora) for clave, data in filas]
+        )
+
+    def anotar_evento(self, mensaje: dict):
+        with self._pool.conexion() as conexion:
+            self.anotar(conexion, TABLA_EVENTOS, [(None, json.dumps(mensaje, ensure_ascii=False, default=str))])
+
+    def ultimo(self) -> int:
+        with self._pool.conexion() as conexion:
+            return conexion.execute("SELECT COALESCE(MAX(seq), 0) FROM cambios").fetchone()[0]
+
+    def leer(self, desde: int, limite: int = 500) -> Tuple[int, List[tuple]]:
+        """
+        Anotaciones posteriores a 'desde': devuelve el último seq leído y los
+        cambios (tabla, clave, datos) de otros workers, en orden.
+        """
+        with self._pool.conexion() as conexion:
+            filas = conexion.execute(
+                "SELECT seq, origen, tabla, clave, data FROM cambios WHERE seq > ? ORDER BY seq LIMIT ?",
+                (desde, limite)
+            ).fetchall()
+        ultimo = filas[-1][0] if filas else desde
+        return ultimo, [
+            (tabla, clave, json.loads(data) if data is not None else None)
+            for _, origen, tabla, clave, data in filas
+            if origen != self.origen
+        ]
+
+    def podar(self, antes_de: float) -> int:
+        """Borra las anotaciones viejas (ya las leyeron todos los workers)"""
+        with self._pool.conexion() as conexion:
+            return conexion.execute("DELETE FROM cambios WHERE creado < ?", (antes_de,)).rowcount
+
+
+class EleccionLider:
+    """
+    Elige un solo worker para los barridos periódicos
+
+    El turno es una fila por tarea con el worker dueño y su vencimiento;
+    el dueño la renueva y cualquier otro la toma cuando vence (el worker
+    líder murió). Con un solo worker no se consulta la base.
+    """
+
+    def __init__(self, pool: PoolConexiones, activo: bool, origen: str = WORKER_ID,
+                 duracion: float = LIDER_SEGUNDOS):
+        self._pool = pool
+        self._activo = activo
+        self.origen = origen
+        self._duracion = duracion
+        self._vigente_hasta: Dict[str, float] = {}
+        if activo:
+            with self._pool.conexion() as conexion:
+                conexion.execute(
+                    "CREATE TABLE IF NOT EXISTS lideres (tarea TEXT PRIMARY KEY, worker TEXT NOT NULL, vence REAL NOT NULL)"
+                )
+
+    def es_lider(self, tarea: str = "barridos") -> bool:
+        """True si este worker tiene (o acaba de tomar) el turno de la tarea"""
+        if not self._activo:
+            return True
+        ahora = time.time()
+        # Se renueva a mitad de turno: mientras tanto no hace falta ir a la base
+        if self._vigente_hasta.get(tarea, 0) - self._duracion / 2 > ahora:
+            return True
+        with self._pool.conexion() as conexion:
+            conexion.execute(
+                "INSERT INTO lideres (tarea, worker, vence) VALUES (?, ?, ?) "
+                "ON CONFLICT(tarea) DO UPDATE SET worker = excluded.worker, vence = excluded.vence "
+                "WHERE lideres.worker = excluded.worker OR lideres.vence < ?",
+                (tarea, self.origen, ahora + self._duracion, ahora)
+            )
+            worker, vence = conexion.execute(
+                "SELECT worker, vence FROM lideres WHERE tarea = ?", (tarea,)
+            ).fetchone()
+        if worker != self.origen:
+            self._vigente_hasta.pop(tarea, None)
+            return False
+        self._vigente_hasta[tarea] = vence
+        return True
+
+
+class Repositorio:
+    """
+    Repositorio de una entidad
+
+    Guarda cada registro como JSON en la columna 'data' y copia en columnas
+    propias los campos por los que se filtra, para poder indexarlos.
+    """
+
+    def __init__(
+        self,
+        pool: PoolConexiones,
+        tabla: str,
+        campo_id: str,
+        columnas: Optional[Dict[str, str]] = None,
+        indices: Sequence[Sequence[str]] = (),
+        tipo_id: str = "INTEGER",
+        bitacora: Optional[BitacoraCambios] = None
+    ):
+        self._pool = pool
+        self.tabla = tabla
+        self.campo_id = campo_id
+        self._columnas = columnas or {}
+        self._bitacora = bitacora
+        self._crear_tabla(indices, tipo_id)
+
+        nombres = ["id", *self._columnas, "data"]
+        actualizaciones = ", ".join(f"{c} = excluded.{c}" for c in nombres[1:])
+        self._sql_insertar = f"INSERT INTO {tabla} ({', '.join(nombres)}) VALUES ({', '.join('?' for _ in nombres)})"
+        self._sql_guardar = f"{self._sql_insertar} ON CONFLICT(id) DO UPDATE SET {actualizaciones}"
+
+    def _crear_tabla(self, indices: Sequence[Sequence[str]], tipo_id: str):
+        columnas = "".join(f", {nombre} {tipo}" for nombre, tipo in self._columnas.items())
+        with self._pool.conexion() as conexion:
+            conexion.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.tabla} (id {tipo_id} PRIMARY KEY{columnas}, data TEXT NOT NULL)"
+            )
+            for campos in indices:
+                conexion.execute(
+                    f"CREATE INDEX IF NOT EXISTS ix_{self.tabla}_{'_'.join(campos)} "
+                    f"ON {self.tabla} ({', '.join(campos)})"
+                )
+
+    def _a_dict(self, registro: Any) -> dict:
+        return registro if isinstance(registro, dict) else registro.model_dump()
+
+    def _fila(self, registro: Any) -> tuple:
+        datos = self._a_dict(registro)
+        return (
+            datos[self.campo_id],
+            *(datos.get(columna) for columna in self._columnas),
+            json.dumps(datos, ensure_ascii=False)
+        )
+
+    def guardar(self, registro: Any):
+        """Inserta o actualiza un registro (modelo pydantic o dict)"""
+        self.guardar_todos([registro])
+
+    def guardar_todos(self, registros: List[Any]):
+        """Inserta o actualiza varios registros en una sola transacción"""
+        filas = [self._fila(r) for r in registros]
+        with self._pool.conexion() as conexion:
+            conexion.executemany(self._sql_guardar, filas)
+            if self._bitacora is not None:
+                self._bitacora.anotar(conexion, self.tabla, [(fila[0], fila[-1]) for fila in filas])
+
+    def insertar(self, registro: Any):
+        """
+        Alta que no pisa: si el id (o un campo único) ya existe en la base
+        lanza RegistroDuplicado, aunque lo haya creado otro worker.
+        """
+        fila = self._fila(registro)
+        try:
+            with self._pool.conexion() as conexion:
+                conexion.execute(self._sql_insertar, fila)
+                if self._bitacora is not None:
+                    self._bitacora.anotar(conexion, self.tabla, [(fila[0], fila[-1])])
+        except sqlite3.IntegrityError as e:
+            raise RegistroDuplicado(f"{self.tabla}: {e}") from e
+
+    def eliminar(self, id_registro: Any):
+        with self._pool.conexion() as conexion:
+            conexion.execute(f"DELETE FROM {self.tabla} WHERE id = ?", (id_registro,))
+            if self._bitacora is not None:
+                self._bitacora.anotar(conexion, self.tabla, [(id_registro, None)])
+
+    def nuevo_id(self) -> int:
+        """
+        Siguiente id entero, reservado en la base: dos workers que crean a la
+        vez nunca reciben el mismo (el UPDATE toma el lock de escritura).
+        """
+        return self.reservar_ids(1)[0]
+
+    def reservar_ids(self, cantidad: int) -> range:
+        """Reserva 'cantidad' ids consecutivos en una sola transacción (altas en lote)"""
+        with self._pool.conexion() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS secuencias (tabla TEXT PRIMARY KEY, valor INTEGER NOT NULL)"
+            )
+            conexion.execute(
+                f"INSERT OR IGNORE INTO secuencias (tabla, valor) "
+                f"SELECT ?, COALESCE(MAX(id), 0) FROM {self.tabla}",
+                (self.tabla,)
+            )
+            ultimo = conexion.execute(
+                f"UPDATE secuencias SET valor = MAX(valor, (SELECT COALESCE(MAX(id), 0) FROM {self.tabla})) + ? "
+                f"WHERE tabla = ? RETURNING valor",
+                (cantidad, self.tabla)
+            ).fetchone()[0]
+        return range(ultimo - cantidad + 1, ultimo + 1)
+
+    def cargar(self, modelo: Any = None) -> List[Any]:
+        """Todos los registros ordenados por id (como modelos si se indica la clase)"""
+        with self._pool.conexion() as conexion:
+            filas = conexion.execute(f"SELECT data FROM {self.tabla} ORDER BY id").fetchall()
+        datos = [json.loads(fila[0]) for fila in filas]
+        return [modelo(**d) for d in datos] if modelo else datos
+
+    def cargar_o_sembrar(self, modelo: Any, semilla: List[Any]) -> List[Any]:
+        """
+        Carga los registros guardados; si la tabla está vacía (primer arranque)
+        guarda la semilla y la devuelve.
+        """
+        with self._pool.conexion() as conexion:
+            vacia = conexion.execute(f"SELECT 1 FROM {self.tabla} LIMIT 1").fetchone() is None
+        if vacia:
+            if semilla:
+                self.guardar_todos(semilla)
+            return list(semilla)
+        return self.cargar(modelo)
+
+
+pool = PoolConexiones(ruta_sqlite(DATABASE_URL))
+
+# Se crea siempre (para poder leerla); los repositorios solo anotan con varios workers
+bitacora = BitacoraCambios(pool)
+
+# Un solo worker corre los barridos periódicos (vencimientos de la fila, poda)
+lider_workers = EleccionLider(pool, RELAY_WORKERS)
+
+# Aplica en este worker los cambios de los demás; main.py lo inicia si RELAY_WORKERS
+relay_workers = RelayWorkers(bitacora, TABLA_EVENTOS, es_lider=lider_workers.es_lider)
+
+
+@contextmanager
+def transaccion():
+    """
+    Valida y escribe sin carreras entre workers: toma el lock de escritura
+    de SQLite y, con varios workers, aplica antes lo pendiente de la
+    bitácora, así las cachés con las que se valida están al día. Las
+    escrituras de los repositorios dentro del bloque van en esta misma
+    transacción.
+    """
+    with pool.transaccion() as conexion:
+        if RELAY_WORKERS:
+            relay_workers.procesar()
+        yield conexion
+
+
+def repositorio(
+    tabla: str,
+    campo_id: str,
+    columnas: Optional[Dict[str, str]] = None,
+    indices: Sequence[Sequence[str]] = (),
+    tipo_id: str = "INTEGER"
+) -> Repositorio:
+    """Crea el repositorio de una entidad sobre el pool compartido"""
+    return Repositorio(pool, tabla, campo_id, columnas, indices, tipo_id, bitacora if RELAY_WORKERS else None)
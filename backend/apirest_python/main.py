@@ -1,13 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response, Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from routers import user, Restaurante, Reserva, Menu, Plato, Mesa, FilaVirtual, Cliente, CategoriaMenu, auth
+from routers import user, Restaurante, Reserva, Menu, Plato, Mesa, FilaVirtual, Cliente, CategoriaMenu, auth, Dashboard, TiempoReal
+from websocket_broadcast import broadcaster, hub_eventos
+from routers.FilaVirtual import vencimientos_llamados
+from database import RELAY_WORKERS, relay_workers
+from routers.auth import servicio_contrasenas
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicio y cierre de la aplicación"""
+    # Startup: broadcaster WebSocket con pool de conexiones y envío por lotes
+    await broadcaster.iniciar()
+    # Startup: vencimiento de llamados de la fila virtual que no confirman
+    await vencimientos_llamados.iniciar()
+    # Startup: con varios workers, cachés y eventos se sincronizan por la bitácora
+    if RELAY_WORKERS:
+        hub_eventos.relay = relay_workers.publicar_evento
+        relay_workers.al_evento(hub_eventos.publicar_local)
+        await relay_workers.iniciar()
+    yield
+    # Shutdown: detener relay y vencimientos, enviar eventos pendientes y cerrar conexiones
+    await relay_workers.detener()
+    await vencimientos_llamados.detener()
+    await broadcaster.detener()
+    servicio_contrasenas.shutdown()
 
 
 app = FastAPI(
     title="Chuwue Grill API",
     version="1.0.0",
-    description="API REST principal para operaciones del restaurante, reservas y menú."
+    description="API REST principal para operaciones del restaurante, reservas y menú.",
+    lifespan=lifespan
 )
 
 # Configurar CORS para permitir peticiones desde el frontend
@@ -40,6 +66,8 @@ app.include_router(Mesa.router)
 app.include_router(FilaVirtual.router)
 app.include_router(Cliente.router)
 app.include_router(CategoriaMenu.router)
+app.include_router(Dashboard.router)
+app.include_router(TiempoReal.router)
 
 @app.get("/")
 def root():
@@ -69,6 +97,21 @@ def integracion_status(response: Response):
         "pilar2": {"status": "ok", "b2b": True}
     }
 
+# Contadores del broadcaster WebSocket (enviados, descartados, latencia)
+@app.get("/integracion/websocket/metrics")
+def websocket_metrics():
+    return broadcaster.resumen()
+
+# Estado del relay entre workers (cambios aplicados de otros procesos)
+@app.get("/integracion/workers/metrics")
+def workers_metrics():
+    return {"relay": RELAY_WORKERS, **relay_workers.resumen()}
+
+# Pool de bcrypt: operaciones en espera, en curso, rechazadas y rehashes
+@app.get("/integracion/auth/metrics")
+def auth_metrics():
+    return servicio_contrasenas.summary()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
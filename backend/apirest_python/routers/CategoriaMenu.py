@@ -1,5 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
+from database import repositorio, relay_workers, RegistroDuplicado
+from utils.relay import aplicar_en_lista
+from utils.catalogo import ColeccionCatalogo, respuesta_catalogo
 
 router= APIRouter (tags=["CategoriaMenu"])
 
@@ -7,17 +11,28 @@ class CategoriaMenu(BaseModel):
     id_categoria: int
     nombre: str
 
-categorias_list = [CategoriaMenu(id_categoria=1, nombre="Entradas"),
+repo_categorias = repositorio("categorias_menu", "id_categoria")
+
+categorias_list = repo_categorias.cargar_o_sembrar(CategoriaMenu, [CategoriaMenu(id_categoria=1, nombre="Entradas"),
                    CategoriaMenu(id_categoria=2, nombre="Platos principales"),
-                   CategoriaMenu(id_categoria=3, nombre="Postres")]
+                   CategoriaMenu(id_categoria=3, nombre="Postres")])
 
 @router.get("/categoria/")
 async def categoria_status():
     return {"api categoria activa"}
 
+catalogo_categorias = ColeccionCatalogo(lambda: categorias_list, "id_categoria")
+
+def aplicar_cambio_remoto(id_categoria: int, datos: Optional[dict]):
+    """Aplica a la caché de este worker una categoría escrito por otro worker"""
+    aplicar_en_lista(categorias_list, "id_categoria", id_categoria, CategoriaMenu(**datos) if datos is not None else None)
+    catalogo_categorias.invalidar()
+
+relay_workers.al_cambiar(repo_categorias.tabla, aplicar_cambio_remoto)
+
 @router.get("/categorias/")
-async def get_categorias():
-    return categorias_list
+async def get_categorias(request: Request):
+    return respuesta_catalogo(request, catalogo_categorias.todo())
 
 #path
 @router.get("/categoria/{id_categoria}")
@@ -34,7 +49,7 @@ async def buscar_categoria_query(id_categoria: int):
 async def crear_categoria(categoria: CategoriaMenu):
     # Generar ID automáticamente
     if not categoria.id_categoria or categoria.id_categoria == 0:
-        categoria.id_categoria = max([c.id_categoria for c in categorias_list]) + 1 if categorias_list else 1
+        categoria.id_categoria = repo_categorias.nuevo_id()
     
     # Verificar si ya existe una categoría con el mismo ID
     try:
@@ -45,7 +60,12 @@ async def crear_categoria(categoria: CategoriaMenu):
         if e.status_code != 404:
             raise e
     
+    try:
+        repo_categorias.insertar(categoria)  # La base rechaza el id aunque lo haya creado otro worker
+    except RegistroDuplicado:
+        raise HTTPException(status_code=400, detail="La categoría ya existe")
     categorias_list.append(categoria)
+    catalogo_categorias.invalidar()
     return categoria
 
 #PUT
@@ -57,6 +77,8 @@ async def actualizar_categoria(id_categoria: int, categoria: CategoriaMenu):
             # Mantener el ID original
             categoria.id_categoria = id_categoria
             categorias_list[index] = categoria
+            repo_categorias.guardar(categoria)
+            catalogo_categorias.invalidar()
             found = True
             return {"message": "Categoría actualizada exitosamente", "categoria": categoria}
     
@@ -71,6 +93,8 @@ async def eliminar_categoria(id: int):
         if guardar_categoria.id_categoria == id:
             categoria_eliminada = categorias_list[index]
             del categorias_list[index]
+            repo_categorias.eliminar(id)
+            catalogo_categorias.invalidar()
             found = True
             return {
                 "message": "Categoría eliminada exitosamente",
@@ -1,5 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from database import repositorio, relay_workers, RegistroDuplicado
+from utils.relay import aplicar_en_lista
+from utils.paginacion import ParametrosLista, responder_lista
 
 router= APIRouter (tags=["Cliente"])
 
@@ -9,17 +13,26 @@ class Cliente(BaseModel):
     correo: str
     telefono: str
 
-clientes_list = [Cliente(id_cliente=1, nombre="Ana García", correo="ana@email.com", telefono="555-0001"),
+repo_clientes = repositorio("clientes", "id_cliente")
+
+clientes_list = repo_clientes.cargar_o_sembrar(Cliente, [Cliente(id_cliente=1, nombre="Ana García", correo="ana@email.com", telefono="555-0001"),
                  Cliente(id_cliente=2, nombre="Luis Pérez", correo="luis@email.com", telefono="555-0002"),
-                 Cliente(id_cliente=3, nombre="María López", correo="maria@email.com", telefono="555-0003")]
+                 Cliente(id_cliente=3, nombre="María López", correo="maria@email.com", telefono="555-0003")])
+
+def aplicar_cambio_remoto(id_cliente: int, datos: Optional[dict]):
+    """Aplica a la caché de este worker un cliente escrito por otro worker"""
+    aplicar_en_lista(clientes_list, "id_cliente", id_cliente, Cliente(**datos) if datos is not None else None)
+
+relay_workers.al_cambiar(repo_clientes.tabla, aplicar_cambio_remoto)
 
 @router.get("/cliente/")
 async def cliente():
     return {"api cliente activa"}
 
 @router.get("/clientes/")
-async def clientes():
-    return clientes_list
+async def clientes(params: ParametrosLista = Depends()):
+    """Clientes con paginación por cursor (id_cliente) y selección de campos"""
+    return responder_lista(clientes_list, "id_cliente", params, list(Cliente.model_fields))
 
 #path
 @router.get("/cliente/{id_cliente}")
@@ -37,6 +50,10 @@ async def cliente(cliente: Cliente):
     if type(Buscar_cliente(cliente.id_cliente)) == Cliente:
         raise HTTPException(status_code=400, detail="El cliente ya existe")
     else:
+        try:
+            repo_clientes.insertar(cliente)  # La base rechaza el id aunque lo haya creado otro worker
+        except RegistroDuplicado:
+            raise HTTPException(status_code=400, detail="El cliente ya existe")
         clientes_list.append(cliente)
         return cliente
 
@@ -47,6 +64,7 @@ async def cliente(cliente: Cliente):
     for index, guardar_cliente in enumerate(clientes_list):
         if guardar_cliente.id_cliente == cliente.id_cliente:
             clientes_list[index] = cliente
+            repo_clientes.guardar(cliente)
             found = True
             return {"actualizado exitosamente"}
     if not found:
@@ -59,6 +77,7 @@ async def cliente(id: int):
     for index, guardar_cliente in enumerate(clientes_list):
         if guardar_cliente.id_cliente == id:
             del clientes_list[index]
+            repo_clientes.eliminar(id)
             found = True
             return {"Eliminado exitosamente"}
     if not found:
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date
-from .auth import current_user, UserAuth
+import asyncio
+import json
+from .auth import current_user, current_admin, crear_ticket_stream, usuario_de_ticket, UserAuth, TICKET_STREAM_SEGUNDOS
+from database import repositorio, relay_workers, transaccion
+from utils.agregados import AgregadosDashboard, hoy
+from utils.fila_engine import BUCKETS_CAPACIDAD, bucket_capacidad
 
 router = APIRouter(
     prefix="/dashboard",
@@ -10,6 +16,12 @@ router = APIRouter(
     responses={404: {"description": "No encontrado"}}
 )
 
+# Contadores en vivo; los actualizan Mesa, Reserva y FilaVirtual al escribir
+agregados_dashboard = AgregadosDashboard()
+
+# Segundos entre comentarios de keep-alive en el stream SSE
+SSE_KEEPALIVE_SEGUNDOS = 15
+
 # --- MODELOS PYDANTIC ---
 class EstadoRestaurante(BaseModel):
     abierto: bool
@@ -41,6 +53,26 @@ class ResumenDashboard(BaseModel):
     personas_en_cola: int
     ingresos_hoy: float
 
+class Ingreso(BaseModel):
+    id_ingreso: Optional[int] = None  # Lo asigna el servidor
+    monto: float
+    fecha: Optional[str] = None  # YYYY-MM-DD, hoy por defecto
+    referencia: Optional[str] = None
+
+# Los ingresos se guardan uno por uno: el total del día se reconstruye al
+# arrancar y los de otros workers llegan por el relay
+repo_ingresos = repositorio("ingresos", "id_ingreso", {"fecha": "TEXT"}, [("fecha",)])
+
+for _ingreso in repo_ingresos.cargar(Ingreso):
+    agregados_dashboard.ingreso(_ingreso)
+
+def aplicar_cambio_remoto(id_ingreso: int, datos: Optional[dict]):
+    """Suma a los agregados de este worker un ingreso registrado por otro worker"""
+    if datos is not None:
+        agregados_dashboard.ingreso(Ingreso(**datos))
+
+relay_workers.al_cambiar(repo_ingresos.tabla, aplicar_cambio_remoto)
+
 # --- ENDPOINTS ---
 
 @router.get("/estado-restaurante", response_model=EstadoRestaurante, summary="Estado actual del restaurante")
@@ -132,45 +164,85 @@ async def obtener_promociones_activas():
 async def obtener_resumen_dashboard(user: UserAuth = Depends(current_user)):
     """
     Obtiene el resumen general para el dashboard administrativo.
-    Requiere autenticación.
+    Lectura O(1) de los contadores incrementales. Requiere autenticación.
     """
     try:
-        # Aquí iría la lógica real para calcular estadísticas
-        resumen = {
-            "mesas_ocupadas": 8,
-            "mesas_disponibles": 4,
-            "reservas_hoy": 15,
-            "personas_en_cola": 3,
-            "ingresos_hoy": 1847.50
-        }
-        return ResumenDashboard(**resumen)
+        return ResumenDashboard(**agregados_dashboard.resumen())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener resumen del dashboard: {str(e)}")
 
+@router.post("/ingresos", response_model=ResumenDashboard, summary="Registrar un ingreso")
+async def registrar_ingreso(ingreso: Ingreso, user: UserAuth = Depends(current_admin)):
+    """
+    Registra un ingreso (por ejemplo, un pago confirmado) y lo suma al total del día.
+    Solo administradores.
+    """
+    if ingreso.monto <= 0:
+        raise HTTPException(status_code=400, detail="El monto debe ser mayor a cero")
+    ingreso.fecha = ingreso.fecha or hoy()
+    with transaccion():
+        ingreso.id_ingreso = repo_ingresos.nuevo_id()
+        repo_ingresos.guardar(ingreso)
+    agregados_dashboard.ingreso(ingreso)
+    return ResumenDashboard(**agregados_dashboard.resumen())
+
+@router.post("/stream/ticket", summary="Ticket para abrir el stream SSE")
+async def ticket_stream(user: UserAuth = Depends(current_user)):
+    """
+    EventSource no permite headers: el cliente pide con su token un ticket
+    de vida corta y abre /dashboard/stream?ticket=... El JWT de acceso
+    nunca viaja en la URL.
+    """
+    return {"ticket": crear_ticket_stream(user.username), "expira_en": TICKET_STREAM_SEGUNDOS}
+
+async def usuario_stream(ticket: str = Query(..., description="Ticket de /dashboard/stream/ticket")):
+    """Autenticación del stream SSE por ticket"""
+    return await usuario_de_ticket(ticket)
+
+@router.get("/stream", summary="Stream SSE del resumen")
+async def stream_resumen(request: Request, user: UserAuth = Depends(usuario_stream)):
+    """
+    Server-Sent Events con el resumen del dashboard: se envía al conectar
+    y cada vez que cambia un contador, en lugar de hacer polling.
+    """
+    async def eventos():
+        cola = agregados_dashboard.suscribir()
+        try:
+            resumen = {"version": agregados_dashboard.version, **agregados_dashboard.resumen()}
+            yield f"event: resumen\ndata: {json.dumps(resumen)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    resumen = await asyncio.wait_for(cola.get(), timeout=SSE_KEEPALIVE_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: resumen\ndata: {json.dumps(resumen)}\n\n"
+        finally:
+            agregados_dashboard.desuscribir(cola)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/mesas-tiempo-real", summary="Estado de mesas en tiempo real")
 async def obtener_mesas_tiempo_real():
     """
-    Obtiene el estado actual de todas las mesas para la fila virtual.
+    Obtiene el estado actual de todas las mesas agrupadas por capacidad,
+    con los minutos estimados que le faltan a cada mesa ocupada.
     """
     try:
-        # Simulación del estado de mesas (reemplazar con lógica real)
-        mesas_estado = {
-            "mesas_2_personas": [
-                {"numero": 1, "estado": "disponible", "tiempo_estimado": 0},
-                {"numero": 2, "estado": "ocupada", "tiempo_estimado": 30},
-                {"numero": 3, "estado": "disponible", "tiempo_estimado": 0}
-            ],
-            "mesas_4_personas": [
-                {"numero": 4, "estado": "ocupada", "tiempo_estimado": 45},
-                {"numero": 5, "estado": "reservada", "tiempo_estimado": 120},
-                {"numero": 6, "estado": "ocupada", "tiempo_estimado": 25},
-                {"numero": 7, "estado": "limpieza", "tiempo_estimado": 5}
-            ],
-            "mesas_6_personas": [
-                {"numero": 8, "estado": "ocupada", "tiempo_estimado": 60},
-                {"numero": 9, "estado": "reservada", "tiempo_estimado": 180}
-            ]
-        }
+        from routers.Mesa import mesas_list
+        from routers.FilaVirtual import estimador_espera
+        
+        mesas_estado = {f"mesas_{bucket}_personas": [] for bucket in BUCKETS_CAPACIDAD}
+        for mesa in mesas_list:
+            mesas_estado[f"mesas_{bucket_capacidad(mesa.capacidad)}_personas"].append({
+                "numero": mesa.numero,
+                "estado": mesa.estado,
+                "tiempo_estimado": estimador_espera.minutos_restantes(mesa.id_mesa) if mesa.estado == "ocupada" else 0
+            })
         return mesas_estado
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener estado de mesas: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al obtener estado de mesas: {str(e)}")
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, Response
 from pydantic import BaseModel
 from typing import Optional
 from typing import Optional, List
 from datetime import datetime, timedelta
+import time
 import sys
 sys.path.append('..')
 from websocket_broadcast import broadcast_fila_virtual
+from utils.fila_engine import ColaVirtual, bucket_capacidad
+from utils.tiempo_espera import EstimadorEspera
+from utils.vencimientos import ProgramadorVencimientos
+from database import repositorio, relay_workers, transaccion, lider_workers, LIDER_SEGUNDOS, RegistroDuplicado
+from utils.relay import aplicar_en_lista
+from utils.paginacion import ParametrosLista, responder_lista, filtro_estado
+from routers.Dashboard import agregados_dashboard
 
 router = APIRouter(tags=["FilaVirtual"])
 
@@ -32,6 +40,8 @@ class PersonaFilaVirtual(BaseModel):
     tiempoEstimado: int
     hora_llegada: str
     estado: str
+    hora_llamado: Optional[str] = None
+    id_mesa: Optional[int] = None  # Mesa prometida al llamarla (la ven todos los workers)
 
 # Modelo legacy para compatibilidad
 class FilaVirtual(BaseModel):
@@ -41,39 +51,112 @@ class FilaVirtual(BaseModel):
     tiempo_espera: Optional[str] = None
     estado: Optional[str] = 'esperando'
 
-# Base de datos simulada para la fila virtual
-fila_virtual_db: List[PersonaFilaVirtual] = []
-id_counter = 1
+# Persistencia: entradas de la fila virtual (indexadas por estado) y filas legacy
+repo_fila_virtual = repositorio(
+    "fila_virtual",
+    "id",
+    {"estado": "TEXT", "telefono": "TEXT"},
+    [("estado",), ("telefono",)]
+)
+repo_filas = repositorio("filas", "id_fila")
 
 # Datos legacy para compatibilidad
-filas_list = [
+filas_list = repo_filas.cargar_o_sembrar(FilaVirtual, [
     FilaVirtual(id_fila=1, id_cliente=1, posicion=1, tiempo_espera="15 min", estado="esperando"),
     FilaVirtual(id_fila=2, id_cliente=2, posicion=2, tiempo_espera="30 min", estado="esperando"),
     FilaVirtual(id_fila=3, id_cliente=3, posicion=3, tiempo_espera="45 min", estado="esperando")
-]
-
-def calcular_tiempo_estimado(posicion: int) -> int:
-    """Calcular tiempo estimado en minutos basado en la posición"""
-    return posicion * 15  # 15 minutos por persona aproximadamente
-
-def actualizar_posiciones():
-    """Actualizar las posiciones y tiempos estimados de todas las personas en la fila"""
-    global fila_virtual_db
-    fila_virtual_db = [
-        PersonaFilaVirtual(
-            id=persona.id,
-            cliente_id=persona.cliente_id,
-            nombre=persona.nombre,
-            telefono=persona.telefono,
-            numeroPersonas=persona.numeroPersonas,
-            posicion=index + 1,
-            tiempoEstimado=calcular_tiempo_estimado(index + 1),
-            hora_llegada=persona.hora_llegada,
-            estado=persona.estado
-        )
-        for index, persona in enumerate(fila_virtual_db)
-        if persona.estado == "esperando"
-    ]
+])
+
+# Tiempos de espera aprendidos de la rotación real de mesas (lo alimenta routers.Mesa)
+estimador_espera = EstimadorEspera()
+
+# Fila virtual indexada: posición, siguiente y bajas en O(log n)
+cola_virtual = ColaVirtual(estimador_espera, repo_fila_virtual)
+cola_virtual.cargar(repo_fila_virtual.cargar(PersonaFilaVirtual))
+
+# Personas en cola para el dashboard (O(1): la cola ya lleva la cuenta)
+agregados_dashboard.cola(cola_virtual.total_esperando)
+cola_virtual.observar(lambda cambio: agregados_dashboard.cola(cola_virtual.total_esperando))
+
+# Minutos que tiene una persona llamada para confirmar su llegada
+GRACIA_LLAMADO_MINUTOS = 15
+
+def vencer_llamados(ids: List[int]) -> List[str]:
+    """
+    Saca de la fila a los llamados que no confirmaron a tiempo.
+    Un solo broadcast por barrido con todos los cambios.
+
+    Todos los workers programan los vencimientos, pero solo el líder los
+    aplica; los demás los reprograman por si el líder cae, y al llegarles
+    la baja por el relay se cancelan solos.
+    """
+    if not lider_workers.es_lider():
+        for persona_id in ids:
+            vencimientos_llamados.programar(persona_id, time.time() + LIDER_SEGUNDOS)
+        return []
+
+    seq_inicial = cola_virtual.version
+    removidos = []
+    with transaccion():
+        for persona_id in ids:
+            persona = cola_virtual.obtener(persona_id)
+            if persona is not None and persona.estado == "llamado":
+                cola_virtual.remover(persona_id)
+                removidos.append(persona.nombre)
+    
+    if removidos:
+        import asyncio
+        try:
+            asyncio.create_task(broadcast_fila_virtual("limpieza_vencidos", {
+                "type": "limpieza_vencidos",
+                "data": removidos,
+                "seq": cola_virtual.version,
+                "cambios": cola_virtual.cambios_desde(seq_inicial),
+                "mensaje": f"Se removieron {len(removidos)} personas que no confirmaron su llegada"
+            }))
+        except Exception as e:
+            print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
+        print(f"⏰ {len(removidos)} llamados vencidos removidos de la fila")
+    return removidos
+
+# Vencimiento de llamados por hora de llamado (lo inicia el lifespan de main.py)
+vencimientos_llamados = ProgramadorVencimientos(vencer_llamados)
+
+def programar_vencimiento(persona: PersonaFilaVirtual):
+    try:
+        llamado_en = datetime.fromisoformat(persona.hora_llamado).timestamp()
+    except (TypeError, ValueError):
+        llamado_en = time.time()  # Sin hora de llamado: el plazo corre desde ahora
+    vencimientos_llamados.programar(persona.id, llamado_en + GRACIA_LLAMADO_MINUTOS * 60)
+
+def marcar_llamado(persona: PersonaFilaVirtual, mesa=None):
+    """
+    Marca a la persona como 'llamado' y programa su vencimiento. La mesa
+    que se le promete queda guardada en la entrada: routers.Mesa la saca
+    de las mesas libres al ver el cambio (aquí o en otro worker).
+    """
+    persona.hora_llamado = datetime.now().isoformat()
+    persona.id_mesa = mesa.id_mesa if mesa is not None else None
+    cola_virtual.cambiar_estado(persona.id, "llamado")
+    programar_vencimiento(persona)
+
+for _persona in cola_virtual.con_estado("llamado"):
+    programar_vencimiento(_persona)
+
+def aplicar_cambio_remoto(persona_id: int, datos: Optional[dict]):
+    """Aplica a la fila de este worker una entrada escrita por otro worker"""
+    persona = PersonaFilaVirtual(**datos) if datos is not None else None
+    cola_virtual.sincronizar(persona_id, persona)
+    if persona is not None and persona.estado == "llamado":
+        programar_vencimiento(cola_virtual.obtener(persona_id))
+    else:
+        vencimientos_llamados.cancelar(persona_id)
+
+def aplicar_fila_remota(id_fila: int, datos: Optional[dict]):
+    aplicar_en_lista(filas_list, "id_fila", id_fila, FilaVirtual(**datos) if datos is not None else None)
+
+relay_workers.al_cambiar(repo_fila_virtual.tabla, aplicar_cambio_remoto)
+relay_workers.al_cambiar(repo_filas.tabla, aplicar_fila_remota)
 
 def Buscar_fila(id_fila: int):
     """Función legacy para buscar fila"""
@@ -85,8 +168,11 @@ async def fila_legacy():
     return {"api fila virtual activa"}
 
 @router.get("/filas/")
-async def filas_legacy():
-    return filas_list
+async def filas_legacy(
+    params: ParametrosLista = Depends(),
+    estado: Optional[str] = Query(None, description="Estados separados por coma")
+):
+    return responder_lista(filas_list, "id_fila", params, list(FilaVirtual.model_fields), filtro_estado("estado", estado))
 
 @router.get("/fila/{id_fila}")
 async def fila_por_id_legacy(id_fila: int):
@@ -94,14 +180,9 @@ async def fila_por_id_legacy(id_fila: int):
 
 @router.post("/fila/", response_model=FilaVirtual)
 async def fila(fila: FilaVirtual):
-    # Generar id_fila automáticamente si no fue provisto
-    max_id = 0
-    for existing in filas_list:
-        if existing.id_fila and existing.id_fila > max_id:
-            max_id = existing.id_fila
-
+    # Generar id_fila automáticamente si no fue provisto (único entre workers)
     if fila.id_fila is None:
-        fila.id_fila = max_id + 1
+        fila.id_fila = repo_filas.nuevo_id()
 
     # Comprobar existencia por id_fila ahora que tenemos id asignado
     exists = any(guardar_fila.id_fila == fila.id_fila for guardar_fila in filas_list)
@@ -116,6 +197,10 @@ async def fila(fila: FilaVirtual):
     if fila.tiempo_espera is None:
         fila.tiempo_espera = "15 min"
 
+    try:
+        repo_filas.insertar(fila)  # La base rechaza el id aunque lo haya creado otro worker
+    except RegistroDuplicado:
+        raise HTTPException(status_code=400, detail="La fila ya existe")
     filas_list.append(fila)
     # Enviar notificación al WebSocket (no-bloqueante)
     import asyncio
@@ -131,16 +216,29 @@ async def fila(fila: FilaVirtual):
     return fila
 
 # ===== ENDPOINTS NUEVOS =====
-@router.get("/fila-virtual/", response_model=List[PersonaFilaVirtual])
-async def obtener_fila_virtual():
-    """Obtener toda la fila virtual actual"""
-    actualizar_posiciones()
-    return fila_virtual_db
+@router.get("/fila-virtual/")
+async def obtener_fila_virtual(
+    response: Response,
+    since: Optional[int] = Query(None, ge=0, description="Devolver solo los cambios posteriores a esta secuencia")
+):
+    """
+    Obtener la fila virtual actual.
+    Con ?since=<seq> devuelve solo los cambios desde esa secuencia; si ya no
+    están en el log devuelve la fila completa con 'completo': true.
+    """
+    response.headers["X-Fila-Seq"] = str(cola_virtual.version)
+    if since is None:
+        return cola_virtual.esperando()
+    
+    cambios = cola_virtual.cambios_desde(since)
+    if cambios is None:
+        return {"seq": cola_virtual.version, "completo": True, "fila": cola_virtual.esperando()}
+    return {"seq": cola_virtual.version, "completo": False, "cambios": cambios}
 
 @router.get("/fila-virtual/{fila_id}", response_model=PersonaFilaVirtual)
 async def obtener_persona_fila(fila_id: int):
     """Obtener una persona específica de la fila virtual"""
-    persona = next((p for p in fila_virtual_db if p.id == fila_id), None)
+    persona = cola_virtual.obtener(fila_id)
     if not persona:
         raise HTTPException(status_code=404, detail="Persona no encontrada en la fila virtual")
     return persona
@@ -148,8 +246,6 @@ async def obtener_persona_fila(fila_id: int):
 @router.post("/fila-virtual/", response_model=PersonaFilaVirtual)
 async def agregar_a_fila_virtual(persona_data: PersonaFilaVirtualCreate):
     """Agregar una persona a la fila virtual"""
-    global id_counter
-    
     print(f"📥 Datos recibidos en POST /fila-virtual/: {persona_data.dict()}")
     
     try:
@@ -164,29 +260,27 @@ async def agregar_a_fila_virtual(persona_data: PersonaFilaVirtualCreate):
         
         print(f"✅ Valores procesados: cliente_id={cliente_id}, nombre={nombre}, telefono={telefono}, numeroPersonas={numero_personas}")
         
-        # Verificar si la persona ya está en la fila
-        persona_existente = next(
-            (p for p in fila_virtual_db if p.telefono == telefono and p.estado == "esperando"), 
-            None
-        )
-        if persona_existente:
-            print(f"⚠️ Persona {telefono} ya existe en la fila")
-            raise HTTPException(status_code=400, detail="Ya tienes una posición activa en la fila virtual")
-        
-        nueva_persona = PersonaFilaVirtual(
-            id=id_counter,
-            cliente_id=cliente_id,
-            nombre=nombre,
-            telefono=telefono,
-            numeroPersonas=numero_personas,
-            posicion=len(fila_virtual_db) + 1,
-            tiempoEstimado=calcular_tiempo_estimado(len(fila_virtual_db) + 1),
-            hora_llegada=hora_llegada,
-            estado=estado
-        )
-        
-        fila_virtual_db.append(nueva_persona)
-        id_counter += 1
+        # Chequeo de duplicado y alta en una transacción (sin carreras entre workers)
+        with transaccion():
+            # Verificar si la persona ya está en la fila
+            persona_existente = cola_virtual.buscar_por_telefono(telefono)
+            if persona_existente:
+                print(f"⚠️ Persona {telefono} ya existe en la fila")
+                raise HTTPException(status_code=400, detail="Ya tienes una posición activa en la fila virtual")
+            
+            nueva_persona = PersonaFilaVirtual(
+                id=repo_fila_virtual.nuevo_id(),  # Único entre workers
+                cliente_id=cliente_id,
+                nombre=nombre,
+                telefono=telefono,
+                numeroPersonas=numero_personas,
+                posicion=0,  # Posición y tiempo los asigna la cola al encolar
+                tiempoEstimado=0,
+                hora_llegada=hora_llegada,
+                estado=estado
+            )
+            
+            cola_virtual.agregar(nueva_persona)
         
         print(f"✅ Persona {nueva_persona.id} agregada a la fila: {nueva_persona.nombre}")
         
@@ -195,13 +289,12 @@ async def agregar_a_fila_virtual(persona_data: PersonaFilaVirtualCreate):
         try:
             asyncio.create_task(broadcast_fila_virtual("nueva_entrada", {
                 "type": "nueva_entrada",
-                "data": nueva_persona.dict(),
+                **cola_virtual.ultimo_cambio(),
                 "mensaje": f"{nueva_persona.nombre} se unió a la fila virtual"
             }))
         except Exception as e:
             print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
         
-        actualizar_posiciones()
         return nueva_persona
         
     except HTTPException as he:
@@ -215,21 +308,25 @@ async def agregar_a_fila_virtual(persona_data: PersonaFilaVirtualCreate):
 @router.put("/fila-virtual/{fila_id}/siguiente")
 async def siguiente_en_fila(fila_id: int):
     """Llamar al siguiente en la fila (marcar como 'llamado')"""
-    persona = next((p for p in fila_virtual_db if p.id == fila_id), None)
-    if not persona:
-        raise HTTPException(status_code=404, detail="Persona no encontrada en la fila virtual")
-    
+    with transaccion():
+        persona = cola_virtual.obtener(fila_id)
+        if not persona:
+            raise HTTPException(status_code=404, detail="Persona no encontrada en la fila virtual")
+        return llamar_persona(persona)
+
+def llamar_persona(persona: PersonaFilaVirtual, mesa=None) -> dict:
+    """Marca a la persona como llamada (con su mesa, si hay) y lo notifica"""
     if persona.estado != "esperando":
         raise HTTPException(status_code=400, detail="Esta persona ya no está esperando")
     
-    persona.estado = "llamado"
+    marcar_llamado(persona, mesa)
     
     # Notificar via WebSocket (no-bloqueante)
     import asyncio
     try:
         asyncio.create_task(broadcast_fila_virtual("persona_llamada", {
             "type": "persona_llamada",
-            "data": persona.dict(),
+            **cola_virtual.ultimo_cambio(),
             "mensaje": f"Es el turno de {persona.nombre} - Mesa lista"
         }))
     except Exception as e:
@@ -240,63 +337,63 @@ async def siguiente_en_fila(fila_id: int):
 @router.put("/fila-virtual/{fila_id}/confirmar")
 async def confirmar_llegada(fila_id: int):
     """Confirmar que la persona llegó al restaurante"""
-    global fila_virtual_db
-    
-    persona = next((p for p in fila_virtual_db if p.id == fila_id), None)
-    if not persona:
-        raise HTTPException(status_code=404, detail="Persona no encontrada en la fila virtual")
-    
-    if persona.estado != "llamado":
-        raise HTTPException(status_code=400, detail="Esta persona no ha sido llamada aún")
-    
-    # Remover de la fila virtual
-    fila_virtual_db = [p for p in fila_virtual_db if p.id != fila_id]
+    # Se valida dentro de la transacción: otro worker pudo vencer el llamado
+    with transaccion():
+        persona = cola_virtual.obtener(fila_id)
+        if not persona:
+            raise HTTPException(status_code=404, detail="Persona no encontrada en la fila virtual")
+        
+        if persona.estado != "llamado":
+            raise HTTPException(status_code=400, detail="Esta persona no ha sido llamada aún")
+        
+        # 'sentado' cumple la promesa de mesa en todos los workers; luego sale de la fila
+        cola_virtual.cambiar_estado(fila_id, "sentado")
+        cola_virtual.remover(fila_id)
+    vencimientos_llamados.cancelar(fila_id)
     
     # Notificar via WebSocket (no-bloqueante)
     import asyncio
     try:
         asyncio.create_task(broadcast_fila_virtual("persona_confirmada", {
             "type": "persona_confirmada",
-            "data": persona.dict(),
+            **cola_virtual.ultimo_cambio(),
             "mensaje": f"{persona.nombre} confirmó su llegada y fue asignado a una mesa"
         }))
     except Exception as e:
         print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
     
-    actualizar_posiciones()
     return {"mensaje": f"{persona.nombre} confirmó su llegada", "persona": persona}
 
 @router.delete("/fila-virtual/{fila_id}")
 async def remover_de_fila(fila_id: int):
     """Remover una persona de la fila virtual (cancelar o no confirmar)"""
-    global fila_virtual_db
-    
-    persona = next((p for p in fila_virtual_db if p.id == fila_id), None)
-    if not persona:
-        raise HTTPException(status_code=404, detail="Persona no encontrada en la fila virtual")
-    
-    # Remover de la fila
-    fila_virtual_db = [p for p in fila_virtual_db if p.id != fila_id]
+    with transaccion():
+        persona = cola_virtual.obtener(fila_id)
+        if not persona:
+            raise HTTPException(status_code=404, detail="Persona no encontrada en la fila virtual")
+        
+        # Remover de la fila (libera la mesa prometida, si tenía)
+        cola_virtual.remover(fila_id)
+    vencimientos_llamados.cancelar(fila_id)
     
     # Notificar via WebSocket (no-bloqueante)
     import asyncio
     try:
         asyncio.create_task(broadcast_fila_virtual("salida_fila", {
             "type": "salida_fila",
-            "data": persona.dict(),
+            **cola_virtual.ultimo_cambio(),
             "mensaje": f"{persona.nombre} fue removido de la fila virtual"
         }))
     except Exception as e:
         print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
     
-    actualizar_posiciones()
     return {"mensaje": f"{persona.nombre} fue removido de la fila virtual"}
 
 @router.get("/fila-virtual/estadisticas/resumen")
 async def obtener_estadisticas_fila():
     """Obtener estadísticas de la fila virtual"""
-    personas_esperando = [p for p in fila_virtual_db if p.estado == "esperando"]
-    personas_llamadas = [p for p in fila_virtual_db if p.estado == "llamado"]
+    personas_esperando = cola_virtual.esperando()
+    personas_llamadas = cola_virtual.con_estado("llamado")
     
     if personas_esperando:
         tiempo_espera_max = max(p.tiempoEstimado for p in personas_esperando)
@@ -315,83 +412,56 @@ async def obtener_estadisticas_fila():
 
 @router.get("/fila-virtual/tiempos-estimados/por-capacidad")
 async def obtener_tiempos_por_capacidad():
-    """Obtener tiempos estimados organizados por capacidad de mesa"""
-    personas_esperando = [p for p in fila_virtual_db if p.estado == "esperando"]
-    
-    tiempos_por_capacidad = {
-        "2_personas": [],
-        "4_personas": [],
-        "6_plus_personas": []
-    }
-    
-    for persona in personas_esperando:
-        if persona.numeroPersonas <= 2:
-            tiempos_por_capacidad["2_personas"].append(persona.tiempoEstimado)
-        elif persona.numeroPersonas <= 4:
-            tiempos_por_capacidad["4_personas"].append(persona.tiempoEstimado)
-        else:
-            tiempos_por_capacidad["6_plus_personas"].append(persona.tiempoEstimado)
+    """
+    Obtener tiempos estimados organizados por capacidad de mesa.
+    Usa los conteos por bucket de la cola y los intervalos del estimador,
+    sin recorrer la fila.
+    """
+    def resumen(buckets):
+        esperando = sum(cola_virtual.esperando_en_bucket(b) for b in buckets)
+        con_gente = [b for b in buckets if cola_virtual.esperando_en_bucket(b)] or buckets[:1]
+        return {
+            "personas_esperando": esperando,
+            "tiempo_estimado_min": min(estimador_espera(1, b, 1) for b in con_gente),
+            "tiempo_estimado_max": max(
+                estimador_espera(1, b, max(1, cola_virtual.esperando_en_bucket(b))) for b in con_gente
+            ),
+            "tiempo_nuevo_grupo": estimador_espera(1, buckets[0], cola_virtual.esperando_en_bucket(buckets[0]) + 1)
+        }
     
     return {
-        "mesa_2_personas": {
-            "personas_esperando": len(tiempos_por_capacidad["2_personas"]),
-            "tiempo_estimado_min": min(tiempos_por_capacidad["2_personas"]) if tiempos_por_capacidad["2_personas"] else 15,
-            "tiempo_estimado_max": max(tiempos_por_capacidad["2_personas"]) if tiempos_por_capacidad["2_personas"] else 25
-        },
-        "mesa_4_personas": {
-            "personas_esperando": len(tiempos_por_capacidad["4_personas"]),
-            "tiempo_estimado_min": min(tiempos_por_capacidad["4_personas"]) if tiempos_por_capacidad["4_personas"] else 25,
-            "tiempo_estimado_max": max(tiempos_por_capacidad["4_personas"]) if tiempos_por_capacidad["4_personas"] else 40
-        },
-        "mesa_6_plus_personas": {
-            "personas_esperando": len(tiempos_por_capacidad["6_plus_personas"]),
-            "tiempo_estimado_min": min(tiempos_por_capacidad["6_plus_personas"]) if tiempos_por_capacidad["6_plus_personas"] else 45,
-            "tiempo_estimado_max": max(tiempos_por_capacidad["6_plus_personas"]) if tiempos_por_capacidad["6_plus_personas"] else 60
-        }
+        "mesa_2_personas": resumen((bucket_capacidad(2),)),
+        "mesa_4_personas": resumen((bucket_capacidad(4),)),
+        "mesa_6_plus_personas": resumen((bucket_capacidad(6), bucket_capacidad(8))),
+        "intervalos_por_bucket": estimador_espera.intervalos()
     }
 
 # Funciones auxiliares para el administrador
 @router.post("/fila-virtual/admin/llamar-siguiente")
 async def admin_llamar_siguiente():
     """Función para que el admin llame al siguiente en la fila"""
-    siguiente = next((p for p in fila_virtual_db if p.estado == "esperando"), None)
-    if not siguiente:
-        raise HTTPException(status_code=404, detail="No hay personas esperando en la fila")
+    from routers.Mesa import mesas_libres, datos_asignacion
+    with transaccion():
+        siguiente = cola_virtual.siguiente()
+        if not siguiente:
+            raise HTTPException(status_code=404, detail="No hay personas esperando en la fila")
+        
+        # Reservarle la mesa libre más pequeña donde quepa su grupo
+        mesa = mesas_libres.mejor_mesa(siguiente.numeroPersonas)
+        resultado = llamar_persona(siguiente, mesa)
+    
+    if mesa:
+        resultado["mesa_asignada"] = datos_asignacion(mesa, siguiente)
     
-    return await siguiente_en_fila(siguiente.id)
+    return resultado
 
 @router.post("/fila-virtual/admin/limpiar-vencidos")
 async def admin_limpiar_vencidos():
-    """Limpiar personas que fueron llamadas hace más de 15 minutos y no confirmaron"""
-    global fila_virtual_db
-    ahora = datetime.now()
-    removidos = []
-    
-    for persona in fila_virtual_db[:]:  # Crear copia para iteración segura
-        if persona.estado == "llamado":
-            try:
-                hora_llamada = datetime.fromisoformat(persona.hora_llegada.replace('Z', '+00:00'))
-                if ahora - hora_llamada > timedelta(minutes=15):
-                    fila_virtual_db.remove(persona)
-                    removidos.append(persona.nombre)
-            except:
-                # Si hay error al parsear fecha, remover también
-                fila_virtual_db.remove(persona)
-                removidos.append(persona.nombre)
-    
-    if removidos:
-        # Notificar via WebSocket (no-bloqueante)
-        import asyncio
-        try:
-            asyncio.create_task(broadcast_fila_virtual("limpieza_vencidos", {
-                "type": "limpieza_vencidos",
-                "data": removidos,
-                "mensaje": f"Se removieron {len(removidos)} personas que no confirmaron su llegada"
-            }))
-        except Exception as e:
-            print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
-        actualizar_posiciones()
-    
+    """
+    Forzar el barrido de personas llamadas hace más de 15 minutos que no confirmaron.
+    Normalmente el programador de vencimientos ya las saca al cumplirse el plazo.
+    """
+    removidos = vencer_llamados(vencimientos_llamados.vencidos())
     return {"mensaje": f"Se removieron {len(removidos)} personas vencidas", "removidos": removidos}
 
 # ===== ENDPOINTS LEGACY ADICIONALES =====
@@ -402,6 +472,7 @@ async def actualizar_fila_legacy(fila: FilaVirtual):
     for index, guardar_fila in enumerate(filas_list):
         if guardar_fila.id_fila == fila.id_fila:
             filas_list[index] = fila
+            repo_filas.guardar(fila)
             found = True
             break
     
@@ -419,4 +490,5 @@ async def eliminar_fila_legacy(id_fila: int):
         raise HTTPException(status_code=404, detail="Fila no encontrada")
     
     filas_list = [f for f in filas_list if f.id_fila != id_fila]
+    repo_filas.eliminar(id_fila)
     return {"mensaje": f"Fila {id_fila} eliminada correctamente"}
\ No newline at end of file
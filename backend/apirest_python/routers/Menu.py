@@ -1,5 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
+from database import repositorio, relay_workers, RegistroDuplicado
+from utils.relay import aplicar_en_lista
+from utils.catalogo import ColeccionCatalogo, respuesta_catalogo
 
 router= APIRouter (tags=["Menu"])
 
@@ -8,17 +12,28 @@ class Menu(BaseModel):
     fecha: str
 '''    platos: plato[]'''
 
-menus_list = [Menu(id_menu=1, fecha="2024-10-05"),
+repo_menus = repositorio("menus", "id_menu", {"fecha": "TEXT"}, [("fecha",)])
+
+menus_list = repo_menus.cargar_o_sembrar(Menu, [Menu(id_menu=1, fecha="2024-10-05"),
               Menu(id_menu=2, fecha="2024-10-06"),
-              Menu(id_menu=3, fecha="2024-10-07")]
+              Menu(id_menu=3, fecha="2024-10-07")])
 
 @router.get("/menu/")
 async def menu():
     return {"api menu activa"}
 
+catalogo_menus = ColeccionCatalogo(lambda: menus_list, "id_menu")
+
+def aplicar_cambio_remoto(id_menu: int, datos: Optional[dict]):
+    """Aplica a la caché de este worker un menú escrito por otro worker"""
+    aplicar_en_lista(menus_list, "id_menu", id_menu, Menu(**datos) if datos is not None else None)
+    catalogo_menus.invalidar()
+
+relay_workers.al_cambiar(repo_menus.tabla, aplicar_cambio_remoto)
+
 @router.get("/menus/")
-async def menus():
-    return menus_list
+async def menus(request: Request):
+    return respuesta_catalogo(request, catalogo_menus.todo())
 
 #path
 @router.get("/menu/{id_menu}")
@@ -36,7 +51,12 @@ async def menu(menu: Menu):
     if type(Buscar_menu(menu.id_menu)) == Menu:
         raise HTTPException(status_code=400, detail="El menú ya existe")
     else:
+        try:
+            repo_menus.insertar(menu)  # La base rechaza el id aunque lo haya creado otro worker
+        except RegistroDuplicado:
+            raise HTTPException(status_code=400, detail="El menú ya existe")
         menus_list.append(menu)
+        catalogo_menus.invalidar()
         return menu
 
 #PUT
@@ -46,6 +66,8 @@ async def menu(menu: Menu):
     for index, guardar_menu in enumerate(menus_list):
         if guardar_menu.id_menu == menu.id_menu:
             menus_list[index] = menu
+            repo_menus.guardar(menu)
+            catalogo_menus.invalidar()
             found = True
             return {"actualizado exitosamente"}
     if not found:
@@ -58,6 +80,8 @@ async def menu(id: int):
     for index, guardar_menu in enumerate(menus_list):
         if guardar_menu.id_menu == id:
             del menus_list[index]
+            repo_menus.eliminar(id)
+            catalogo_menus.invalidar()
             found = True
             return {"Eliminado exitosamente"}
     if not found:
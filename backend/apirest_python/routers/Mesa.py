@@ -1,9 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
 import sys
 sys.path.append('..')
 from websocket_broadcast import broadcast_mesas, broadcast_fila_virtual
+from utils.mesa_matcher import IndiceMesasLibres, emparejar_lote
+from database import repositorio, relay_workers, transaccion, RegistroDuplicado
+from utils.relay import aplicar_en_lista
+from utils.paginacion import ParametrosLista, responder_lista, filtro_estado, combinar_filtros
+from routers.FilaVirtual import estimador_espera, cola_virtual
+from routers.Dashboard import agregados_dashboard
 
 router = APIRouter(tags=["Mesa"])
 
@@ -16,47 +22,135 @@ class Mesa(BaseModel):
     capacidad: int
     estado: str
 
-mesas_list = [Mesa(id_mesa=1, numero=1, capacidad=2, estado="disponible"),
+repo_mesas = repositorio("mesas", "id_mesa", {"estado": "TEXT"}, [("estado",)])
+
+mesas_list = repo_mesas.cargar_o_sembrar(Mesa, [Mesa(id_mesa=1, numero=1, capacidad=2, estado="disponible"),
               Mesa(id_mesa=2, numero=2, capacidad=4, estado="disponible"),
               Mesa(id_mesa=3, numero=3, capacidad=6, estado="ocupada"),
               Mesa(id_mesa=4, numero=4, capacidad=8, estado="disponible"),
               Mesa(id_mesa=5, numero=5, capacidad=4, estado="reservada"),
-              Mesa(id_mesa=6, numero=6, capacidad=2, estado="disponible")]
+              Mesa(id_mesa=6, numero=6, capacidad=2, estado="disponible")])
+
+# Mesas libres por capacidad (sin las ya prometidas a alguien de la fila)
+mesas_libres = IndiceMesasLibres()
+for _mesa in mesas_list:
+    mesas_libres.sincronizar(_mesa)
+    estimador_espera.agregar_mesa(_mesa.capacidad)
+    agregados_dashboard.mesa(_mesa)
+
+def aplicar_cambio_remoto(id_mesa: int, datos: Optional[dict]):
+    """Aplica a la caché de este worker una mesa escrita por otro worker"""
+    mesa = Mesa(**datos) if datos is not None else None
+    anterior = aplicar_en_lista(mesas_list, "id_mesa", id_mesa, mesa)
+    if mesa is None:
+        if anterior is not None:
+            mesas_libres.quitar(id_mesa)
+            estimador_espera.quitar_mesa(id_mesa, anterior.capacidad)
+            agregados_dashboard.quitar_mesa(id_mesa)
+        return
+    estado_anterior = anterior.estado if anterior is not None else None
+    if anterior is None:
+        estimador_espera.agregar_mesa(mesa.capacidad)
+    elif anterior.capacidad != mesa.capacidad:
+        estimador_espera.quitar_mesa(id_mesa, anterior.capacidad)
+        estimador_espera.agregar_mesa(mesa.capacidad)
+    mesas_libres.sincronizar(mesa, estado_anterior)
+    estimador_espera.observar(mesa, estado_anterior)  # El worker que escribió ya avisó a los clientes
+    agregados_dashboard.mesa(mesa)
+
+relay_workers.al_cambiar(repo_mesas.tabla, aplicar_cambio_remoto)
+
+def prometer_mesa_guardada(persona):
+    """Saca de las libres la mesa que la entrada de la fila dice tener prometida"""
+    mesa = next((m for m in mesas_list if m.id_mesa == persona.id_mesa), None)
+    if mesa is not None:
+        mesas_libres.prometer(mesa, persona.id)
+
+def seguir_promesas_de_mesa(cambio: dict):
+    """
+    Observador de la fila (cambios propios y de otros workers): al llamar a
+    alguien con mesa, la mesa sale de las libres; al sentarse la promesa se
+    cumple; si sale sin sentarse (cancela, vence, vuelve a esperar o se
+    vacía la fila), su mesa prometida vuelve al índice.
+    """
+    if cambio["op"] == "estado" and cambio["estado"] == "llamado":
+        persona = cola_virtual.obtener(cambio["id"])
+        if persona is not None and persona.id_mesa is not None:
+            prometer_mesa_guardada(persona)
+    elif cambio["op"] == "estado" and cambio["estado"] == "sentado":
+        mesas_libres.sentar(cambio["id"])
+    elif cambio["op"] == "baja" or (cambio["op"] == "estado" and cambio["estado"] == "esperando"):
+        mesas_libres.liberar(cambio["id"])
+    elif cambio["op"] == "reinicio":
+        mesas_libres.liberar_todas()
+
+cola_virtual.observar(seguir_promesas_de_mesa)
+for _persona in cola_virtual.con_estado("llamado"):
+    if _persona.id_mesa is not None:
+        prometer_mesa_guardada(_persona)
+
+def registrar_rotacion(mesa: Mesa, estado_anterior: Optional[str]):
+    """
+    Alimenta el estimador de espera con el cambio de estado de la mesa.
+    Si cambian los tiempos, la fila registra un cambio 'tiempos' y se notifica.
+    """
+    if not estimador_espera.observar(mesa, estado_anterior):
+        return
+    from routers.FilaVirtual import cola_virtual
+    import asyncio
+    
+    cambio = cola_virtual.notificar_tiempos(estimador_espera.intervalos())
+    try:
+        asyncio.create_task(broadcast_fila_virtual("tiempos_actualizados", {
+            "type": "tiempos_actualizados",
+            **cambio
+        }))
+    except Exception as e:
+        print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
 
 # ===== FUNCIÓN DE ASIGNACIÓN AUTOMÁTICA =====
 
+def datos_asignacion(mesa: Mesa, persona) -> dict:
+    """Payload de una asignación mesa -> persona de la fila"""
+    return {
+        "persona_id": persona.id,
+        "persona_nombre": persona.nombre,
+        "mesa_id": mesa.id_mesa,
+        "mesa_numero": mesa.numero,
+        "capacidad": mesa.capacidad,
+        "mensaje": f"¡{persona.nombre}! Tu mesa #{mesa.numero} está lista"
+    }
+
 async def asignar_siguiente_en_cola(mesa: Mesa):
     """
-    Busca al siguiente en la fila virtual que necesite una mesa con esta capacidad
-    y lo marca como 'llamado'.
+    Busca en la fila virtual al grupo que mejor aprovecha esta mesa
+    (best-fit por bucket de capacidad) y lo marca como 'llamado'.
     """
     try:
-        from routers.FilaVirtual import fila_virtual_db, PersonaFilaVirtual
+        from routers.FilaVirtual import cola_virtual, marcar_llamado
         import asyncio
         
-        # Buscar primera persona esperando que quepa en esta mesa
-        for persona in fila_virtual_db:
-            if persona.estado == "esperando" and persona.numeroPersonas <= mesa.capacidad:
-                persona.estado = "llamado"
-                
-                # Notificar via WebSocket
-                try:
-                    asyncio.create_task(broadcast_fila_virtual("mesa_asignada", {
-                        "type": "mesa_asignada",
-                        "persona_id": persona.id,
-                        "persona_nombre": persona.nombre,
-                        "mesa_id": mesa.id_mesa,
-                        "mesa_numero": mesa.numero,
-                        "capacidad": mesa.capacidad,
-                        "mensaje": f"¡{persona.nombre}! Tu mesa #{mesa.numero} está lista"
-                    }))
-                except Exception as e:
-                    print(f"⚠️ Error notificando asignación: {str(e)}")
-                
-                print(f"✅ Mesa #{mesa.numero} asignada automáticamente a {persona.nombre}")
-                return persona
+        # Con el lock de escritura: otro worker no puede prometer la misma mesa
+        with transaccion():
+            if mesa.id_mesa not in mesas_libres:
+                return None
+            persona = cola_virtual.mejor_para_mesa(mesa.capacidad)
+            if persona is None:
+                return None
+            marcar_llamado(persona, mesa)  # La promesa la registra seguir_promesas_de_mesa
         
-        return None
+        # Notificar via WebSocket
+        try:
+            asyncio.create_task(broadcast_fila_virtual("mesa_asignada", {
+                "type": "mesa_asignada",
+                **datos_asignacion(mesa, persona),
+                "cambio": cola_virtual.ultimo_cambio()
+            }))
+        except Exception as e:
+            print(f"⚠️ Error notificando asignación: {str(e)}")
+        
+        print(f"✅ Mesa #{mesa.numero} asignada automáticamente a {persona.nombre}")
+        return persona
     except Exception as e:
         print(f"⚠️ Error en asignación automática: {str(e)}")
         return None
@@ -66,8 +160,17 @@ async def mesa_status():
     return {"api mesa activa"}
 
 @router.get("/mesas/")
-async def get_mesas():
-    return mesas_list
+async def get_mesas(
+    params: ParametrosLista = Depends(),
+    estado: Optional[str] = Query(None, description="Estados separados por coma"),
+    capacidad_min: Optional[int] = Query(None, ge=1)
+):
+    """Mesas con filtros, paginación por cursor (id_mesa) y selección de campos"""
+    filtro = combinar_filtros(
+        filtro_estado("estado", estado),
+        (lambda m: m.capacidad >= capacidad_min) if capacidad_min else None
+    )
+    return responder_lista(mesas_list, "id_mesa", params, list(Mesa.model_fields), filtro)
 
 #path
 @router.get("/mesa/{id_mesa}")
@@ -91,7 +194,15 @@ async def crear_mesa(mesa: Mesa):
         if e.status_code != 404:
             raise e
     
+    try:
+        repo_mesas.insertar(mesa)  # La base rechaza el id aunque lo haya creado otro worker
+    except RegistroDuplicado:
+        raise HTTPException(status_code=400, detail="La mesa ya existe")
     mesas_list.append(mesa)
+    mesas_libres.sincronizar(mesa)
+    estimador_espera.agregar_mesa(mesa.capacidad)
+    registrar_rotacion(mesa, None)
+    agregados_dashboard.mesa(mesa)
     # Enviar notificación al WebSocket (no-bloqueante)
     import asyncio
     try:
@@ -115,6 +226,13 @@ async def actualizar_mesa(mesa: Mesa):
         if guardar_mesa.id_mesa == mesa.id_mesa:
             estado_anterior = guardar_mesa.estado
             mesas_list[index] = mesa
+            repo_mesas.guardar(mesa)
+            mesas_libres.sincronizar(mesa, estado_anterior)
+            if guardar_mesa.capacidad != mesa.capacidad:
+                estimador_espera.quitar_mesa(guardar_mesa.id_mesa, guardar_mesa.capacidad)
+                estimador_espera.agregar_mesa(mesa.capacidad)
+            registrar_rotacion(mesa, estado_anterior)
+            agregados_dashboard.mesa(mesa)
             found = True
             
             # Enviar notificación al WebSocket
@@ -162,6 +280,10 @@ async def cambiar_estado_mesa(id_mesa: int, nuevo_estado: str = Query(...)):
         if mesa.id_mesa == id_mesa:
             estado_anterior = mesa.estado
             mesa.estado = nuevo_estado
+            repo_mesas.guardar(mesa)
+            mesas_libres.sincronizar(mesa, estado_anterior)
+            registrar_rotacion(mesa, estado_anterior)
+            agregados_dashboard.mesa(mesa)
             
             import asyncio
             persona_asignada = None
@@ -193,6 +315,38 @@ async def cambiar_estado_mesa(id_mesa: int, nuevo_estado: str = Query(...)):
     
     raise HTTPException(status_code=404, detail="Mesa no encontrada")
 
+# Reasignación en lote: varias mesas se liberan a la vez
+@router.post("/mesas/reasignar")
+async def reasignar_mesas_libres():
+    """Empareja todas las mesas libres con la fila virtual en una sola pasada"""
+    from routers.FilaVirtual import cola_virtual, marcar_llamado
+    import asyncio
+    
+    seq_inicial = cola_virtual.version
+    with transaccion():
+        asignaciones = [
+            datos_asignacion(mesa, persona)
+            for mesa, persona in emparejar_lote(mesas_libres, cola_virtual, marcar_llamado)
+        ]
+    
+    if asignaciones:
+        try:
+            asyncio.create_task(broadcast_fila_virtual("reasignacion_lote", {
+                "type": "reasignacion_lote",
+                "data": asignaciones,
+                "seq": cola_virtual.version,
+                "cambios": cola_virtual.cambios_desde(seq_inicial),
+                "mensaje": f"Se asignaron {len(asignaciones)} mesas"
+            }))
+        except Exception as e:
+            print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
+    
+    return {
+        "message": f"Se asignaron {len(asignaciones)} mesas",
+        "asignaciones": asignaciones,
+        "mesas_libres_restantes": len(mesas_libres)
+    }
+
 # Endpoint para obtener estadísticas de mesas
 @router.get("/mesas/estadisticas")
 async def get_estadisticas_mesas():
@@ -215,6 +369,10 @@ async def eliminar_mesa(id: int):
         if guardar_mesa.id_mesa == id:
             mesa_eliminada = mesas_list[index]
             del mesas_list[index]
+            repo_mesas.eliminar(id)
+            mesas_libres.quitar(id)
+            estimador_espera.quitar_mesa(id, mesa_eliminada.capacidad)
+            agregados_dashboard.quitar_mesa(id)
             found = True
             # Enviar notificación al WebSocket (no-bloqueante)
             import asyncio
@@ -1,5 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from pydantic import BaseModel
+from typing import Optional
+from database import repositorio, relay_workers, RegistroDuplicado
+from utils.relay import aplicar_en_lista
+from utils.catalogo import ColeccionCatalogo, respuesta_catalogo, normalizar
+from utils.paginacion import ParametrosLista, responder_lista, filtro_estado
 
 router= APIRouter (tags=["Plato"])
 
@@ -13,7 +18,9 @@ class Plato(BaseModel):
     disponible: bool = True  # Campo adicional para frontend
 '''    Categoria: CategoriaMenu'''
 
-platos_list = [
+repo_platos = repositorio("platos", "id_plato", {"id_categoria": "INTEGER"}, [("id_categoria",)])
+
+platos_list = repo_platos.cargar_o_sembrar(Plato, [
     Plato(id_plato=1, nombre="Ceviche", descripcion="Pescado fresco marinado", precio=25.50, estado="disponible", id_categoria=1, disponible=True),
     Plato(id_plato=2, nombre="Tequeños", descripcion="Palitos de queso envueltos en masa", precio=18.00, estado="disponible", id_categoria=1, disponible=True),
     Plato(id_plato=3, nombre="Lomo Saltado", descripcion="Carne salteada con papas y verduras", precio=32.00, estado="disponible", id_categoria=2, disponible=True),
@@ -22,15 +29,62 @@ platos_list = [
     Plato(id_plato=6, nombre="Suspiro Limeño", descripcion="Postre tradicional peruano", precio=15.00, estado="disponible", id_categoria=3, disponible=True),
     Plato(id_plato=7, nombre="Tres Leches", descripcion="Torta húmeda con tres tipos de leche", precio=12.50, estado="disponible", id_categoria=3, disponible=True),
     Plato(id_plato=8, nombre="Anticuchos", descripcion="Brochetas de corazón marinado", precio=22.00, estado="disponible", id_categoria=1, disponible=True),
-]
+])
+
+# Catálogo cacheado: bytes JSON por categoría + índice invertido de nombre/descripción
+catalogo_platos = ColeccionCatalogo(
+    lambda: platos_list,
+    "id_plato",
+    campos_texto=("nombre", "descripcion"),
+    campo_grupo="id_categoria",
+    campo_precio="precio"
+)
+
+def aplicar_cambio_remoto(id_plato: int, datos: Optional[dict]):
+    """Aplica a la caché de este worker un plato escrito por otro worker"""
+    aplicar_en_lista(platos_list, "id_plato", id_plato, Plato(**datos) if datos is not None else None)
+    catalogo_platos.invalidar()
+
+relay_workers.al_cambiar(repo_platos.tabla, aplicar_cambio_remoto)
+
+def ids_categoria(categoria: str) -> list:
+    """Acepta el id de la categoría o (parte de) su nombre: '2', 'postres'"""
+    if categoria.strip().isdigit():
+        return [int(categoria)]
+    from routers.CategoriaMenu import categorias_list
+    buscado = normalizar(categoria.strip())
+    return [c.id_categoria for c in categorias_list if buscado in normalizar(c.nombre)]
 
 @router.get("/plato/")
 async def plato_status():
     return {"api plato activa"}
 
 @router.get("/platos/")
-async def get_platos():
-    return platos_list
+async def get_platos(
+    request: Request,
+    search: Optional[str] = Query(None, description="Texto a buscar en nombre y descripción"),
+    categoria: Optional[str] = Query(None, description="Id o nombre de la categoría"),
+    precio_min: Optional[float] = Query(None, ge=0),
+    precio_max: Optional[float] = Query(None, ge=0),
+    estado: Optional[str] = Query(None, description="Estados separados por coma"),
+    params: ParametrosLista = Depends()
+):
+    """
+    Platos del catálogo (cacheados, con ETag) con filtros opcionales.
+    Con limit/cursor/fields/formato la respuesta se pagina y se envía en streaming.
+    """
+    grupos = ids_categoria(categoria) if categoria else None
+    filtros = (search or None, grupos, precio_min, precio_max)
+    if params.por_defecto and estado is None:
+        return respuesta_catalogo(request, catalogo_platos.buscar(*filtros))
+    return responder_lista(
+        catalogo_platos.elementos(*filtros),
+        "id_plato",
+        params,
+        list(Plato.model_fields),
+        filtro_estado("estado", estado),
+        catalogo_platos.bytes_de
+    )
 
 #path
 @router.get("/plato/{id_plato}")
@@ -47,7 +101,7 @@ async def buscar_plato_query(id_plato: int):
 async def crear_plato(plato: Plato):
     # Generar ID automáticamente
     if not plato.id_plato or plato.id_plato == 0:
-        plato.id_plato = max([p.id_plato for p in platos_list]) + 1 if platos_list else 1
+        plato.id_plato = repo_platos.nuevo_id()
     
     # Verificar si ya existe un plato con el mismo ID
     try:
@@ -58,7 +112,12 @@ async def crear_plato(plato: Plato):
         if e.status_code != 404:
             raise e
     
+    try:
+        repo_platos.insertar(plato)  # La base rechaza el id aunque lo haya creado otro worker
+    except RegistroDuplicado:
+        raise HTTPException(status_code=400, detail="El plato ya existe")
     platos_list.append(plato)
+    catalogo_platos.invalidar()
     return plato
 
 #PUT
@@ -70,6 +129,8 @@ async def actualizar_plato(id_plato: int, plato: Plato):
             # Mantener el ID original
             plato.id_plato = id_plato
             platos_list[index] = plato
+            repo_platos.guardar(plato)
+            catalogo_platos.invalidar()
             found = True
             return {"message": "Plato actualizado exitosamente", "plato": plato}
     
@@ -84,6 +145,8 @@ async def eliminar_plato(id: int):
         if guardar_plato.id_plato == id:
             plato_eliminado = platos_list[index]
             del platos_list[index]
+            repo_platos.eliminar(id)
+            catalogo_platos.invalidar()
             found = True
             return {
                 "message": "Plato eliminado exitosamente",
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime, timedelta
+from typing import Optional, List, Tuple
+from datetime import datetime, date, timedelta
 import sys
 sys.path.append('..')
 from websocket_broadcast import broadcast_reservas
+from utils.reserva_index import IndiceReservas, hora_a_minutos, minutos_a_hora
+from utils.disponibilidad_grid import GrillaDisponibilidad
+from database import repositorio, relay_workers, transaccion
+from utils.relay import aplicar_en_lista
+from utils.paginacion import ParametrosLista, responder_lista, filtro_estado, filtro_rango, combinar_filtros
+from routers.Dashboard import agregados_dashboard
 
 router = APIRouter(tags=["Reserva"])
 
@@ -15,6 +21,8 @@ ESTADOS_RESERVA = ['pendiente', 'confirmada', 'en_curso', 'completada', 'cancela
 HORARIO_APERTURA = "11:00"
 HORARIO_CIERRE = "22:00"
 DURACION_RESERVA_MINUTOS = 120  # 2 horas por defecto
+MAX_DIAS_RANGO_DISPONIBILIDAD = 62  # Hasta dos meses por consulta
+MAX_LOTE_RESERVAS = 1000  # Reservas por llamada a /reservas/bulk
 
 class Reserva(BaseModel):
     id_reserva: Optional[int] = None
@@ -31,88 +39,146 @@ class Reserva(BaseModel):
     ocasion_especial: Optional[str] = None
     comentarios: Optional[str] = None
 
-reservas_list = []
+# Persistencia con índice por mesa+fecha para consultas de disponibilidad
+repo_reservas = repositorio(
+    "reservas",
+    "id_reserva",
+    {"id_mesa": "INTEGER", "fecha": "TEXT", "estado": "TEXT"},
+    [("id_mesa", "fecha"), ("fecha",)]
+)
+
+reservas_list = repo_reservas.cargar(Reserva)
+
+# Ocupación por bits: un bloque de 30 minutos por bit, por mesa y fecha
+grilla_disponibilidad = GrillaDisponibilidad(
+    hora_a_minutos(HORARIO_APERTURA),
+    hora_a_minutos(HORARIO_CIERRE),
+    30,
+    DURACION_RESERVA_MINUTOS
+)
+
+# Reservas activas por (mesa, fecha); se mantiene en cada alta, edición y baja
+indice_reservas = IndiceReservas(DURACION_RESERVA_MINUTOS, grilla_disponibilidad)
+for _reserva in reservas_list:
+    indice_reservas.indexar(_reserva)
+    agregados_dashboard.reserva(_reserva)
+
+def aplicar_cambio_remoto(id_reserva: int, datos: Optional[dict]):
+    """Aplica a la caché de este worker una reserva escrita por otro worker"""
+    reserva = Reserva(**datos) if datos is not None else None
+    aplicar_en_lista(reservas_list, "id_reserva", id_reserva, reserva)
+    if reserva is None:
+        indice_reservas.quitar(id_reserva)
+        agregados_dashboard.quitar_reserva(id_reserva)
+    else:
+        indice_reservas.indexar(reserva)
+        agregados_dashboard.reserva(reserva)
+
+relay_workers.al_cambiar(repo_reservas.tabla, aplicar_cambio_remoto)
 
 # ===== FUNCIONES DE VALIDACIÓN =====
 
-def parse_hora(hora_str: str) -> datetime:
-    """Convierte string de hora (HH:MM) a datetime para comparación"""
-    try:
-        return datetime.strptime(hora_str, "%H:%M")
-    except:
-        return datetime.strptime(hora_str.split(":")[0] + ":00", "%H:%M")
-
 def calcular_hora_fin(hora_inicio: str, duracion_minutos: int = DURACION_RESERVA_MINUTOS) -> str:
     """Calcula la hora de fin basada en hora de inicio y duración"""
-    inicio = parse_hora(hora_inicio)
-    fin = inicio + timedelta(minutes=duracion_minutos)
-    return fin.strftime("%H:%M")
-
-def horarios_se_solapan(inicio1: str, fin1: str, inicio2: str, fin2: str) -> bool:
-    """Verifica si dos rangos de horario se solapan"""
-    h_inicio1 = parse_hora(inicio1)
-    h_fin1 = parse_hora(fin1)
-    h_inicio2 = parse_hora(inicio2)
-    h_fin2 = parse_hora(fin2)
-    
-    # Hay solapamiento si un rango empieza antes de que termine el otro
-    return h_inicio1 < h_fin2 and h_inicio2 < h_fin1
+    return minutos_a_hora(hora_a_minutos(hora_inicio) + duracion_minutos)
 
 def verificar_conflicto(id_mesa: int, fecha: str, hora_inicio: str, hora_fin: str, excluir_reserva_id: int = None) -> dict:
     """
-    Verifica si existe conflicto con otras reservas.
+    Verifica si existe conflicto con otras reservas activas usando el índice
+    de intervalos (búsqueda binaria sobre la mesa y fecha).
     Retorna None si no hay conflicto, o dict con info del conflicto.
     """
-    for r in reservas_list:
-        # Ignorar la reserva actual (para ediciones)
-        if excluir_reserva_id and r.id_reserva == excluir_reserva_id:
-            continue
-        
-        # Solo verificar reservas activas (no canceladas, no_show, completadas)
-        if r.estado in ['cancelada', 'no_show', 'completada']:
-            continue
-            
-        # Verificar si es la misma mesa y fecha
-        if r.id_mesa == id_mesa and r.fecha == fecha:
-            r_hora_fin = r.hora_fin or calcular_hora_fin(r.hora_inicio)
-            
-            if horarios_se_solapan(r.hora_inicio, r_hora_fin, hora_inicio, hora_fin):
-                return {
-                    "reserva_existente": r.id_reserva,
-                    "hora_inicio": r.hora_inicio,
-                    "hora_fin": r_hora_fin,
-                    "nombre": r.nombre
-                }
+    inicio, fin = indice_reservas.intervalo(hora_inicio, hora_fin)
+    r = indice_reservas.conflicto(id_mesa, fecha, inicio, fin, excluir_reserva_id)
+    if r is None:
+        return None
     
-    return None
+    return {
+        "reserva_existente": r.id_reserva,
+        "hora_inicio": r.hora_inicio,
+        "hora_fin": r.hora_fin or calcular_hora_fin(r.hora_inicio),
+        "nombre": r.nombre
+    }
+
+def conflicto_de_cambio(anterior: Reserva, reserva: Reserva) -> Optional[dict]:
+    """
+    Conflicto que produciría guardar 'reserva' en lugar de 'anterior'.
+    Se valida si pasa a otra mesa, fecha u hora, o si vuelve a un estado
+    activo (p. ej. de 'cancelada' a 'confirmada') y ocupa otra vez la mesa.
+    """
+    if reserva.estado in IndiceReservas.ESTADOS_INACTIVOS or not reserva.id_mesa or not reserva.hora_inicio:
+        return None
+    mismo_turno = (
+        reserva.id_mesa == anterior.id_mesa and
+        reserva.fecha == anterior.fecha and
+        reserva.hora_inicio == anterior.hora_inicio
+    )
+    if mismo_turno and anterior.estado not in IndiceReservas.ESTADOS_INACTIVOS:
+        return None
+    hora_fin = reserva.hora_fin or calcular_hora_fin(reserva.hora_inicio)
+    return verificar_conflicto(reserva.id_mesa, reserva.fecha, reserva.hora_inicio, hora_fin,
+                               excluir_reserva_id=reserva.id_reserva)
+
+def error_de_conflicto(conflicto: dict) -> HTTPException:
+    return HTTPException(status_code=409, detail={
+        'error': 'Conflicto de horario',
+        'mensaje': f"La mesa ya está reservada de {conflicto['hora_inicio']} a {conflicto['hora_fin']}",
+        'conflicto': conflicto
+    })
+
+def buscar_en_cache(id_reserva: int) -> Optional[Reserva]:
+    return next((r for r in reservas_list if r.id_reserva == id_reserva), None)
 
 def obtener_horarios_disponibles(id_mesa: int, fecha: str) -> List[str]:
-    """Obtiene lista de horarios disponibles para una mesa en una fecha"""
-    horarios = []
-    hora_actual = parse_hora(HORARIO_APERTURA)
-    hora_cierre = parse_hora(HORARIO_CIERRE)
+    """Obtiene lista de horarios disponibles (cada 30 minutos) para una mesa en una fecha"""
+    return grilla_disponibilidad.horarios(grilla_disponibilidad.turnos_libres(id_mesa, fecha))
+
+def disponibilidad_del_dia(fecha: str, personas: int, mesas: list) -> dict:
+    """Mesas con capacidad suficiente y sus turnos libres, usando solo operaciones de bits"""
+    resultado = []
     
-    while hora_actual < hora_cierre:
-        hora_str = hora_actual.strftime("%H:%M")
-        hora_fin_str = calcular_hora_fin(hora_str)
-        
-        # Verificar si este horario está disponible
-        conflicto = verificar_conflicto(id_mesa, fecha, hora_str, hora_fin_str)
-        if not conflicto:
-            horarios.append(hora_str)
-        
-        # Avanzar 30 minutos
-        hora_actual += timedelta(minutes=30)
+    for mesa in mesas:
+        # Solo mesas con capacidad suficiente
+        if mesa.capacidad >= personas:
+            libres = grilla_disponibilidad.turnos_libres(mesa.id_mesa, fecha)
+            if libres:
+                resultado.append({
+                    "mesa_id": mesa.id_mesa,
+                    "numero": mesa.numero,
+                    "capacidad": mesa.capacidad,
+                    "horarios_disponibles": grilla_disponibilidad.horarios(libres)
+                })
     
-    return horarios
+    return {
+        "fecha": fecha,
+        "personas": personas,
+        "mesas_disponibles": resultado,
+        "total_opciones": sum(len(m["horarios_disponibles"]) for m in resultado)
+    }
 
 @router.get("/reserva/")
 async def reserva_status():
     return {"api reserva activa"}
 
 @router.get("/reservas/")
-async def get_reservas():
-    return reservas_list
+async def get_reservas(
+    params: ParametrosLista = Depends(),
+    estado: Optional[str] = Query(None, description="Estados separados por coma"),
+    fecha_desde: Optional[str] = Query(None, description="YYYY-MM-DD (inclusive)"),
+    fecha_hasta: Optional[str] = Query(None, description="YYYY-MM-DD (inclusive)"),
+    id_mesa: Optional[int] = Query(None)
+):
+    """
+    Reservas con filtros por estado, rango de fechas y mesa, paginación por
+    cursor (id_reserva) y selección de campos (?fields=id_reserva,fecha,estado).
+    Con formato=ndjson se envía un objeto por línea.
+    """
+    filtro = combinar_filtros(
+        filtro_estado("estado", estado),
+        filtro_rango("fecha", fecha_desde, fecha_hasta),
+        (lambda r: r.id_mesa == id_mesa) if id_mesa is not None else None
+    )
+    return responder_lista(reservas_list, "id_reserva", params, list(Reserva.model_fields), filtro)
 
 #path
 @router.get("/reserva/{id_reserva}")
@@ -137,25 +203,47 @@ async def obtener_disponibilidad(
     """
     from routers.Mesa import mesas_list
     
-    resultado = []
+    return disponibilidad_del_dia(fecha, personas, mesas_list)
+
+@router.get("/reservas/disponibilidad/rango")
+async def obtener_disponibilidad_rango(
+    desde: str = Query(..., description="Fecha inicial en formato YYYY-MM-DD"),
+    hasta: str = Query(..., description="Fecha final (incluida) en formato YYYY-MM-DD"),
+    personas: int = Query(default=2, description="Número de personas")
+):
+    """
+    Disponibilidad de una semana o un mes en una sola llamada
+    (para el calendario del frontend). Misma estructura por día que /reservas/disponibilidad.
+    """
+    from routers.Mesa import mesas_list
     
-    for mesa in mesas_list:
-        # Solo mesas con capacidad suficiente
-        if mesa.capacidad >= personas:
-            horarios = obtener_horarios_disponibles(mesa.id_mesa, fecha)
-            if horarios:
-                resultado.append({
-                    "mesa_id": mesa.id_mesa,
-                    "numero": mesa.numero,
-                    "capacidad": mesa.capacidad,
-                    "horarios_disponibles": horarios
-                })
+    try:
+        fecha_desde = date.fromisoformat(desde)
+        fecha_hasta = date.fromisoformat(hasta)
+    except ValueError:
+        raise HTTPException(status_code=400, detail={
+            'error': 'Fecha inválida',
+            'formato': 'YYYY-MM-DD'
+        })
+    
+    total_dias = (fecha_hasta - fecha_desde).days + 1
+    if total_dias < 1 or total_dias > MAX_DIAS_RANGO_DISPONIBILIDAD:
+        raise HTTPException(status_code=400, detail={
+            'error': 'Rango inválido',
+            'max_dias': MAX_DIAS_RANGO_DISPONIBILIDAD
+        })
+    
+    dias = [
+        disponibilidad_del_dia((fecha_desde + timedelta(days=i)).isoformat(), personas, mesas_list)
+        for i in range(total_dias)
+    ]
     
     return {
-        "fecha": fecha,
+        "desde": desde,
+        "hasta": hasta,
         "personas": personas,
-        "mesas_disponibles": resultado,
-        "total_opciones": sum(len(m["horarios_disponibles"]) for m in resultado)
+        "dias": dias,
+        "dias_con_disponibilidad": sum(1 for d in dias if d["mesas_disponibles"])
     }
 
 @router.get("/reservas/verificar-disponibilidad")
@@ -183,16 +271,11 @@ async def verificar_disponibilidad_especifica(
 
 # ===== ENDPOINTS CRUD =====
 
-#POST
-@router.post("/reserva/", response_model=Reserva)
-async def crear_reserva(reserva: Reserva):
-    # Generar id_reserva automáticamente
-    max_id = 0
-    for existing in reservas_list:
-        if existing.id_reserva and existing.id_reserva > max_id:
-            max_id = existing.id_reserva
-    reserva.id_reserva = max_id + 1
-
+def validar_nueva_reserva(reserva: Reserva) -> Optional[Tuple[int, dict]]:
+    """
+    Valida una reserva nueva contra el índice de conflictos y completa
+    hora_fin y estado. Devuelve (status, detalle) del error o None si es válida.
+    """
     # Validación de campos obligatorios
     missing_fields = []
     if not reserva.fecha:
@@ -205,37 +288,57 @@ async def crear_reserva(reserva: Reserva):
         missing_fields.append('nombre')
 
     if missing_fields:
-        raise HTTPException(status_code=400, detail={
+        return 400, {
             'error': 'Faltan campos obligatorios',
             'missing': missing_fields
-        })
+        }
 
     # Calcular hora_fin si no se proporciona
-    if not reserva.hora_fin:
-        reserva.hora_fin = calcular_hora_fin(reserva.hora_inicio)
+    try:
+        if not reserva.hora_fin:
+            reserva.hora_fin = calcular_hora_fin(reserva.hora_inicio)
 
-    # *** VALIDACIÓN DE CONFLICTOS ***
-    conflicto = verificar_conflicto(reserva.id_mesa, reserva.fecha, reserva.hora_inicio, reserva.hora_fin)
+        # *** VALIDACIÓN DE CONFLICTOS ***
+        conflicto = verificar_conflicto(reserva.id_mesa, reserva.fecha, reserva.hora_inicio, reserva.hora_fin)
+    except ValueError:
+        return 400, {'error': 'Hora inválida', 'formato': 'HH:MM'}
     if conflicto:
-        raise HTTPException(status_code=409, detail={
+        return 409, {
             'error': 'Conflicto de horario',
             'mensaje': f"La mesa ya está reservada de {conflicto['hora_inicio']} a {conflicto['hora_fin']}",
             'conflicto': conflicto,
             'sugerencia': 'Usa /reservas/disponibilidad para ver horarios libres'
-        })
+        }
 
     # Validar estado
     if reserva.estado and reserva.estado not in ESTADOS_RESERVA:
-        raise HTTPException(status_code=400, detail={
+        return 400, {
             'error': 'Estado inválido',
             'estados_validos': ESTADOS_RESERVA
-        })
+        }
 
     # Asegurar valores por defecto
     if reserva.estado is None:
         reserva.estado = 'pendiente'
+    return None
+
+#POST
+@router.post("/reserva/", response_model=Reserva)
+async def crear_reserva(reserva: Reserva):
+    # Validación y alta en la misma transacción: otro worker no puede
+    # reservar la mesa entre el chequeo de conflictos y la escritura
+    with transaccion():
+        error = validar_nueva_reserva(reserva)
+        if error:
+            raise HTTPException(status_code=error[0], detail=error[1])
+
+        # id reservado en la base (sin recorrer las reservas existentes)
+        reserva.id_reserva = repo_reservas.nuevo_id()
+        repo_reservas.guardar(reserva)
 
     reservas_list.append(reserva)
+    indice_reservas.indexar(reserva)
+    agregados_dashboard.reserva(reserva)
     
     # Enviar notificación al WebSocket
     import asyncio
@@ -255,56 +358,151 @@ async def crear_reserva(reserva: Reserva):
     
     return reserva
 
+@router.post("/reservas/bulk")
+async def crear_reservas_lote(
+    reservas: List[Reserva],
+    todo_o_nada: bool = Query(False, description="Si alguna reserva falla, no se crea ninguna")
+):
+    """
+    Alta de reservas en lote (por ejemplo, una temporada de eventos).
+
+    Cada reserva se valida contra el índice de conflictos y contra las
+    anteriores del mismo lote (se indexan al aceptarse), las aceptadas se
+    guardan en una sola transacción y se envía un único broadcast.
+    Devuelve el resultado de cada elemento en el orden recibido.
+    """
+    if not reservas:
+        raise HTTPException(status_code=400, detail={'error': 'El lote está vacío'})
+    if len(reservas) > MAX_LOTE_RESERVAS:
+        raise HTTPException(status_code=413, detail={
+            'error': 'Lote demasiado grande',
+            'maximo': MAX_LOTE_RESERVAS
+        })
+
+    # Validación contra el índice y alta en una transacción (sin carreras entre workers).
+    # Las aceptadas se indexan con id provisorio; si el lote no se guarda, se sacan.
+    resultados = []
+    aceptadas = []
+    guardadas = []
+    try:
+        with transaccion():
+            for posicion, reserva in enumerate(reservas):
+                reserva.id_reserva = -(posicion + 1)  # Id provisorio para indexar dentro del lote
+                error = validar_nueva_reserva(reserva)
+                if error is None:
+                    indice_reservas.indexar(reserva)
+                    aceptadas.append(reserva)
+                    resultados.append({"indice": posicion, "ok": True})
+                    continue
+                status, detalle = error
+                conflicto = detalle.get('conflicto')
+                if conflicto and conflicto['reserva_existente'] < 0:
+                    conflicto['indice_lote'] = -conflicto.pop('reserva_existente') - 1
+                resultados.append({"indice": posicion, "ok": False, "status": status, "error": detalle})
+
+            errores = len(reservas) - len(aceptadas)
+            if todo_o_nada and errores:
+                raise HTTPException(status_code=409, detail={
+                    'error': f'{errores} reservas no son válidas; no se creó ninguna',
+                    'resultados': [r for r in resultados if not r["ok"]]
+                })
+
+            if aceptadas:
+                ids = repo_reservas.reservar_ids(len(aceptadas))
+                guardadas = [r.model_copy(update={"id_reserva": i}) for r, i in zip(aceptadas, ids)]
+                repo_reservas.guardar_todos(guardadas)
+    except BaseException:
+        for reserva in aceptadas:
+            indice_reservas.quitar(reserva.id_reserva)
+        raise
+
+    # Lote confirmado en la base: recién ahora se actualiza la caché del worker
+    for reserva, guardada in zip(aceptadas, guardadas):
+        indice_reservas.quitar(reserva.id_reserva)
+        indice_reservas.indexar(guardada)
+        agregados_dashboard.reserva(guardada)
+    reservas_list.extend(guardadas)
+    aceptadas = guardadas
+
+    if aceptadas:
+        import asyncio
+        try:
+            asyncio.create_task(broadcast_reservas("reservas_lote", {
+                "id": aceptadas[0].id_reserva,  # Clave del evento: dos lotes seguidos no se fusionan
+                "reserva_ids": [r.id_reserva for r in aceptadas],
+                "fechas": sorted({r.fecha for r in aceptadas}),
+                "mensaje": f"Se crearon {len(aceptadas)} reservas"
+            }))
+        except Exception as e:
+            print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
+
+    por_indice = iter(aceptadas)
+    for resultado in resultados:
+        if resultado["ok"]:
+            resultado["id_reserva"] = next(por_indice).id_reserva
+
+    return {"creadas": len(aceptadas), "errores": errores, "resultados": resultados}
+
+@router.get("/reservas/export")
+async def exportar_reservas(
+    formato: str = Query("csv", description="csv o ndjson"),
+    fecha_desde: Optional[str] = Query(None, description="YYYY-MM-DD (inclusive)"),
+    fecha_hasta: Optional[str] = Query(None, description="YYYY-MM-DD (inclusive)"),
+    estado: Optional[str] = Query(None, description="Estados separados por coma"),
+    fields: Optional[str] = Query(None, description="Columnas a exportar, separadas por coma")
+):
+    """Exportación en streaming de reservas por rango de fechas (CSV o NDJSON)"""
+    if formato not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail={'error': 'Formato inválido', 'formatos_validos': ['csv', 'ndjson']})
+    params = ParametrosLista(limit=None, cursor=None, fields=fields, formato=formato)
+    filtro = combinar_filtros(
+        filtro_estado("estado", estado),
+        filtro_rango("fecha", fecha_desde, fecha_hasta)
+    )
+    response = responder_lista(reservas_list, "id_reserva", params, list(Reserva.model_fields), filtro)
+    nombre = f"reservas_{fecha_desde or 'inicio'}_{fecha_hasta or 'fin'}.{formato}"
+    response.headers["Content-Disposition"] = f'attachment; filename="{nombre}"'
+    return response
+
 #PUT
 @router.put("/reserva/")
 async def actualizar_reserva(reserva: Reserva):
-    found = False
-    for index, guardar_reserva in enumerate(reservas_list):
-        if guardar_reserva.id_reserva == reserva.id_reserva:
-            # Si cambia mesa, fecha u hora, validar conflictos
-            if (reserva.id_mesa != guardar_reserva.id_mesa or 
-                reserva.fecha != guardar_reserva.fecha or
-                reserva.hora_inicio != guardar_reserva.hora_inicio):
-                
-                hora_fin = reserva.hora_fin or calcular_hora_fin(reserva.hora_inicio)
-                conflicto = verificar_conflicto(
-                    reserva.id_mesa, 
-                    reserva.fecha, 
-                    reserva.hora_inicio, 
-                    hora_fin,
-                    excluir_reserva_id=reserva.id_reserva
-                )
-                if conflicto:
-                    raise HTTPException(status_code=409, detail={
-                        'error': 'Conflicto de horario',
-                        'mensaje': f"La mesa ya está reservada de {conflicto['hora_inicio']} a {conflicto['hora_fin']}",
-                        'conflicto': conflicto
-                    })
-            
-            # Validar estado
-            if reserva.estado and reserva.estado not in ESTADOS_RESERVA:
-                raise HTTPException(status_code=400, detail={
-                    'error': 'Estado inválido',
-                    'estados_validos': ESTADOS_RESERVA
-                })
-            
-            reservas_list[index] = reserva
-            found = True
-            
-            import asyncio
-            try:
-                asyncio.create_task(broadcast_reservas("update_reservation", {
-                    "reserva_id": reserva.id_reserva,
-                    "estado": reserva.estado,
-                    "fecha": reserva.fecha,
-                    "hora_inicio": reserva.hora_inicio
-                }))
-            except Exception as e:
-                print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
-            return {"message": "Reserva actualizada exitosamente", "reserva": reserva}
+    # Búsqueda, chequeo y escritura en una transacción (sin carreras entre workers)
+    with transaccion():
+        anterior = buscar_en_cache(reserva.id_reserva)
+        if anterior is None:
+            raise HTTPException(status_code=404, detail="No se encontró la reserva")
+        
+        # Otra mesa/fecha/hora o reactivación: validar conflictos
+        conflicto = conflicto_de_cambio(anterior, reserva)
+        if conflicto:
+            raise error_de_conflicto(conflicto)
+        
+        # Validar estado
+        if reserva.estado and reserva.estado not in ESTADOS_RESERVA:
+            raise HTTPException(status_code=400, detail={
+                'error': 'Estado inválido',
+                'estados_validos': ESTADOS_RESERVA
+            })
+        
+        repo_reservas.guardar(reserva)
     
-    if not found:
-        raise HTTPException(status_code=404, detail="No se encontró la reserva")
+    # La caché cambia solo si la escritura se confirmó
+    aplicar_en_lista(reservas_list, "id_reserva", reserva.id_reserva, reserva)
+    indice_reservas.indexar(reserva)
+    agregados_dashboard.reserva(reserva)
+    
+    import asyncio
+    try:
+        asyncio.create_task(broadcast_reservas("update_reservation", {
+            "reserva_id": reserva.id_reserva,
+            "estado": reserva.estado,
+            "fecha": reserva.fecha,
+            "hora_inicio": reserva.hora_inicio
+        }))
+    except Exception as e:
+        print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
+    return {"message": "Reserva actualizada exitosamente", "reserva": reserva}
 
 # Endpoint para cambiar estado fácilmente
 @router.put("/reserva/{id_reserva}/estado")
@@ -316,28 +514,39 @@ async def cambiar_estado_reserva(id_reserva: int, nuevo_estado: str = Query(...)
             'estados_validos': ESTADOS_RESERVA
         })
     
-    for reserva in reservas_list:
-        if reserva.id_reserva == id_reserva:
-            estado_anterior = reserva.estado
-            reserva.estado = nuevo_estado
-            
-            import asyncio
-            try:
-                asyncio.create_task(broadcast_reservas("cambio_estado", {
-                    "reserva_id": id_reserva,
-                    "estado_anterior": estado_anterior,
-                    "estado_nuevo": nuevo_estado,
-                    "mesa_id": reserva.id_mesa
-                }))
-            except Exception as e:
-                print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
-            
-            return {
-                "message": f"Estado cambiado de '{estado_anterior}' a '{nuevo_estado}'",
-                "reserva": reserva
-            }
+    with transaccion():
+        anterior = buscar_en_cache(id_reserva)
+        if anterior is None:
+            raise HTTPException(status_code=404, detail="Reserva no encontrada")
+        estado_anterior = anterior.estado
+        reserva = anterior.model_copy(update={"estado": nuevo_estado})
+        
+        # Volver a un estado activo ocupa otra vez la mesa
+        conflicto = conflicto_de_cambio(anterior, reserva)
+        if conflicto:
+            raise error_de_conflicto(conflicto)
+        
+        repo_reservas.guardar(reserva)
+    
+    aplicar_en_lista(reservas_list, "id_reserva", id_reserva, reserva)
+    indice_reservas.indexar(reserva)
+    agregados_dashboard.reserva(reserva)
+    
+    import asyncio
+    try:
+        asyncio.create_task(broadcast_reservas("cambio_estado", {
+            "reserva_id": id_reserva,
+            "estado_anterior": estado_anterior,
+            "estado_nuevo": nuevo_estado,
+            "mesa_id": reserva.id_mesa
+        }))
+    except Exception as e:
+        print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
     
-    raise HTTPException(status_code=404, detail="Reserva no encontrada")
+    return {
+        "message": f"Estado cambiado de '{estado_anterior}' a '{nuevo_estado}'",
+        "reserva": reserva
+    }
 
 # Endpoint para obtener reservas del día
 @router.get("/reservas/hoy")
@@ -378,33 +587,34 @@ async def get_estadisticas_reservas():
 #Delete
 @router.delete("/reserva/{id}")
 async def eliminar_reserva(id: int):
-    found = False
-    for index, guardar_reserva in enumerate(reservas_list):
-        if guardar_reserva.id_reserva == id:
-            reserva_eliminada = reservas_list[index]
-            del reservas_list[index]
-            found = True
-            # Enviar notificación al WebSocket (no-bloqueante)
-            import asyncio
-            try:
-                asyncio.create_task(broadcast_reservas("reserva_eliminada", {
-                    "reserva_id": reserva_eliminada.id_reserva,
-                    "fecha": reserva_eliminada.fecha,
-                    "hora_inicio": reserva_eliminada.hora_inicio
-                }))
-            except Exception as e:
-                print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
-            return {
-                "message": "Reserva eliminada exitosamente", 
-                "reserva_eliminada": {
-                    "id_reserva": reserva_eliminada.id_reserva,
-                    "fecha": reserva_eliminada.fecha,
-                    "hora_inicio": reserva_eliminada.hora_inicio
-                }
-            }
+    with transaccion():
+        reserva_eliminada = buscar_en_cache(id)
+        if reserva_eliminada is None:
+            raise HTTPException(status_code=404, detail="No se encontró la reserva")
+        repo_reservas.eliminar(id)
     
-    if not found:
-        raise HTTPException(status_code=404, detail="No se encontró la reserva")
+    aplicar_en_lista(reservas_list, "id_reserva", id, None)
+    indice_reservas.quitar(id)
+    agregados_dashboard.quitar_reserva(id)
+    
+    # Enviar notificación al WebSocket (no-bloqueante)
+    import asyncio
+    try:
+        asyncio.create_task(broadcast_reservas("reserva_eliminada", {
+            "reserva_id": reserva_eliminada.id_reserva,
+            "fecha": reserva_eliminada.fecha,
+            "hora_inicio": reserva_eliminada.hora_inicio
+        }))
+    except Exception as e:
+        print(f"⚠️ Error en WebSocket broadcast: {str(e)}")
+    return {
+        "message": "Reserva eliminada exitosamente", 
+        "reserva_eliminada": {
+            "id_reserva": reserva_eliminada.id_reserva,
+            "fecha": reserva_eliminada.fecha,
+            "hora_inicio": reserva_eliminada.hora_inicio
+        }
+    }
 
 #funciones
 def Buscar_reserva(id_reserva: int):
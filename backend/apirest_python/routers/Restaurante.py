@@ -1,5 +1,8 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from database import repositorio, relay_workers, RegistroDuplicado
+from utils.relay import aplicar_en_lista
 
 router= APIRouter (tags=["Restaurante"])
 
@@ -13,9 +16,17 @@ class Restaurante(BaseModel):
     menu: Menu
 '''
 
-lista_restaurantes= [Restaurante(id_restaurante=1, nombre="restaurante1", direccion="Calle 1", telefono="123"),
+repo_restaurantes = repositorio("restaurantes", "id_restaurante")
+
+lista_restaurantes= repo_restaurantes.cargar_o_sembrar(Restaurante, [Restaurante(id_restaurante=1, nombre="restaurante1", direccion="Calle 1", telefono="123"),
                      Restaurante(id_restaurante=2, nombre="restaurante2", direccion="Calle 2", telefono="987"),
-                     Restaurante(id_restaurante=3, nombre="restaurante3", direccion="Calle 3", telefono="456")]
+                     Restaurante(id_restaurante=3, nombre="restaurante3", direccion="Calle 3", telefono="456")])
+
+def aplicar_cambio_remoto(id_restaurante: int, datos: Optional[dict]):
+    """Aplica a la caché de este worker un restaurante escrito por otro worker"""
+    aplicar_en_lista(lista_restaurantes, "id_restaurante", id_restaurante, Restaurante(**datos) if datos is not None else None)
+
+relay_workers.al_cambiar(repo_restaurantes.tabla, aplicar_cambio_remoto)
 
 @router.get("/restaurante")
 def get_restaurante():
@@ -34,6 +45,10 @@ async def restaurante (restaurante: Restaurante):
     if type(buscar_restaurante(restaurante.id_restaurante))== Restaurante:
         raise HTTPException(status_code=400, detail="El restaurante ya existe")
     else:
+        try:
+            repo_restaurantes.insertar(restaurante)  # La base rechaza el id aunque lo haya creado otro worker
+        except RegistroDuplicado:
+            raise HTTPException(status_code=400, detail="El restaurante ya existe")
         lista_restaurantes.append(restaurante)
         return restaurante
 
@@ -43,6 +58,7 @@ async def restaurante (restaurante: Restaurante):
     for index, guardar_restaurante in enumerate(lista_restaurantes):
         if guardar_restaurante.id_restaurante == restaurante.id_restaurante:
             lista_restaurantes[index] = restaurante
+            repo_restaurantes.guardar(restaurante)
             found= True
             return {"actualizado exitosamente"}
     if not found:
@@ -54,6 +70,7 @@ async def restaurante (id_restaurante: int):
     for index, guardar_restaurante in enumerate(lista_restaurantes):
         if guardar_restaurante.id_restaurante == id_restaurante:
             del lista_restaurantes[index]
+            repo_restaurantes.eliminar(id_restaurante)
             found= True
             return {"Eliminado exitosamente"}
     if not found:
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import asyncio
+import sys
+sys.path.append('..')
+from websocket_broadcast import hub_eventos
+
+router = APIRouter(
+    prefix="/tiempo-real",
+    tags=["TiempoReal"],
+    responses={404: {"description": "No encontrado"}}
+)
+
+# Segundos entre comentarios de keep-alive en el stream SSE
+SSE_KEEPALIVE_SEGUNDOS = 15
+
+# Código de cierre WebSocket para un suscriptor lento ("try again later")
+CIERRE_SUSCRIPTOR_LENTO = 1013
+
+
+def canales_pedidos(canales: Optional[str]) -> Optional[List[str]]:
+    """'mesas,reservas' -> ['mesas', 'reservas'] (None = todos los canales)"""
+    if not canales:
+        return None
+    return [c.strip() for c in canales.split(",") if c.strip()]
+
+
+@router.get("/stream", summary="Stream SSE de eventos")
+async def stream_eventos(
+    request: Request,
+    canales: Optional[str] = Query(default=None, description="Canales separados por coma (fila_virtual, mesas, reservas)")
+):
+    """
+    Server-Sent Events con los mismos mensajes que el servidor WebSocket Ruby
+    ({channel, action, data}); el nombre del evento SSE es el canal.
+    Si el cliente no lee y se llena su buffer, se cierra el stream.
+    """
+    try:
+        suscriptor = hub_eventos.suscribir(canales_pedidos(canales))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "canales": list(hub_eventos.canales)})
+
+    async def eventos():
+        try:
+            yield ": conectado\n\n"
+            while not await request.is_disconnected():
+                try:
+                    mensaje = await suscriptor.siguiente(timeout=SSE_KEEPALIVE_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if mensaje is None:
+                    yield "event: expulsado\ndata: {}\n\n"
+                    return
+                canal, texto = mensaje
+                yield f"event: {canal}\ndata: {texto}\n\n"
+        finally:
+            hub_eventos.desuscribir(suscriptor)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def websocket_eventos(websocket: WebSocket, canales: Optional[str] = None):
+    """
+    WebSocket nativo con los eventos de los canales pedidos
+    (reemplaza el salto al servidor Ruby para clientes que se conecten aquí)
+    """
+    try:
+        suscriptor = hub_eventos.suscribir(canales_pedidos(canales))
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    async def escuchar_cierre():
+        # El cliente no envía nada útil; solo se detecta la desconexión
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    cierre = asyncio.create_task(escuchar_cierre())
+    try:
+        while not cierre.done():
+            siguiente = asyncio.create_task(suscriptor.siguiente())
+            await asyncio.wait({siguiente, cierre}, return_when=asyncio.FIRST_COMPLETED)
+            if not siguiente.done():
+                siguiente.cancel()
+                break
+            mensaje = siguiente.result()
+            if mensaje is None:
+                await websocket.close(code=CIERRE_SUSCRIPTOR_LENTO)
+                break
+            await websocket.send_text(mensaje[1])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        cierre.cancel()
+        hub_eventos.desuscribir(suscriptor)
+
+
+@router.get("/metrics", summary="Métricas del hub de eventos")
+async def metricas_tiempo_real():
+    return hub_eventos.resumen()
@@ -4,15 +4,34 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError
-from passlib.context import CryptContext
-import bcrypt
 from datetime import datetime, timedelta, timezone
+from typing import Optional
+import os
+import sys
+from database import repositorio, relay_workers, RegistroDuplicado
+from utils.token_cache import CacheTokens
+
+# backend/shared: en la imagen se copia junto al servicio; en desarrollo está un nivel arriba
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.password_hasher import PasswordHasher, HashSaturado
 
 # Configuración JWT
 ALGORITHM = "HS256"
 ACCESS_TOKEN_DURATION = 60  # 60 minutos
 SECRET = "restaurante_secret_key_2024_proyecto_autonomo_servidores"
 
+# Usuarios con acceso a las operaciones de administración
+ADMIN_USUARIOS = {u.strip() for u in os.getenv("ADMIN_USUARIOS", "admin,crisjo").split(",") if u.strip()}
+
+# Tickets de los streams SSE (EventSource no envía headers): vida corta y solo para streams
+TICKET_STREAM_SEGUNDOS = 30
+TICKET_STREAM_AUDIENCIA = "stream"
+
+# Configuración bcrypt: costo de los hashes nuevos y tamaño del pool de hilos
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_HILOS = int(os.getenv("BCRYPT_HILOS", "2"))
+BCRYPT_MAX_EN_COLA = int(os.getenv("BCRYPT_MAX_EN_COLA", "64"))
+
 router = APIRouter(
     prefix="/auth",
     tags=["auth"],
@@ -20,26 +39,33 @@ router = APIRouter(
 )
 
 oauth2 = OAuth2PasswordBearer(tokenUrl="auth/login")
-crypt = CryptContext(schemes=["bcrypt"])
+
+# bcrypt corre en un pool de hilos propio: un login no bloquea el event loop
+servicio_contrasenas = PasswordHasher(BCRYPT_ROUNDS, BCRYPT_HILOS, BCRYPT_MAX_EN_COLA)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica una contraseña usando bcrypt directamente"""
+    """Verifica una contraseña con bcrypt (síncrono, para scripts; los endpoints usan el servicio)"""
+    return servicio_contrasenas.verify_sync(plain_password, hashed_password)
+
+async def verificar_contrasena(username: str, password: str, hashed: str) -> bool:
+    """
+    Verifica en el pool de bcrypt; si el hash guardado tiene otro costo
+    que BCRYPT_ROUNDS se reemplaza por uno nuevo (rehash transparente).
+    """
     try:
-        # Intentar con passlib primero
-        return crypt.verify(plain_password, hashed_password)
-    except Exception as e:
-        try:
-            # Si falla, intentar con bcrypt directamente
-            # Los hashes de bcrypt deben ser bytes
-            if isinstance(hashed_password, str):
-                hashed_password = hashed_password.encode('utf-8')
-            if isinstance(plain_password, str):
-                plain_password = plain_password.encode('utf-8')
-            return bcrypt.checkpw(plain_password, hashed_password)
-        except Exception as e2:
-            print(f"Error verificando contraseña (passlib): {e}")
-            print(f"Error verificando contraseña (bcrypt): {e2}")
-            return False
+        correcta, nuevo_hash = await servicio_contrasenas.verify_and_rehash(password, hashed)
+    except HashSaturado:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": "Demasiados inicios de sesión simultáneos", "reintentar_en_segundos": 1},
+            headers={"Retry-After": "1"}
+        )
+    if correcta and nuevo_hash is not None and username in users_auth_db:
+        actualizado = {**users_auth_db[username], "password": nuevo_hash}
+        indexar_usuario(actualizado)
+        repo_users_auth.guardar(actualizado)
+        print(f"🔐 Contraseña de {username} re-hasheada con costo {servicio_contrasenas.rounds}")
+    return correcta
 
 # Modelos de usuario para autenticación
 class UserAuth(BaseModel):
@@ -61,7 +87,9 @@ class UserCreate(BaseModel):
 
 # Base de datos de usuarios con autenticación
 # Las contraseñas están hasheadas con bcrypt
-users_auth_db = {
+repo_users_auth = repositorio("users_auth", "username", {"email": "TEXT"}, [("email",)], tipo_id="TEXT")
+
+_usuarios_iniciales = {
     "admin": {
         "username": "admin",
         "full_name": "Administrador",
@@ -96,6 +124,43 @@ users_auth_db = {
     }
 }
 
+users_auth_db = {}
+
+# Índices derivados de users_auth_db: usuario público ya construido (se
+# reutiliza en cada request) y email -> username para el login
+usuarios_publicos = {}
+usuarios_por_email = {}
+
+def indexar_usuario(datos: dict):
+    """Alta o cambio de un usuario en users_auth_db y sus índices"""
+    anterior = users_auth_db.get(datos["username"])
+    if anterior is not None and usuarios_por_email.get(anterior.get("email")) == datos["username"]:
+        del usuarios_por_email[anterior["email"]]
+    users_auth_db[datos["username"]] = datos
+    usuarios_publicos[datos["username"]] = UserAuth(**datos)
+    usuarios_por_email[datos.get("email")] = datos["username"]
+
+def quitar_usuario(username: str):
+    datos = users_auth_db.pop(username, None)
+    usuarios_publicos.pop(username, None)
+    if datos is not None and usuarios_por_email.get(datos.get("email")) == username:
+        del usuarios_por_email[datos["email"]]
+
+for _usuario in repo_users_auth.cargar_o_sembrar(None, list(_usuarios_iniciales.values())):
+    indexar_usuario(_usuario)
+
+# Tokens ya verificados: una petición autenticada repetida no vuelve a decodificar el JWT
+cache_tokens = CacheTokens()
+
+def aplicar_cambio_remoto(username: str, datos: Optional[dict]):
+    """Aplica a la caché de este worker un usuario registrado por otro worker"""
+    if datos is None:
+        quitar_usuario(username)
+    else:
+        indexar_usuario(datos)
+
+relay_workers.al_cambiar(repo_users_auth.tabla, aplicar_cambio_remoto)
+
 # Funciones de búsqueda de usuarios
 def search_user_db(username: str):
     """Busca usuario en la base de datos con contraseña"""
@@ -104,10 +169,8 @@ def search_user_db(username: str):
     return None
 
 def search_user(username: str):
-    """Busca usuario sin contraseña"""
-    if username in users_auth_db:
-        return UserAuth(**users_auth_db[username])
-    return None
+    """Busca usuario sin contraseña (objeto compartido, no modificar)"""
+    return usuarios_publicos.get(username)
 
 # Función de autenticación del token
 async def auth_user(token: str = Depends(oauth2)):
@@ -118,12 +181,16 @@ async def auth_user(token: str = Depends(oauth2)):
         headers={"WWW-Authenticate": "Bearer"}
     )
 
-    try:
-        username = jwt.decode(token, SECRET, algorithms=[ALGORITHM]).get("sub")
+    username = cache_tokens.obtener(token)
+    if username is None:
+        try:
+            payload = jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+        except JWTError:
+            raise exception
+        username = payload.get("sub")
         if username is None:
             raise exception
-    except JWTError:
-        raise exception
+        cache_tokens.guardar(token, username, payload.get("exp"))
 
     user = search_user(username)
     if user is None:
@@ -141,6 +208,44 @@ async def current_user(user: UserAuth = Depends(auth_user)):
         )
     return user
 
+async def current_admin(user: UserAuth = Depends(current_user)):
+    """Verifica que el usuario sea administrador"""
+    if user.username not in ADMIN_USUARIOS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo administradores"
+        )
+    return user
+
+def crear_ticket_stream(username: str) -> str:
+    """
+    Ticket para abrir un stream SSE por query string. No sirve como token
+    de acceso (auth_user lo rechaza por la audiencia) y vence en segundos,
+    así lo que quede en logs de proxies o en el historial no da acceso.
+    """
+    return jwt.encode({
+        "sub": username,
+        "aud": TICKET_STREAM_AUDIENCIA,
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=TICKET_STREAM_SEGUNDOS)
+    }, SECRET, algorithm=ALGORITHM)
+
+async def usuario_de_ticket(ticket: str) -> UserAuth:
+    """Valida un ticket de stream y devuelve el usuario activo"""
+    exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Ticket de stream inválido o vencido"
+    )
+    try:
+        payload = jwt.decode(ticket, SECRET, algorithms=[ALGORITHM], audience=TICKET_STREAM_AUDIENCIA)
+    except JWTError:
+        raise exception
+    if payload.get("aud") != TICKET_STREAM_AUDIENCIA:
+        raise exception  # Un token de acceso (sin audiencia) no abre streams
+    user = search_user(payload.get("sub"))
+    if user is None:
+        raise exception
+    return await current_user(user)
+
 # Modelo para login JSON (Frontend Admin)
 class LoginRequest(BaseModel):
     email: str
@@ -168,15 +273,11 @@ async def login_json(credentials: LoginRequest):
             detail="Solo administradores pueden acceder"
         )
     
-    # Buscar usuario por email
-    user_db = None
-    username_found = None
-    for username, user_data in users_auth_db.items():
-        if user_data.get("email") == credentials.email:
-            user_db = user_data
-            username_found = username
-            print(f"[LOGIN] Usuario encontrado: {username_found}")
-            break
+    # Buscar usuario por email (índice email -> username)
+    username_found = usuarios_por_email.get(credentials.email)
+    user_db = users_auth_db.get(username_found) if username_found else None
+    if user_db:
+        print(f"[LOGIN] Usuario encontrado: {username_found}")
     
     if not user_db:
         print(f"[LOGIN] Usuario no encontrado para email: {credentials.email}")
@@ -189,8 +290,10 @@ async def login_json(credentials: LoginRequest):
     try:
         print(f"[LOGIN] Verificando contraseña para usuario: {username_found}")
         print(f"[LOGIN] Hash almacenado: {user_db['password'][:30]}...")
-        password_correct = verify_password(credentials.password, user_db["password"])
+        password_correct = await verificar_contrasena(username_found, credentials.password, user_db["password"])
         print(f"[LOGIN] Resultado verificación: {password_correct}")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[LOGIN] Error verificando contraseña: {e}")
         import traceback
@@ -249,7 +352,7 @@ async def login_form(form: OAuth2PasswordRequestForm = Depends()):
         )
 
     # Verificar la contraseña
-    if not verify_password(form.password, user.password):
+    if not await verificar_contrasena(user.username, form.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="La contraseña no es correcta"
@@ -285,7 +388,14 @@ async def register(user_data: UserCreate):
         )
     
     # Hashear la contraseña
-    hashed_password = crypt.hash(user_data.password)
+    try:
+        hashed_password = await servicio_contrasenas.hash(user_data.password)
+    except HashSaturado:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": "Demasiados registros simultáneos", "reintentar_en_segundos": 1},
+            headers={"Retry-After": "1"}
+        )
     
     # Crear nuevo usuario
     new_user = {
@@ -297,8 +407,15 @@ async def register(user_data: UserCreate):
         "password": hashed_password
     }
     
-    # Agregar a la base de datos
-    users_auth_db[user_data.username] = new_user
+    # Agregar a la base de datos (el username es la clave: otro worker no puede crearlo a la vez)
+    try:
+        repo_users_auth.insertar(new_user)
+    except RegistroDuplicado:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El usuario ya existe"
+        )
+    indexar_usuario(new_user)
     
     # Retornar usuario sin contraseña
     return UserAuth(**new_user)
@@ -307,10 +424,7 @@ async def register(user_data: UserCreate):
 @router.get("/users")
 async def get_all_users(current_user: UserAuth = Depends(current_user)):
     """Obtiene lista de todos los usuarios (requiere autenticación)"""
-    users = []
-    for username, user_data in users_auth_db.items():
-        users.append(UserAuth(**user_data))
-    return users
+    return list(usuarios_publicos.values())
 
 # Endpoint para verificar el estado de autenticación
 @router.get("/verify")
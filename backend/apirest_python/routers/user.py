@@ -1,5 +1,8 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel 
+from database import repositorio, relay_workers, RegistroDuplicado
+from utils.relay import aplicar_en_lista
 
 router = APIRouter(tags=["user"])
 
@@ -10,10 +13,18 @@ class User(BaseModel):
     correo: str
     telefono: str
 
-users_list = [User(id_cliente=1, nombre="crisjo", correo= "correo1", telefono="123"),
+repo_users = repositorio("users", "id_cliente")
+
+users_list = repo_users.cargar_o_sembrar(User, [User(id_cliente=1, nombre="crisjo", correo= "correo1", telefono="123"),
               User(id_cliente=2, nombre="victoria", correo= "correo2", telefono="456"),
-              User(id_cliente=3, nombre="kilian", correo= "correo3", telefono="789")]
+              User(id_cliente=3, nombre="kilian", correo= "correo3", telefono="789")])
+
+
+def aplicar_cambio_remoto(id_cliente: int, datos: Optional[dict]):
+    """Aplica a la caché de este worker un usuario escrito por otro worker"""
+    aplicar_en_lista(users_list, "id_cliente", id_cliente, User(**datos) if datos is not None else None)
 
+relay_workers.al_cambiar(repo_users.tabla, aplicar_cambio_remoto)
 
 @router.get("/user/")
 async def users ():
@@ -40,6 +51,10 @@ async def user (user: User):
     if type (Buscar_usuario(user.id_cliente)) ==User:
         raise HTTPException(status_code=400, detail="Error usuario ya existe")
     else:
+        try:
+            repo_users.insertar(user)  # La base rechaza el id aunque lo haya creado otro worker
+        except RegistroDuplicado:
+            raise HTTPException(status_code=400, detail="Error usuario ya existe")
         users_list.append(user)
         return user
  
@@ -50,6 +65,7 @@ async def user (user: User):
     for index, guardar_user in enumerate(users_list):
         if guardar_user.id_cliente == user.id_cliente:
             users_list[index] = user
+            repo_users.guardar(user)
             found= True
             return {"actualizado exitosamente"}
     if not found:
@@ -62,6 +78,7 @@ async def user (id: int):
     for index, guardar_user in enumerate(users_list):
         if guardar_user.id_cliente == id:
             del users_list[index]
+            repo_users.eliminar(id)
             found= True
             return{"Eliminado exitosamente"}
     if not found:
@@ -7,10 +7,14 @@ import pytest
 from fastapi.testclient import TestClient
 import sys
 import os
+import tempfile
 
 # Agregar el directorio padre al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Base de datos temporal por ejecución (antes de importar la app)
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_restaurant.db"
+
 from main import app
 
 
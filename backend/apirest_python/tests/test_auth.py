@@ -3,7 +3,20 @@ test_auth.py
 Tests para el endpoint de autenticación
 """
 
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
 import pytest
+from jose import jwt
+
+from routers.auth import (
+    ALGORITHM, SECRET, cache_tokens, indexar_usuario, quitar_usuario, repo_users_auth, search_user,
+    servicio_contrasenas, users_auth_db, usuarios_por_email
+)
+from shared.password_hasher import PasswordHasher, HashSaturado, bcrypt_cost
+from utils.token_cache import CacheTokens
 
 
 class TestAuth:
@@ -91,3 +104,121 @@ class TestTokenValidation:
         response = client.get("/auth/users/me", headers=headers)
         
         assert response.status_code in [401, 403]
+
+
+class TestCacheTokens:
+    """Tests de la caché de tokens verificados y los índices de usuarios"""
+
+    def test_segunda_peticion_sin_decodificar(self, client):
+        """El mismo token se verifica una vez; luego sale de la caché"""
+        token = jwt.encode(
+            {"sub": "crisjo", "exp": datetime.now(timezone.utc) + timedelta(minutes=5)},
+            SECRET, algorithm=ALGORITHM
+        )
+        headers = {"Authorization": f"Bearer {token}"}
+        aciertos = cache_tokens.metricas["aciertos"]
+
+        assert client.get("/auth/users/me", headers=headers).json()["username"] == "crisjo"
+        assert client.get("/auth/users/me", headers=headers).status_code == 200
+        assert cache_tokens.metricas["aciertos"] == aciertos + 1
+
+    def test_entrada_vence_con_el_token(self):
+        ahora = [1000.0]
+        cache = CacheTokens(capacidad=2, reloj=lambda: ahora[0])
+        cache.guardar("a", "admin", exp=1060)
+        cache.guardar("vencido", "admin", exp=999)
+        assert cache.obtener("a") == "admin"
+        assert cache.obtener("vencido") is None
+
+        ahora[0] = 1061
+        assert cache.obtener("a") is None
+
+    def test_lru_respeta_capacidad(self):
+        cache = CacheTokens(capacidad=2, reloj=lambda: 0.0)
+        for token in ("a", "b"):
+            cache.guardar(token, token, exp=100)
+        cache.obtener("a")
+        cache.guardar("c", "c", exp=100)
+        assert (cache.obtener("a"), cache.obtener("b"), cache.obtener("c")) == ("a", None, "c")
+
+    def test_indice_email(self):
+        indexar_usuario({"username": "temporal", "full_name": "T", "email": "t@restaurante.com",
+                         "telefono": "1", "disabled": False, "password": "x"})
+        indexar_usuario({"username": "temporal", "full_name": "T", "email": "nuevo@restaurante.com",
+                         "telefono": "1", "disabled": False, "password": "x"})
+        assert "t@restaurante.com" not in usuarios_por_email
+        assert usuarios_por_email["nuevo@restaurante.com"] == "temporal"
+
+        quitar_usuario("temporal")
+        assert "nuevo@restaurante.com" not in usuarios_por_email
+        assert search_user("temporal") is None
+
+
+class TestPasswordHasher:
+    """Tests del pool de bcrypt: rehash por costo, saturación y métricas"""
+
+    def test_login_rehashea_costo_distinto(self, client):
+        """Un hash con otro costo se reemplaza al iniciar sesión"""
+        viejo = bcrypt.hashpw(b"clave-vieja", bcrypt.gensalt(4)).decode("utf-8")
+        indexar_usuario({"username": "rehash", "full_name": "R", "email": "rehash@restaurante.com",
+                         "telefono": "1", "disabled": False, "password": viejo})
+        try:
+            response = client.post("/auth/login-form", data={"username": "rehash", "password": "clave-vieja"})
+            assert response.status_code == 200
+            nuevo = users_auth_db["rehash"]["password"]
+            assert bcrypt_cost(nuevo) == servicio_contrasenas.rounds
+            assert servicio_contrasenas.verify_sync("clave-vieja", nuevo)
+        finally:
+            quitar_usuario("rehash")
+            repo_users_auth.eliminar("rehash")
+
+    def test_contrasena_incorrecta_no_rehashea(self):
+        servicio = PasswordHasher(rounds=5)
+        viejo = bcrypt.hashpw(b"correcta", bcrypt.gensalt(4)).decode("utf-8")
+        correcta, nuevo = asyncio.run(servicio.verify_and_rehash("otra", viejo))
+        assert (correcta, nuevo) == (False, None)
+        servicio.shutdown()
+
+    def test_cola_llena_rechaza(self):
+        servicio = PasswordHasher(rounds=4, max_workers=1, max_queue=2)
+        hashed = servicio.hash_sync("clave")
+
+        async def escenario():
+            return await asyncio.gather(
+                *(servicio.verify("clave", hashed) for _ in range(3)), return_exceptions=True
+            )
+
+        resultados = asyncio.run(escenario())
+        servicio.shutdown()
+
+        assert resultados[:2] == [True, True]
+        assert isinstance(resultados[2], HashSaturado)
+        assert servicio.summary()["rejected"] == 1
+        assert servicio.summary()["completed"] == 2
+
+    def test_contrasena_larga_no_falla(self):
+        """bcrypt 5 rechaza más de 72 bytes: el servicio los recorta"""
+        servicio = PasswordHasher(rounds=4)
+        hashed = servicio.hash_sync("x" * 100)
+        assert servicio.verify_sync("x" * 100, hashed)
+
+    def test_resultados_se_cuentan_por_separado(self):
+        """Fallos y cancelaciones no cuentan como completadas"""
+        servicio = PasswordHasher(rounds=4, max_workers=1)
+
+        async def escenario():
+            await servicio.hash("clave")
+            with pytest.raises(ZeroDivisionError):
+                await servicio._run(lambda: 1 / 0)
+            lenta = asyncio.ensure_future(servicio._run(time.sleep, 0.2))
+            await asyncio.sleep(0.05)
+            lenta.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await lenta
+
+        asyncio.run(escenario())
+        servicio.shutdown()
+
+        resumen = servicio.summary()
+        assert (resumen["completed"], resumen["failed"], resumen["cancelled"]) == (1, 1, 1)
+        assert resumen["pending"] == 0
@@ -0,0 +1,108 @@
+"""
+Tests del dashboard con agregados incrementales
+"""
+
+import asyncio
+
+import pytest
+from jose import jwt
+
+from routers.auth import SECRET, ALGORITHM, usuario_de_ticket
+from utils.agregados import AgregadosDashboard
+
+
+@pytest.fixture
+def auth_headers():
+    """Token válido para un usuario existente"""
+    token = jwt.encode({"sub": "crisjo"}, SECRET, algorithm=ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestResumenDashboard:
+    """Tests de los endpoints del dashboard sobre datos reales"""
+
+    def test_resumen_sigue_a_las_mesas(self, client, auth_headers):
+        """Cambiar el estado de una mesa se refleja en el resumen"""
+        antes = client.get("/dashboard/resumen", headers=auth_headers).json()
+        client.post("/mesa/", json={"id_mesa": 300, "numero": 300, "capacidad": 4, "estado": "ocupada"})
+        despues = client.get("/dashboard/resumen", headers=auth_headers).json()
+
+        assert despues["mesas_ocupadas"] == antes["mesas_ocupadas"] + 1
+        client.delete("/mesa/300")
+
+    def test_resumen_requiere_autenticacion(self, client):
+        """Sin token el resumen no está disponible"""
+        assert client.get("/dashboard/resumen").status_code == 401
+
+    def test_ingresos_solo_admin_y_persistidos(self, client, auth_headers):
+        """El ingreso se guarda en la base y el total se reconstruye desde ella"""
+        from routers.Dashboard import Ingreso, repo_ingresos
+        no_admin = {"Authorization": f"Bearer {jwt.encode({'sub': 'kilian'}, SECRET, algorithm=ALGORITHM)}"}
+        ingreso = {"monto": 12.5, "fecha": "2026-02-01"}
+
+        assert client.post("/dashboard/ingresos", json=ingreso).status_code == 401
+        assert client.post("/dashboard/ingresos", json=ingreso, headers=no_admin).status_code == 403
+        assert client.post("/dashboard/ingresos", json=ingreso, headers=auth_headers).status_code == 200
+
+        reconstruidos = AgregadosDashboard()
+        for guardado in repo_ingresos.cargar(Ingreso):
+            reconstruidos.ingreso(guardado)
+        assert reconstruidos.resumen("2026-02-01")["ingresos_hoy"] == 12.5
+
+    def test_stream_con_ticket(self, client, auth_headers):
+        """El stream se abre con un ticket de vida corta, no con el token de acceso"""
+        token = auth_headers["Authorization"].split()[1]
+        ticket = client.post("/dashboard/stream/ticket", headers=auth_headers).json()["ticket"]
+
+        assert client.get(f"/dashboard/stream?token={token}").status_code == 422
+        assert client.get(f"/dashboard/stream?ticket={token}").status_code == 401
+        assert client.get("/dashboard/resumen", headers={"Authorization": f"Bearer {ticket}"}).status_code == 401
+        assert asyncio.run(usuario_de_ticket(ticket)).username == "crisjo"
+
+    def test_mesas_tiempo_real(self, client):
+        """Las mesas reales se agrupan por capacidad"""
+        data = client.get("/dashboard/mesas-tiempo-real").json()
+
+        assert "mesas_2_personas" in data
+        assert sum(len(mesas) for mesas in data.values()) == len(client.get("/mesas/").json())
+
+
+class TestAgregadosDashboard:
+    """Tests de los contadores incrementales"""
+
+    def test_contadores_por_upsert(self):
+        """Reservas canceladas o movidas de fecha ajustan los contadores"""
+        from routers.Reserva import Reserva
+        from routers.Mesa import Mesa
+        from routers.Dashboard import Ingreso
+
+        agregados = AgregadosDashboard()
+        reserva = Reserva(id_reserva=1, fecha="2026-01-15", estado="pendiente")
+        agregados.reserva(reserva)
+        agregados.reserva(Reserva(id_reserva=2, fecha="2026-01-15", estado="confirmada"))
+        agregados.reserva(Reserva(id_reserva=1, fecha="2026-01-15", estado="cancelada"))
+        agregados.mesa(Mesa(id_mesa=1, numero=1, capacidad=2, estado="ocupada"))
+        agregados.mesa(Mesa(id_mesa=1, numero=1, capacidad=2, estado="disponible"))
+        agregados.ingreso(Ingreso(id_ingreso=1, monto=20.5, fecha="2026-01-15"))
+        agregados.ingreso(Ingreso(id_ingreso=1, monto=20.5, fecha="2026-01-15"))  # Repetido por el relay
+
+        resumen = agregados.resumen("2026-01-15")
+        assert resumen["reservas_hoy"] == 1
+        assert resumen["mesas_ocupadas"] == 0
+        assert resumen["mesas_disponibles"] == 1
+        assert resumen["ingresos_hoy"] == 20.5
+
+    def test_suscriptor_recibe_solo_el_ultimo(self):
+        """Un suscriptor lento recibe el resumen más reciente, no la ráfaga completa"""
+        agregados = AgregadosDashboard()
+
+        async def escenario():
+            cola = agregados.suscribir()
+            for personas in (1, 2, 3):
+                agregados.cola(personas)
+            return cola.qsize(), await cola.get()
+
+        pendientes, ultimo = asyncio.run(escenario())
+
+        assert pendientes == 1
+        assert ultimo["personas_en_cola"] == 3
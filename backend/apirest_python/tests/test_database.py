@@ -0,0 +1,52 @@
+"""
+Tests de la capa de persistencia SQLite
+"""
+
+import os
+import tempfile
+
+from database import PoolConexiones, Repositorio
+from routers.Mesa import Mesa
+from routers.FilaVirtual import PersonaFilaVirtual
+from utils.fila_engine import ColaVirtual
+
+
+class TestRepositorio:
+    """Tests del repositorio sobre SQLite en modo WAL"""
+
+    def _pool(self):
+        return PoolConexiones(os.path.join(tempfile.mkdtemp(), "test.db"), 2)
+
+    def test_guardar_actualizar_eliminar(self):
+        """Los registros sobreviven a un nuevo repositorio y se actualizan por id"""
+        pool = self._pool()
+        repo = Repositorio(pool, "mesas", "id_mesa", {"estado": "TEXT"}, [("estado",)])
+        semilla = [Mesa(id_mesa=2, numero=2, capacidad=4, estado="ocupada"),
+                   Mesa(id_mesa=1, numero=1, capacidad=2, estado="disponible")]
+        assert repo.cargar_o_sembrar(Mesa, semilla) == semilla
+
+        repo.guardar(Mesa(id_mesa=1, numero=1, capacidad=2, estado="reservada"))
+        repo.eliminar(2)
+        recargado = Repositorio(pool, "mesas", "id_mesa", {"estado": "TEXT"}).cargar_o_sembrar(Mesa, semilla)
+
+        assert [(m.id_mesa, m.estado) for m in recargado] == [(1, "reservada")]
+        with pool.conexion() as conexion:
+            assert conexion.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_cola_virtual_persistente(self):
+        """La fila virtual se restaura en orden y sin volver a escribir al cargar"""
+        repo = Repositorio(self._pool(), "fila_virtual", "id", {"estado": "TEXT"})
+        cola = ColaVirtual(lambda posicion, *_: posicion * 15, repo)
+        for i in (1, 2, 3):
+            cola.agregar(PersonaFilaVirtual(id=i, cliente_id=i, nombre=f"P{i}", telefono=str(i),
+                                            numeroPersonas=2, posicion=0, tiempoEstimado=0,
+                                            hora_llegada="12:00", estado="esperando"))
+        cola.cambiar_estado(1, "llamado")
+        cola.remover(2)
+
+        restaurada = ColaVirtual(lambda posicion, *_: posicion * 15, repo)
+        restaurada.cargar(repo.cargar(PersonaFilaVirtual))
+
+        assert [p.id for p in restaurada.todas()] == [1, 3]
+        assert restaurada.siguiente().id == 3
+        assert restaurada.obtener(1).estado == "llamado"
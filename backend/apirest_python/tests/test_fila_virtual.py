@@ -101,3 +101,196 @@ class TestFilaVirtualValidaciones:
             data = response.json()
             assert "tiempoEstimado" in data
             assert data["tiempoEstimado"] > 0
+
+
+class TestColaVirtualIndexada:
+    """Tests del motor indexado de la fila virtual"""
+
+    def test_posiciones_se_recorren_al_remover(self, client, fila_data):
+        """Al salir alguien, los que estaban detrás avanzan una posición"""
+        ids = []
+        for i in range(3):
+            fila_data["telefono"] = f"09900000{i}"
+            response = client.post("/fila-virtual/", json=fila_data)
+            assert response.status_code == 200
+            ids.append(response.json()["id"])
+
+        posicion_antes = client.get(f"/fila-virtual/{ids[2]}").json()["posicion"]
+        client.delete(f"/fila-virtual/{ids[0]}")
+        posicion_despues = client.get(f"/fila-virtual/{ids[2]}").json()["posicion"]
+
+        assert posicion_despues == posicion_antes - 1
+
+    def test_llamado_no_cuenta_en_posiciones(self):
+        """Las personas llamadas salen del conteo de posiciones"""
+        from utils.fila_engine import ColaVirtual
+        from routers.FilaVirtual import PersonaFilaVirtual
+
+        cola = ColaVirtual(lambda posicion, *_: posicion * 15)
+        for i in range(1, 4):
+            cola.agregar(PersonaFilaVirtual(
+                id=i, cliente_id=i, nombre=f"P{i}", telefono=str(i),
+                numeroPersonas=2, posicion=0, tiempoEstimado=0,
+                hora_llegada="2026-01-09T12:00:00", estado="esperando"
+            ))
+
+        cola.cambiar_estado(1, "llamado")
+
+        assert cola.total_esperando == 2
+        assert cola.siguiente().id == 2
+        assert cola.obtener(3).posicion == 2
+        assert cola.obtener(3).tiempoEstimado == 30
+        assert cola.buscar_por_telefono("1") is None
+
+
+class TestCambiosFilaVirtual:
+    """Tests del protocolo de cambios por secuencia (?since=)"""
+
+    def test_since_devuelve_solo_cambios(self, client, fila_data):
+        """Con ?since solo llegan los cambios posteriores, con su desplazamiento"""
+        fila_data["telefono"] = "0980000001"
+        primero = client.post("/fila-virtual/", json=fila_data).json()
+        fila_data["telefono"] = "0980000002"
+        client.post("/fila-virtual/", json=fila_data)
+
+        seq = int(client.get("/fila-virtual/").headers["X-Fila-Seq"])
+        client.delete(f"/fila-virtual/{primero['id']}")
+
+        data = client.get(f"/fila-virtual/?since={seq}").json()
+
+        assert data["completo"] is False
+        assert data["seq"] == seq + 1
+        assert data["cambios"] == [{
+            "seq": seq + 1, "op": "baja", "id": primero["id"],
+            "desde": primero["posicion"] + 1, "desplazamiento": -1
+        }]
+
+    def test_since_fuera_del_log_devuelve_fila_completa(self, client):
+        """Una secuencia desconocida obliga a resincronizar con la fila completa"""
+        seq = int(client.get("/fila-virtual/").headers["X-Fila-Seq"])
+
+        data = client.get(f"/fila-virtual/?since={seq + 100}").json()
+
+        assert data["completo"] is True
+        assert isinstance(data["fila"], list)
+
+
+class TestEstimadorEspera:
+    """Tests del estimador de tiempos por rotación de mesas"""
+
+    def test_aprende_de_la_rotacion(self):
+        """La duración observada de una mesa ocupada reemplaza el valor inicial"""
+        from utils.tiempo_espera import EstimadorEspera, DURACION_INICIAL
+        from routers.Mesa import Mesa
+
+        reloj = [1_700_000_000.0]
+        estimador = EstimadorEspera(reloj=lambda: reloj[0])
+        estimador.agregar_mesa(2)
+        estimador.agregar_mesa(2)
+        assert estimador.intervalos()[2] == DURACION_INICIAL[2] / 2
+
+        mesa = Mesa(id_mesa=1, numero=1, capacidad=2, estado="ocupada")
+        assert estimador.observar(mesa, "disponible") is False
+        reloj[0] += 20 * 60
+        mesa.estado = "disponible"
+        assert estimador.observar(mesa, "ocupada") is True
+
+        assert estimador.intervalos()[2] == 10
+        assert estimador(3, 2, 2) == 20
+        # Sin mesas de 6 ni de 8 los grupos grandes no tienen mesa: valor por defecto
+        assert estimador.intervalos()[8] == 15
+
+    def test_tiempo_por_posicion_en_bucket(self):
+        """El tiempo depende de la posición dentro del bucket, no de la global"""
+        from utils.fila_engine import ColaVirtual
+        from routers.FilaVirtual import PersonaFilaVirtual
+
+        cola = ColaVirtual(lambda posicion, bucket, en_bucket: bucket * 100 + en_bucket)
+        for i, personas in enumerate((2, 6, 2, 6), start=1):
+            cola.agregar(PersonaFilaVirtual(
+                id=i, cliente_id=i, nombre=f"P{i}", telefono=str(i),
+                numeroPersonas=personas, posicion=0, tiempoEstimado=0,
+                hora_llegada="2026-01-09T12:00:00", estado="esperando"
+            ))
+
+        assert [p.tiempoEstimado for p in cola.esperando()] == [201, 601, 202, 602]
+        cola.remover(1)
+        assert cola.obtener(3).tiempoEstimado == 201
+        assert cola.esperando_en_bucket(6) == 2
+
+
+class TestVencimientosLlamados:
+    """Tests del programador de vencimientos de llamados"""
+
+    def test_vencidos_en_orden_y_cancelados(self):
+        """Solo salen las claves vencidas y vigentes, en orden de plazo"""
+        from utils.vencimientos import ProgramadorVencimientos
+
+        programador = ProgramadorVencimientos(lambda ids: None)
+        programador.programar(1, 300)
+        programador.programar(2, 100)
+        programador.programar(3, 200)
+        programador.cancelar(3)
+        programador.programar(1, 150)  # Reprogramado: el plazo viejo se ignora
+
+        assert programador.vencidos(ahora=250) == [2, 1]
+        assert len(programador) == 0
+
+    def test_bucle_vence_en_un_barrido(self):
+        """La tarea de fondo entrega juntas las claves que vencen a la vez"""
+        import asyncio
+        import time
+        from utils.vencimientos import ProgramadorVencimientos
+
+        barridos = []
+        programador = ProgramadorVencimientos(barridos.append)
+
+        async def escenario():
+            await programador.iniciar()
+            ahora = time.time()
+            programador.programar("a", ahora + 0.05)
+            programador.programar("b", ahora + 0.05)
+            programador.programar("c", ahora + 30)
+            await asyncio.sleep(0.2)
+            await programador.detener()
+
+        asyncio.run(escenario())
+
+        assert [sorted(b) for b in barridos] == [["a", "b"]]
+        assert "c" in programador
+
+    def test_llamado_registra_hora_y_vence(self, client, fila_data):
+        """Al llamar se guarda la hora de llamado y el vencimiento queda programado"""
+        from routers.FilaVirtual import vencimientos_llamados
+
+        fila_data["telefono"] = "0970000001"
+        persona = client.post("/fila-virtual/", json=fila_data).json()
+        client.put(f"/fila-virtual/{persona['id']}/siguiente")
+
+        llamada = client.get(f"/fila-virtual/{persona['id']}").json()
+        assert llamada["hora_llamado"] is not None
+        assert persona["id"] in vencimientos_llamados
+
+        client.put(f"/fila-virtual/{persona['id']}/confirmar")
+        assert persona["id"] not in vencimientos_llamados
+
+    def test_vencido_devuelve_su_mesa(self, client, fila_data):
+        """Si el llamado vence sin confirmar, su mesa prometida se vuelve a asignar"""
+        from routers.FilaVirtual import vencer_llamados
+        from routers.Mesa import mesas_libres
+
+        client.post("/mesa/", json={"id_mesa": 902, "numero": 902, "capacidad": 20, "estado": "ocupada"})
+        fila_data.update(telefono="0970000902", numeroPersonas=15)
+        vencido = client.post("/fila-virtual/", json=fila_data).json()
+        client.put("/mesa/902/estado", params={"nuevo_estado": "disponible"})
+        assert mesas_libres.prometida_a(vencido["id"]).id_mesa == 902
+
+        vencer_llamados([vencido["id"]])
+
+        assert client.get(f"/fila-virtual/{vencido['id']}").status_code == 404
+        assert 902 in mesas_libres
+
+        fila_data.update(telefono="0970000903")
+        siguiente = client.post("/fila-virtual/", json=fila_data).json()
+        asignaciones = client.post("/mesas/reasignar").json()["asignaciones"]
+        assert any(a["mesa_id"] == 902 and a["persona_id"] == siguiente["id"] for a in asignaciones)
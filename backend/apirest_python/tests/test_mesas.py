@@ -85,3 +85,106 @@ class TestAsignacionAutomatica:
         response = client.put("/mesa/", json=mesa_data)
         
         assert response.status_code == 200
+
+
+class TestEmparejamientoMesas:
+    """Tests del emparejamiento best-fit mesa <-> fila virtual"""
+
+    def _persona(self, id, numero_personas):
+        from routers.FilaVirtual import PersonaFilaVirtual
+        return PersonaFilaVirtual(
+            id=id, cliente_id=id, nombre=f"P{id}", telefono=f"tel{id}",
+            numeroPersonas=numero_personas, posicion=0, tiempoEstimado=0,
+            hora_llegada="2026-01-09T12:00:00", estado="esperando"
+        )
+
+    def test_mesa_grande_prefiere_grupo_grande(self):
+        """Una mesa de 6 va al grupo de 5 aunque el de 2 llegó antes"""
+        from utils.fila_engine import ColaVirtual
+
+        cola = ColaVirtual(lambda posicion, *_: posicion * 15)
+        cola.agregar(self._persona(1, 2))
+        cola.agregar(self._persona(2, 5))
+
+        assert cola.mejor_para_mesa(6).id == 2
+        assert cola.mejor_para_mesa(2).id == 1
+        assert cola.mejor_para_mesa(1) is None
+
+    def test_grupo_que_no_cabe_no_tapa_al_siguiente(self):
+        """En el bucket 8+ un grupo de 10 primero no impide llamar al de 7 que viene detrás"""
+        from utils.fila_engine import ColaVirtual
+
+        cola = ColaVirtual(lambda posicion, *_: posicion * 15)
+        cola.agregar(self._persona(1, 10))
+        cola.agregar(self._persona(2, 7))
+        cola.agregar(self._persona(3, 8))
+
+        assert cola.mejor_para_mesa(8).id == 2
+        assert cola.mejor_para_mesa(12).id == 1
+
+    def test_promesa_se_libera_o_se_cumple(self):
+        """La mesa prometida vuelve al índice si la persona sale sin sentarse"""
+        from utils.mesa_matcher import IndiceMesasLibres
+        from routers.Mesa import Mesa
+
+        indice = IndiceMesasLibres()
+        mesa = Mesa(id_mesa=1, numero=1, capacidad=4, estado="disponible")
+        indice.sincronizar(mesa)
+
+        indice.prometer(mesa, persona_id=10)
+        assert 1 not in indice
+        indice.sincronizar(mesa, "disponible")  # Sigue disponible pero prometida
+        assert 1 not in indice
+        assert indice.prometida_a(10) is mesa
+
+        indice.liberar(10)
+        assert indice.mejor_mesa(4) is mesa
+
+        indice.prometer(mesa, persona_id=11)
+        indice.sentar(11)
+        assert indice.liberar(11) is None
+        assert 1 not in indice
+
+    def test_mesa_vuelve_al_indice_si_cancela_el_llamado(self, client, fila_data):
+        """Si la persona llamada sale de la fila, su mesa se puede volver a asignar"""
+        from routers.Mesa import mesas_libres
+
+        client.post("/mesa/", json={"id_mesa": 901, "numero": 901, "capacidad": 20, "estado": "ocupada"})
+        fila_data.update(telefono="0960000901", numeroPersonas=15)
+        persona = client.post("/fila-virtual/", json=fila_data).json()
+
+        asignacion = client.put("/mesa/901/estado", params={"nuevo_estado": "disponible"}).json()
+        assert asignacion["asignacion_automatica"]["persona_nombre"] == persona["nombre"]
+        assert 901 not in mesas_libres
+
+        client.delete(f"/fila-virtual/{persona['id']}")
+
+        assert 901 in mesas_libres
+        assert mesas_libres.prometida_a(persona["id"]) is None
+
+    def test_emparejar_lote(self):
+        """El lote llena primero las mesas pequeñas con grupos pequeños"""
+        from utils.fila_engine import ColaVirtual
+        from utils.mesa_matcher import IndiceMesasLibres, emparejar_lote
+        from routers.Mesa import Mesa
+
+        cola = ColaVirtual(lambda posicion, *_: posicion * 15)
+        cola.agregar(self._persona(1, 2))
+        cola.agregar(self._persona(2, 4))
+
+        indice = IndiceMesasLibres()
+        indice.sincronizar(Mesa(id_mesa=1, numero=1, capacidad=8, estado="disponible"))
+        indice.sincronizar(Mesa(id_mesa=2, numero=2, capacidad=2, estado="disponible"))
+
+        asignaciones = {mesa.id_mesa: persona.id for mesa, persona in emparejar_lote(indice, cola)}
+
+        assert asignaciones == {2: 1, 1: 2}
+        assert len(indice) == 0
+        assert cola.total_esperando == 0
+
+    def test_reasignar_endpoint(self, client):
+        """El endpoint de reasignación en lote responde con las asignaciones"""
+        response = client.post("/mesas/reasignar")
+
+        assert response.status_code == 200
+        assert "asignaciones" in response.json()
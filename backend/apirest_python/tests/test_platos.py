@@ -0,0 +1,67 @@
+"""
+Tests del catálogo de platos (caché con ETag y filtros)
+"""
+
+import pytest
+
+
+class TestCatalogoPlatos:
+    """Tests de ETag, 304 e invalidación del catálogo"""
+
+    def test_etag_y_304(self, client):
+        """Con el mismo ETag el servidor responde 304 sin cuerpo"""
+        response = client.get("/platos/")
+        etag = response.headers["ETag"]
+
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+
+        cacheada = client.get("/platos/", headers={"If-None-Match": etag})
+        assert cacheada.status_code == 304
+        assert cacheada.content == b""
+
+    def test_escritura_invalida_etag(self, client):
+        """Crear un plato cambia el ETag y aparece en el listado"""
+        etag = client.get("/platos/").headers["ETag"]
+        client.post("/plato/", json={
+            "id_plato": 0, "nombre": "Ají de Gallina", "descripcion": "Gallina en crema de ají amarillo",
+            "precio": 27.0, "estado": "disponible", "id_categoria": 2
+        })
+
+        response = client.get("/platos/", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert any(p["nombre"] == "Ají de Gallina" for p in response.json())
+
+
+class TestBusquedaPlatos:
+    """Tests de los filtros del catálogo"""
+
+    @pytest.mark.parametrize("params,esperados", [
+        ({"search": "limeno"}, {"Suspiro Limeño"}),
+        ({"search": "pap"}, {"Lomo Saltado", "Pollo a la Brasa"}),
+        ({"search": "carne parrilla"}, {"Parrilla Mixta"}),
+        ({"categoria": "postres"}, {"Suspiro Limeño", "Tres Leches"}),
+        ({"categoria": "1", "precio_max": 20}, {"Tequeños"}),
+    ])
+    def test_filtros(self, client, params, esperados):
+        """Búsqueda por prefijo sin tildes, categoría por nombre o id y rango de precio"""
+        response = client.get("/platos/", params=params)
+
+        assert response.status_code == 200
+        assert {p["nombre"] for p in response.json()} == esperados
+        assert all(
+            p["precio"] <= params.get("precio_max", float("inf")) for p in response.json()
+        )
+
+    def test_paginado_con_filtros(self, client):
+        """Con limit los filtros del catálogo se mantienen y se pagina por id_plato"""
+        todos = sorted((p["id_plato"], p["nombre"]) for p in client.get("/platos/", params={"categoria": "2"}).json())
+
+        response = client.get("/platos/", params={"categoria": "2", "limit": 2, "fields": "id_plato,nombre"})
+        assert response.json() == [{"id_plato": i, "nombre": n} for i, n in todos[:2]]
+        assert response.headers["X-Siguiente-Cursor"] == str(todos[1][0])
+
+        resto = client.get("/platos/", params={"categoria": "2", "cursor": todos[1][0]})
+        assert [(p["id_plato"], p["nombre"]) for p in resto.json()] == todos[2:]
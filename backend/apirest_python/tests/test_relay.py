@@ -0,0 +1,193 @@
+"""
+Tests del relay de cambios entre workers
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+import pytest
+
+import database
+from database import BitacoraCambios, EleccionLider, PoolConexiones, RegistroDuplicado, Repositorio, TABLA_EVENTOS
+from routers.Mesa import Mesa, mesas_libres, mesas_list, repo_mesas
+from routers.FilaVirtual import PersonaFilaVirtual, cola_virtual, repo_fila_virtual
+from routers.Dashboard import agregados_dashboard
+from utils.relay import RelayWorkers
+
+
+class TestBitacoraCambios:
+    """Tests de la bitácora y el relay con dos workers simulados"""
+
+    def _pool(self):
+        return PoolConexiones(os.path.join(tempfile.mkdtemp(), "test.db"), 2)
+
+    def test_cambios_ajenos_llegan_al_otro_worker(self):
+        """Lo que escribe un worker se aplica en el otro; lo propio no se reaplica"""
+        pool = self._pool()
+        bitacora_a = BitacoraCambios(pool, origen="worker-a")
+        bitacora_b = BitacoraCambios(pool, origen="worker-b")
+        relay_b = RelayWorkers(bitacora_b, TABLA_EVENTOS)
+        recibidos = []
+        relay_b.al_cambiar("mesas", lambda clave, datos: recibidos.append((clave, datos and datos["estado"])))
+
+        repo_a = Repositorio(pool, "mesas", "id_mesa", {"estado": "TEXT"}, bitacora=bitacora_a)
+        repo_b = Repositorio(pool, "mesas", "id_mesa", {"estado": "TEXT"}, bitacora=bitacora_b)
+        repo_a.guardar(Mesa(id_mesa=1, numero=1, capacidad=2, estado="ocupada"))
+        repo_b.guardar(Mesa(id_mesa=2, numero=2, capacidad=4, estado="disponible"))
+        repo_a.eliminar(1)
+
+        assert relay_b.procesar() == 2
+        assert recibidos == [(1, "ocupada"), (1, None)]
+        assert relay_b.procesar() == 0
+
+    def test_eventos_y_poda(self):
+        pool = self._pool()
+        bitacora_a = BitacoraCambios(pool, origen="worker-a")
+        relay_b = RelayWorkers(BitacoraCambios(pool, origen="worker-b"), TABLA_EVENTOS)
+        eventos = []
+        relay_b.al_evento(eventos.append)
+
+        RelayWorkers(bitacora_a, TABLA_EVENTOS).publicar_evento({"channel": "mesas", "action": "cambio_estado", "data": {"mesa_id": 1}})
+        relay_b.procesar()
+
+        assert eventos == [{"channel": "mesas", "action": "cambio_estado", "data": {"mesa_id": 1}}]
+        assert bitacora_a.podar(float("inf")) == 1
+
+    def test_nuevo_id_unico_entre_repositorios(self):
+        """Dos workers que crean a la vez no reciben el mismo id"""
+        pool = self._pool()
+        repo_a = Repositorio(pool, "platos", "id_plato")
+        repo_b = Repositorio(pool, "platos", "id_plato")
+        repo_a.guardar({"id_plato": 5, "nombre": "Ceviche"})
+
+        ids = [repo_a.nuevo_id(), repo_b.nuevo_id(), repo_a.nuevo_id()]
+
+        assert ids == [6, 7, 8]
+
+    def test_insertar_rechaza_id_de_otro_worker(self):
+        """El alta choca con la clave primaria aunque la caché no conozca el registro"""
+        pool = self._pool()
+        repo_a = Repositorio(pool, "clientes", "id_cliente")
+        repo_b = Repositorio(pool, "clientes", "id_cliente")
+        repo_a.insertar({"id_cliente": 1, "nombre": "Ana"})
+
+        with pytest.raises(RegistroDuplicado):
+            repo_b.insertar({"id_cliente": 1, "nombre": "Luis"})
+        assert repo_a.cargar() == [{"id_cliente": 1, "nombre": "Ana"}]
+
+    def test_transaccion_toma_el_lock_de_escritura(self):
+        """Dentro de la transacción otro proceso no puede escribir; las escrituras anidadas van en ella"""
+        ruta = os.path.join(tempfile.mkdtemp(), "test.db")
+        pool = PoolConexiones(ruta, 2)
+        repo = Repositorio(pool, "mesas", "id_mesa")
+        otro_proceso = sqlite3.connect(ruta, timeout=0)
+
+        with pool.transaccion():
+            repo.guardar({"id_mesa": 1, "estado": "disponible"})
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                otro_proceso.execute("BEGIN IMMEDIATE")
+        otro_proceso.execute("BEGIN IMMEDIATE")
+        otro_proceso.rollback()
+
+        with pytest.raises(ValueError):
+            with pool.transaccion():
+                repo.guardar({"id_mesa": 2, "estado": "disponible"})
+                raise ValueError("conflicto")
+        assert [m["id_mesa"] for m in repo.cargar()] == [1]
+
+    def test_un_solo_lider_y_relevo(self):
+        """Solo un worker corre los barridos; si deja de renovar, otro toma el turno"""
+        pool = self._pool()
+        lider_a = EleccionLider(pool, True, origen="worker-a", duracion=0.05)
+        lider_b = EleccionLider(pool, True, origen="worker-b", duracion=0.05)
+
+        assert lider_a.es_lider()
+        assert not lider_b.es_lider()
+        assert lider_a.es_lider()  # Renueva su turno
+
+        time.sleep(0.1)
+        assert lider_b.es_lider()
+        assert not lider_a.es_lider()
+        assert EleccionLider(pool, False).es_lider()  # Un solo worker: siempre
+
+
+class TestCachesDeRouters:
+    """Los manejadores de los routers mantienen coherentes las cachés del worker"""
+
+    def test_mesa_de_otro_worker(self):
+        otro = BitacoraCambios(database.pool, origen="otro-worker")
+        repo_otro = Repositorio(database.pool, repo_mesas.tabla, "id_mesa", {"estado": "TEXT"}, bitacora=otro)
+        disponibles = agregados_dashboard.mesas_en_estado("disponible")
+
+        repo_otro.guardar(Mesa(id_mesa=90, numero=90, capacidad=4, estado="disponible"))
+        database.relay_workers.procesar()
+        assert any(m.id_mesa == 90 for m in mesas_list)
+        assert agregados_dashboard.mesas_en_estado("disponible") == disponibles + 1
+
+        repo_otro.eliminar(90)
+        database.relay_workers.procesar()
+        assert not any(m.id_mesa == 90 for m in mesas_list)
+        assert agregados_dashboard.mesas_en_estado("disponible") == disponibles
+
+    def test_fila_virtual_de_otro_worker(self):
+        otro = BitacoraCambios(database.pool, origen="otro-worker")
+        repo_otro = Repositorio(database.pool, repo_fila_virtual.tabla, "id", {"estado": "TEXT"}, bitacora=otro)
+        persona = PersonaFilaVirtual(id=900, cliente_id=1, nombre="Remota", telefono="555-0900", numeroPersonas=2,
+                                     posicion=0, tiempoEstimado=0, hora_llegada="12:00", estado="esperando")
+
+        repo_otro.guardar(persona)
+        database.relay_workers.procesar()
+        assert cola_virtual.obtener(900).nombre == "Remota"
+
+        persona.estado = "confirmado"
+        repo_otro.guardar(persona)
+        database.relay_workers.procesar()
+        assert cola_virtual.obtener(900).estado == "confirmado"
+
+        repo_otro.eliminar(900)
+        database.relay_workers.procesar()
+        assert 900 not in cola_virtual
+
+    def test_mesa_prometida_en_otro_worker(self):
+        """La promesa de mesa viaja con la entrada de la fila y se libera al salir"""
+        otro = BitacoraCambios(database.pool, origen="otro-worker")
+        repo_mesas_otro = Repositorio(database.pool, repo_mesas.tabla, "id_mesa", {"estado": "TEXT"}, bitacora=otro)
+        repo_fila_otro = Repositorio(database.pool, repo_fila_virtual.tabla, "id", {"estado": "TEXT"}, bitacora=otro)
+        repo_mesas_otro.guardar(Mesa(id_mesa=91, numero=91, capacidad=4, estado="disponible"))
+        database.relay_workers.procesar()
+        assert 91 in mesas_libres
+
+        persona = PersonaFilaVirtual(id=901, cliente_id=1, nombre="Llamada", telefono="555-0901", numeroPersonas=4,
+                                     posicion=0, tiempoEstimado=0, hora_llegada="12:00", estado="esperando")
+        repo_fila_otro.guardar(persona)
+        persona.estado, persona.id_mesa = "llamado", 91
+        repo_fila_otro.guardar(persona)
+        database.relay_workers.procesar()
+        assert 91 not in mesas_libres
+        assert mesas_libres.prometida_a(901).id_mesa == 91
+
+        repo_fila_otro.eliminar(901)
+        database.relay_workers.procesar()
+        assert 91 in mesas_libres
+
+        repo_mesas_otro.eliminar(91)
+        database.relay_workers.procesar()
+
+    def test_confirmar_llamado_vencido_en_otro_worker(self, client, monkeypatch):
+        """La confirmación se valida dentro de la transacción, con los cambios ajenos ya aplicados"""
+        otro = BitacoraCambios(database.pool, origen="otro-worker")
+        repo_otro = Repositorio(database.pool, repo_fila_virtual.tabla, "id", {"estado": "TEXT"}, bitacora=otro)
+        persona = PersonaFilaVirtual(id=902, cliente_id=1, nombre="Vencida", telefono="555-0902", numeroPersonas=2,
+                                     posicion=0, tiempoEstimado=0, hora_llegada="12:00", estado="llamado")
+        repo_otro.guardar(persona)
+        database.relay_workers.procesar()
+        assert cola_virtual.obtener(902).estado == "llamado"
+
+        # El líder la vence sin que este worker haya leído el relay todavía
+        repo_otro.eliminar(902)
+        monkeypatch.setattr(database, "RELAY_WORKERS", True)
+        response = client.put("/fila-virtual/902/confirmar")
+        assert response.status_code == 404
+        assert 902 not in cola_virtual
@@ -3,8 +3,13 @@ test_reservas.py
 Tests para el endpoint de reservas
 """
 
+import asyncio
+import json
+
 import pytest
 
+from utils.paginacion import LIMITE_MAXIMO, LIMITE_POR_DEFECTO, ParametrosLista, responder_lista
+
 
 class TestReservas:
     """Tests para el CRUD de reservas"""
@@ -98,3 +103,226 @@ class TestConflictosReservas:
         
         # Debería crearse sin problema
         assert response.status_code in [200, 409]
+
+
+class TestIndiceReservas:
+    """Tests del índice de intervalos de reservas"""
+
+    def test_cancelar_libera_horario(self, client, reserva_data):
+        """Al cancelar una reserva su horario vuelve a estar disponible"""
+        reserva_data["id_mesa"] = 501
+        reserva_data["fecha"] = "2026-03-01"
+        reserva_data["hora_inicio"] = "13:00"
+        response = client.post("/reserva/", json=reserva_data)
+        assert response.status_code == 200
+        id_reserva = response.json()["id_reserva"]
+
+        params = "mesa_id=501&fecha=2026-03-01&hora_inicio=14:00"
+        assert client.get(f"/reservas/verificar-disponibilidad?{params}").json()["disponible"] is False
+
+        client.put(f"/reserva/{id_reserva}/estado?nuevo_estado=cancelada")
+        assert client.get(f"/reservas/verificar-disponibilidad?{params}").json()["disponible"] is True
+
+    def test_reactivar_cancelada_valida_conflicto(self, client, reserva_data):
+        """Una reserva cancelada no vuelve a activarse sobre el horario de otra"""
+        reserva_data.update(id_mesa=502, fecha="2026-03-02", hora_inicio="13:00")
+        cancelada = client.post("/reserva/", json=reserva_data).json()["id_reserva"]
+        client.put(f"/reserva/{cancelada}/estado?nuevo_estado=cancelada")
+        assert client.post("/reserva/", json=reserva_data).status_code == 200
+
+        response = client.put(f"/reserva/{cancelada}/estado?nuevo_estado=confirmada")
+        assert response.status_code == 409
+        assert client.get(f"/reserva/{cancelada}").json()["estado"] == "cancelada"
+
+        datos = client.get(f"/reserva/{cancelada}").json()
+        datos["estado"] = "pendiente"
+        assert client.put("/reserva/", json=datos).status_code == 409
+
+    def test_escritura_fallida_no_toca_la_cache(self, client, reserva_data, monkeypatch):
+        """Si el repositorio falla, la caché, el índice y el dashboard quedan como estaban"""
+        from routers import Reserva as modulo
+
+        reserva_data.update(id_mesa=503, fecha="2026-03-03", hora_inicio="13:00")
+        id_reserva = client.post("/reserva/", json=reserva_data).json()["id_reserva"]
+        params = "mesa_id=503&fecha=2026-03-03&hora_inicio=13:00"
+
+        def falla(*args, **kwargs):
+            raise RuntimeError("disco lleno")
+
+        monkeypatch.setattr(modulo.repo_reservas, "guardar", falla)
+        monkeypatch.setattr(modulo.repo_reservas, "eliminar", falla)
+        with pytest.raises(RuntimeError):
+            client.put(f"/reserva/{id_reserva}/estado?nuevo_estado=cancelada")
+        with pytest.raises(RuntimeError):
+            client.delete(f"/reserva/{id_reserva}")
+
+        assert modulo.buscar_en_cache(id_reserva).estado == "pendiente"
+        assert client.get(f"/reservas/verificar-disponibilidad?{params}").json()["disponible"] is False
+
+    def test_horarios_libres_en_la_grilla(self):
+        """Los turnos que se cruzan con una reserva no aparecen como libres"""
+        from utils.disponibilidad_grid import GrillaDisponibilidad
+        from utils.reserva_index import IndiceReservas, hora_a_minutos
+        from routers.Reserva import Reserva
+
+        grilla = GrillaDisponibilidad(hora_a_minutos("11:00"), hora_a_minutos("15:00"), 30, 120)
+        indice = IndiceReservas(120, grilla)
+        indice.indexar(Reserva(id_reserva=1, id_mesa=1, fecha="2026-03-01",
+                               hora_inicio="12:00", estado="confirmada"))
+
+        libres = grilla.horarios(grilla.turnos_libres(1, "2026-03-01"))
+
+        assert libres == ["14:00", "14:30"]
+        assert indice.conflicto(1, "2026-03-01", 600, 721) is not None
+        assert indice.conflicto(1, "2026-03-01", 600, 720) is None
+
+
+class TestDisponibilidadRango:
+    """Tests de la grilla de disponibilidad y el endpoint por rango"""
+
+    def test_rango_semana(self, client, reserva_data):
+        """Devuelve un día por fecha y refleja las reservas existentes"""
+        reserva_data["id_mesa"] = 1
+        reserva_data["fecha"] = "2026-04-02"
+        reserva_data["hora_inicio"] = "11:00"
+        client.post("/reserva/", json=reserva_data)
+
+        response = client.get("/reservas/disponibilidad/rango?desde=2026-04-01&hasta=2026-04-07&personas=2")
+
+        assert response.status_code == 200
+        dias = response.json()["dias"]
+        assert [d["fecha"] for d in dias][0] == "2026-04-01"
+        assert len(dias) == 7
+
+        mesa_1 = next(m for m in dias[1]["mesas_disponibles"] if m["mesa_id"] == 1)
+        assert "11:00" not in mesa_1["horarios_disponibles"]
+        assert "13:00" in mesa_1["horarios_disponibles"]
+
+    def test_rango_invalido(self, client):
+        """Rechaza rangos invertidos o demasiado largos"""
+        assert client.get("/reservas/disponibilidad/rango?desde=2026-04-07&hasta=2026-04-01").status_code == 400
+        assert client.get("/reservas/disponibilidad/rango?desde=2026-01-01&hasta=2026-12-31").status_code == 400
+
+
+class TestListadoReservas:
+    """Tests de paginación, selección de campos y filtros de /reservas/"""
+
+    def _crear(self, client, reserva_data, fecha, hora, mesa):
+        reserva_data = {**reserva_data, "fecha": fecha, "hora_inicio": hora, "id_mesa": mesa}
+        return client.post("/reserva/", json=reserva_data).json()["id_reserva"]
+
+    def test_paginas_por_cursor(self, client, reserva_data):
+        """Recorrer con limit y X-Siguiente-Cursor devuelve cada reserva una sola vez"""
+        for hora in ("11:00", "13:00", "15:00"):
+            self._crear(client, reserva_data, "2026-05-10", hora, 2)
+
+        vistos, cursor = [], None
+        while True:
+            url = "/reservas/?limit=2&fields=id_reserva" + (f"&cursor={cursor}" if cursor else "")
+            response = client.get(url)
+            pagina = [r["id_reserva"] for r in response.json()]
+            vistos += pagina
+            cursor = response.headers.get("X-Siguiente-Cursor")
+            if cursor is None:
+                break
+            assert len(pagina) == 2
+
+        assert vistos == sorted(vistos)
+        assert len(vistos) == len(set(vistos)) == len(client.get(f"/reservas/?limit={LIMITE_MAXIMO}").json())
+
+    def test_pagina_por_defecto(self, client, reserva_data):
+        """Sin limit se devuelve una página acotada, no el listado entero"""
+        lote = [{**reserva_data, "fecha": "2026-05-11", "hora_inicio": "12:00", "id_mesa": 1000 + i}
+                for i in range(LIMITE_POR_DEFECTO + 1)]
+        assert client.post("/reservas/bulk", json=lote).json()["creadas"] == len(lote)
+
+        response = client.get("/reservas/?fields=id_reserva")
+
+        assert len(response.json()) == LIMITE_POR_DEFECTO
+        assert "X-Siguiente-Cursor" in response.headers
+
+    def test_streaming_sobre_una_copia(self):
+        """Lo que se agrega a la lista mientras se envía la respuesta no aparece en ella"""
+        lista = [{"id": i} for i in range(3)]
+        params = ParametrosLista(limit=None, cursor=None, fields=None, formato="ndjson")
+        response = responder_lista(lista, "id", params, ["id"])
+        lista.append({"id": 3})
+
+        async def leer():
+            return b"".join([bloque async for bloque in response.body_iterator])
+
+        assert asyncio.run(leer()).splitlines() == [b'{"id":0}', b'{"id":1}', b'{"id":2}']
+
+    def test_filtros_y_campos(self, client, reserva_data):
+        """Filtra por rango de fechas y estado, y devuelve solo los campos pedidos"""
+        dentro = self._crear(client, reserva_data, "2026-06-15", "12:00", 3)
+        self._crear(client, reserva_data, "2026-07-01", "12:00", 3)
+
+        response = client.get("/reservas/?fecha_desde=2026-06-01&fecha_hasta=2026-06-30&estado=pendiente&fields=id_reserva,fecha,estado")
+
+        assert response.json() == [{"id_reserva": dentro, "fecha": "2026-06-15", "estado": "pendiente"}]
+
+    def test_ndjson_y_campo_desconocido(self, client, reserva_data):
+        self._crear(client, reserva_data, "2026-08-01", "12:00", 4)
+
+        response = client.get("/reservas/?formato=ndjson&fecha_desde=2026-08-01&fecha_hasta=2026-08-01")
+
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert [json.loads(linea)["fecha"] for linea in response.text.splitlines()] == ["2026-08-01"]
+        assert client.get("/reservas/?fields=id_reserva,clave").status_code == 400
+
+
+class TestReservasLote:
+    """Tests del alta en lote y la exportación"""
+
+    def _lote(self, reserva_data, horas, fecha="2026-09-20", mesa=5):
+        return [{**reserva_data, "fecha": fecha, "hora_inicio": h, "id_mesa": mesa} for h in horas]
+
+    def test_lote_valida_contra_si_mismo(self, client, reserva_data):
+        """Las reservas del lote que se pisan entre sí se rechazan; el resto se crea"""
+        response = client.post("/reservas/bulk", json=self._lote(reserva_data, ["11:00", "12:00", "14:00"]))
+
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["creadas"], body["errores"]) == (2, 1)
+        fallida = body["resultados"][1]
+        assert fallida["status"] == 409
+        assert fallida["error"]["conflicto"]["indice_lote"] == 0
+        ids = [r["id_reserva"] for r in body["resultados"] if r["ok"]]
+        assert ids[1] == ids[0] + 1
+        assert client.get(f"/reserva/{ids[0]}").json()["hora_inicio"] == "11:00"
+
+    def test_todo_o_nada(self, client, reserva_data):
+        lote = self._lote(reserva_data, ["11:00", "11:30"], fecha="2026-09-21")
+
+        response = client.post("/reservas/bulk?todo_o_nada=true", json=lote)
+
+        assert response.status_code == 409
+        # Nada quedó indexado: la primera ahora entra sola
+        assert client.post("/reservas/bulk", json=lote[:1]).json()["creadas"] == 1
+
+    def test_lote_fallido_no_toca_la_cache(self, client, reserva_data, monkeypatch):
+        """Si el lote no se guarda, no queda nada en la lista ni en el índice"""
+        from routers.Reserva import repo_reservas, reservas_list
+        lote = self._lote(reserva_data, ["11:00", "15:00"], fecha="2026-09-22")
+        cantidad = len(reservas_list)
+
+        def falla(reservas):
+            raise RuntimeError("disco lleno")
+        monkeypatch.setattr(repo_reservas, "guardar_todos", falla)
+        with pytest.raises(RuntimeError):
+            client.post("/reservas/bulk", json=lote)
+        monkeypatch.undo()
+
+        assert len(reservas_list) == cantidad
+        assert client.post("/reservas/bulk", json=lote).json()["creadas"] == 2
+
+    def test_exportar_csv(self, client, reserva_data):
+        client.post("/reservas/bulk", json=self._lote(reserva_data, ["11:00", "15:00"], fecha="2026-10-05"))
+
+        response = client.get("/reservas/export?fecha_desde=2026-10-05&fecha_hasta=2026-10-05&fields=fecha,hora_inicio")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+        assert response.text.splitlines() == ["fecha,hora_inicio", "2026-10-05,11:00", "2026-10-05,15:00"]
@@ -0,0 +1,97 @@
+"""
+Tests del hub de eventos en proceso y sus endpoints SSE/WebSocket
+"""
+
+import asyncio
+import json
+
+from utils.pubsub import HubEventos
+from websocket_broadcast import hub_eventos
+
+
+class TestHubEventos:
+    """Tests de reparto por canal y expulsión de suscriptores lentos"""
+
+    def test_reparto_por_canal(self):
+        """Cada suscriptor recibe solo los canales que pidió"""
+        hub = HubEventos()
+
+        async def escenario():
+            mesas = hub.suscribir(["mesas"])
+            todos = hub.suscribir()
+            hub.publicar("mesas", "cambio_estado", {"mesa_id": 1, "estado": "ocupada"})
+            hub.publicar("reservas", "nueva_reserva", {"id": 7})
+            recibidos_mesas = [await mesas.siguiente(timeout=1)]
+            recibidos_todos = [await todos.siguiente(timeout=1), await todos.siguiente(timeout=1)]
+            return recibidos_mesas, recibidos_todos, mesas.cola.empty()
+
+        recibidos_mesas, recibidos_todos, vacia = asyncio.run(escenario())
+
+        assert [canal for canal, _ in recibidos_mesas] == ["mesas"]
+        assert vacia
+        assert [canal for canal, _ in recibidos_todos] == ["mesas", "reservas"]
+        assert json.loads(recibidos_todos[1][1]) == {"channel": "reservas", "action": "nueva_reserva", "data": {"id": 7}}
+
+    def test_suscriptor_lento_es_expulsado(self):
+        """Si el buffer se llena el suscriptor recibe la señal de fin y sale del hub"""
+        hub = HubEventos(max_buffer=2)
+
+        async def escenario():
+            lento = hub.suscribir(["mesas"])
+            rapido = hub.suscribir(["mesas"], max_buffer=10)
+            for i in range(3):
+                hub.publicar("mesas", "cambio_estado", {"mesa_id": i})
+            return await lento.siguiente(timeout=1), lento.expulsado, rapido.cola.qsize()
+
+        mensaje, expulsado, pendientes_rapido = asyncio.run(escenario())
+
+        assert mensaje is None
+        assert expulsado
+        assert pendientes_rapido == 3
+        assert hub.metricas["expulsados"] == 1
+        assert hub.suscriptores() == 1
+
+    def test_relay_recibe_publicaciones_locales(self):
+        """Lo publicado localmente pasa al relay; lo que llega del relay no vuelve a salir"""
+        hub = HubEventos()
+        enviados = []
+        hub.relay = enviados.append
+
+        hub.publicar("fila_virtual", "nueva_persona", {"id": 1})
+        hub.publicar_local({"channel": "fila_virtual", "action": "persona_removida", "data": {"id": 2}})
+
+        assert [m["action"] for m in enviados] == ["nueva_persona"]
+
+    def test_canal_desconocido(self):
+        hub = HubEventos()
+
+        async def escenario():
+            hub.suscribir(["cocina"])
+
+        try:
+            asyncio.run(escenario())
+            assert False, "Debió rechazar el canal"
+        except ValueError:
+            pass
+
+
+class TestEndpointsTiempoReal:
+    """Tests de los endpoints /tiempo-real"""
+
+    def test_websocket_recibe_eventos(self, client):
+        """El WebSocket nativo entrega los mensajes del canal pedido"""
+        with client.websocket_connect("/tiempo-real/ws?canales=mesas") as websocket:
+            hub_eventos.publicar("reservas", "nueva_reserva", {"id": 1})
+            hub_eventos.publicar("mesas", "cambio_estado", {"mesa_id": 3, "estado": "ocupada"})
+            mensaje = websocket.receive_json()
+
+        assert mensaje == {"channel": "mesas", "action": "cambio_estado", "data": {"mesa_id": 3, "estado": "ocupada"}}
+
+    def test_stream_canal_invalido(self, client):
+        response = client.get("/tiempo-real/stream?canales=cocina")
+        assert response.status_code == 400
+
+    def test_metricas(self, client):
+        response = client.get("/tiempo-real/metrics")
+        assert response.status_code == 200
+        assert set(response.json()["por_canal"]) == {"fila_virtual", "mesas", "reservas"}
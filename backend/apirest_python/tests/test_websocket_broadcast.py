@@ -0,0 +1,91 @@
+"""
+Tests del broadcaster WebSocket con envío por lotes
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from websocket_broadcast import BroadcasterWebSocket
+
+
+def _broadcaster(recibidos, **kwargs):
+    def responder(request):
+        recibidos.append(json.loads(request.content))
+        return httpx.Response(200, json={"status": "ok"})
+
+    cliente = httpx.AsyncClient(transport=httpx.MockTransport(responder))
+    return BroadcasterWebSocket(url="http://ws/broadcast", cliente=cliente, **kwargs)
+
+
+class TestBroadcasterWebSocket:
+    """Tests de fusión, descarte y lotes del broadcaster"""
+
+    def test_rafaga_en_un_lote_con_fusion(self):
+        """Una ráfaga sale en un solo POST y las actualizaciones de la misma mesa se fusionan"""
+        recibidos = []
+        broadcaster = _broadcaster(recibidos)
+
+        async def escenario():
+            await broadcaster.iniciar()
+            for estado in ("ocupada", "limpieza", "disponible"):
+                broadcaster.publicar("mesas", "cambio_estado", {"mesa_id": 1, "estado": estado})
+            broadcaster.publicar("mesas", "cambio_estado", {"mesa_id": 2, "estado": "ocupada"})
+            await asyncio.sleep(0.2)
+            await broadcaster.detener()
+
+        asyncio.run(escenario())
+
+        assert len(recibidos) == 1
+        assert [(m["data"]["mesa_id"], m["data"]["estado"]) for m in recibidos[0]] == [
+            (1, "disponible"), (2, "ocupada")
+        ]
+        assert broadcaster.metricas["enviados"] == 2
+        assert broadcaster.metricas["fusionados"] == 2
+
+    def test_cola_llena_fusiona_o_descarta(self):
+        """Con la cola llena solo se fusiona la misma entidad; otra entidad se descarta"""
+        recibidos = []
+        broadcaster = _broadcaster(recibidos, max_pendientes=2)
+
+        assert broadcaster.publicar("mesas", "cambio_estado", {"mesa_id": 1, "estado": "ocupada"})
+        assert broadcaster.publicar("reservas", "nueva_reserva", {"reserva_id": 1})
+        assert not broadcaster.publicar("mesas", "cambio_estado", {"mesa_id": 2})
+        assert not broadcaster.publicar("fila_virtual", "nueva_entrada", {"id": 9})
+        assert broadcaster.publicar("mesas", "cambio_estado", {"mesa_id": 1, "estado": "disponible"})
+
+        asyncio.run(broadcaster.vaciar())
+
+        # La actualización fusionada conserva el lugar de la mesa en la cola
+        assert recibidos[0][0]["data"] == {"mesa_id": 1, "estado": "disponible"}
+        assert recibidos[0][1]["channel"] == "reservas"
+        assert broadcaster.metricas["fusionados"] == 1
+        assert broadcaster.metricas["descartados"] == 2
+
+    def test_detener_termina_el_lote_en_curso(self):
+        """Detener no corta un POST a la mitad: el lote en curso y lo pendiente se envían"""
+        recibidos = []
+        enviando = asyncio.Event()
+
+        async def responder(request):
+            enviando.set()
+            await asyncio.sleep(0.05)
+            recibidos.append(json.loads(request.content))
+            return httpx.Response(200, json={"status": "ok"})
+
+        cliente = httpx.AsyncClient(transport=httpx.MockTransport(responder))
+        broadcaster = BroadcasterWebSocket(url="http://ws/broadcast", cliente=cliente, max_lote=1, ventana=0)
+
+        async def escenario():
+            await broadcaster.iniciar()
+            broadcaster.publicar("mesas", "cambio_estado", {"mesa_id": 1})
+            broadcaster.publicar("mesas", "cambio_estado", {"mesa_id": 2})
+            await enviando.wait()
+            await broadcaster.detener()
+
+        asyncio.run(escenario())
+
+        assert [m["data"]["mesa_id"] for m in recibidos] == [1, 2]
+        assert broadcaster.metricas["errores"] == 0
+        assert broadcaster.pendientes() == 0
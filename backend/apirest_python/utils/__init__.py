@@ -0,0 +1,4 @@
+"""
+Utilidades del Core API
+Estructuras de datos e infraestructura compartida por los routers
+"""
@@ -0,0 +1,132 @@
+"""
+Agregados del dashboard
+Contadores mantenidos en O(1) por los caminos de escritura de los routers
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+# Estados de reserva que no cuentan como reservas del día
+ESTADOS_RESERVA_EXCLUIDOS = ("cancelada", "no_show")
+
+
+def hoy() -> str:
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+class AgregadosDashboard:
+    """
+    Contadores incrementales para el dashboard
+
+    Cada router informa altas, cambios y bajas (upsert por id), así los
+    contadores nunca se recalculan recorriendo listas. Los suscriptores
+    (streams SSE) reciben el resumen nuevo en una cola de tamaño 1: si
+    no alcanzaron a leer el anterior, se reemplaza por el más reciente.
+    """
+
+    def __init__(self):
+        self._mesas_por_estado: Counter = Counter()
+        self._estado_mesa: Dict[int, str] = {}
+        self._reservas_por_fecha: Counter = Counter()
+        self._fecha_reserva: Dict[int, str] = {}  # Solo reservas que cuentan
+        self._ingresos_por_fecha: Dict[str, float] = {}
+        self._ingreso_registrado: Dict[int, Tuple[str, float]] = {}  # id -> (fecha, monto)
+        self.personas_en_cola = 0
+        self.version = 0
+        self._suscriptores: Set[asyncio.Queue] = set()
+
+    # ===== Escrituras (O(1)) =====
+
+    def mesa(self, mesa: Any):
+        """Alta o cambio de estado de una mesa"""
+        anterior = self._estado_mesa.get(mesa.id_mesa)
+        if anterior == mesa.estado:
+            return
+        if anterior is not None:
+            self._mesas_por_estado[anterior] -= 1
+        self._mesas_por_estado[mesa.estado] += 1
+        self._estado_mesa[mesa.id_mesa] = mesa.estado
+        self._notificar()
+
+    def quitar_mesa(self, id_mesa: int):
+        anterior = self._estado_mesa.pop(id_mesa, None)
+        if anterior is not None:
+            self._mesas_por_estado[anterior] -= 1
+            self._notificar()
+
+    def reserva(self, reserva: Any):
+        """Alta o edición de una reserva (fecha o estado pueden cambiar)"""
+        cuenta = reserva.fecha and reserva.estado not in ESTADOS_RESERVA_EXCLUIDOS
+        anterior = self._fecha_reserva.get(reserva.id_reserva)
+        nueva = reserva.fecha if cuenta else None
+        if anterior == nueva:
+            return
+        if anterior is not None:
+            self._reservas_por_fecha[anterior] -= 1
+            del self._fecha_reserva[reserva.id_reserva]
+        if nueva is not None:
+            self._reservas_por_fecha[nueva] += 1
+            self._fecha_reserva[reserva.id_reserva] = nueva
+        self._notificar()
+
+    def quitar_reserva(self, id_reserva: int):
+        anterior = self._fecha_reserva.pop(id_reserva, None)
+        if anterior is not None:
+            self._reservas_por_fecha[anterior] -= 1
+            self._notificar()
+
+    def cola(self, personas_esperando: int):
+        if personas_esperando != self.personas_en_cola:
+            self.personas_en_cola = personas_esperando
+            self._notificar()
+
+    def ingreso(self, ingreso: Any):
+        """Alta o corrección de un ingreso guardado (el relay puede repetirlo)"""
+        nuevo = (ingreso.fecha, ingreso.monto)
+        anterior = self._ingreso_registrado.get(ingreso.id_ingreso)
+        if anterior == nuevo:
+            return
+        if anterior is not None:
+            self._sumar_ingreso(*anterior, signo=-1)
+        self._sumar_ingreso(*nuevo)
+        self._ingreso_registrado[ingreso.id_ingreso] = nuevo
+        self._notificar()
+
+    def _sumar_ingreso(self, fecha: str, monto: float, signo: int = 1):
+        self._ingresos_por_fecha[fecha] = round(self._ingresos_por_fecha.get(fecha, 0.0) + signo * monto, 2)
+
+    # ===== Lecturas (O(1)) =====
+
+    def mesas_en_estado(self, estado: str) -> int:
+        return self._mesas_por_estado[estado]
+
+    def resumen(self, fecha: Optional[str] = None) -> Dict[str, Any]:
+        fecha = fecha or hoy()
+        return {
+            "mesas_ocupadas": self._mesas_por_estado["ocupada"],
+            "mesas_disponibles": self._mesas_por_estado["disponible"],
+            "reservas_hoy": self._reservas_por_fecha[fecha],
+            "personas_en_cola": self.personas_en_cola,
+            "ingresos_hoy": self._ingresos_por_fecha.get(fecha, 0.0)
+        }
+
+    # ===== Suscripciones (SSE) =====
+
+    def suscribir(self) -> asyncio.Queue:
+        cola: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._suscriptores.add(cola)
+        return cola
+
+    def desuscribir(self, cola: asyncio.Queue):
+        self._suscriptores.discard(cola)
+
+    def _notificar(self):
+        self.version += 1
+        if not self._suscriptores:
+            return
+        resumen = {"version": self.version, **self.resumen()}
+        for cola in self._suscriptores:
+            if cola.full():
+                cola.get_nowait()  # El suscriptor solo necesita el último resumen
+            cola.put_nowait(resumen)
@@ -0,0 +1,185 @@
+"""
+Caché del catálogo (platos, categorías, menús)
+JSON pre-serializado con orjson, ETag fuerte e índice invertido para búsquedas
+"""
+import bisect
+import hashlib
+import re
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from fastapi import Request, Response
+
+_SEPARADORES = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes: 'Limeño' -> 'limeno'"""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def tokenizar(texto: str) -> List[str]:
+    return [token for token in _SEPARADORES.split(normalizar(texto)) if token]
+
+
+def etag_de(contenido: bytes) -> str:
+    """ETag fuerte derivado del contenido (igual en todos los workers)"""
+    return '"' + hashlib.blake2b(contenido, digest_size=16).hexdigest() + '"'
+
+
+class ColeccionCatalogo:
+    """
+    Colección cacheada del catálogo
+
+    Se reconstruye de forma perezosa en la primera lectura después de
+    invalidar(): cada elemento se serializa una sola vez y las respuestas
+    (lista completa, por grupo o filtradas) se arman uniendo esos bytes.
+    """
+
+    def __init__(
+        self,
+        fuente: Callable[[], List[Any]],
+        campo_id: str,
+        campos_texto: Iterable[str] = (),
+        campo_grupo: Optional[str] = None,
+        campo_precio: Optional[str] = None
+    ):
+        self._fuente = fuente
+        self._campo_id = campo_id
+        self._campos_texto = tuple(campos_texto)
+        self._campo_grupo = campo_grupo
+        self._campo_precio = campo_precio
+        self.version = 0
+        self._construida = -1
+        self._orden: List[Any] = []
+        self._bytes: Dict[Any, bytes] = {}
+        self._elementos: Dict[Any, dict] = {}
+        self._todo: Tuple[bytes, str] = (b"[]", etag_de(b"[]"))
+        self._grupos: Dict[Any, List[Any]] = {}
+        self._respuestas_grupo: Dict[Any, Tuple[bytes, str]] = {}
+        self._tokens: Dict[str, Set[Any]] = {}
+        self._vocabulario: List[str] = []  # tokens ordenados, para búsqueda por prefijo
+        self._precios: List[Tuple[float, Any]] = []
+
+    def invalidar(self):
+        """Marca la colección como modificada (la llaman los endpoints de escritura)"""
+        self.version += 1
+
+    def _asegurar(self):
+        if self._construida == self.version:
+            return
+        elementos = [e if isinstance(e, dict) else e.model_dump() for e in self._fuente()]
+
+        self._orden = [e[self._campo_id] for e in elementos]
+        self._elementos = {e[self._campo_id]: e for e in elementos}
+        self._bytes = {e[self._campo_id]: orjson.dumps(e) for e in elementos}
+        self._todo = self._unir(self._orden)
+        self._respuestas_grupo = {}
+
+        self._grupos = {}
+        if self._campo_grupo:
+            for e in elementos:
+                self._grupos.setdefault(e.get(self._campo_grupo), []).append(e[self._campo_id])
+
+        self._tokens = {}
+        for e in elementos:
+            for campo in self._campos_texto:
+                for token in tokenizar(str(e.get(campo) or "")):
+                    self._tokens.setdefault(token, set()).add(e[self._campo_id])
+        self._vocabulario = sorted(self._tokens)
+
+        self._precios = sorted(
+            (float(e[self._campo_precio]), e[self._campo_id])
+            for e in elementos if self._campo_precio and e.get(self._campo_precio) is not None
+        )
+        self._construida = self.version
+
+    def _unir(self, ids: Iterable[Any]) -> Tuple[bytes, str]:
+        contenido = b"[" + b",".join(self._bytes[i] for i in ids) + b"]"
+        return contenido, etag_de(contenido)
+
+    # ===== Lecturas =====
+
+    def todo(self) -> Tuple[bytes, str]:
+        self._asegurar()
+        return self._todo
+
+    def grupo(self, valor: Any) -> Tuple[bytes, str]:
+        self._asegurar()
+        if valor not in self._respuestas_grupo:
+            self._respuestas_grupo[valor] = self._unir(self._grupos.get(valor, []))
+        return self._respuestas_grupo[valor]
+
+    def _coincidencias(self, texto: str) -> Set[Any]:
+        """Ids que tienen todos los términos (cada término como prefijo de una palabra)"""
+        resultado: Optional[Set[Any]] = None
+        for termino in tokenizar(texto):
+            ids: Set[Any] = set()
+            indice = bisect.bisect_left(self._vocabulario, termino)
+            while indice < len(self._vocabulario) and self._vocabulario[indice].startswith(termino):
+                ids |= self._tokens[self._vocabulario[indice]]
+                indice += 1
+            resultado = ids if resultado is None else resultado & ids
+            if not resultado:
+                return set()
+        return resultado if resultado is not None else set(self._orden)
+
+    def buscar(
+        self,
+        texto: Optional[str] = None,
+        grupos: Optional[Iterable[Any]] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None
+    ) -> Tuple[bytes, str]:
+        """Lista filtrada (en el orden original) como bytes JSON + ETag"""
+        self._asegurar()
+        if texto is None and precio_min is None and precio_max is None:
+            if grupos is None:
+                return self._todo
+            grupos = list(grupos)
+            if len(grupos) == 1:
+                return self.grupo(grupos[0])
+        return self._unir(self.ids(texto, grupos, precio_min, precio_max))
+
+    def elementos(self, *filtros) -> List[dict]:
+        """Elementos (dicts) que cumplen los mismos filtros que buscar()"""
+        return [self._elementos[i] for i in self.ids(*filtros)]
+
+    def bytes_de(self, elemento: dict) -> bytes:
+        """JSON ya serializado de un elemento devuelto por elementos()"""
+        return self._bytes[elemento[self._campo_id]]
+
+    def ids(
+        self,
+        texto: Optional[str] = None,
+        grupos: Optional[Iterable[Any]] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None
+    ) -> List[Any]:
+        """Ids filtrados, en el orden original"""
+        self._asegurar()
+        candidatos: Optional[Set[Any]] = None
+        if texto:
+            candidatos = self._coincidencias(texto)
+        if grupos is not None:
+            en_grupos = {i for g in grupos for i in self._grupos.get(g, [])}
+            candidatos = en_grupos if candidatos is None else candidatos & en_grupos
+        if precio_min is not None or precio_max is not None:
+            desde = bisect.bisect_left(self._precios, (precio_min,)) if precio_min is not None else 0
+            hasta = bisect.bisect_right(self._precios, (precio_max, float("inf"))) if precio_max is not None else len(self._precios)
+            en_rango = {i for _, i in self._precios[desde:hasta]}
+            candidatos = en_rango if candidatos is None else candidatos & en_rango
+
+        return [i for i in self._orden if candidatos is None or i in candidatos]
+
+
+def respuesta_catalogo(request: Request, contenido: Tuple[bytes, str]) -> Response:
+    """200 con los bytes cacheados, o 304 si el cliente ya tiene ese ETag"""
+    cuerpo, etag = contenido
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    si_no_coincide = request.headers.get("if-none-match")
+    if si_no_coincide and (si_no_coincide.strip() == "*" or etag in [e.strip() for e in si_no_coincide.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cuerpo, media_type="application/json", headers=headers)
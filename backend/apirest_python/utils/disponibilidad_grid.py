@@ -0,0 +1,69 @@
+"""
+Grilla de disponibilidad por bits
+Un entero por (mesa, fecha) con un bit por bloque de 30 minutos
+"""
+from typing import Dict, Iterable, List, Tuple
+
+
+class GrillaDisponibilidad:
+    """
+    Mapa de ocupación en bits
+
+    El bit i representa el bloque [apertura + i*paso, apertura + (i+1)*paso).
+    Un turno que empieza en el bloque i y dura 'duracion' minutos está libre
+    si los bloques i .. i+k-1 están libres, lo que se resuelve con OR de
+    desplazamientos y una máscara, sin recorrer reservas.
+    """
+
+    def __init__(self, apertura: int, cierre: int, paso: int, duracion: int):
+        self.apertura = apertura
+        self.paso = paso
+        self.turnos = -(-(cierre - apertura) // paso)  # Inicios de turno entre apertura y cierre
+        self.bloques_por_turno = -(-duracion // paso)
+        self.total_bloques = self.turnos + self.bloques_por_turno - 1
+        self.mascara_turnos = (1 << self.turnos) - 1
+        self.etiquetas = [
+            f"{(apertura + i * paso) // 60 % 24:02d}:{(apertura + i * paso) % 60:02d}"
+            for i in range(self.turnos)
+        ]
+        self._ocupacion: Dict[Tuple[int, str], int] = {}
+
+    def bits_intervalo(self, inicio: int, fin: int) -> int:
+        """Bits de los bloques que se cruzan con [inicio, fin)"""
+        primero = max(0, (inicio - self.apertura) // self.paso)
+        ultimo = min(self.total_bloques, -(-(fin - self.apertura) // self.paso))
+        if ultimo <= primero:
+            return 0
+        return ((1 << (ultimo - primero)) - 1) << primero
+
+    def actualizar(self, id_mesa: int, fecha: str, intervalos: Iterable[Tuple[int, int]]):
+        """Recalcula la ocupación de una mesa en una fecha a partir de sus intervalos"""
+        ocupacion = 0
+        for inicio, fin in intervalos:
+            ocupacion |= self.bits_intervalo(inicio, fin)
+        if ocupacion:
+            self._ocupacion[(id_mesa, fecha)] = ocupacion
+        else:
+            self._ocupacion.pop((id_mesa, fecha), None)
+
+    def ocupacion(self, id_mesa: int, fecha: str) -> int:
+        return self._ocupacion.get((id_mesa, fecha), 0)
+
+    def turnos_libres(self, id_mesa: int, fecha: str) -> int:
+        """Máscara de inicios de turno libres (bit i = turno i libre)"""
+        ocupacion = self._ocupacion.get((id_mesa, fecha), 0)
+        if not ocupacion:
+            return self.mascara_turnos
+        bloqueado = 0
+        for k in range(self.bloques_por_turno):
+            bloqueado |= ocupacion >> k
+        return ~bloqueado & self.mascara_turnos
+
+    def horarios(self, mascara: int) -> List[str]:
+        """Convierte una máscara de turnos en la lista de horas 'HH:MM'"""
+        horarios = []
+        while mascara:
+            bit = mascara & -mascara
+            horarios.append(self.etiquetas[bit.bit_length() - 1])
+            mascara ^= bit
+        return horarios
@@ -0,0 +1,425 @@
+"""
+Motor indexado de la fila virtual
+Índices hash por id y teléfono + árbol de Fenwick por orden de llegada
+"""
+import heapq
+from collections import deque
+from typing import Callable, Dict, List, Optional, Any
+
+# Capacidades de mesa usadas para agrupar a quienes esperan (8 = "8+")
+BUCKETS_CAPACIDAD = (2, 4, 6, 8)
+
+# Cambios que se guardan para responder ?since=<seq> sin mandar la fila completa
+MAX_CAMBIOS = 1000
+
+
+def bucket_capacidad(numero_personas: int) -> int:
+    """Bucket de capacidad más pequeño donde cabe el grupo"""
+    for bucket in BUCKETS_CAPACIDAD:
+        if numero_personas <= bucket:
+            return bucket
+    return BUCKETS_CAPACIDAD[-1]
+
+
+def _serializar(entrada: Any) -> dict:
+    return entrada.model_dump() if hasattr(entrada, "model_dump") else dict(vars(entrada))
+
+
+class ArbolFenwick:
+    """
+    Árbol de Fenwick (Binary Indexed Tree) de conteos 0/1
+
+    Permite marcar/desmarcar posiciones, contar cuántas posiciones
+    marcadas hay hasta un índice y encontrar la k-ésima marcada,
+    todo en O(log n).
+    """
+
+    def __init__(self, capacidad: int = 64):
+        self._capacidad = capacidad
+        self._arbol = [0] * (capacidad + 1)
+
+    @property
+    def capacidad(self) -> int:
+        return self._capacidad
+
+    def sumar(self, indice: int, delta: int):
+        """Suma delta en el índice (1-based)"""
+        while indice <= self._capacidad:
+            self._arbol[indice] += delta
+            indice += indice & -indice
+
+    def prefijo(self, indice: int) -> int:
+        """Suma acumulada de 1..indice"""
+        total = 0
+        while indice > 0:
+            total += self._arbol[indice]
+            indice -= indice & -indice
+        return total
+
+    def k_esimo(self, k: int) -> int:
+        """Índice de la k-ésima posición marcada (0 si no existe)"""
+        posicion = 0
+        paso = 1 << self._capacidad.bit_length()
+        while paso:
+            siguiente = posicion + paso
+            if siguiente <= self._capacidad and self._arbol[siguiente] < k:
+                posicion = siguiente
+                k -= self._arbol[siguiente]
+            paso >>= 1
+        return posicion + 1 if posicion < self._capacidad else 0
+
+
+class ColaVirtual:
+    """
+    Cola virtual con operaciones O(log n)
+
+    - id -> entrada (hash) para búsquedas directas
+    - teléfono -> id (hash) para detectar duplicados entre los que esperan
+    - Fenwick por secuencia de llegada para posición, k-ésimo y conteo
+    - Un heap por bucket de capacidad (2, 4, 6, 8+) para emparejar mesas
+    - Un Fenwick por bucket para la posición dentro del bucket
+
+    El estimador recibe (posicion, bucket, posicion_en_bucket) y devuelve minutos.
+
+    Las entradas se guardan tal cual (no se reconstruyen modelos al escribir);
+    la posición y el tiempo estimado se calculan al momento de leer.
+    Si recibe un repositorio, cada alta, cambio de estado y baja se persiste.
+
+    Cada escritura incrementa 'version' y deja un cambio compacto en el log:
+      {"seq": 8, "op": "baja", "id": 17, "desde": 5, "desplazamiento": -1}
+    significa "salió el id 17; las posiciones >= 5 bajan en 1".
+    """
+
+    ESTADO_ESPERANDO = "esperando"
+
+    def __init__(self, estimador: Callable[[int, int, int], int], repositorio: Any = None):
+        self._estimador = estimador
+        self._repositorio = repositorio
+        self._entradas: Dict[int, Any] = {}  # id -> entrada, en orden de llegada
+        self._secuencia: Dict[int, int] = {}  # id -> secuencia de llegada
+        self._por_secuencia: Dict[int, int] = {}  # secuencia -> id
+        self._por_telefono: Dict[str, int] = {}  # teléfono -> id (solo esperando)
+        self._fenwick = ArbolFenwick()
+        self._buckets: Dict[int, list] = {b: [] for b in BUCKETS_CAPACIDAD}  # heaps (secuencia, id)
+        self._fenwick_bucket = {b: ArbolFenwick() for b in BUCKETS_CAPACIDAD}
+        self._esperando_bucket: Dict[int, int] = {b: 0 for b in BUCKETS_CAPACIDAD}
+        self._siguiente_secuencia = 1
+        self._esperando = 0
+        self.version = 0
+        self._cambios: deque = deque(maxlen=MAX_CAMBIOS)
+        self._observadores: List[Callable[[dict], None]] = []
+
+    # ===== Consultas =====
+
+    def cambios_desde(self, seq: int) -> Optional[List[dict]]:
+        """
+        Cambios con número de secuencia mayor a 'seq'.
+        None si el log ya no alcanza (el cliente debe pedir la fila completa).
+        """
+        if seq > self.version:
+            return None
+        if seq == self.version:
+            return []
+        if not self._cambios or self._cambios[0]["seq"] > seq + 1:
+            return None
+        inicio = len(self._cambios) - (self.version - seq)
+        return [self._cambios[i] for i in range(inicio, len(self._cambios))]
+
+    def ultimo_cambio(self) -> Optional[dict]:
+        return self._cambios[-1] if self._cambios else None
+
+    def observar(self, observador: Callable[[dict], None]):
+        """Registra una función que recibe cada cambio de la fila"""
+        self._observadores.append(observador)
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def __contains__(self, entrada_id: int) -> bool:
+        return entrada_id in self._entradas
+
+    @property
+    def total_esperando(self) -> int:
+        return self._esperando
+
+    def esperando_en_bucket(self, bucket: int) -> int:
+        return self._esperando_bucket[bucket]
+
+    def posicion(self, entrada_id: int) -> int:
+        """Posición (1-based) entre los que esperan, 0 si no está esperando"""
+        entrada = self._entradas.get(entrada_id)
+        if entrada is None or entrada.estado != self.ESTADO_ESPERANDO:
+            return 0
+        return self._fenwick.prefijo(self._secuencia[entrada_id])
+
+    def obtener(self, entrada_id: int) -> Optional[Any]:
+        """Obtiene una entrada con su posición y tiempo estimado al día"""
+        entrada = self._entradas.get(entrada_id)
+        if entrada is not None:
+            self._refrescar(entrada, self.posicion(entrada_id))
+        return entrada
+
+    def buscar_por_telefono(self, telefono: str) -> Optional[Any]:
+        """Entrada que está esperando con ese teléfono"""
+        entrada_id = self._por_telefono.get(telefono)
+        return self.obtener(entrada_id) if entrada_id is not None else None
+
+    def siguiente(self) -> Optional[Any]:
+        """Primera persona que está esperando"""
+        return self.k_esimo(1)
+
+    def k_esimo(self, k: int) -> Optional[Any]:
+        """Persona en la posición k de la fila de espera"""
+        if k < 1 or k > self._esperando:
+            return None
+        secuencia = self._fenwick.k_esimo(k)
+        entrada = self._entradas[self._por_secuencia[secuencia]]
+        self._refrescar(entrada, k)
+        return entrada
+
+    def primero_en_bucket(self, bucket: int) -> Optional[Any]:
+        """Primera persona esperando en un bucket de capacidad"""
+        heap = self._buckets[bucket]
+        while heap:
+            secuencia, entrada_id = heap[0]
+            entrada = self._entradas.get(entrada_id)
+            if (entrada is not None and self._secuencia[entrada_id] == secuencia
+                    and entrada.estado == self.ESTADO_ESPERANDO):
+                return entrada
+            heapq.heappop(heap)  # Borrado perezoso de entradas que ya no esperan
+        return None
+
+    def primero_que_cabe(self, bucket: int, capacidad: int) -> Optional[Any]:
+        """
+        Primera persona del bucket (en orden de llegada) cuyo grupo cabe en la mesa.
+
+        Si todo el bucket cabe basta con el primero; si no (bucket 8+ o mesa
+        más chica que el bucket) se recorre el bucket con su Fenwick, así un
+        grupo que no cabe no tapa a los que vienen detrás.
+        """
+        if bucket <= capacidad and bucket != BUCKETS_CAPACIDAD[-1]:
+            return self.primero_en_bucket(bucket)
+        fenwick = self._fenwick_bucket[bucket]
+        for k in range(1, self._esperando_bucket[bucket] + 1):
+            entrada = self._entradas[self._por_secuencia[fenwick.k_esimo(k)]]
+            if entrada.numeroPersonas <= capacidad:
+                return entrada
+        return None
+
+    def mejor_para_mesa(self, capacidad: int) -> Optional[Any]:
+        """
+        Best-fit: primero que cabe en el bucket más grande posible.
+        Así las mesas grandes no se gastan en grupos pequeños si hay
+        grupos grandes esperando. O(log n) amortizado salvo en buckets
+        que la mesa no cubre entera, donde se recorre el bucket.
+        """
+        for indice in range(len(BUCKETS_CAPACIDAD) - 1, -1, -1):
+            # El grupo más pequeño del bucket tiene (bucket anterior + 1) personas
+            minimo = BUCKETS_CAPACIDAD[indice - 1] + 1 if indice else 1
+            if minimo > capacidad:
+                continue
+            entrada = self.primero_que_cabe(BUCKETS_CAPACIDAD[indice], capacidad)
+            if entrada is not None:
+                return self.obtener(entrada.id)
+        return None
+
+    def esperando(self) -> List[Any]:
+        """
+        Personas esperando, en orden, con posición y tiempo al día.
+        Una sola pasada: la posición en el bucket se cuenta sobre la marcha.
+        """
+        resultado = []
+        por_bucket = dict.fromkeys(BUCKETS_CAPACIDAD, 0)
+        for entrada in self._entradas.values():
+            if entrada.estado == self.ESTADO_ESPERANDO:
+                resultado.append(entrada)
+                bucket = bucket_capacidad(entrada.numeroPersonas)
+                por_bucket[bucket] += 1
+                self._refrescar(entrada, len(resultado), por_bucket[bucket])
+        return resultado
+
+    def con_estado(self, estado: str) -> List[Any]:
+        """Entradas con un estado dado, en orden de llegada"""
+        if estado == self.ESTADO_ESPERANDO:
+            return self.esperando()
+        return [e for e in self._entradas.values() if e.estado == estado]
+
+    def todas(self) -> List[Any]:
+        return list(self._entradas.values())
+
+    # ===== Escrituras =====
+
+    def cargar(self, entradas: List[Any]):
+        """Restaura entradas ya persistidas (en orden de llegada) sin volver a guardarlas"""
+        repositorio, self._repositorio = self._repositorio, None
+        try:
+            for entrada in entradas:
+                self.agregar(entrada)
+        finally:
+            self._repositorio = repositorio
+            self._cambios.clear()  # El estado cargado es la línea base, no un cambio
+
+    def agregar(self, entrada: Any) -> Any:
+        """Encola una entrada al final de la fila"""
+        if entrada.id in self._entradas:
+            raise ValueError(f"La entrada {entrada.id} ya está en la fila")
+
+        if self._siguiente_secuencia > self._fenwick.capacidad:
+            self._reconstruir()
+
+        secuencia = self._siguiente_secuencia
+        self._siguiente_secuencia += 1
+
+        self._entradas[entrada.id] = entrada
+        self._secuencia[entrada.id] = secuencia
+        self._por_secuencia[secuencia] = entrada.id
+
+        posicion = 0
+        if entrada.estado == self.ESTADO_ESPERANDO:
+            self._marcar_esperando(entrada, secuencia)
+            posicion = self._esperando
+            self._refrescar(entrada, posicion)
+        if self._repositorio is not None:
+            self._repositorio.guardar(entrada)
+        self._registrar("alta", entrada.id, posicion=posicion, persona=_serializar(entrada))
+        return entrada
+
+    def cambiar_estado(self, entrada_id: int, estado: str) -> Optional[Any]:
+        """Cambia el estado de una entrada actualizando los índices"""
+        entrada = self._entradas.get(entrada_id)
+        if entrada is None or entrada.estado == estado:
+            return entrada
+
+        secuencia = self._secuencia[entrada_id]
+        cambio = {"estado": estado}
+        if entrada.estado == self.ESTADO_ESPERANDO:
+            cambio.update(desde=self._fenwick.prefijo(secuencia) + 1, desplazamiento=-1)
+            self._desmarcar_esperando(entrada, secuencia)
+        entrada.estado = estado
+        if estado == self.ESTADO_ESPERANDO:
+            self._marcar_esperando(entrada, secuencia)
+            posicion = self._fenwick.prefijo(secuencia)
+            cambio.update(posicion=posicion, desde=posicion, desplazamiento=1)
+        if self._repositorio is not None:
+            self._repositorio.guardar(entrada)
+        self._registrar("estado", entrada_id, **cambio)
+        return entrada
+
+    def remover(self, entrada_id: int) -> Optional[Any]:
+        """Saca una entrada de la fila"""
+        entrada = self._entradas.pop(entrada_id, None)
+        if entrada is None:
+            return None
+
+        secuencia = self._secuencia.pop(entrada_id)
+        del self._por_secuencia[secuencia]
+        cambio = {}
+        if entrada.estado == self.ESTADO_ESPERANDO:
+            cambio.update(desde=self._fenwick.prefijo(secuencia) + 1, desplazamiento=-1)
+            self._desmarcar_esperando(entrada, secuencia)
+        if self._repositorio is not None:
+            self._repositorio.eliminar(entrada_id)
+        self._registrar("baja", entrada_id, **cambio)
+
+        # Compactar cuando la mayoría de secuencias ya no están en uso
+        if self._fenwick.capacidad > 64 and len(self._entradas) * 4 < self._fenwick.capacidad:
+            self._reconstruir()
+        return entrada
+
+    def sincronizar(self, entrada_id: int, entrada: Optional[Any]):
+        """
+        Refleja una entrada ya persistida por otro worker (None = eliminada)
+        sin volver a guardarla; los cambios quedan en el log de deltas.
+        """
+        repositorio, self._repositorio = self._repositorio, None
+        try:
+            if entrada is None:
+                self.remover(entrada_id)
+            elif entrada_id not in self._entradas:
+                self.agregar(entrada)
+            else:
+                actual = self._entradas[entrada_id]
+                for campo, valor in vars(entrada).items():
+                    if campo != "estado":
+                        setattr(actual, campo, valor)
+                self.cambiar_estado(entrada_id, entrada.estado)
+        finally:
+            self._repositorio = repositorio
+
+    def notificar_tiempos(self, intervalos: Dict[int, float]) -> dict:
+        """
+        Registra que cambiaron los tiempos estimados (sin mover a nadie):
+        tiempo = posición en el bucket * intervalo del bucket.
+        """
+        return self._registrar("tiempos", None, intervalos=intervalos)
+
+    def limpiar(self):
+        """Vacía la fila completa (en memoria)"""
+        version, observadores = self.version, self._observadores
+        self.__init__(self._estimador, self._repositorio)
+        self.version, self._observadores = version, observadores
+        self._registrar("reinicio", None)
+
+    # ===== Internos =====
+
+    def _registrar(self, op: str, entrada_id: Optional[int], **campos) -> dict:
+        self.version += 1
+        cambio = {"seq": self.version, "op": op, "id": entrada_id, **campos}
+        self._cambios.append(cambio)
+        for observador in self._observadores:
+            try:
+                observador(cambio)
+            except Exception as e:
+                print(f"⚠️ Error en observador de la fila: {str(e)}")
+        return cambio
+
+    def _refrescar(self, entrada: Any, posicion: int, posicion_bucket: Optional[int] = None):
+        if entrada.estado == self.ESTADO_ESPERANDO:
+            bucket = bucket_capacidad(entrada.numeroPersonas)
+            if posicion_bucket is None:
+                posicion_bucket = self._fenwick_bucket[bucket].prefijo(self._secuencia[entrada.id])
+            entrada.posicion = posicion
+            entrada.tiempoEstimado = self._estimador(posicion, bucket, posicion_bucket)
+
+    def _marcar_esperando(self, entrada: Any, secuencia: int):
+        bucket = bucket_capacidad(entrada.numeroPersonas)
+        self._fenwick.sumar(secuencia, 1)
+        self._fenwick_bucket[bucket].sumar(secuencia, 1)
+        self._esperando += 1
+        self._esperando_bucket[bucket] += 1
+        self._por_telefono.setdefault(entrada.telefono, entrada.id)
+        heapq.heappush(self._buckets[bucket], (secuencia, entrada.id))
+
+    def _desmarcar_esperando(self, entrada: Any, secuencia: int):
+        bucket = bucket_capacidad(entrada.numeroPersonas)
+        self._fenwick.sumar(secuencia, -1)
+        self._fenwick_bucket[bucket].sumar(secuencia, -1)
+        self._esperando -= 1
+        self._esperando_bucket[bucket] -= 1
+        if self._por_telefono.get(entrada.telefono) == entrada.id:
+            del self._por_telefono[entrada.telefono]
+
+    def _reconstruir(self):
+        """
+        Renumera las secuencias y reconstruye el Fenwick.
+        O(n) amortizado: solo ocurre al duplicar o compactar la capacidad.
+        """
+        capacidad = 64
+        while capacidad < (len(self._entradas) + 1) * 2:
+            capacidad *= 2
+
+        self._fenwick = ArbolFenwick(capacidad)
+        self._fenwick_bucket = {b: ArbolFenwick(capacidad) for b in BUCKETS_CAPACIDAD}
+        self._buckets = {b: [] for b in BUCKETS_CAPACIDAD}
+        self._secuencia.clear()
+        self._por_secuencia.clear()
+        for secuencia, (entrada_id, entrada) in enumerate(self._entradas.items(), start=1):
+            self._secuencia[entrada_id] = secuencia
+            self._por_secuencia[secuencia] = entrada_id
+            if entrada.estado == self.ESTADO_ESPERANDO:
+                bucket = bucket_capacidad(entrada.numeroPersonas)
+                self._fenwick.sumar(secuencia, 1)
+                self._fenwick_bucket[bucket].sumar(secuencia, 1)
+                # Secuencias crecientes: la lista ya cumple la propiedad de heap
+                self._buckets[bucket].append((secuencia, entrada_id))
+        self._siguiente_secuencia = len(self._entradas) + 1
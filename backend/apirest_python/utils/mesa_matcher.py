@@ -0,0 +1,157 @@
+"""
+Índice de mesas libres por capacidad
+Empareja mesas libres con la fila virtual (best-fit)
+"""
+import bisect
+from typing import Any, Callable, Dict, List, Optional
+
+
+class IndiceMesasLibres:
+    """
+    Mesas disponibles agrupadas por capacidad
+
+    Mantiene una lista ordenada de las capacidades que tienen al menos
+    una mesa libre, así la mesa más pequeña donde cabe un grupo se
+    encuentra con una búsqueda binaria.
+
+    Las mesas prometidas a alguien de la fila salen del índice pero
+    quedan registradas con la persona: si esa persona sale de la fila
+    sin sentarse (cancela, vence o se vacía la fila), liberar() devuelve
+    la mesa al índice.
+    """
+
+    def __init__(self):
+        self._por_capacidad: Dict[int, Dict[int, Any]] = {}  # capacidad -> {id_mesa: mesa}
+        self._capacidades: List[int] = []  # capacidades con mesas libres, ordenadas
+        self._capacidad_de: Dict[int, int] = {}  # id_mesa -> capacidad
+        self._prometidas: Dict[int, tuple] = {}  # id_mesa -> (mesa, id de la persona)
+        self._mesa_de: Dict[int, int] = {}  # id de la persona -> id_mesa
+
+    def __len__(self) -> int:
+        return len(self._capacidad_de)
+
+    def __contains__(self, id_mesa: int) -> bool:
+        return id_mesa in self._capacidad_de
+
+    def agregar(self, mesa: Any):
+        """Registra (o actualiza) una mesa como libre"""
+        self._sacar(mesa.id_mesa)
+        grupo = self._por_capacidad.get(mesa.capacidad)
+        if grupo is None:
+            grupo = self._por_capacidad[mesa.capacidad] = {}
+            bisect.insort(self._capacidades, mesa.capacidad)
+        grupo[mesa.id_mesa] = mesa
+        self._capacidad_de[mesa.id_mesa] = mesa.capacidad
+
+    def quitar(self, id_mesa: int) -> Optional[Any]:
+        """Saca una mesa del índice (ocupada, reservada o eliminada) y olvida su promesa"""
+        self._olvidar_promesa(id_mesa)
+        return self._sacar(id_mesa)
+
+    def _sacar(self, id_mesa: int) -> Optional[Any]:
+        capacidad = self._capacidad_de.pop(id_mesa, None)
+        if capacidad is None:
+            return None
+        grupo = self._por_capacidad[capacidad]
+        mesa = grupo.pop(id_mesa)
+        if not grupo:
+            del self._por_capacidad[capacidad]
+            del self._capacidades[bisect.bisect_left(self._capacidades, capacidad)]
+        return mesa
+
+    # ===== Promesas =====
+
+    def prometer(self, mesa: Any, persona_id: int):
+        """Reserva la mesa para una persona llamada de la fila (repetirlo no cambia nada)"""
+        self.liberar(persona_id)  # Si ya tenía otra mesa prometida, vuelve al índice
+        self.quitar(mesa.id_mesa)
+        self._prometidas[mesa.id_mesa] = (mesa, persona_id)
+        self._mesa_de[persona_id] = mesa.id_mesa
+
+    def prometida_a(self, persona_id: int) -> Optional[Any]:
+        """Mesa prometida a la persona (None si no tiene)"""
+        id_mesa = self._mesa_de.get(persona_id)
+        return self._prometidas[id_mesa][0] if id_mesa is not None else None
+
+    def sentar(self, persona_id: int) -> Optional[Any]:
+        """La persona llegó: la promesa se cumple y la mesa no vuelve al índice"""
+        id_mesa = self._mesa_de.get(persona_id)
+        if id_mesa is None:
+            return None
+        return self._olvidar_promesa(id_mesa)
+
+    def liberar(self, persona_id: int) -> Optional[Any]:
+        """La persona salió de la fila sin sentarse: su mesa vuelve a estar libre"""
+        id_mesa = self._mesa_de.get(persona_id)
+        if id_mesa is None:
+            return None
+        mesa = self._olvidar_promesa(id_mesa)
+        if mesa.estado == "disponible":
+            self.agregar(mesa)
+        return mesa
+
+    def liberar_todas(self) -> List[Any]:
+        """Devuelve al índice todas las mesas prometidas (la fila se vació)"""
+        return [self.liberar(persona_id) for persona_id in list(self._mesa_de)]
+
+    def _olvidar_promesa(self, id_mesa: int) -> Optional[Any]:
+        promesa = self._prometidas.pop(id_mesa, None)
+        if promesa is None:
+            return None
+        del self._mesa_de[promesa[1]]
+        return promesa[0]
+
+    # ===== Consultas =====
+
+    def mejor_mesa(self, numero_personas: int) -> Optional[Any]:
+        """Mesa libre más pequeña donde cabe el grupo"""
+        indice = bisect.bisect_left(self._capacidades, numero_personas)
+        if indice == len(self._capacidades):
+            return None
+        grupo = self._por_capacidad[self._capacidades[indice]]
+        return next(iter(grupo.values()))
+
+    def libres(self) -> List[Any]:
+        """Mesas libres ordenadas de menor a mayor capacidad"""
+        return [mesa for capacidad in self._capacidades for mesa in self._por_capacidad[capacidad].values()]
+
+    def sincronizar(self, mesa: Any, estado_anterior: Optional[str] = None):
+        """
+        Refleja en el índice un cambio de la mesa.
+
+        Una mesa que deja de estar disponible sale del índice (y pierde su
+        promesa). Una prometida solo actualiza sus datos para cuando se
+        libere. Una disponible entra al índice al pasar a 'disponible';
+        si ya lo estaba y no figura, es que alguien ya se sentó en ella.
+        """
+        if mesa.estado != "disponible":
+            self.quitar(mesa.id_mesa)
+        elif mesa.id_mesa in self._prometidas:
+            self._prometidas[mesa.id_mesa] = (mesa, self._prometidas[mesa.id_mesa][1])
+        elif estado_anterior != "disponible" or mesa.id_mesa in self:
+            self.agregar(mesa)
+
+
+def emparejar_lote(indice: IndiceMesasLibres, cola: Any,
+                   llamar: Optional[Callable[[Any, Any], None]] = None) -> List[tuple]:
+    """
+    Re-ejecuta el emparejamiento para todas las mesas libres a la vez.
+
+    Recorre las mesas de menor a mayor capacidad para que las mesas
+    pequeñas se llenen primero con grupos pequeños y las grandes queden
+    para los grupos grandes. Devuelve pares (mesa, persona).
+    'llamar(persona, mesa)' marca a la persona como llamada (por defecto
+    solo cambia su estado).
+    """
+    asignaciones = []
+    for mesa in indice.libres():
+        persona = cola.mejor_para_mesa(mesa.capacidad)
+        if persona is None:
+            continue
+        if llamar is not None:
+            llamar(persona, mesa)
+        else:
+            cola.cambiar_estado(persona.id, "llamado")
+        indice.prometer(mesa, persona.id)
+        asignaciones.append((mesa, persona))
+    return asignaciones
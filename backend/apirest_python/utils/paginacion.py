@@ -0,0 +1,183 @@
+"""
+Listados paginados
+Cursor por id, selección de campos, filtros y respuestas en streaming (JSON, NDJSON o CSV)
+"""
+import csv
+import heapq
+import io
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+import orjson
+from fastapi import HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+LIMITE_MAXIMO = 500
+
+# Página que se devuelve si el cliente no pide limit (nunca el listado entero)
+LIMITE_POR_DEFECTO = 100
+
+# Elementos serializados por bloque enviado al cliente
+TAMANO_BLOQUE = 100
+
+FORMATOS = ("json", "ndjson", "csv")
+
+
+class ParametrosLista:
+    """Parámetros comunes de los listados (se usa con Depends())"""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Máximo de elementos por página"),
+        cursor: Optional[int] = Query(None, description="Id del último elemento de la página anterior"),
+        fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma"),
+        formato: str = Query("json", description="json (arreglo), ndjson (un objeto por línea) o csv")
+    ):
+        if formato not in FORMATOS:
+            raise HTTPException(status_code=400, detail={"error": "Formato inválido", "formatos_validos": list(FORMATOS)})
+        self.limit = limit
+        self.cursor = cursor
+        self.campos = [c.strip() for c in fields.split(",") if c.strip()] if fields else None
+        self.formato = formato
+
+    @property
+    def por_defecto(self) -> bool:
+        """True si no se pidió nada (la primera página, sin selección de campos)"""
+        return self.limit == LIMITE_POR_DEFECTO and self.cursor is None and self.campos is None and self.formato == "json"
+
+
+def _a_dict(elemento: Any) -> dict:
+    return elemento if isinstance(elemento, dict) else elemento.model_dump()
+
+
+def _valor(elemento: Any, campo: str) -> Any:
+    return elemento.get(campo) if isinstance(elemento, dict) else getattr(elemento, campo, None)
+
+
+# ===== Filtros =====
+
+def filtro_estado(campo: str, estados: Optional[str]) -> Optional[Callable[[Any], bool]]:
+    """'pendiente,confirmada' -> el elemento debe estar en alguno de esos estados"""
+    if not estados:
+        return None
+    permitidos = {e.strip() for e in estados.split(",") if e.strip()}
+    return lambda elemento: _valor(elemento, campo) in permitidos
+
+
+def filtro_rango(campo: str, desde: Optional[str], hasta: Optional[str]) -> Optional[Callable[[Any], bool]]:
+    """Rango inclusivo sobre un campo de texto ordenable (fechas YYYY-MM-DD)"""
+    if desde is None and hasta is None:
+        return None
+
+    def en_rango(elemento: Any) -> bool:
+        valor = _valor(elemento, campo)
+        if valor is None:
+            return False
+        return (desde is None or valor >= desde) and (hasta is None or valor <= hasta)
+    return en_rango
+
+
+def combinar_filtros(*filtros: Optional[Callable[[Any], bool]]) -> Optional[Callable[[Any], bool]]:
+    activos = [f for f in filtros if f is not None]
+    if not activos:
+        return None
+    if len(activos) == 1:
+        return activos[0]
+    return lambda elemento: all(f(elemento) for f in activos)
+
+
+# ===== Respuesta =====
+
+def responder_lista(
+    elementos: Iterable[Any],
+    campo_id: str,
+    params: ParametrosLista,
+    campos_validos: Sequence[str],
+    filtro: Optional[Callable[[Any], bool]] = None,
+    serializar: Optional[Callable[[Any], bytes]] = None
+) -> StreamingResponse:
+    """
+    Listado filtrado y paginado, enviado en streaming.
+
+    Se ordena por id y solo se guardan en memoria los limit+1 primeros
+    (heapq.nsmallest). Si hay más, X-Siguiente-Cursor trae el id desde
+    el que pedir la página siguiente. Solo una exportación (limit=None
+    explícito) recorre todo, en el orden de la lista.
+    """
+    if params.campos is not None:
+        desconocidos = [c for c in params.campos if c not in campos_validos]
+        if desconocidos:
+            raise HTTPException(status_code=400, detail={
+                "error": "Campos desconocidos",
+                "campos": desconocidos,
+                "campos_validos": list(campos_validos)
+            })
+
+    # Copia de la lista: el streaming termina después del handler y otra
+    # petición puede modificarla mientras tanto
+    seleccion: Iterable[Any] = list(elementos)
+    if filtro is not None:
+        seleccion = (e for e in seleccion if filtro(e))
+    if params.cursor is not None:
+        seleccion = (e for e in seleccion if _valor(e, campo_id) > params.cursor)
+
+    headers = {}
+    if params.limit is not None:
+        pagina: List[Any] = heapq.nsmallest(params.limit + 1, seleccion, key=lambda e: _valor(e, campo_id))
+        if len(pagina) > params.limit:
+            pagina = pagina[:params.limit]
+            headers["X-Siguiente-Cursor"] = str(_valor(pagina[-1], campo_id))
+        seleccion = pagina
+    elif params.cursor is not None:
+        seleccion = sorted(seleccion, key=lambda e: _valor(e, campo_id))
+
+    if params.formato == "csv":
+        columnas = params.campos or list(campos_validos)
+        return StreamingResponse(_filas_csv(seleccion, columnas), media_type="text/csv; charset=utf-8", headers=headers)
+
+    if params.campos is not None:
+        campos = params.campos
+
+        def a_bytes(elemento: Any) -> bytes:
+            datos = _a_dict(elemento)
+            return orjson.dumps({c: datos.get(c) for c in campos})
+    else:
+        a_bytes = serializar or (lambda e: orjson.dumps(_a_dict(e)))
+
+    if params.formato == "ndjson":
+        cuerpo = _bloques(seleccion, a_bytes, b"", b"", b"\n", b"")
+        media_type = "application/x-ndjson"
+    else:
+        cuerpo = _bloques(seleccion, a_bytes, b"[", b",", b"", b"]")
+        media_type = "application/json"
+    return StreamingResponse(cuerpo, media_type=media_type, headers=headers)
+
+
+def _bloques(elementos: Iterable[Any], a_bytes: Callable[[Any], bytes], inicio: bytes,
+             separador: bytes, final_elemento: bytes, fin: bytes) -> Iterator[bytes]:
+    """Serializa de a TAMANO_BLOQUE elementos: la memoria no crece con el tamaño del listado"""
+    bloque: List[bytes] = []
+    primero = True
+    for elemento in elementos:
+        bloque.append(a_bytes(elemento) + final_elemento)
+        if len(bloque) == TAMANO_BLOQUE:
+            yield (inicio if primero else separador) + separador.join(bloque)
+            bloque, primero = [], False
+    if bloque:
+        yield (inicio if primero else separador) + separador.join(bloque) + fin
+    else:
+        yield (inicio if primero else b"") + fin
+
+
+def _filas_csv(elementos: Iterable[Any], columnas: Sequence[str]) -> Iterator[bytes]:
+    """CSV con encabezado, enviado de a TAMANO_BLOQUE filas"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas)
+    for numero, elemento in enumerate(elementos, 1):
+        datos = _a_dict(elemento)
+        escritor.writerow([datos.get(c) for c in columnas])
+        if numero % TAMANO_BLOQUE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,133 @@
+"""
+Hub de eventos en proceso
+Pub/sub por canal para servir SSE y WebSocket directamente desde el Core API
+"""
+import asyncio
+import json
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+CANALES = ("fila_virtual", "mesas", "reservas")
+
+
+class Suscriptor:
+    """
+    Un cliente conectado (SSE o WebSocket)
+
+    Tiene un buffer acotado propio: si se llena, el suscriptor es lento y
+    se expulsa en lugar de frenar al resto o acumular memoria sin límite.
+    """
+
+    __slots__ = ("canales", "cola", "expulsado", "_loop")
+
+    def __init__(self, canales: Set[str], max_buffer: int):
+        self.canales = canales
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self.expulsado = False
+        self._loop = asyncio.get_running_loop()
+
+    def _entregar(self, mensaje: Tuple[str, str]) -> bool:
+        if self.expulsado:
+            return False
+        try:
+            self.cola.put_nowait(mensaje)
+            return True
+        except asyncio.QueueFull:
+            self.expulsado = True
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(None)  # Señal de fin para el endpoint
+            return False
+
+    async def siguiente(self, timeout: Optional[float] = None) -> Optional[Tuple[str, str]]:
+        """Próximo (canal, mensaje JSON); None si fue expulsado. TimeoutError si no llega nada"""
+        return await asyncio.wait_for(self.cola.get(), timeout)
+
+
+class HubEventos:
+    """
+    Pub/sub en memoria con los canales del servidor Ruby
+
+    Cada mensaje se serializa una sola vez y se reparte a los suscriptores
+    del canal. Si se define 'relay', los mensajes publicados localmente se
+    le pasan para que lleguen a otros workers; los que vienen de otro
+    worker entran por publicar_local().
+    """
+
+    def __init__(self, canales: Iterable[str] = CANALES, max_buffer: int = 256):
+        self.max_buffer = max_buffer
+        self._por_canal: Dict[str, Set[Suscriptor]] = {canal: set() for canal in canales}
+        self.relay: Optional[Callable[[dict], None]] = None
+        self.metricas = {"publicados": 0, "entregados": 0, "expulsados": 0}
+
+    @property
+    def canales(self):
+        return tuple(self._por_canal)
+
+    def suscriptores(self) -> int:
+        return len({s for grupo in self._por_canal.values() for s in grupo})
+
+    def suscribir(self, canales: Optional[Iterable[str]] = None, max_buffer: Optional[int] = None) -> Suscriptor:
+        """Crea un suscriptor (debe llamarse dentro del event loop)"""
+        elegidos = set(canales or self._por_canal)
+        desconocidos = elegidos - set(self._por_canal)
+        if desconocidos:
+            raise ValueError(f"Canales desconocidos: {', '.join(sorted(desconocidos))}")
+        suscriptor = Suscriptor(elegidos, max_buffer or self.max_buffer)
+        for canal in elegidos:
+            self._por_canal[canal].add(suscriptor)
+        return suscriptor
+
+    def desuscribir(self, suscriptor: Suscriptor):
+        for canal in suscriptor.canales:
+            self._por_canal[canal].discard(suscriptor)
+
+    def publicar(self, channel: str, event: str, data: Dict[str, Any]):
+        """Publica un evento local y lo pasa al relay (si hay)"""
+        mensaje = {"channel": channel, "action": event, "data": data}
+        self.publicar_local(mensaje)
+        if self.relay is not None:
+            try:
+                self.relay(mensaje)
+            except Exception as e:
+                print(f"⚠️ Error en relay de eventos: {str(e)}")
+
+    def publicar_local(self, mensaje: dict):
+        """Reparte un mensaje a los suscriptores de este proceso"""
+        grupo = self._por_canal.get(mensaje["channel"])
+        self.metricas["publicados"] += 1
+        if not grupo:
+            return
+        texto = (mensaje["channel"], json.dumps(mensaje, ensure_ascii=False, default=str))
+        try:
+            actual = asyncio.get_running_loop()
+        except RuntimeError:
+            actual = None
+
+        for suscriptor in list(grupo):
+            if suscriptor._loop is actual:
+                if suscriptor._entregar(texto):
+                    self.metricas["entregados"] += 1
+                else:
+                    self._expulsar(suscriptor)
+            else:
+                # Publicación desde otro hilo (endpoint sync o relay): entregar en su loop
+                suscriptor._loop.call_soon_threadsafe(self._entregar_remoto, suscriptor, texto)
+
+    def _entregar_remoto(self, suscriptor: Suscriptor, texto: Tuple[str, str]):
+        if suscriptor._entregar(texto):
+            self.metricas["entregados"] += 1
+        else:
+            self._expulsar(suscriptor)
+
+    def _expulsar(self, suscriptor: Suscriptor):
+        if any(suscriptor in self._por_canal[c] for c in suscriptor.canales):
+            self.desuscribir(suscriptor)
+            self.metricas["expulsados"] += 1
+            print("⚠️ Suscriptor lento expulsado del hub de eventos")
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            **self.metricas,
+            "suscriptores": self.suscriptores(),
+            "por_canal": {canal: len(grupo) for canal, grupo in self._por_canal.items()}
+        }
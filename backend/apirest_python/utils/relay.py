@@ -0,0 +1,120 @@
+"""
+Relay entre workers
+Lee la bitácora de cambios compartida y los aplica a las cachés de este proceso
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Cada cuánto se revisa la bitácora y cuánto se conserva antes de podarla
+INTERVALO_SEGUNDOS = 0.1
+RETENCION_SEGUNDOS = 10 * 60
+
+
+def aplicar_en_lista(lista: List[Any], campo_id: str, clave: Any, registro: Optional[Any]) -> Optional[Any]:
+    """
+    Upsert/borrado por id sobre una lista en memoria de un router.
+    Devuelve el registro que había antes (None si no existía).
+    """
+    for indice, actual in enumerate(lista):
+        if getattr(actual, campo_id) == clave:
+            if registro is None:
+                del lista[indice]
+            else:
+                lista[indice] = registro
+            return actual
+    if registro is not None:
+        lista.append(registro)
+    return None
+
+
+class RelayWorkers:
+    """
+    Coherencia de cachés entre workers
+
+    Las escrituras van a SQLite (fuente única de verdad) y dejan una
+    anotación en la bitácora. Cada worker sondea la bitácora desde su
+    último seq y entrega cada cambio ajeno al manejador de su tabla
+    (registrado por el router dueño de la caché). Los eventos en tiempo
+    real viajan por la misma bitácora y se reparten con 'al_evento'.
+    La poda de la bitácora la hace solo el worker líder ('es_lider').
+    """
+
+    def __init__(self, bitacora: Any, tabla_eventos: str, intervalo: float = INTERVALO_SEGUNDOS,
+                 retencion: float = RETENCION_SEGUNDOS, es_lider: Callable[[], bool] = lambda: True):
+        self._bitacora = bitacora
+        self._es_lider = es_lider
+        self._tabla_eventos = tabla_eventos
+        self._intervalo = intervalo
+        self._retencion = retencion
+        self._manejadores: Dict[str, Callable[[Any, Optional[dict]], None]] = {}
+        self._al_evento: Optional[Callable[[dict], None]] = None
+        self._cursor = bitacora.ultimo()  # Lo anterior ya está en la base que cargan los routers
+        self._tarea: Optional[asyncio.Task] = None
+        self.metricas = {"aplicados": 0, "eventos": 0, "errores": 0}
+
+    def al_cambiar(self, tabla: str, manejador: Callable[[Any, Optional[dict]], None]):
+        """Registra quién aplica los cambios de una tabla: manejador(clave, datos o None)"""
+        self._manejadores[tabla] = manejador
+
+    def al_evento(self, manejador: Callable[[dict], None]):
+        self._al_evento = manejador
+
+    def publicar_evento(self, mensaje: dict):
+        """Hace llegar un evento en tiempo real a los demás workers"""
+        self._bitacora.anotar_evento(mensaje)
+
+    def procesar(self) -> int:
+        """Aplica todo lo pendiente de la bitácora; devuelve cuántos cambios ajenos había"""
+        total = 0
+        while True:
+            self._cursor, cambios = self._bitacora.leer(self._cursor)
+            if not cambios:
+                return total
+            for tabla, clave, datos in cambios:
+                try:
+                    if tabla == self._tabla_eventos:
+                        if self._al_evento is not None:
+                            self._al_evento(datos)
+                            self.metricas["eventos"] += 1
+                    elif tabla in self._manejadores:
+                        self._manejadores[tabla](clave, datos)
+                        self.metricas["aplicados"] += 1
+                except Exception as e:
+                    self.metricas["errores"] += 1
+                    print(f"❌ Error aplicando cambio de {tabla} ({clave}): {str(e)}")
+            total += len(cambios)
+
+    # ===== Ciclo de vida =====
+
+    async def iniciar(self):
+        if self._tarea is not None and not self._tarea.done():
+            return
+        self._tarea = asyncio.create_task(self._bucle())
+        print(f"🔁 Relay entre workers iniciado ({self._bitacora.origen})")
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    async def _bucle(self):
+        proxima_poda = time.time() + self._retencion
+        while True:
+            await asyncio.sleep(self._intervalo)
+            try:
+                self.procesar()
+                if time.time() >= proxima_poda:
+                    if self._es_lider():
+                        self._bitacora.podar(time.time() - self._retencion)
+                    proxima_poda = time.time() + self._retencion
+            except Exception as e:
+                self.metricas["errores"] += 1
+                print(f"❌ Error leyendo la bitácora de cambios: {str(e)}")
+
+    def resumen(self) -> Dict[str, Any]:
+        return {**self.metricas, "cursor": self._cursor, "activo": self._tarea is not None}
@@ -0,0 +1,158 @@
+"""
+Índice de intervalos de reservas
+Reservas activas por (mesa, fecha) con horas en minutos enteros
+"""
+import bisect
+from typing import Any, Dict, List, Optional, Tuple
+
+MINUTOS_DIA = 24 * 60
+
+
+def hora_a_minutos(hora_str: str) -> int:
+    """Convierte 'HH:MM' (o 'HH:MM:SS') a minutos desde medianoche"""
+    partes = hora_str.strip().split(":")
+    horas = int(partes[0])
+    try:
+        minutos = int(partes[1]) if len(partes) > 1 else 0
+    except ValueError:
+        minutos = 0
+    if not (0 <= horas < 24 and 0 <= minutos < 60):
+        raise ValueError(f"Hora inválida: {hora_str}")
+    return horas * 60 + minutos
+
+
+def minutos_a_hora(minutos: int) -> str:
+    """Convierte minutos desde medianoche a 'HH:MM'"""
+    minutos %= MINUTOS_DIA
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+class _IntervalosDia:
+    """
+    Intervalos [inicio, fin) de una mesa en una fecha, ordenados por inicio.
+
+    Guarda además el máximo 'fin' acumulado, de modo que saber si algún
+    intervalo se cruza con [inicio, fin) es una búsqueda binaria.
+    """
+
+    __slots__ = ("inicios", "fines", "ids", "max_fin")
+
+    def __init__(self):
+        self.inicios: List[int] = []
+        self.fines: List[int] = []
+        self.ids: List[int] = []
+        self.max_fin: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def insertar(self, inicio: int, fin: int, id_reserva: int):
+        indice = bisect.bisect_right(self.inicios, inicio)
+        self.inicios.insert(indice, inicio)
+        self.fines.insert(indice, fin)
+        self.ids.insert(indice, id_reserva)
+        self.max_fin.insert(indice, 0)
+        self._recalcular_desde(indice)
+
+    def quitar(self, inicio: int, id_reserva: int):
+        indice = bisect.bisect_left(self.inicios, inicio)
+        while self.ids[indice] != id_reserva:
+            indice += 1
+        for lista in (self.inicios, self.fines, self.ids, self.max_fin):
+            del lista[indice]
+        self._recalcular_desde(indice)
+
+    def _recalcular_desde(self, indice: int):
+        acumulado = self.max_fin[indice - 1] if indice else 0
+        for i in range(indice, len(self.fines)):
+            acumulado = max(acumulado, self.fines[i])
+            self.max_fin[i] = acumulado
+
+    def cruce(self, inicio: int, fin: int, excluir: Optional[int] = None) -> Optional[int]:
+        """Id de una reserva que se cruza con [inicio, fin), o None"""
+        limite = bisect.bisect_left(self.inicios, fin)  # Intervalos que empiezan antes de 'fin'
+        if limite == 0 or self.max_fin[limite - 1] <= inicio:
+            return None
+        for i in range(limite - 1, -1, -1):
+            if self.max_fin[i] <= inicio:
+                break
+            if self.fines[i] > inicio and self.ids[i] != excluir:
+                return self.ids[i]
+        return None
+
+
+class IndiceReservas:
+    """
+    Índice incremental de reservas activas por (mesa, fecha)
+
+    Se actualiza en cada alta, edición, cambio de estado o baja, así
+    la verificación de conflictos no recorre la lista completa ni
+    vuelve a parsear horas. Si recibe una grilla de disponibilidad,
+    la mantiene sincronizada con cada cambio.
+    """
+
+    ESTADOS_INACTIVOS = ("cancelada", "no_show", "completada")
+
+    def __init__(self, duracion_por_defecto: int, grilla: Any = None):
+        self._duracion = duracion_por_defecto
+        self._grilla = grilla
+        self._dias: Dict[Tuple[int, str], _IntervalosDia] = {}
+        self._entradas: Dict[int, Tuple[Tuple[int, str], int, int]] = {}  # id -> (clave, inicio, fin)
+        self._reservas: Dict[int, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def intervalo(self, hora_inicio: str, hora_fin: Optional[str] = None) -> Tuple[int, int]:
+        """Intervalo [inicio, fin) en minutos; si la reserva cruza medianoche, fin > 1440"""
+        inicio = hora_a_minutos(hora_inicio)
+        fin = hora_a_minutos(hora_fin) if hora_fin else inicio + self._duracion
+        if fin <= inicio:
+            fin += MINUTOS_DIA
+        return inicio, fin
+
+    def indexar(self, reserva: Any):
+        """Alta o actualización de una reserva en el índice"""
+        self.quitar(reserva.id_reserva)
+        if (reserva.estado in self.ESTADOS_INACTIVOS or not reserva.id_mesa
+                or not reserva.fecha or not reserva.hora_inicio):
+            return
+        try:
+            inicio, fin = self.intervalo(reserva.hora_inicio, reserva.hora_fin)
+        except ValueError:
+            return
+
+        clave = (reserva.id_mesa, reserva.fecha)
+        dia = self._dias.get(clave)
+        if dia is None:
+            dia = self._dias[clave] = _IntervalosDia()
+        dia.insertar(inicio, fin, reserva.id_reserva)
+        self._entradas[reserva.id_reserva] = (clave, inicio, fin)
+        self._reservas[reserva.id_reserva] = reserva
+        self._sincronizar_grilla(clave, dia)
+
+    def quitar(self, id_reserva: int):
+        """Saca una reserva del índice (cancelada, eliminada o editada)"""
+        entrada = self._entradas.pop(id_reserva, None)
+        if entrada is None:
+            return
+        clave, inicio, _ = entrada
+        del self._reservas[id_reserva]
+        dia = self._dias[clave]
+        dia.quitar(inicio, id_reserva)
+        self._sincronizar_grilla(clave, dia)
+        if not dia:
+            del self._dias[clave]
+
+    def _sincronizar_grilla(self, clave: Tuple[int, str], dia: _IntervalosDia):
+        if self._grilla is not None:
+            self._grilla.actualizar(clave[0], clave[1], zip(dia.inicios, dia.fines))
+
+    def conflicto(self, id_mesa: int, fecha: str, inicio: int, fin: int,
+                  excluir_reserva_id: Optional[int] = None) -> Optional[Any]:
+        """Reserva activa que se cruza con [inicio, fin) en esa mesa y fecha"""
+        dia = self._dias.get((id_mesa, fecha))
+        if dia is None:
+            return None
+        id_reserva = dia.cruce(inicio, fin, excluir_reserva_id)
+        return self._reservas[id_reserva] if id_reserva is not None else None
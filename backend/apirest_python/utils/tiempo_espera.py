@@ -0,0 +1,161 @@
+"""
+Estimador de tiempos de espera
+Aprende la rotación de mesas por bucket de capacidad y franja horaria
+"""
+import math
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from utils.fila_engine import BUCKETS_CAPACIDAD, bucket_capacidad
+
+# Franjas horarias (hora inicio, hora fin, nombre)
+FRANJAS = ((0, 11, "manana"), (11, 16, "almuerzo"), (16, 19, "tarde"), (19, 24, "cena"))
+
+# Minutos que dura una mesa ocupada mientras no hay datos reales
+DURACION_INICIAL = {2: 45.0, 4: 60.0, 6: 75.0, 8: 90.0}
+
+# Ocupaciones fuera de este rango (mesa olvidada, clic por error) no se aprenden
+DURACION_MINIMA = 1.0
+DURACION_MAXIMA = 6 * 60.0
+
+# Sin mesas registradas se usa el cálculo clásico de 15 min por posición
+MINUTOS_POR_POSICION = 15
+
+
+def franja_de(instante: float) -> str:
+    hora = datetime.fromtimestamp(instante).hour
+    for inicio, fin, nombre in FRANJAS:
+        if inicio <= hora < fin:
+            return nombre
+    return FRANJAS[-1][2]
+
+
+class PromedioExponencial:
+    """Media móvil exponencial: O(1) memoria, sin guardar muestras"""
+
+    __slots__ = ("alfa", "valor", "muestras")
+
+    def __init__(self, alfa: float):
+        self.alfa = alfa
+        self.valor = 0.0
+        self.muestras = 0
+
+    def actualizar(self, muestra: float):
+        self.valor = muestra if self.muestras == 0 else self.alfa * muestra + (1 - self.alfa) * self.valor
+        self.muestras += 1
+
+
+class EstimadorEspera:
+    """
+    Estimador online de tiempos de espera
+
+    Cada vez que una mesa pasa a 'ocupada' se anota la hora; cuando deja
+    de estarlo, la duración alimenta la media exponencial de su bucket
+    (general y por franja horaria). El intervalo entre mesas que se
+    liberan en un bucket es duración media / número de mesas del bucket,
+    y el tiempo de quien espera es su posición dentro del bucket por ese
+    intervalo. Los intervalos se recalculan solo cuando cambian las
+    estadísticas o la franja; estimar cada posición es O(1).
+
+    Se puede usar directamente como estimador de ColaVirtual.
+    """
+
+    def __init__(self, alfa: float = 0.2, reloj: Callable[[], float] = time.time):
+        self._alfa = alfa
+        self._reloj = reloj
+        self._por_franja: Dict[Tuple[int, str], PromedioExponencial] = {}
+        self._general: Dict[int, PromedioExponencial] = {b: PromedioExponencial(alfa) for b in BUCKETS_CAPACIDAD}
+        self._mesas: Dict[int, int] = {b: 0 for b in BUCKETS_CAPACIDAD}  # bucket -> mesas
+        self._ocupadas: Dict[int, Tuple[float, int]] = {}  # id_mesa -> (desde, bucket)
+        self.version = 0
+        self._cache: Optional[Tuple[int, str, Dict[int, float]]] = None
+
+    # ===== Eventos de mesas =====
+
+    def agregar_mesa(self, capacidad: int):
+        self._mesas[bucket_capacidad(capacidad)] += 1
+        self.version += 1
+
+    def quitar_mesa(self, id_mesa: int, capacidad: int):
+        bucket = bucket_capacidad(capacidad)
+        self._mesas[bucket] = max(0, self._mesas[bucket] - 1)
+        self._ocupadas.pop(id_mesa, None)
+        self.version += 1
+
+    def observar(self, mesa, estado_anterior: Optional[str]) -> bool:
+        """
+        Registra un cambio de estado de mesa. Devuelve True si cambiaron
+        las estadísticas (y con ello los tiempos estimados).
+        """
+        if mesa.estado == estado_anterior:
+            return False
+        ahora = self._reloj()
+        if mesa.estado == "ocupada":
+            self._ocupadas[mesa.id_mesa] = (ahora, bucket_capacidad(mesa.capacidad))
+            return False
+        if estado_anterior != "ocupada":
+            return False
+
+        inicio = self._ocupadas.pop(mesa.id_mesa, None)
+        if inicio is None:
+            return False
+        desde, bucket = inicio
+        duracion = (ahora - desde) / 60
+        if not DURACION_MINIMA <= duracion <= DURACION_MAXIMA:
+            return False
+
+        self._general[bucket].actualizar(duracion)
+        clave = (bucket, franja_de(desde))
+        if clave not in self._por_franja:
+            self._por_franja[clave] = PromedioExponencial(self._alfa)
+        self._por_franja[clave].actualizar(duracion)
+        self.version += 1
+        return True
+
+    # ===== Estimación =====
+
+    def minutos_restantes(self, id_mesa: int) -> int:
+        """Minutos que le faltan a una mesa ocupada según la duración esperada"""
+        ocupada = self._ocupadas.get(id_mesa)
+        if ocupada is None:
+            return 0
+        desde, bucket = ocupada
+        transcurrido = (self._reloj() - desde) / 60
+        return max(0, math.ceil(self.duracion(bucket, franja_de(desde)) - transcurrido))
+
+    def duracion(self, bucket: int, franja: str) -> float:
+        """Duración esperada de una ocupación: franja, luego general, luego valor inicial"""
+        por_franja = self._por_franja.get((bucket, franja))
+        if por_franja is not None and por_franja.muestras:
+            return por_franja.valor
+        if self._general[bucket].muestras:
+            return self._general[bucket].valor
+        return DURACION_INICIAL[bucket]
+
+    def intervalos(self) -> Dict[int, float]:
+        """Minutos entre mesas que se liberan, por bucket (cacheado por versión y franja)"""
+        franja = franja_de(self._reloj())
+        if self._cache is not None and self._cache[0] == self.version and self._cache[1] == franja:
+            return self._cache[2]
+
+        intervalos = {}
+        for indice, bucket in enumerate(BUCKETS_CAPACIDAD):
+            # Si no hay mesas de ese tamaño el grupo espera una del siguiente bucket con mesas
+            for mayor in BUCKETS_CAPACIDAD[indice:]:
+                if self._mesas[mayor]:
+                    intervalos[bucket] = round(self.duracion(mayor, franja) / self._mesas[mayor], 2)
+                    break
+            else:
+                intervalos[bucket] = float(MINUTOS_POR_POSICION)
+        self._cache = (self.version, franja, intervalos)
+        return intervalos
+
+    def estimar(self, posicion: int, bucket: Optional[int] = None, posicion_bucket: Optional[int] = None) -> int:
+        """Minutos de espera para la posición dada (dentro de su bucket si se conoce)"""
+        if bucket is None:
+            return posicion * MINUTOS_POR_POSICION
+        rango = posicion_bucket if posicion_bucket is not None else posicion
+        return max(1, math.ceil(rango * self.intervalos()[bucket]))
+
+    __call__ = estimar
@@ -0,0 +1,69 @@
+"""
+Caché de tokens verificados
+LRU por hash del token con vencimiento igual al 'exp' del JWT
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Tokens sin 'exp' se vuelven a verificar pasado este plazo
+TTL_MAXIMO_SEGUNDOS = 5 * 60
+
+
+def huella_token(token: str) -> bytes:
+    """Clave de la caché: no se guardan tokens en claro"""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+
+class CacheTokens:
+    """
+    LRU de tokens ya verificados (firma y vencimiento)
+
+    Un acierto evita jwt.decode: queda un hash y un lookup en un dict.
+    Cada entrada vence cuando vence el token, así un token expirado
+    nunca se acepta desde la caché.
+    """
+
+    def __init__(self, capacidad: int = 1024, reloj: Callable[[], float] = time.time):
+        self._capacidad = capacidad
+        self._reloj = reloj
+        self._entradas: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self.metricas = {"aciertos": 0, "fallos": 0}
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obtener(self, token: str) -> Optional[str]:
+        """Usuario (sub) del token si está en caché y no venció"""
+        clave = huella_token(token)
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self.metricas["fallos"] += 1
+            return None
+        usuario, vence = entrada
+        if vence <= self._reloj():
+            del self._entradas[clave]
+            self.metricas["fallos"] += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self.metricas["aciertos"] += 1
+        return usuario
+
+    def guardar(self, token: str, usuario: str, exp: Optional[Any] = None):
+        """Anota un token recién verificado; 'exp' es el claim del JWT (epoch)"""
+        ahora = self._reloj()
+        vence = float(exp) if exp is not None else ahora + TTL_MAXIMO_SEGUNDOS
+        if vence <= ahora:
+            return
+        clave = huella_token(token)
+        self._entradas[clave] = (usuario, vence)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self._capacidad:
+            self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    def resumen(self) -> Dict[str, Any]:
+        return {**self.metricas, "entradas": len(self._entradas), "capacidad": self._capacidad}
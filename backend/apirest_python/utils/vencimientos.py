@@ -0,0 +1,101 @@
+"""
+Programador de vencimientos
+Min-heap de plazos con una tarea asyncio que despierta justo al vencer el primero
+"""
+import asyncio
+import heapq
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ProgramadorVencimientos:
+    """
+    Vencimientos por clave sobre un min-heap
+
+    programar/cancelar son O(log n) / O(1): al cancelar o reprogramar la
+    entrada vieja queda en el heap y se descarta al salir (borrado perezoso).
+    La tarea de fondo duerme hasta el plazo más cercano; en cada barrido
+    entrega todas las claves vencidas juntas a 'al_vencer'.
+    """
+
+    def __init__(self, al_vencer: Callable[[List[Any]], Any], reloj: Callable[[], float] = time.time):
+        self._al_vencer = al_vencer
+        self._reloj = reloj
+        self._heap: List[tuple] = []  # (vence_en, orden, clave)
+        self._plazos: Dict[Any, float] = {}  # clave -> vence_en vigente
+        self._orden = 0
+        self._despertar: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._plazos)
+
+    def __contains__(self, clave: Any) -> bool:
+        return clave in self._plazos
+
+    def proximo(self) -> Optional[float]:
+        """Plazo vigente más cercano (limpia entradas obsoletas del tope)"""
+        while self._heap:
+            vence_en, _, clave = self._heap[0]
+            if self._plazos.get(clave) == vence_en:
+                return vence_en
+            heapq.heappop(self._heap)
+        return None
+
+    def programar(self, clave: Any, vence_en: float):
+        """Programa (o reprograma) el vencimiento de una clave"""
+        anterior = self.proximo()
+        self._plazos[clave] = vence_en
+        self._orden += 1
+        heapq.heappush(self._heap, (vence_en, self._orden, clave))
+        if self._despertar is not None and (anterior is None or vence_en < anterior):
+            self._despertar.set()
+
+    def cancelar(self, clave: Any):
+        self._plazos.pop(clave, None)
+
+    def vencidos(self, ahora: Optional[float] = None) -> List[Any]:
+        """Saca y devuelve todas las claves cuyo plazo ya pasó"""
+        ahora = self._reloj() if ahora is None else ahora
+        resultado = []
+        while True:
+            vence_en = self.proximo()
+            if vence_en is None or vence_en > ahora:
+                return resultado
+            _, _, clave = heapq.heappop(self._heap)
+            del self._plazos[clave]
+            resultado.append(clave)
+
+    # ===== Ciclo de vida =====
+
+    async def iniciar(self):
+        if self._tarea is not None and not self._tarea.done():
+            return
+        self._despertar = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        self._despertar = None
+
+    async def _bucle(self):
+        while True:
+            vence_en = self.proximo()
+            espera = None if vence_en is None else max(0.0, vence_en - self._reloj())
+            self._despertar.clear()
+            try:
+                await asyncio.wait_for(self._despertar.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+            vencidos = self.vencidos()
+            if vencidos:
+                try:
+                    self._al_vencer(vencidos)
+                except Exception as e:
+                    print(f"❌ Error procesando vencimientos: {str(e)}")
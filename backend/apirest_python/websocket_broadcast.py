@@ -1,39 +1,248 @@
 """
 websocket_broadcast.py
 Utilidad para enviar notificaciones al servidor WebSocket Ruby
+
+Los eventos no se envían uno por uno: se encolan en un broadcaster de
+larga vida (iniciado en el lifespan de la app) que reutiliza un pool de
+conexiones keep-alive y agrupa las ráfagas en un solo POST /broadcast.
+
+Además cada evento se reparte en proceso por el hub de eventos, que
+alimenta los endpoints SSE/WebSocket propios (routers/TiempoReal.py).
+Con WEBSOCKET_BROADCAST_URL vacío el reenvío al servidor Ruby se omite.
 """
 
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
 import httpx
-import json
-from typing import Dict, Any
 
-WEBSOCKET_BROADCAST_URL = "http://localhost:8081/broadcast"
+from utils.pubsub import HubEventos
 
-async def send_websocket_broadcast(channel: str, event: str, data: Dict[str, Any]):
-   
-    try:
-        message = {
+WEBSOCKET_BROADCAST_URL = os.getenv("WEBSOCKET_BROADCAST_URL", "http://localhost:8081/broadcast")
+BROADCAST_MAX_PENDIENTES = int(os.getenv("BROADCAST_MAX_PENDIENTES", "500"))
+BROADCAST_MAX_LOTE = int(os.getenv("BROADCAST_MAX_LOTE", "50"))
+BROADCAST_VENTANA_SEGUNDOS = float(os.getenv("BROADCAST_VENTANA_SEGUNDOS", "0.05"))
+TIEMPO_REAL_BUFFER = int(os.getenv("TIEMPO_REAL_BUFFER", "256"))
+
+# Campos que identifican la entidad de un evento (para fusionar actualizaciones)
+CAMPOS_ENTIDAD = ("id", "mesa_id", "reserva_id", "persona_id", "cliente_id")
+
+
+def clave_evento(channel: str, event: str, data: Dict[str, Any]) -> Tuple[str, str, Any]:
+    """(canal, acción, entidad): dos eventos con la misma clave son redundantes"""
+    for campo in CAMPOS_ENTIDAD:
+        if data.get(campo) is not None:
+            return channel, event, data[campo]
+    return channel, event, None
+
+
+class BroadcasterWebSocket:
+    """
+    Broadcaster con cola acotada y envío por lotes
+
+    - Un solo httpx.AsyncClient (pool keep-alive) para toda la app
+    - Los eventos pendientes de la misma entidad se fusionan (gana el último)
+    - Con la cola llena solo entran actualizaciones de entidades que ya
+      están pendientes; el resto se descarta (nunca se pisa otra entidad)
+    - Contadores de enviados, descartados, fusionados y latencia
+    """
+
+    def __init__(
+        self,
+        url: str = WEBSOCKET_BROADCAST_URL,
+        max_pendientes: int = BROADCAST_MAX_PENDIENTES,
+        max_lote: int = BROADCAST_MAX_LOTE,
+        ventana: float = BROADCAST_VENTANA_SEGUNDOS,
+        cliente: Optional[httpx.AsyncClient] = None
+    ):
+        self.url = url
+        self.max_pendientes = max_pendientes
+        self.max_lote = max_lote
+        self.ventana = ventana
+        self._cliente = cliente
+        self._cliente_propio = cliente is None
+        self._pendientes: "OrderedDict[tuple, tuple]" = OrderedDict()  # clave -> (mensaje, encolado)
+        self._secuencia = 0  # Desempate para eventos sin entidad
+        self._hay_eventos: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._deteniendo = False
+        self.metricas = {
+            "encolados": 0,
+            "enviados": 0,
+            "lotes": 0,
+            "fusionados": 0,
+            "descartados": 0,
+            "errores": 0,
+            "latencia_ms_ultima": 0.0,
+            "latencia_ms_max": 0.0,
+            "latencia_ms_total": 0.0
+        }
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea is not None and not self._tarea.done()
+
+    def pendientes(self) -> int:
+        return len(self._pendientes)
+
+    # ===== Ciclo de vida =====
+
+    async def iniciar(self):
+        """Crea el pool de conexiones y arranca el worker de envío"""
+        if self.activo:
+            return
+        if self._cliente is None:
+            self._cliente = httpx.AsyncClient(
+                timeout=2.0,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)
+            )
+        self._hay_eventos = asyncio.Event()
+        self._deteniendo = False
+        if self._pendientes:
+            self._hay_eventos.set()
+        self._tarea = asyncio.create_task(self._worker())
+        print(f"📡 Broadcaster WebSocket iniciado ({self.url})")
+
+    async def detener(self, timeout: float = 2.0):
+        """
+        Deja terminar el lote en curso, envía lo pendiente y cierra el pool.
+        Todo con un mismo límite de tiempo: lo que no alcanza se pierde.
+        """
+        limite = time.monotonic() + timeout
+        if self._tarea is not None:
+            self._deteniendo = True
+            self._hay_eventos.set()
+            try:
+                await asyncio.wait_for(self._tarea, timeout)
+            except asyncio.TimeoutError:
+                pass  # wait_for ya canceló el worker
+            self._tarea = None
+        try:
+            await asyncio.wait_for(self.vaciar(), max(0.0, limite - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+        if self._pendientes:
+            print(f"⚠️ Broadcaster detenido con {self.pendientes()} eventos sin enviar")
+        if self._cliente is not None and self._cliente_propio:
+            await self._cliente.aclose()
+            self._cliente = None
+
+    # ===== Encolado =====
+
+    def publicar(self, channel: str, event: str, data: Dict[str, Any]) -> bool:
+        """
+        Encola un evento sin bloquear. Devuelve False si se descartó.
+        """
+        mensaje = {
             "channel": channel,
-            "action": event,  # Cambiar "event" a "action" para coincidir con el servidor Ruby
+            "action": event,  # "action" para coincidir con el servidor Ruby
             "data": data
         }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                WEBSOCKET_BROADCAST_URL,
-                json=message,
-                timeout=2.0  # 2 segundos timeout
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ Broadcast enviado a WebSocket: {channel}/{event}")
-            else:
+        clave = clave_evento(channel, event, data)
+        if clave[2] is None:
+            self._secuencia += 1
+            clave = (*clave, self._secuencia)
+        self.metricas["encolados"] += 1
+
+        if clave in self._pendientes:
+            self._fusionar(clave, mensaje)
+        elif len(self._pendientes) >= self.max_pendientes:
+            self.metricas["descartados"] += 1
+            return False
+        else:
+            self._pendientes[clave] = (mensaje, time.perf_counter())
+
+        if self._hay_eventos is not None:
+            self._hay_eventos.set()
+        return True
+
+    def _fusionar(self, clave: tuple, mensaje: dict):
+        """Reemplaza un evento pendiente por uno más nuevo (conserva su lugar y su hora de encolado)"""
+        _, encolado = self._pendientes[clave]
+        self._pendientes[clave] = (mensaje, encolado)
+        self.metricas["fusionados"] += 1
+
+    # ===== Envío =====
+
+    async def _worker(self):
+        while not self._deteniendo:
+            await self._hay_eventos.wait()
+            if self._deteniendo:
+                return
+            # Ventana corta para juntar la ráfaga en un mismo lote
+            await asyncio.sleep(self.ventana)
+            self._hay_eventos.clear()
+            await self.vaciar(hasta_detener=True)
+
+    async def vaciar(self, hasta_detener: bool = False):
+        """
+        Envía todos los eventos pendientes en lotes de hasta max_lote.
+        El worker corta entre lotes al detenerse; el resto lo envía detener().
+        """
+        while self._pendientes and not (hasta_detener and self._deteniendo):
+            lote = []
+            while self._pendientes and len(lote) < self.max_lote:
+                lote.append(self._pendientes.popitem(last=False)[1])
+            await self._enviar_lote(lote)
+
+    async def _enviar_lote(self, lote: List[tuple]):
+        if self._cliente is None:
+            self._cliente = httpx.AsyncClient(timeout=2.0)
+            self._cliente_propio = True
+
+        # Un evento suelto mantiene el formato original; varios van como lista
+        mensajes = [mensaje for mensaje, _ in lote]
+        cuerpo = mensajes[0] if len(mensajes) == 1 else mensajes
+        try:
+            response = await self._cliente.post(self.url, json=cuerpo, timeout=2.0)
+            if response.status_code != 200:
+                self.metricas["errores"] += 1
                 print(f"⚠️ Error al enviar broadcast: {response.status_code}")
-                
-    except httpx.ConnectError:
-        print(f"⚠️ WebSocket server no disponible en {WEBSOCKET_BROADCAST_URL}")
-    except Exception as e:
-        print(f"❌ Error al enviar broadcast: {str(e)}")
+                return
+        except httpx.ConnectError:
+            self.metricas["errores"] += 1
+            print(f"⚠️ WebSocket server no disponible en {self.url}")
+            return
+        except Exception as e:
+            self.metricas["errores"] += 1
+            print(f"❌ Error al enviar broadcast: {str(e)}")
+            return
+
+        ahora = time.perf_counter()
+        for _, encolado in lote:
+            latencia = (ahora - encolado) * 1000
+            self.metricas["latencia_ms_total"] += latencia
+            self.metricas["latencia_ms_max"] = max(self.metricas["latencia_ms_max"], latencia)
+        self.metricas["latencia_ms_ultima"] = latencia
+        self.metricas["enviados"] += len(lote)
+        self.metricas["lotes"] += 1
+
+    def resumen(self) -> Dict[str, Any]:
+        """Contadores para el endpoint de métricas"""
+        enviados = self.metricas["enviados"]
+        return {
+            **{k: v for k, v in self.metricas.items() if k != "latencia_ms_total"},
+            "latencia_ms_promedio": round(self.metricas["latencia_ms_total"] / enviados, 2) if enviados else 0.0,
+            "pendientes": self.pendientes(),
+            "activo": self.activo
+        }
+
+
+# Instancia única; el lifespan de main.py la inicia y la detiene
+broadcaster = BroadcasterWebSocket()
+
+# Hub en proceso para los clientes conectados directamente al Core API
+hub_eventos = HubEventos(max_buffer=TIEMPO_REAL_BUFFER)
+
+
+async def send_websocket_broadcast(channel: str, event: str, data: Dict[str, Any]):
+    """Reparte el evento en proceso y lo encola para el servidor Ruby (si está configurado)"""
+    hub_eventos.publicar(channel, event, data)
+    if broadcaster.url:
+        broadcaster.publicar(channel, event, data)
 
 
 # Funciones específicas por canal
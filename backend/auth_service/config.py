@@ -12,13 +12,32 @@ class Settings(BaseSettings):
     
     # JWT
     jwt_secret: str = os.getenv("JWT_SECRET", "chuwue_grill_secret_key_cambiar_en_produccion")
-    jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
+    jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "RS256")  # RS256 (JWKS) o HS256 (secret compartido)
+    jwt_keys_dir: str = os.getenv("JWT_KEYS_DIR", "./data/keys")
+    jwt_key_rotation_hours: int = int(os.getenv("JWT_KEY_ROTATION_HOURS", "24"))
+    # Tokens HS256 sin kid (anteriores a RS256): se aceptan hasta esta fecha ISO 8601; vacío = nunca
+    jwt_hs256_fallback_until: str = os.getenv("JWT_HS256_FALLBACK_UNTIL", "")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     refresh_token_expire_days: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
     
     # Database
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./data/auth.db")
     
+    # Contraseñas: costo bcrypt y pool de hilos dedicado
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    password_hash_max_queue: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+    
+    # Cachés en memoria: lista negra de jti y usuarios activos
+    # (el TTL acota cuánto tarda en verse un cambio de usuario hecho fuera del proceso)
+    revocation_capacity: int = int(os.getenv("REVOCATION_CAPACITY", "10000"))
+    user_cache_ttl_seconds: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    
+    # Limpieza de tokens vencidos
+    janitor_interval_seconds: int = int(os.getenv("JANITOR_INTERVAL_SECONDS", "300"))
+    janitor_batch_size: int = int(os.getenv("JANITOR_BATCH_SIZE", "500"))
+    janitor_analyze_every: int = int(os.getenv("JANITOR_ANALYZE_EVERY", "12"))
+    
     # Rate Limiting
     rate_limit_per_minute: int = 10  # Intentos de login por minuto
     
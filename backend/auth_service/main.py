@@ -9,6 +9,7 @@ Endpoints:
 - POST /auth/refresh - Renovar tokens
 - GET /auth/me - Usuario actual
 - GET /auth/validate - Validar token (interno)
+- GET /auth/jwks.json - Claves públicas de firma (JWKS)
 """
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
@@ -20,9 +21,14 @@ from config import get_settings
 from database import init_db, get_db, SessionLocal
 from routers.auth import router as auth_router
 from routers.users import router as users_router
+from routers.keys import router as keys_router
 from middleware.rate_limiter import limiter, rate_limit_exceeded_handler
 from models.user import User
-from utils.password import hash_password
+from utils.password import hash_password, password_hasher
+from utils.revocation import revocation_list
+from utils.user_cache import user_cache
+from utils.janitor import token_janitor
+from utils.keys import key_ring
 
 settings = get_settings()
 
@@ -51,16 +57,39 @@ def create_default_admin():
         db.close()
 
 
+def load_revocations():
+    """Carga en memoria los tokens revocados que aún no vencen"""
+    db = SessionLocal()
+    try:
+        total = revocation_list.load(db)
+        print(f"🛡️ Lista negra cargada: {total} tokens revocados vigentes")
+    except Exception as e:
+        print(f"⚠️ Error cargando tokens revocados: {e}")
+    finally:
+        db.close()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Ciclo de vida de la aplicación"""
     # Startup
     print("🚀 Iniciando Auth Service...")
     init_db()
+    key_ring.load()
+    await key_ring.start()
     create_default_admin()
+    load_revocations()
+    try:
+        token_janitor.prepare()
+    except Exception as e:
+        print(f"⚠️ Error preparando la limpieza de tokens: {e}")
+    await token_janitor.start()
     print("✅ Auth Service listo")
     yield
     # Shutdown
+    await token_janitor.stop()
+    await key_ring.stop()
+    password_hasher.shutdown()
     print("👋 Auth Service cerrado")
 
 
@@ -91,6 +120,7 @@ app.add_middleware(
 # Routers
 app.include_router(auth_router)
 app.include_router(users_router)
+app.include_router(keys_router)
 
 
 @app.get("/health")
@@ -103,6 +133,24 @@ async def health_check():
     }
 
 
+@app.get("/auth/metrics/password-hasher")
+async def password_hasher_metrics():
+    """Cola del pool de bcrypt: pendientes, en curso, rechazadas y rehashes"""
+    return password_hasher.summary()
+
+
+@app.get("/auth/metrics/caches")
+async def cache_metrics():
+    """Lista negra en memoria y caché de usuarios"""
+    return {"revocation": revocation_list.summary(), "users": user_cache.summary(), "keys": key_ring.summary()}
+
+
+@app.get("/auth/metrics/maintenance")
+def maintenance_metrics():
+    """Limpieza de tokens: filas por tabla, tamaño de la base y ritmo de purga"""
+    return {"tables": token_janitor.table_stats(), "janitor": token_janitor.summary()}
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -15,7 +15,7 @@ class RevokedToken(Base):
     jti = Column(String(255), unique=True, index=True, nullable=False)  # JWT ID
     token_type = Column(String(20), nullable=False)  # 'access' o 'refresh'
     revoked_at = Column(DateTime(timezone=True), server_default=func.now())
-    expires_at = Column(DateTime(timezone=True), nullable=False)  # Para limpieza
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Para limpieza
     reason = Column(String(100), nullable=True)  # Razón de revocación
     
     def __repr__(self):
@@ -3,5 +3,6 @@ Routers del Auth Service
 """
 from .auth import router as auth_router
 from .users import router as users_router
+from .keys import router as keys_router
 
-__all__ = ["auth_router", "users_router"]
+__all__ = ["auth_router", "users_router", "keys_router"]
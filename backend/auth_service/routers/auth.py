@@ -13,7 +13,9 @@ from database import get_db
 from models.user import User
 from models.refresh_token import RefreshToken
 from models.revoked_token import RevokedToken
-from utils.password import hash_password, verify_password
+from utils.password import password_hasher, HashSaturado
+from utils.revocation import revocation_list
+from utils.user_cache import user_cache
 from utils.jwt_handler import (
     create_access_token,
     create_refresh_token,
@@ -79,6 +81,31 @@ class LogoutRequest(BaseModel):
     refresh_token: Optional[str] = None
 
 
+# ============================================
+# Helpers
+# ============================================
+
+def _saturado() -> HTTPException:
+    """503 cuando el pool de bcrypt tiene la cola llena"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail={
+            "status": 503,
+            "error": "SERVICE_UNAVAILABLE",
+            "message": "Servicio ocupado, intenta de nuevo",
+            "details": [{"code": "AUTH_HASH_BUSY", "message": "Demasiadas operaciones de contraseña en curso"}]
+        },
+        headers={"Retry-After": "1"}
+    )
+
+
+async def _hash_or_503(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HashSaturado:
+        raise _saturado()
+
+
 # ============================================
 # Endpoints
 # ============================================
@@ -123,7 +150,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         email=user_data.email,
         full_name=user_data.full_name,
         telefono=user_data.telefono,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=await _hash_or_503(user_data.password),
         is_active=True,
         is_admin=False
     )
@@ -162,8 +189,12 @@ async def login(request: Request, credentials: LoginRequest, db: Session = Depen
             }
         )
     
-    # Verificar contraseña
-    if not verify_password(credentials.password, user.hashed_password):
+    # Verificar contraseña (en el pool de bcrypt)
+    try:
+        password_ok, new_hash = await password_hasher.verify_and_rehash(credentials.password, user.hashed_password)
+    except HashSaturado:
+        raise _saturado()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={
@@ -174,6 +205,12 @@ async def login(request: Request, credentials: LoginRequest, db: Session = Depen
             }
         )
     
+    # Rehash transparente si el costo bcrypt configurado cambió
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        db.commit()
+        user_cache.invalidate(user.id)
+    
     # Verificar si usuario está activo
     if not user.is_active:
         raise HTTPException(
@@ -284,6 +321,12 @@ async def logout(
     
     db.commit()
     
+    # Lista negra en memoria (después del commit: la BD sigue siendo la fuente)
+    if payload:
+        revocation_list.revoke(jti, exp)
+    if logout_data.refresh_token and refresh_payload:
+        revocation_list.revoke(refresh_jti, refresh_exp)
+    
     return {"message": "Sesión cerrada exitosamente"}
 
 
@@ -324,9 +367,9 @@ async def refresh_tokens(
             }
         )
     
-    # Verificar que no esté revocado
+    # Verificar que no esté revocado (lista negra en memoria)
     jti = payload.get("jti")
-    if db.query(RevokedToken).filter(RevokedToken.jti == jti).first():
+    if revocation_list.is_revoked(jti):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={
@@ -398,6 +441,7 @@ async def refresh_tokens(
     )
     db.add(new_db_refresh)
     db.commit()
+    revocation_list.revoke(jti, payload.get("exp", 0))
     
     expires_in = int((access_exp - datetime.now(timezone.utc)).total_seconds())
     
@@ -0,0 +1,40 @@
+"""
+Router de Claves
+Endpoints: jwks.json (público) y rotación manual (admin)
+"""
+import asyncio
+
+from fastapi import APIRouter, Depends, Response
+
+from utils.keys import key_ring
+from routers.users import CachedUser, get_current_admin
+
+router = APIRouter(tags=["Claves"])
+
+# Los validadores refrescan en segundo plano; la caché HTTP solo evita ráfagas
+JWKS_MAX_AGE_SECONDS = 300
+
+
+@router.get("/auth/jwks.json")
+@router.get("/.well-known/jwks.json", include_in_schema=False)
+async def get_jwks(response: Response):
+    """
+    Claves públicas de firma (RFC 7517)
+
+    Incluye la clave activa, la próxima (publicada antes de firmar con
+    ella) y las retiradas que aún pueden verificar tokens vigentes.
+    """
+    response.headers["Cache-Control"] = f"public, max-age={JWKS_MAX_AGE_SECONDS}"
+    return key_ring.jwks()
+
+
+@router.post("/auth/keys/rotate")
+async def rotate_keys(current_user: CachedUser = Depends(get_current_admin)):
+    """
+    Rotar la clave de firma ahora (solo admin)
+
+    La nueva clave activa ya estaba publicada como 'next', así que los
+    tokens que firma validan de inmediato en los demás servicios.
+    """
+    kid = await asyncio.to_thread(key_ring.rotate)
+    return {"active_kid": kid, "keys": key_ring.summary()["keys"]}
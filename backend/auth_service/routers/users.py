@@ -11,8 +11,9 @@ from typing import Optional
 
 from database import get_db
 from models.user import User
-from models.revoked_token import RevokedToken
 from utils.jwt_handler import verify_token
+from utils.revocation import revocation_list
+from utils.user_cache import CachedUser, user_cache
 
 router = APIRouter(prefix="/auth", tags=["Usuarios"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -49,10 +50,32 @@ class ValidateResponse(BaseModel):
 # Dependencias
 # ============================================
 
+def get_cached_user(db: Session, user_id: Optional[int]) -> Optional[CachedUser]:
+    """
+    Usuario por id desde la caché; solo consulta la BD si no está o venció
+
+    Args:
+        db: Sesión de BD (no abre conexión si hay acierto)
+        user_id: ID del usuario del token
+
+    Returns:
+        Instantánea del usuario o None si no existe
+    """
+    if user_id is None:
+        return None
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        return None
+    return user_cache.put(user)
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
+) -> CachedUser:
     """
     Obtiene el usuario actual a partir del token JWT
     Valida localmente sin llamar a otro servicio
@@ -77,9 +100,9 @@ async def get_current_user(
     if payload.get("type") != "access":
         raise credentials_exception
     
-    # Verificar que no esté revocado
+    # Verificar que no esté revocado (lista negra en memoria)
     jti = payload.get("jti")
-    if db.query(RevokedToken).filter(RevokedToken.jti == jti).first():
+    if revocation_list.is_revoked(jti):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={
@@ -91,8 +114,7 @@ async def get_current_user(
         )
     
     # Obtener usuario
-    user_id = payload.get("user_id")
-    user = db.query(User).filter(User.id == user_id).first()
+    user = get_cached_user(db, payload.get("user_id"))
     
     if not user:
         raise credentials_exception
@@ -112,8 +134,8 @@ async def get_current_user(
 
 
 async def get_current_admin(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: CachedUser = Depends(get_current_user)
+) -> CachedUser:
     """Verifica que el usuario sea administrador"""
     if not current_user.is_admin:
         raise HTTPException(
@@ -133,7 +155,7 @@ async def get_current_admin(
 # ============================================
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: CachedUser = Depends(get_current_user)):
     """
     Obtener información del usuario actual
     
@@ -166,15 +188,13 @@ async def validate_token(
         return ValidateResponse(valid=False)
     
     # Verificar revocación
-    jti = payload.get("jti")
-    if db.query(RevokedToken).filter(RevokedToken.jti == jti).first():
+    if revocation_list.is_revoked(payload.get("jti")):
         return ValidateResponse(valid=False)
     
     # Verificar usuario
-    user_id = payload.get("user_id")
-    user = db.query(User).filter(User.id == user_id, User.is_active == True).first()
+    user = get_cached_user(db, payload.get("user_id"))
     
-    if not user:
+    if not user or not user.is_active:
         return ValidateResponse(valid=False)
     
     exp_timestamp = payload.get("exp")
@@ -191,7 +211,7 @@ async def validate_token(
 
 @router.get("/users", response_model=list[UserResponse])
 async def list_users(
-    current_user: User = Depends(get_current_admin),
+    current_user: CachedUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     """
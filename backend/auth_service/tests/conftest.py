@@ -0,0 +1,47 @@
+"""
+conftest.py
+Fixtures compartidos para los tests del Auth Service
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Agregar el directorio del servicio y backend/ (módulos shared) al path
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+sys.path.append(os.path.dirname(SERVICE_DIR))
+
+# Base de datos y claves temporales por ejecución (antes de importar la app)
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test_auth.db"
+os.environ["JWT_KEYS_DIR"] = f"{_tmp}/keys"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+from main import app  # noqa: E402
+from middleware.rate_limiter import limiter  # noqa: E402
+from utils.user_cache import user_cache  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    """Cliente de test con el ciclo de vida de la app (crea tablas y admin)"""
+    limiter.reset()
+    user_cache.clear()
+    with TestClient(app) as c:
+        yield c
+
+
+def login(client, email: str, password: str) -> dict:
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def admin_headers(client):
+    """Headers con un access token del admin por defecto"""
+    return login(client, "admin@chuwuegrill.com", "admin123")
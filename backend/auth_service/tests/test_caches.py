@@ -0,0 +1,117 @@
+"""
+test_caches.py
+Tests de la lista negra en memoria y de la caché de usuarios
+"""
+
+import time
+import uuid
+
+from tests.conftest import login
+from utils.password import password_hasher
+from utils.revocation import BloomFilter, RevocationList
+from utils.user_cache import CachedUser, UserCache, user_cache
+
+
+def _usuario(user_id=1, **cambios):
+    datos = dict(id=user_id, username=f"u{user_id}", email=f"u{user_id}@test.com", full_name="Test",
+                 telefono=None, is_active=True, is_admin=False)
+    datos.update(cambios)
+    return CachedUser(**datos)
+
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+class TestRevocationList:
+    """Filtro de Bloom + conjunto exacto de jti"""
+
+    def test_bloom_sin_falsos_negativos(self):
+        bloom = BloomFilter(1000)
+        claves = [str(uuid.uuid4()) for _ in range(1000)]
+        for clave in claves:
+            bloom.add(clave)
+        assert all(clave in bloom for clave in claves)
+
+    def test_revocados_siempre_se_detectan(self):
+        # Capacidad chica: obliga a purgar y agrandar el filtro varias veces
+        revocados = RevocationList(capacity=16)
+        vence = time.time() + 600
+        jtis = [str(uuid.uuid4()) for _ in range(200)]
+        for jti in jtis:
+            revocados.revoke(jti, vence)
+        assert all(revocados.is_revoked(jti) for jti in jtis)
+        assert revocados.summary()["capacity"] >= 200
+
+    def test_no_revocado_y_vencido(self):
+        revocados = RevocationList(capacity=100)
+        revocados.revoke("vencido", time.time() - 1)  # ya no pasa verify_token: no se guarda
+        revocados.revoke("vigente", time.time() + 600)
+        assert not revocados.is_revoked("vencido")
+        assert not revocados.is_revoked("otro")
+        assert not revocados.is_revoked(None)
+        assert revocados.is_revoked("vigente")
+        assert len(revocados) == 1
+
+    def test_purga_conserva_vigentes(self):
+        revocados = RevocationList(capacity=100)
+        revocados.revoke("corto", time.time() + 0.05)
+        revocados.revoke("largo", time.time() + 600)
+        time.sleep(0.1)
+        assert revocados.purge_expired() == 1
+        assert not revocados.is_revoked("corto")
+        assert revocados.is_revoked("largo")
+
+
+class TestUserCache:
+    """LRU con TTL de usuarios"""
+
+    def test_vence_por_ttl(self):
+        reloj = _Reloj()
+        cache = UserCache(ttl_seconds=60, clock=reloj)
+        cache.put(_usuario(1))
+        reloj.ahora += 59
+        assert cache.get(1) is not None
+        reloj.ahora += 1
+        assert cache.get(1) is None
+        assert cache.summary()["entries"] == 0
+
+    def test_invalidate_y_usuario_inactivo(self):
+        cache = UserCache(ttl_seconds=60)
+        cache.put(_usuario(1))
+        cache.invalidate(1)
+        assert cache.get(1) is None
+        cache.put(_usuario(2, is_active=False))
+        assert cache.get(2) is None
+
+    def test_capacidad_desaloja_el_menos_usado(self):
+        cache = UserCache(ttl_seconds=60, capacity=2)
+        cache.put(_usuario(1))
+        cache.put(_usuario(2))
+        cache.get(1)
+        cache.put(_usuario(3))
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+
+
+class TestInvalidacionEnEndpoints:
+    """Las escrituras del servicio invalidan la instantánea sin esperar el TTL"""
+
+    def test_rehash_del_login_invalida(self, client, monkeypatch):
+        response = client.post("/auth/register", json={
+            "username": "rehash", "email": "rehash@test.com", "full_name": "Usuario Test", "password": "secreto1"
+        })
+        assert response.status_code == 201, response.text
+        user_id = response.json()["id"]
+        headers = login(client, "rehash@test.com", "secreto1")
+        assert client.get("/auth/me", headers=headers).status_code == 200
+        assert user_cache.get(user_id) is not None
+
+        # Otro costo de bcrypt: el próximo login reemplaza el hash guardado
+        monkeypatch.setattr(password_hasher, "rounds", password_hasher.rounds + 1)
+        login(client, "rehash@test.com", "secreto1")
+        assert user_cache.get(user_id) is None
@@ -0,0 +1,122 @@
+"""
+test_janitor.py
+Tests de la limpieza de tokens vencidos y revocados
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database import SessionLocal, init_db
+from models.refresh_token import RefreshToken
+from models.revoked_token import RevokedToken
+from utils.janitor import TokenJanitor
+from utils.revocation import revocation_list
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionLocal()
+    session.query(RevokedToken).delete()
+    session.query(RefreshToken).delete()
+    session.commit()
+    revocation_list.purge_expired()
+    yield session
+    session.close()
+
+
+def _revocado(db, minutos):
+    jti = str(uuid.uuid4())
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=minutos)
+    db.add(RevokedToken(jti=jti, token_type="access", expires_at=expires_at, reason="test"))
+    return jti
+
+
+def _refresh(db, minutos, revocado=False):
+    db.add(RefreshToken(
+        token=str(uuid.uuid4()),
+        user_id=1,
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=minutos),
+        is_revoked=revocado
+    ))
+
+
+class TestTokenJanitor:
+    """Purga por lotes y ciclo de vida de la tarea"""
+
+    def test_purga_vencidos_y_conserva_vigentes(self, db):
+        vencidos = [_revocado(db, -5) for _ in range(5)]
+        vigente = _revocado(db, 30)
+        for _ in range(3):
+            _refresh(db, -5)
+        _refresh(db, 30, revocado=True)
+        _refresh(db, 30)
+        db.commit()
+
+        janitor = TokenJanitor(interval=60, batch_size=2, analyze_every=1)
+        assert janitor.run_once() == {"revoked_tokens": 5, "refresh_tokens": 4}
+        assert janitor.metrics["batches"] >= 5  # lotes de 2 filas
+
+        assert [row.jti for row in db.query(RevokedToken).all()] == [vigente]
+        restantes = db.query(RefreshToken).all()
+        assert len(restantes) == 1 and not restantes[0].is_revoked
+        assert all(jti not in [row.jti for row in db.query(RevokedToken).all()] for jti in vencidos)
+
+        # Segunda pasada: nada que borrar
+        assert janitor.run_once() == {"revoked_tokens": 0, "refresh_tokens": 0}
+
+    def test_purga_la_lista_negra_en_memoria(self, db):
+        revocation_list.revoke("janitor-corto", time.time() + 0.05)
+        revocation_list.revoke("janitor-largo", time.time() + 600)
+        time.sleep(0.1)
+
+        TokenJanitor(interval=60, batch_size=100, analyze_every=1).run_once()
+        assert not revocation_list.is_revoked("janitor-corto")
+        assert revocation_list.is_revoked("janitor-largo")
+
+    def test_arranca_y_se_detiene(self, db):
+        _revocado(db, -5)
+        db.commit()
+        janitor = TokenJanitor(interval=0.01, batch_size=100, analyze_every=1)
+
+        async def ciclo():
+            await janitor.start()
+            await janitor.start()  # idempotente: una sola tarea
+            for _ in range(200):
+                if janitor.metrics["runs"] >= 2:
+                    break
+                await asyncio.sleep(0.01)
+            await janitor.stop()
+            runs = janitor.metrics["runs"]
+            await asyncio.sleep(0.05)
+            return runs
+
+        runs = asyncio.run(ciclo())
+        assert runs >= 2
+        assert janitor.metrics["runs"] == runs  # nada corre después de stop()
+        assert janitor.metrics["revoked_deleted"] == 1
+        assert janitor.metrics["errors"] == 0
+        assert janitor.summary()["active"] is False
+
+    def test_stop_espera_la_pasada_en_curso(self, db):
+        janitor = TokenJanitor(interval=60, batch_size=100, analyze_every=1)
+        run_once = janitor.run_once
+
+        def lenta():
+            time.sleep(0.2)
+            return run_once()
+
+        janitor.run_once = lenta
+
+        async def ciclo():
+            await janitor.start()
+            await asyncio.sleep(0.05)  # la primera pasada está en el hilo
+            await janitor.stop()
+
+        asyncio.run(ciclo())
+        assert janitor.metrics["runs"] == 1
+        assert janitor.metrics["errors"] == 0
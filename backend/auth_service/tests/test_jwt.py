@@ -0,0 +1,178 @@
+"""
+test_jwt.py
+Tests de firma con rotación de claves, JWKS y tokens HS256 anteriores
+"""
+
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from jose import jwt
+
+import shared.jwt_validator as validator
+import utils.jwt_handler as jwt_handler
+from config import get_settings
+from shared.jwks import JWKSCache
+from utils.jwt_handler import create_access_token, verify_token
+from utils.keys import key_ring
+
+
+def _token_hs256(**claims):
+    payload = {"sub": "viejo", "user_id": 1, "type": "access", "jti": "hs256",
+               "exp": datetime.now(timezone.utc) + timedelta(minutes=5)}
+    payload.update(claims)
+    return jwt.encode(payload, get_settings().jwt_secret, algorithm="HS256")
+
+
+@pytest.fixture
+def jwks_server():
+    """Sirve el JWKS del key_ring como lo hace /auth/jwks.json; 'delay' simula un Auth Service lento"""
+    state = {"delay": 0.0, "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"] += 1
+            time.sleep(state["delay"])
+            body = json.dumps(key_ring.jwks()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}/auth/jwks.json"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def _esperar(condicion, segundos=3.0):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestRotacion:
+    """Firma RS256 con kid y rotación del key_ring"""
+
+    def test_tokens_firmados_antes_de_rotar_siguen_validos(self):
+        key_ring.load()
+        viejo, _, _ = create_access_token("rotacion", 1)
+        kid_viejo = jwt.get_unverified_header(viejo)["kid"]
+        proxima = next(kid for kid, estado in key_ring.summary()["keys"].items() if estado == "next")
+
+        assert key_ring.rotate() == proxima
+        nuevo, _, _ = create_access_token("rotacion", 1)
+        assert jwt.get_unverified_header(nuevo)["kid"] == proxima
+        assert key_ring.summary()["keys"][kid_viejo] == "retired"
+        assert verify_token(viejo)["sub"] == "rotacion"
+        assert verify_token(nuevo)["sub"] == "rotacion"
+
+    def test_revision_periodica_fuera_del_event_loop(self, monkeypatch):
+        """La revisión (disco, flock, generar RSA) no corre en el hilo del event loop"""
+        hilos = []
+        monkeypatch.setattr(key_ring, "_check", lambda: hilos.append(threading.get_ident()))
+
+        async def escenario():
+            await key_ring.start(check_interval=0.01)
+            await asyncio.sleep(0.05)
+            await key_ring.stop()
+            return threading.get_ident()
+
+        hilo_del_loop = asyncio.run(escenario())
+        assert hilos and hilo_del_loop not in hilos
+
+    def test_kid_desconocido(self):
+        falso = jwt.encode({"sub": "x", "type": "access"}, "x", algorithm="HS256", headers={"kid": "otro"})
+        assert verify_token(falso) is None
+
+
+class TestFallbackHS256:
+    """Tokens sin kid: deshabilitados salvo fecha de corte futura"""
+
+    def test_rechazado_por_defecto(self):
+        assert jwt_handler.HS256_FALLBACK_UNTIL is None
+        assert verify_token(_token_hs256()) is None
+
+    def test_aceptado_hasta_la_fecha_de_corte(self, monkeypatch):
+        monkeypatch.setattr(jwt_handler, "HS256_FALLBACK_UNTIL", datetime.now(timezone.utc) + timedelta(days=1))
+        assert verify_token(_token_hs256())["sub"] == "viejo"
+        monkeypatch.setattr(jwt_handler, "HS256_FALLBACK_UNTIL", datetime.now(timezone.utc) - timedelta(seconds=1))
+        assert verify_token(_token_hs256()) is None
+
+    def test_fecha_sin_zona_es_utc(self):
+        assert jwt_handler._parse_cutoff("2026-12-01T00:00:00") == datetime(2026, 12, 1, tzinfo=timezone.utc)
+        assert jwt_handler._parse_cutoff("") is None
+
+    def test_validador_compartido(self, monkeypatch):
+        monkeypatch.setattr(validator, "JWT_SECRET", get_settings().jwt_secret)
+        assert validator.validate_jwt_local(_token_hs256())[0] is False
+        monkeypatch.setattr(validator, "HS256_FALLBACK_UNTIL", datetime.now(timezone.utc) + timedelta(days=1))
+        assert validator.validate_jwt_local(_token_hs256())[0] is True
+        monkeypatch.setattr(validator, "HS256_FALLBACK_UNTIL", None)
+        monkeypatch.setattr(validator, "JWT_ALGORITHM", "HS256")  # servicios en modo HS256
+        assert validator.validate_jwt_local(_token_hs256())[0] is True
+
+
+class TestJWKSCache:
+    """Validación local en otros servicios con las claves publicadas"""
+
+    def test_valida_y_sigue_la_rotacion(self, jwks_server, monkeypatch):
+        key_ring.load()
+        cache = JWKSCache(jwks_server["url"], refresh_seconds=60, min_refresh_seconds=0)
+        monkeypatch.setattr(validator, "jwks_cache", cache)
+        cache.start()
+        try:
+            token, _, _ = create_access_token("jwks", 7)
+            valido, payload, _ = validator.validate_jwt_local(token)
+            assert valido and payload["user_id"] == 7
+
+            # La próxima clave ya estaba publicada: valida sin descargar de nuevo
+            descargas = cache.metrics["refreshes"]
+            key_ring.rotate()
+            token, _, _ = create_access_token("jwks", 7)
+            assert validator.validate_jwt_local(token)[0] is True
+            assert cache.metrics["refreshes"] == descargas
+
+            # Dos rotaciones seguidas: kid desconocido -> rechazo y refresco adelantado
+            key_ring.rotate()
+            key_ring.rotate()
+            token, _, _ = create_access_token("jwks", 7)
+            assert validator.validate_jwt_local(token)[0] is False
+            assert _esperar(lambda: validator.validate_jwt_local(token)[0])
+        finally:
+            cache.stop()
+
+    def test_get_no_bloquea_el_request(self, jwks_server):
+        key_ring.load()
+        jwks_server["delay"] = 0.5
+        cache = JWKSCache(jwks_server["url"], refresh_seconds=60, min_refresh_seconds=0)
+        kid = key_ring.summary()["active_kid"]
+        try:
+            inicio = time.perf_counter()
+            assert cache.get(kid) is None  # la primera descarga va al hilo
+            assert time.perf_counter() - inicio < 0.2
+            assert _esperar(lambda: cache.get(kid) is not None)
+            assert jwks_server["requests"] >= 1
+        finally:
+            cache.stop()
+
+    def test_auth_service_caido(self):
+        cache = JWKSCache("http://127.0.0.1:9/jwks.json", timeout=0.2)
+        cache.start()
+        try:
+            assert cache.get("cualquiera") is None
+            assert cache.metrics["errors"] >= 1
+        finally:
+            cache.stop()
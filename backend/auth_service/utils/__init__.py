@@ -2,7 +2,9 @@
 Utilidades del Auth Service
 """
 from .jwt_handler import create_access_token, create_refresh_token, verify_token, decode_token
-from .password import hash_password, verify_password
+from .password import hash_password, verify_password, password_hasher, HashSaturado
+from .revocation import revocation_list
+from .user_cache import user_cache
 
 __all__ = [
     "create_access_token",
@@ -10,5 +12,9 @@ __all__ = [
     "verify_token",
     "decode_token",
     "hash_password",
-    "verify_password"
+    "verify_password",
+    "password_hasher",
+    "HashSaturado",
+    "revocation_list",
+    "user_cache"
 ]
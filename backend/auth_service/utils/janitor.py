@@ -0,0 +1,181 @@
+"""
+Mantenimiento de tokens
+Borra por lotes tokens vencidos y mantiene compacta la base SQLite
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import or_, text
+
+from config import get_settings
+from database import SessionLocal, engine
+
+settings = get_settings()
+
+# Índices para que el borrado por rango de vencimiento no recorra la tabla
+_EXPIRY_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at ON revoked_tokens (expires_at)",
+    "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_expires_at ON refresh_tokens (expires_at)",
+)
+
+
+class TokenJanitor:
+    """
+    Tarea en segundo plano que purga tokens
+
+    Cada 'interval' segundos borra de revoked_tokens los jti vencidos
+    (un token vencido ya no pasa verify_token, no hace falta recordarlo)
+    y de refresh_tokens los vencidos o revocados. Se borra en lotes de
+    'batch_size' filas con un commit por lote para no bloquear a los
+    escritores de SQLite. Luego devuelve páginas libres con
+    incremental_vacuum y cada 'analyze_every' pasadas actualiza las
+    estadísticas del planificador con ANALYZE.
+    """
+
+    def __init__(self, interval: float, batch_size: int, analyze_every: int):
+        self._interval = interval
+        self._batch_size = batch_size
+        self._analyze_every = max(1, analyze_every)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._runs = 0
+        self.metrics = {
+            "runs": 0,
+            "revoked_deleted": 0,
+            "refresh_deleted": 0,
+            "batches": 0,
+            "errors": 0,
+            "last_run_at": None,
+            "last_run_ms": 0.0,
+            "last_rows_per_second": 0.0
+        }
+
+    @property
+    def _sqlite(self) -> bool:
+        return engine.dialect.name == "sqlite"
+
+    def prepare(self):
+        """Índices por vencimiento y auto_vacuum incremental (una sola vez por base)"""
+        with engine.begin() as conn:
+            for ddl in _EXPIRY_INDEXES:
+                conn.execute(text(ddl))
+        if not self._sqlite:
+            return
+        # VACUUM no puede correr dentro de una transacción
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+                # El modo solo se aplica tras un VACUUM completo
+                conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+                conn.execute(text("VACUUM"))
+                print("🧹 SQLite en modo auto_vacuum incremental")
+
+    def _purge(self, db, model, condition) -> int:
+        """Borra en lotes las filas que cumplen 'condition'; devuelve cuántas borró"""
+        deleted = 0
+        while True:
+            ids = [row.id for row in db.query(model.id).filter(condition).limit(self._batch_size).all()]
+            if not ids:
+                return deleted
+            db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            deleted += len(ids)
+            self.metrics["batches"] += 1
+            if len(ids) < self._batch_size:
+                return deleted
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        Una pasada completa de mantenimiento (síncrona)
+
+        Returns:
+            Filas borradas por tabla
+        """
+        from models.refresh_token import RefreshToken
+        from models.revoked_token import RevokedToken
+        from utils.revocation import revocation_list
+
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            revoked = self._purge(db, RevokedToken, RevokedToken.expires_at < now)
+            refresh = self._purge(db, RefreshToken, or_(RefreshToken.expires_at < now, RefreshToken.is_revoked == True))
+        finally:
+            db.close()
+        revocation_list.purge_expired()
+
+        self._runs += 1
+        if self._sqlite:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text("PRAGMA incremental_vacuum"))
+                if self._runs % self._analyze_every == 0:
+                    conn.execute(text("ANALYZE"))
+
+        elapsed = time.perf_counter() - started
+        self.metrics["runs"] += 1
+        self.metrics["revoked_deleted"] += revoked
+        self.metrics["refresh_deleted"] += refresh
+        self.metrics["last_run_at"] = now.isoformat()
+        self.metrics["last_run_ms"] = round(elapsed * 1000, 2)
+        self.metrics["last_rows_per_second"] = round((revoked + refresh) / elapsed, 1) if elapsed > 0 else 0.0
+        return {"revoked_tokens": revoked, "refresh_tokens": refresh}
+
+    # ===== Ciclo de vida =====
+
+    async def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+        print(f"🧹 Limpieza de tokens cada {self._interval:.0f}s (lotes de {self._batch_size})")
+
+    async def stop(self):
+        """Espera a que termine la pasada en curso (el hilo no se puede cancelar)"""
+        if self._task is not None:
+            self._stopping.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                # SQLite bloquea: la pasada corre en un hilo, fuera del event loop
+                deleted = await asyncio.to_thread(self.run_once)
+                if any(deleted.values()):
+                    print(f"🧹 Tokens purgados: {deleted}")
+            except Exception as e:
+                self.metrics["errors"] += 1
+                print(f"⚠️ Error en limpieza de tokens: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def table_stats(self) -> Dict[str, Any]:
+        """Filas por tabla y tamaño del archivo (páginas totales y libres)"""
+        stats: Dict[str, Any] = {}
+        with engine.connect() as conn:
+            for table in ("users", "refresh_tokens", "revoked_tokens"):
+                stats[table] = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            if self._sqlite:
+                page_size = conn.execute(text("PRAGMA page_size")).scalar()
+                stats["db_bytes"] = conn.execute(text("PRAGMA page_count")).scalar() * page_size
+                stats["free_bytes"] = conn.execute(text("PRAGMA freelist_count")).scalar() * page_size
+        return stats
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.metrics, "active": self._task is not None, "interval_seconds": self._interval,
+                "batch_size": self._batch_size}
+
+
+# Instancia compartida (se inicia en el lifespan)
+token_janitor = TokenJanitor(
+    settings.janitor_interval_seconds,
+    settings.janitor_batch_size,
+    settings.janitor_analyze_every
+)
@@ -6,10 +6,53 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, Tuple
 from jose import jwt, JWTError
 from config import get_settings
+from utils.keys import ALGORITHM as RS256, key_ring
 
 settings = get_settings()
 
 
+def _parse_cutoff(value: str) -> Optional[datetime]:
+    """'2026-12-01T00:00:00' (UTC si no trae zona) -> datetime; vacío -> None"""
+    if not value:
+        return None
+    cutoff = datetime.fromisoformat(value)
+    return cutoff if cutoff.tzinfo else cutoff.replace(tzinfo=timezone.utc)
+
+
+# Fecha de corte de los tokens HS256 sin kid en modo RS256 (None = no se aceptan)
+HS256_FALLBACK_UNTIL = _parse_cutoff(settings.jwt_hs256_fallback_until)
+
+
+def _hs256_allowed() -> bool:
+    if settings.jwt_algorithm != RS256:
+        return True
+    return HS256_FALLBACK_UNTIL is not None and datetime.now(timezone.utc) < HS256_FALLBACK_UNTIL
+
+
+def _encode(claims: dict) -> str:
+    """Firma con la clave RSA activa (kid en el header) o, en modo HS256, con el secret"""
+    if settings.jwt_algorithm == RS256:
+        kid, key = key_ring.signing_key()
+        return jwt.encode(claims, key, algorithm=RS256, headers={"kid": kid})
+    return jwt.encode(claims, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+
+
+def _decode(token: str, options: Optional[dict] = None) -> dict:
+    """
+    Verifica con la clave del kid (ya parseada) o, sin kid, con el secret.
+    En modo RS256 un token sin kid solo se acepta hasta JWT_HS256_FALLBACK_UNTIL.
+    """
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        if not _hs256_allowed():
+            raise JWTError("Token sin kid: HS256 no admitido")
+        return jwt.decode(token, settings.jwt_secret, algorithms=["HS256"], options=options)
+    key = key_ring.verification_key(kid)
+    if key is None:
+        raise JWTError(f"kid desconocido: {kid}")
+    return jwt.decode(token, key, algorithms=[RS256], options=options)
+
+
 def create_access_token(
     subject: str,
     user_id: int,
@@ -47,11 +90,7 @@ def create_access_token(
         "iat": datetime.now(timezone.utc)
     }
     
-    encoded_jwt = jwt.encode(
-        to_encode,
-        settings.jwt_secret,
-        algorithm=settings.jwt_algorithm
-    )
+    encoded_jwt = _encode(to_encode)
     
     return encoded_jwt, jti, expire
 
@@ -90,11 +129,7 @@ def create_refresh_token(
         "iat": datetime.now(timezone.utc)
     }
     
-    encoded_jwt = jwt.encode(
-        to_encode,
-        settings.jwt_secret,
-        algorithm=settings.jwt_algorithm
-    )
+    encoded_jwt = _encode(to_encode)
     
     return encoded_jwt, jti, expire
 
@@ -110,11 +145,7 @@ def verify_token(token: str) -> Optional[dict]:
         Payload del token si es válido, None si no
     """
     try:
-        payload = jwt.decode(
-            token,
-            settings.jwt_secret,
-            algorithms=[settings.jwt_algorithm]
-        )
+        payload = _decode(token)
         return payload
     except JWTError:
         return None
@@ -132,12 +163,7 @@ def decode_token(token: str) -> Optional[dict]:
         Payload del token o None
     """
     try:
-        payload = jwt.decode(
-            token,
-            settings.jwt_secret,
-            algorithms=[settings.jwt_algorithm],
-            options={"verify_exp": False}
-        )
+        payload = _decode(token, options={"verify_exp": False})
         return payload
     except JWTError:
         return None
@@ -0,0 +1,257 @@
+"""
+Claves de firma RS256 con rotación
+Publicadas como JWKS para que los demás servicios validen tokens localmente
+"""
+import asyncio
+import base64
+import fcntl
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+from jose.backends.base import Key
+
+from config import get_settings
+
+settings = get_settings()
+
+ALGORITHM = "RS256"
+
+
+def _b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _public_jwk(private_pem: bytes) -> Dict[str, str]:
+    """JWK público (n, e) y kid = thumbprint RFC 7638"""
+    numbers = serialization.load_pem_private_key(private_pem, password=None).public_key().public_numbers()
+    n, e = _b64url_uint(numbers.n), _b64url_uint(numbers.e)
+    canonical = json.dumps({"e": e, "kty": "RSA", "n": n}, separators=(",", ":"), sort_keys=True)
+    kid = base64.urlsafe_b64encode(hashlib.sha256(canonical.encode("utf-8")).digest()[:16]).rstrip(b"=").decode("ascii")
+    return {"kty": "RSA", "use": "sig", "alg": ALGORITHM, "kid": kid, "n": n, "e": e}
+
+
+class _SigningKey:
+    """Clave ya parseada: se construye una vez, no en cada token"""
+
+    def __init__(self, private_pem: bytes, created: float, state: str, retire_at: Optional[float] = None):
+        self.private_pem = private_pem
+        self.created = created
+        self.state = state  # next | active | retired
+        self.retire_at = retire_at
+        self.public = _public_jwk(private_pem)
+        self.kid = self.public["kid"]
+        self.signer: Key = jwk.construct(private_pem.decode("utf-8"), ALGORITHM)
+        self.verifier: Key = jwk.construct(self.public, ALGORITHM)
+
+
+class KeyRing:
+    """
+    Juego de claves RSA con rotación sin cortes
+
+    Siempre hay una clave 'active' (firma) y una 'next' ya publicada en
+    el JWKS. Al rotar, 'next' pasa a firmar: los validadores ya la tienen
+    en caché desde hace un intervalo de refresco, así que nunca ven un
+    kid desconocido. La clave anterior queda 'retired' (solo verifica)
+    hasta que vence el último token que pudo firmar.
+
+    Las claves se guardan en 'keys_dir' (un PEM por kid más keyring.json)
+    para sobrevivir reinicios; un flock evita que dos workers roten a la vez.
+    """
+
+    def __init__(self, keys_dir: str, rotation_seconds: float, retention_seconds: float):
+        self._dir = keys_dir
+        self._rotation = rotation_seconds
+        self._retention = retention_seconds
+        self._keys: Dict[str, _SigningKey] = {}
+        self._active: Optional[_SigningKey] = None
+        self._jwks: Dict[str, List[Dict[str, str]]] = {"keys": []}
+        self._mtime = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {"rotations": 0, "reloads": 0}
+
+    @property
+    def _state_path(self) -> str:
+        return os.path.join(self._dir, "keyring.json")
+
+    # ===== Persistencia =====
+
+    def load(self):
+        """Carga el keyring del disco; lo crea (active + next) si no existe"""
+        os.makedirs(self._dir, exist_ok=True)
+        with self._locked():
+            if not os.path.exists(self._state_path):
+                now = time.time()
+                self._keys = {}
+                for state in ("active", "next"):
+                    key = self._generate(now, state)
+                    self._keys[key.kid] = key
+                self._save()
+            else:
+                self._read()
+        self._index()
+
+    def _read(self):
+        with open(self._state_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        keys = {}
+        for entry in entries:
+            current = self._keys.get(entry["kid"])
+            if current is not None:
+                current.state, current.retire_at = entry["state"], entry.get("retire_at")
+                keys[current.kid] = current
+                continue
+            with open(os.path.join(self._dir, f"{entry['kid']}.pem"), "rb") as f:
+                key = _SigningKey(f.read(), entry["created"], entry["state"], entry.get("retire_at"))
+            keys[key.kid] = key
+        self._keys = keys
+        self._mtime = os.path.getmtime(self._state_path)
+
+    def _save(self):
+        for key in self._keys.values():
+            path = os.path.join(self._dir, f"{key.kid}.pem")
+            if not os.path.exists(path):
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(key.private_pem)
+        entries = [
+            {"kid": k.kid, "state": k.state, "created": k.created, "retire_at": k.retire_at}
+            for k in self._keys.values()
+        ]
+        tmp = self._state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self._state_path)
+        self._mtime = os.path.getmtime(self._state_path)
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self._dir, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _generate(self, now: float, state: str) -> _SigningKey:
+        private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = private.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        return _SigningKey(pem, now, state)
+
+    def _index(self):
+        """Recalcula la clave activa y el JWKS publicado (se sirve ya armado)"""
+        self._active = next(k for k in self._keys.values() if k.state == "active")
+        self._jwks = {"keys": [k.public for k in self._keys.values()]}
+
+    # ===== Rotación =====
+
+    def rotate(self, force: bool = True) -> str:
+        """
+        Rota: next firma, active se retira y se genera una next nueva
+
+        Args:
+            force: False = solo si la activa cumplió su intervalo (otro worker pudo rotar ya)
+
+        Returns:
+            kid de la clave activa
+        """
+        with self._locked():
+            self._read()
+            now = time.time()
+            active = next(k for k in self._keys.values() if k.state == "active")
+            if not force and now - active.created < self._rotation:
+                self._index()
+                return active.kid
+            for key in list(self._keys.values()):
+                if key.state == "retired" and key.retire_at is not None and key.retire_at <= now:
+                    del self._keys[key.kid]
+                    os.remove(os.path.join(self._dir, f"{key.kid}.pem"))
+                elif key.state == "active":
+                    key.state, key.retire_at = "retired", now + self._retention
+                elif key.state == "next":
+                    key.state, key.created = "active", now
+            fresh = self._generate(now, "next")
+            self._keys[fresh.kid] = fresh
+            self._save()
+        self._index()
+        self.metrics["rotations"] += 1
+        print(f"🔑 Clave de firma rotada: {self._active.kid}")
+        return self._active.kid
+
+    def _check(self):
+        """Relee si otro worker rotó; rota si la activa cumplió su intervalo"""
+        if os.path.getmtime(self._state_path) != self._mtime:
+            with self._locked():
+                self._read()
+            self._index()
+            self.metrics["reloads"] += 1
+        if time.time() - self._active.created >= self._rotation:
+            self.rotate(force=False)
+
+    async def start(self, check_interval: float = 60):
+        if self._task is not None and not self._task.done():
+            return
+
+        async def loop():
+            while True:
+                await asyncio.sleep(check_interval)
+                try:
+                    # Lectura del disco, flock y RSA fuera del event loop
+                    await asyncio.to_thread(self._check)
+                except Exception as e:
+                    print(f"⚠️ Error revisando claves de firma: {e}")
+
+        self._task = asyncio.create_task(loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ===== Uso =====
+
+    def signing_key(self) -> Tuple[str, Key]:
+        """(kid, clave privada ya construida) de la clave activa"""
+        if self._active is None:
+            self.load()
+        return self._active.kid, self._active.signer
+
+    def verification_key(self, kid: Optional[str]) -> Optional[Key]:
+        if self._active is None:
+            self.load()
+        key = self._keys.get(kid) if kid else None
+        return key.verifier if key is not None else None
+
+    def jwks(self) -> Dict[str, List[Dict[str, str]]]:
+        return self._jwks
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "active_kid": self._active.kid if self._active else None,
+            "keys": {k.kid: k.state for k in self._keys.values()},
+            "rotation_seconds": self._rotation
+        }
+
+
+# Retención: una clave retirada verifica hasta que vence el último refresh token que firmó
+key_ring = KeyRing(
+    settings.jwt_keys_dir,
+    settings.jwt_key_rotation_hours * 3600,
+    settings.refresh_token_expire_days * 86400
+)
@@ -1,38 +1,49 @@
 """
 Utilidades para manejo de contraseñas
-Hash y verificación con bcrypt
+Hash y verificación con el pool de bcrypt compartido (backend/shared)
 """
-from passlib.context import CryptContext
+import os
+import sys
 
-# Contexto de encriptación con bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# backend/shared: en la imagen se copia junto al servicio; en desarrollo está un nivel arriba
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from shared.password_hasher import PasswordHasher, HashSaturado  # noqa: E402
+
+from config import get_settings  # noqa: E402
+
+settings = get_settings()
+
+# Instancia compartida por los routers
+password_hasher = PasswordHasher(
+    settings.bcrypt_rounds,
+    settings.password_hash_workers,
+    settings.password_hash_max_queue
+)
 
 
 def hash_password(password: str) -> str:
     """
-    Genera hash bcrypt de una contraseña
-    
+    Genera hash bcrypt de una contraseña (síncrono, para el arranque y scripts)
+
     Args:
         password: Contraseña en texto plano
-        
+
     Returns:
         Hash bcrypt de la contraseña
     """
-    return pwd_context.hash(password)
+    return password_hasher.hash_sync(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
-    Verifica una contraseña contra su hash
-    
+    Verifica una contraseña contra su hash (síncrono; los endpoints usan el pool)
+
     Args:
         plain_password: Contraseña en texto plano
         hashed_password: Hash almacenado
-        
+
     Returns:
         True si coincide, False si no
     """
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except Exception:
-        return False
+    return password_hasher.verify_sync(plain_password, hashed_password)
@@ -0,0 +1,169 @@
+"""
+Revocación de tokens en memoria
+Filtro de Bloom para descartar rápido + conjunto exacto de jti vigentes
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config import get_settings
+
+settings = get_settings()
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre un bytearray
+
+    Un "no está" es definitivo; un "puede estar" se confirma contra el
+    conjunto exacto. Las k posiciones salen de un solo blake2b (doble hashing).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _epoch(value: Any) -> float:
+    """datetime (SQLite lo devuelve sin zona: es UTC) o timestamp -> epoch"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class RevocationList:
+    """
+    Lista negra de jti en memoria
+
+    Se carga al iniciar con los tokens revocados que aún no vencen y se
+    actualiza en logout y en la rotación de refresh tokens. La consulta
+    habitual (token no revocado) no toca la base de datos: el filtro de
+    Bloom la responde casi siempre y, si da falso positivo, decide el
+    diccionario exacto jti -> vencimiento. Los jti vencidos se descartan
+    y el filtro se reconstruye para que no se llene de bits viejos.
+    """
+
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.001):
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._lock = threading.Lock()
+        self._expires: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self.metrics = {"checks": 0, "bloom_negative": 0, "false_positive": 0, "revoked_hits": 0}
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def load(self, db) -> int:
+        """
+        Carga desde la BD los tokens revocados que aún no vencen
+
+        Args:
+            db: Sesión de SQLAlchemy
+
+        Returns:
+            Cantidad de jti cargados
+        """
+        from models.revoked_token import RevokedToken
+
+        now = datetime.now(timezone.utc)
+        rows = db.query(RevokedToken.jti, RevokedToken.expires_at).filter(RevokedToken.expires_at > now).all()
+        with self._lock:
+            self._expires = {jti: _epoch(exp) for jti, exp in rows}
+            self._rebuild()
+        return len(self._expires)
+
+    def revoke(self, jti: Optional[str], expires_at: Any):
+        """
+        Anota un jti revocado (ya persistido en RevokedToken)
+
+        Args:
+            jti: JWT ID del token
+            expires_at: Vencimiento del token (datetime o epoch)
+        """
+        if not jti:
+            return
+        exp = _epoch(expires_at)
+        if exp <= time.time():
+            return
+        with self._lock:
+            self._expires[jti] = exp
+            if len(self._expires) > self._capacity:
+                self._purge_expired()
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """
+        True si el jti está revocado y el token aún no vence
+
+        Args:
+            jti: JWT ID del token
+
+        Returns:
+            True si está en la lista negra
+        """
+        self.metrics["checks"] += 1
+        if not jti or jti not in self._bloom:
+            self.metrics["bloom_negative"] += 1
+            return False
+        exp = self._expires.get(jti)
+        if exp is None or exp <= time.time():
+            self.metrics["false_positive"] += 1
+            return False
+        self.metrics["revoked_hits"] += 1
+        return True
+
+    def purge_expired(self) -> int:
+        """Quita los jti vencidos y reconstruye el filtro; devuelve cuántos quitó"""
+        with self._lock:
+            return self._purge_expired()
+
+    def _purge_expired(self) -> int:
+        now = time.time()
+        before = len(self._expires)
+        self._expires = {jti: exp for jti, exp in self._expires.items() if exp > now}
+        # Si aún no entra, se agranda el filtro en lugar de degradar la tasa de error
+        while len(self._expires) > self._capacity:
+            self._capacity *= 2
+        self._rebuild()
+        return before - len(self._expires)
+
+    def _rebuild(self):
+        bloom = BloomFilter(max(self._capacity, len(self._expires)), self._error_rate)
+        for jti in self._expires:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "revoked": len(self._expires),
+            "capacity": self._capacity,
+            "bloom_bits": self._bloom.size,
+            "bloom_hashes": self._bloom.hashes
+        }
+
+
+# Instancia compartida por los routers (se carga en el lifespan)
+revocation_list = RevocationList(settings.revocation_capacity)
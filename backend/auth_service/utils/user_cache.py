@@ -0,0 +1,97 @@
+"""
+Caché de usuarios activos
+Instantáneas de User por id con vencimiento (TTL)
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import get_settings
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Copia inmutable de los campos de User que usan las dependencias y respuestas"""
+    id: int
+    username: str
+    email: str
+    full_name: str
+    telefono: Optional[str]
+    is_active: bool
+    is_admin: bool
+
+    @classmethod
+    def from_model(cls, user: Any) -> "CachedUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            telefono=user.telefono,
+            is_active=user.is_active,
+            is_admin=user.is_admin
+        )
+
+
+class UserCache:
+    """
+    LRU con TTL de usuarios activos
+
+    Se guardan instantáneas (no objetos de sesión de SQLAlchemy) para
+    poder compartirlas entre requests. Cota de desactualización: un
+    cambio en la BD hecho por fuera de este proceso (otro worker, SQL
+    directo, p. ej. desactivar la cuenta o quitar is_admin) se ve a más
+    tardar USER_CACHE_TTL_SECONDS después; hasta entonces los access
+    tokens vigentes siguen resolviendo la instantánea anterior. Los
+    caminos de escritura del servicio (el rehash del login) llaman a
+    invalidate() y se ven de inmediato.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, capacity: int = 5000, clock: Callable[[], float] = time.monotonic):
+        self._ttl = ttl_seconds
+        self._capacity = capacity
+        self._clock = clock
+        self._entries: "OrderedDict[int, Tuple[CachedUser, float]]" = OrderedDict()
+        self.metrics = {"hits": 0, "misses": 0}
+
+    def get(self, user_id: Any) -> Optional[CachedUser]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.metrics["misses"] += 1
+            return None
+        user, expires = entry
+        if expires <= self._clock():
+            del self._entries[user_id]
+            self.metrics["misses"] += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.metrics["hits"] += 1
+        return user
+
+    def put(self, user: Any) -> CachedUser:
+        """Guarda (si está activo) y devuelve la instantánea del usuario"""
+        snapshot = user if isinstance(user, CachedUser) else CachedUser.from_model(user)
+        if not snapshot.is_active:
+            self.invalidate(snapshot.id)
+            return snapshot
+        self._entries[snapshot.id] = (snapshot, self._clock() + self._ttl)
+        self._entries.move_to_end(snapshot.id)
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id: Any):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.metrics, "entries": len(self._entries), "ttl_seconds": self._ttl}
+
+
+# Instancia compartida por los routers
+user_cache = UserCache(settings.user_cache_ttl_seconds)
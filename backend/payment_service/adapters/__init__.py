@@ -2,8 +2,12 @@
 Adapters de Payment Providers
 Patrón Adapter para abstraer diferentes pasarelas de pago
 """
-from .base import PaymentProvider, PaymentResult
+from .base import PaymentProvider, PaymentResult, ProviderUnavailableError
 from .mock_adapter import MockAdapter
-from .stripe_adapter import StripeAdapter
+from .stripe_adapter import StripeAdapter, StripeAPIError, StripeUnavailableError
+from .registry import ProviderRegistry, provider_registry
 
-__all__ = ["PaymentProvider", "PaymentResult", "MockAdapter", "StripeAdapter"]
+__all__ = [
+    "PaymentProvider", "PaymentResult", "ProviderUnavailableError", "MockAdapter", "StripeAdapter",
+    "StripeAPIError", "StripeUnavailableError", "ProviderRegistry", "provider_registry"
+]
@@ -18,6 +18,11 @@ class PaymentStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class ProviderUnavailableError(Exception):
+    """El proveedor no respondió (red, timeout, 5xx) o su circuito está abierto"""
+    pass
+
+
 @dataclass
 class PaymentResult:
     """Resultado normalizado de una operación de pago"""
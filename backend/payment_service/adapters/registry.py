@@ -0,0 +1,232 @@
+"""
+Registro de Payment Providers
+Un adapter de larga vida por proveedor, con circuit breaker y recarga en caliente
+"""
+import asyncio
+import time
+from typing import Optional, Dict, Any
+
+from .base import PaymentProvider, PaymentResult, ProviderUnavailableError, WebhookEvent
+from .mock_adapter import MockAdapter
+from .stripe_adapter import StripeAdapter, build_client
+from config import Settings, get_settings
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por proveedor
+
+    closed: las llamadas pasan. Tras 'failure_threshold' fallos seguidos
+    (errores de red o 5xx) pasa a open y rechaza al instante durante
+    'reset_timeout' segundos. Luego half_open deja pasar una llamada de
+    prueba: si sale bien se cierra, si falla vuelve a open.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self._threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.metrics = {"rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self._reset_timeout:
+                self.metrics["rejected"] += 1
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.metrics["rejected"] += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def configure(self, failure_threshold: int, reset_timeout: float):
+        """Umbrales nuevos (recarga) sin perder el estado: un circuito abierto sigue abierto"""
+        self._threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+
+    def record_success(self):
+        self.state = "closed"
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def release(self):
+        """La llamada de prueba terminó sin veredicto (p. ej. cancelada)"""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self._failures >= self._threshold:
+            if self.state != "open":
+                self.metrics["opened"] += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.metrics, "state": self.state, "consecutive_failures": self._failures}
+
+
+class GuardedProvider(PaymentProvider):
+    """
+    Adapter envuelto: pasa por el circuit breaker y cuenta llamadas en curso
+
+    Solo ProviderUnavailableError (el proveedor no respondió bien) cuenta
+    como fallo; un pago rechazado es una respuesta válida del proveedor.
+    """
+
+    def __init__(self, adapter: PaymentProvider, breaker: CircuitBreaker, client=None):
+        self.adapter = adapter
+        self.breaker = breaker
+        self.client = client
+        self.in_flight = 0
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+
+    @property
+    def provider_name(self) -> str:
+        return self.adapter.provider_name
+
+    async def _guarded(self, operation: str, *args, **kwargs):
+        if not self.breaker.allow():
+            raise ProviderUnavailableError(f"{self.provider_name} degradado: circuito abierto")
+        self.in_flight += 1
+        try:
+            result = await getattr(self.adapter, operation)(*args, **kwargs)
+        except ProviderUnavailableError as e:
+            self.breaker.record_failure()
+            self.last_error = str(e)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            self.in_flight -= 1
+        self.breaker.record_success()
+        self.last_success_at = time.time()
+        return result
+
+    async def create_payment(self, amount: float, currency: str, description: str,
+                             metadata: Optional[Dict[str, Any]] = None) -> PaymentResult:
+        return await self._guarded("create_payment", amount, currency, description, metadata)
+
+    async def get_payment_status(self, payment_id: str) -> PaymentResult:
+        return await self._guarded("get_payment_status", payment_id)
+
+    async def refund_payment(self, payment_id: str, amount: Optional[float] = None) -> PaymentResult:
+        return await self._guarded("refund_payment", payment_id, amount)
+
+    async def verify_webhook(self, payload: bytes, signature: str) -> bool:
+        return await self.adapter.verify_webhook(payload, signature)
+
+    async def parse_webhook(self, payload: bytes) -> Optional[WebhookEvent]:
+        return await self.adapter.parse_webhook(payload)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.summary(),
+            "in_flight": self.in_flight,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at
+        }
+
+
+class ProviderRegistry:
+    """
+    Adapters de larga vida, creados en el lifespan
+
+    Cada proveedor tiene un adapter, su propio pool keep-alive y su
+    circuit breaker. reload() arma un juego nuevo con la configuración
+    actual y lo reemplaza de una vez: los requests que ya tomaron un
+    adapter terminan con él y el pool viejo se cierra cuando no le
+    quedan llamadas en curso. Los circuit breakers pasan al juego nuevo
+    (con los umbrales nuevos): recargar no cierra un circuito abierto.
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, GuardedProvider] = {}
+        self._default = "mock"
+        self._retiring: set = set()
+        self.reloads = 0
+
+    def _build(self, settings: Settings, previous: Dict[str, GuardedProvider]) -> Dict[str, GuardedProvider]:
+        client = build_client(
+            settings.stripe_api_base,
+            settings.stripe_timeout,
+            settings.provider_max_connections
+        )
+        stripe_adapter = StripeAdapter(
+            client=client,
+            api_key=settings.stripe_secret_key,
+            webhook_secret=settings.stripe_webhook_secret,
+            max_retries=settings.stripe_max_retries,
+            backoff_base=settings.stripe_backoff_base,
+            backoff_max=settings.stripe_backoff_max
+        )
+
+        def breaker(name: str) -> CircuitBreaker:
+            if name not in previous:
+                return CircuitBreaker(settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+            kept = previous[name].breaker
+            kept.configure(settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+            return kept
+
+        # El mock guarda sus pagos en memoria: se conserva entre recargas
+        mock = previous["mock"].adapter if "mock" in previous else MockAdapter()
+        return {
+            "mock": GuardedProvider(mock, breaker("mock")),
+            "stripe": GuardedProvider(stripe_adapter, breaker("stripe"), client)
+        }
+
+    def start(self, settings: Settings):
+        self._providers = self._build(settings, self._providers)
+        self._default = "stripe" if settings.payment_provider == "stripe" and settings.stripe_secret_key else "mock"
+
+    def reload(self, settings: Settings):
+        """Cambia a adapters nuevos sin cortar los requests en curso"""
+        old = self._providers
+        self.start(settings)
+        self.reloads += 1
+        for provider in old.values():
+            task = asyncio.create_task(self._retire(provider))
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+        print(f"🔄 Providers recargados (activo: {self._default})")
+
+    async def _retire(self, provider: GuardedProvider, max_wait: float = 60.0):
+        deadline = time.monotonic() + max_wait
+        while provider.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        await provider.aclose()
+
+    def get(self, name: Optional[str] = None) -> GuardedProvider:
+        """Adapter del proveedor pedido (o el configurado como activo)"""
+        if not self._providers:
+            self.start(get_settings())
+        return self._providers[name or self._default]
+
+    async def aclose(self):
+        for task in list(self._retiring):
+            await task
+        for provider in self._providers.values():
+            await provider.aclose()
+        self._providers = {}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "active": self._default,
+            "reloads": self.reloads,
+            "providers": {name: p.summary() for name, p in self._providers.items()}
+        }
+
+
+# Instancia única (se arma en el lifespan)
+provider_registry = ProviderRegistry()
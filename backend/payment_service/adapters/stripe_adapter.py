@@ -1,31 +1,176 @@
 """
 Stripe Adapter - Integración con Stripe
+API REST de Stripe sobre un cliente httpx asíncrono con pool de conexiones
 """
+import asyncio
+import json
+import random
+import uuid
+from typing import Optional, Dict, Any, List, Tuple
+
+import httpx
 import stripe
-from typing import Optional, Dict, Any
 
-from .base import PaymentProvider, PaymentResult, PaymentStatus, WebhookEvent
+from .base import PaymentProvider, PaymentResult, PaymentStatus, ProviderUnavailableError, WebhookEvent
 from config import get_settings
 
 settings = get_settings()
 
 
+class StripeAPIError(Exception):
+    """Error devuelto por la API de Stripe (tarjeta rechazada, parámetros inválidos...)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StripeUnavailableError(StripeAPIError, ProviderUnavailableError):
+    """
+    Stripe no respondió bien tras los reintentos: red, 429/5xx o cuerpo ilegible
+
+    También es ProviderUnavailableError: cuenta como fallo en el circuit
+    breaker y los routers lo responden con 503.
+    """
+
+
+def _form_encode(params: Dict[str, Any], prefix: str = "") -> List[Tuple[str, str]]:
+    """Parámetros anidados al formato de Stripe: metadata[clave]=valor"""
+    items: List[Tuple[str, str]] = []
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else key
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            items.extend(_form_encode(value, name))
+        elif isinstance(value, bool):
+            items.append((name, "true" if value else "false"))
+        else:
+            items.append((name, str(value)))
+    return items
+
+
+def build_client(api_base: str, timeout: float, max_connections: int = 20) -> httpx.AsyncClient:
+    """Cliente keep-alive con timeout por llamada para la API de Stripe"""
+    return httpx.AsyncClient(
+        base_url=api_base,
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    )
+
+
 class StripeAdapter(PaymentProvider):
     """
     Adapter para Stripe
     
     Requiere STRIPE_SECRET_KEY configurado.
     Para webhooks, también requiere STRIPE_WEBHOOK_SECRET.
+    
+    Las llamadas a la API no bloquean el event loop: van por el
+    httpx.AsyncClient keep-alive que le entrega el registro de
+    providers. Cada operación lleva timeout y se reintenta con backoff
+    exponencial y jitter ante errores de red, 429 y 5xx. Los POST
+    llevan una Idempotency-Key generada una vez por operación (la misma
+    en todos sus reintentos), así Stripe no crea dos PaymentIntent ni
+    dos reembolsos. Reintentos y backoff llegan desde el registro, así
+    una recarga de configuración los cambia. STRIPE_API_BASE permite
+    apuntar a un servidor local que imite la API.
     """
     
-    def __init__(self):
-        stripe.api_key = settings.stripe_secret_key
-        self._webhook_secret = settings.stripe_webhook_secret
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        api_key: Optional[str] = None,
+        webhook_secret: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None
+    ):
+        self._api_key = api_key if api_key is not None else settings.stripe_secret_key
+        self._webhook_secret = webhook_secret if webhook_secret is not None else settings.stripe_webhook_secret
+        self._client = client
+        self._max_retries = max_retries if max_retries is not None else settings.stripe_max_retries
+        self._backoff_base = backoff_base if backoff_base is not None else settings.stripe_backoff_base
+        self._backoff_max = backoff_max if backoff_max is not None else settings.stripe_backoff_max
     
     @property
     def provider_name(self) -> str:
         return "stripe"
     
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = build_client(settings.stripe_api_base, settings.stripe_timeout)
+        return self._client
+    
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        idempotent: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Llamada a la API con reintentos
+        
+        Args:
+            method: GET o POST
+            path: Ruta de la API (/v1/...)
+            params: Parámetros (form-encoded en POST, query en GET)
+            idempotent: POST seguro de reintentar (se envía Idempotency-Key)
+        
+        Returns:
+            JSON de la respuesta
+        """
+        headers = {"Authorization": f"Bearer {self._api_key}"}
+        if method == "POST" and idempotent:
+            headers["Idempotency-Key"] = str(uuid.uuid4())
+        retryable = method == "GET" or idempotent
+        encoded = _form_encode(params or {})
+        kwargs: Dict[str, Any] = {"headers": headers}
+        if method == "GET":
+            kwargs["params"] = encoded
+        else:
+            kwargs["data"] = dict(encoded)
+        
+        attempt = 0
+        while True:
+            try:
+                response = await self._http().request(method, path, **kwargs)
+            except httpx.RequestError as e:
+                if not retryable or attempt >= self._max_retries:
+                    raise StripeUnavailableError(f"Error de red con Stripe: {e!r}")
+            else:
+                if response.status_code < 400:
+                    try:
+                        data = response.json()
+                    except ValueError:
+                        data = None
+                    if isinstance(data, dict):
+                        return data
+                    # 2xx que no es un objeto JSON (proxy, página de error): como un 5xx
+                    if not retryable or attempt >= self._max_retries:
+                        raise StripeUnavailableError(
+                            f"Respuesta ilegible de Stripe ({response.status_code})", response.status_code
+                        )
+                else:
+                    should_retry = response.headers.get("Stripe-Should-Retry")
+                    transient = response.status_code == 429 or response.status_code >= 500
+                    if should_retry is not None:
+                        transient = should_retry == "true"
+                    if not (retryable and transient) or attempt >= self._max_retries:
+                        if response.status_code == 429 or response.status_code >= 500:
+                            raise StripeUnavailableError(
+                                f"Stripe respondió {response.status_code}", response.status_code
+                            )
+                        try:
+                            message = response.json().get("error", {}).get("message")
+                        except (ValueError, AttributeError):
+                            message = None
+                        raise StripeAPIError(message or f"Stripe respondió {response.status_code}", response.status_code)
+            # Backoff exponencial con jitter completo
+            await asyncio.sleep(random.uniform(0, min(self._backoff_max, self._backoff_base * 2 ** attempt)))
+            attempt += 1
+    
     def _map_stripe_status(self, stripe_status: str) -> PaymentStatus:
         """Mapea estado de Stripe a nuestro enum"""
         mapping = {
@@ -52,26 +197,28 @@ class StripeAdapter(PaymentProvider):
             # Stripe usa centavos
             amount_cents = int(amount * 100)
             
-            payment_intent = stripe.PaymentIntent.create(
-                amount=amount_cents,
-                currency=currency.lower(),
-                description=description,
-                metadata=metadata or {},
-                automatic_payment_methods={"enabled": True}
-            )
+            payment_intent = await self._request("POST", "/v1/payment_intents", {
+                "amount": amount_cents,
+                "currency": currency.lower(),
+                "description": description,
+                "metadata": metadata or {},
+                "automatic_payment_methods": {"enabled": True}
+            }, idempotent=True)
             
             return PaymentResult(
                 success=True,
-                payment_id=payment_intent.id,
-                provider_payment_id=payment_intent.id,
-                status=self._map_stripe_status(payment_intent.status),
+                payment_id=payment_intent["id"],
+                provider_payment_id=payment_intent["id"],
+                status=self._map_stripe_status(payment_intent["status"]),
                 message="PaymentIntent creado",
                 metadata={
-                    "client_secret": payment_intent.client_secret
+                    "client_secret": payment_intent.get("client_secret")
                 }
             )
-            
-        except stripe.error.StripeError as e:
+        
+        except StripeUnavailableError:
+            raise
+        except StripeAPIError as e:
             return PaymentResult(
                 success=False,
                 payment_id="",
@@ -83,17 +230,19 @@ class StripeAdapter(PaymentProvider):
         """Obtiene estado de un PaymentIntent"""
         
         try:
-            payment_intent = stripe.PaymentIntent.retrieve(payment_id)
+            payment_intent = await self._request("GET", f"/v1/payment_intents/{payment_id}")
             
             return PaymentResult(
                 success=True,
                 payment_id=payment_id,
-                provider_payment_id=payment_intent.id,
-                status=self._map_stripe_status(payment_intent.status),
-                metadata=dict(payment_intent.metadata)
+                provider_payment_id=payment_intent["id"],
+                status=self._map_stripe_status(payment_intent["status"]),
+                metadata=dict(payment_intent.get("metadata") or {})
             )
-            
-        except stripe.error.StripeError as e:
+        
+        except StripeUnavailableError:
+            raise
+        except StripeAPIError as e:
             return PaymentResult(
                 success=False,
                 payment_id=payment_id,
@@ -113,17 +262,19 @@ class StripeAdapter(PaymentProvider):
             if amount:
                 refund_params["amount"] = int(amount * 100)
             
-            refund = stripe.Refund.create(**refund_params)
+            refund = await self._request("POST", "/v1/refunds", refund_params, idempotent=True)
             
             return PaymentResult(
                 success=True,
                 payment_id=payment_id,
-                provider_payment_id=refund.id,
+                provider_payment_id=refund["id"],
                 status=PaymentStatus.REFUNDED,
                 message="Reembolso procesado"
             )
-            
-        except stripe.error.StripeError as e:
+        
+        except StripeUnavailableError:
+            raise
+        except StripeAPIError as e:
             return PaymentResult(
                 success=False,
                 payment_id=payment_id,
@@ -156,8 +307,8 @@ class StripeAdapter(PaymentProvider):
         
         try:
             event = stripe.Event.construct_from(
-                stripe.util.json.loads(payload),
-                stripe.api_key
+                json.loads(payload),
+                self._api_key
             )
             
             # Mapear tipos de evento de Stripe
@@ -182,6 +333,6 @@ class StripeAdapter(PaymentProvider):
                 metadata=dict(getattr(obj, "metadata", {})),
                 raw_payload=event.to_dict()
             )
-            
+        
         except Exception:
             return None
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark de la firma de webhooks
+
+Compara el flujo anterior (json.dumps ordenado para firmar, clave HMAC
+preparada en cada firma y una segunda serialización al enviar con
+json=payload) contra el actual (orjson una vez, clave HMAC cacheada y
+los mismos bytes firmados y enviados).
+
+Uso (desde backend/payment_service):
+    python benchmarks/bench_hmac_signer.py [iteraciones]
+"""
+import hashlib
+import hmac
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.hmac_signer import sign_body, verify_signature  # noqa: E402
+
+SECRET = "whsec_benchmark_secret_0123456789abcdef"
+
+PAYLOAD = {
+    "event_type": "event.reservation_confirmed",
+    "timestamp": datetime.now(timezone.utc).isoformat(),
+    "source": "chuwue-grill",
+    "version": "1.0",
+    "data": {
+        "reservation_id": "RES-2026-001",
+        "event_name": "Cena Corporativa TechCorp",
+        "date": "2026-02-15",
+        "time": "19:00",
+        "guests": 50,
+        "contact_name": "María García",
+        "contact_phone": "0991234567",
+        "contact_email": "maria@techcorp.com",
+        "services_requested": ["dj", "decoracion", "fotografia"],
+        "notes": "Celebración de aniversario de la empresa",
+        "restaurant": {"name": "Chuwue Grill", "address": "Manta, Ecuador", "phone": "0999999999"}
+    }
+}
+
+
+def old_pipeline():
+    """Firma sobre json.dumps ordenado + body distinto serializado por httpx"""
+    signed = json.dumps(PAYLOAD, sort_keys=True, separators=(',', ':')).encode()
+    signature = hmac.new(SECRET.encode(), signed, hashlib.sha256).hexdigest()
+    body = json.dumps(PAYLOAD).encode()  # lo que hacía httpx con json=payload
+    return body, signature
+
+
+def new_pipeline():
+    """Una serialización canónica, firmada y enviada tal cual"""
+    return sign_body(PAYLOAD, SECRET)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    body, signature = old_pipeline()
+    print(f"Antes:   body firmado == body enviado -> {verify_signature(body, signature, SECRET)}")
+    body, signature = new_pipeline()
+    print(f"Ahora:   body firmado == body enviado -> {verify_signature(body, signature, SECRET)}")
+    print()
+
+    results = {}
+    for name, fn in (("antes", old_pipeline), ("ahora", new_pipeline)):
+        best = min(timeit.repeat(fn, number=iterations, repeat=5))
+        results[name] = best
+        print(f"{name:6} {best / iterations * 1e6:8.2f} µs/webhook  {iterations / best:12,.0f} webhooks/s")
+
+    print(f"\nMejora: {results['antes'] / results['ahora']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,13 +19,35 @@ class Settings(BaseSettings):
     # Stripe
     stripe_secret_key: str = os.getenv("STRIPE_SECRET_KEY", "")
     stripe_webhook_secret: str = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+    stripe_api_base: str = os.getenv("STRIPE_API_BASE", "https://api.stripe.com")  # Servidor local en pruebas
+    stripe_timeout: float = float(os.getenv("STRIPE_TIMEOUT", "10"))  # segundos por llamada
+    stripe_max_retries: int = int(os.getenv("STRIPE_MAX_RETRIES", "2"))
+    stripe_backoff_base: float = 0.25  # segundos, se duplica en cada reintento
+    stripe_backoff_max: float = 2.0
+    
+    # Registro de providers: pool por proveedor y circuit breaker
+    provider_max_connections: int = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "20"))
+    circuit_failure_threshold: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    circuit_reset_seconds: float = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
     
     # Database
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./data/payments.db")
     
-    # Webhooks
-    webhook_timeout: int = 30  # segundos
-    webhook_retry_count: int = 3
+    # Webhooks salientes (outbox en segundo plano)
+    webhook_timeout: float = float(os.getenv("WEBHOOK_TIMEOUT", "10"))  # segundos por intento
+    webhook_retry_count: int = int(os.getenv("WEBHOOK_RETRY_COUNT", "5"))
+    webhook_workers: int = int(os.getenv("WEBHOOK_WORKERS", "8"))
+    webhook_partner_concurrency: int = int(os.getenv("WEBHOOK_PARTNER_CONCURRENCY", "2"))  # envíos simultáneos por partner
+    webhook_backoff_base: float = 2.0  # segundos, se duplica en cada reintento
+    webhook_backoff_max: float = 600.0
+    webhook_flush_interval: float = 0.2  # segundos entre escrituras en lote a la BD
+    
+    # Conexiones a partners: un pool keep-alive por host
+    partner_max_connections: int = int(os.getenv("PARTNER_MAX_CONNECTIONS", "10"))  # por host
+    partner_keepalive_seconds: float = 120.0
+    partner_idle_seconds: float = float(os.getenv("PARTNER_IDLE_SECONDS", "300"))  # cierre de pools sin uso
+    partner_dns_ttl: float = float(os.getenv("PARTNER_DNS_TTL", "60"))
+    partner_http2: bool = os.getenv("PARTNER_HTTP2", "true").lower() == "true"
     
     # CORS
     cors_origins: list = ["http://localhost:5173", "http://localhost:80", "http://localhost:3000"]
@@ -31,4 +31,5 @@ def get_db():
 def init_db():
     from models.payment import Payment
     from models.partner import Partner
+    from models.webhook_delivery import WebhookDelivery
     Base.metadata.create_all(bind=engine)
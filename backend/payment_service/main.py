@@ -8,6 +8,8 @@ Incluye:
 - Registro de Partners B2B
 - Webhooks bidireccionales con HMAC
 """
+import asyncio
+import signal
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -17,17 +19,36 @@ from database import init_db
 from routers.payments import router as payments_router
 from routers.webhooks import router as webhooks_router
 from routers.partners import router as partners_router
+from adapters import provider_registry
+from utils.webhook_outbox import webhook_outbox
+from utils.partner_transport import partner_transports
 
 settings = get_settings()
 
 
+def reload_providers():
+    """Relee .env/variables de entorno y reemplaza los adapters"""
+    get_settings.cache_clear()
+    provider_registry.reload(get_settings())
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Ciclo de vida de la aplicación"""
     print("🚀 Iniciando Payment Service...")
     init_db()
+    provider_registry.start(settings)
+    await webhook_outbox.start()
+    # SIGHUP recarga la configuración y cambia los adapters sin cortar requests
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_providers)
+    except (NotImplementedError, RuntimeError):
+        pass
     print(f"✅ Payment Service listo (Provider: {settings.payment_provider})")
     yield
+    await webhook_outbox.stop()
+    await partner_transports.aclose()
+    await provider_registry.aclose()
     print("👋 Payment Service cerrado")
 
 
@@ -3,5 +3,6 @@ Modelos del Payment Service
 """
 from .payment import Payment
 from .partner import Partner
+from .webhook_delivery import WebhookDelivery
 
-__all__ = ["Payment", "Partner"]
+__all__ = ["Payment", "Partner", "WebhookDelivery"]
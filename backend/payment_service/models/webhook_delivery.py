@@ -0,0 +1,49 @@
+"""
+Modelo de Entrega de Webhook (outbox de webhooks salientes)
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.sql import func
+from database import Base
+import enum
+
+
+class DeliveryStatus(str, enum.Enum):
+    """Estados de una entrega"""
+    PENDING = "pending"        # en cola o esperando reintento
+    DELIVERED = "delivered"
+    FAILED = "failed"          # error permanente o reintentos agotados
+
+
+class WebhookDelivery(Base):
+    """
+    Webhook pendiente de entregar a un partner
+
+    El body se guarda tal cual se firmó y se envía, así cada reintento
+    manda exactamente los mismos bytes (y la misma firma).
+    """
+
+    __tablename__ = "webhook_deliveries"
+    __table_args__ = (
+        # Recuperación al arrancar: pendientes ordenadas por próximo intento
+        Index("ix_webhook_deliveries_due", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    delivery_id = Column(String(50), unique=True, index=True, nullable=False)  # whd_abc123
+    partner_id = Column(String(50), index=True, nullable=True)  # Partner destino (si está registrado)
+    webhook_url = Column(String(500), nullable=False)
+    event_type = Column(String(100), nullable=False)
+    body = Column(Text, nullable=False)  # JSON firmado
+    headers_json = Column(Text, nullable=False)  # Headers a enviar (incluye la firma)
+
+    status = Column(String(20), default=DeliveryStatus.PENDING.value)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    last_status_code = Column(Integer, nullable=True)
+    last_error = Column(String(500), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<WebhookDelivery(delivery_id='{self.delivery_id}', status='{self.status}', attempts={self.attempts})>"
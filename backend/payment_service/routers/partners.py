@@ -10,11 +10,13 @@ from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
-import httpx
 
 from database import get_db
 from models.partner import Partner
-from utils.hmac_signer import sign_payload
+from models.webhook_delivery import WebhookDelivery
+from utils.hmac_signer import sign_body
+from utils.webhook_outbox import webhook_outbox
+from utils.partner_transport import partner_transports
 
 router = APIRouter(prefix="/partners", tags=["Partners B2B"])
 
@@ -168,7 +170,7 @@ async def list_partners(
     ]
 
 
-@router.post("/{partner_id}/send-webhook")
+@router.post("/{partner_id}/send-webhook", status_code=status.HTTP_202_ACCEPTED)
 async def send_webhook_to_partner(
     partner_id: str,
     request: SendWebhookRequest,
@@ -178,6 +180,8 @@ async def send_webhook_to_partner(
     Enviar un webhook a un partner
     
     Útil para pruebas y para disparar eventos manualmente.
+    El webhook se encola y se entrega en segundo plano con reintentos;
+    el estado se consulta en GET /partners/deliveries/{delivery_id}.
     
     - **event_type**: Tipo de evento
     - **data**: Datos del evento
@@ -200,46 +204,69 @@ async def send_webhook_to_partner(
         "data": request.data
     }
     
-    # Firmar
-    signature = sign_payload(payload, partner.shared_secret)
-    
-    # Enviar webhook
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                partner.webhook_url,
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "X-HMAC-Signature": signature,
-                    "X-Webhook-Source": "chuwue-grill"
-                }
-            )
-        
-        success = response.status_code < 400
-        
-        # Actualizar estadísticas
-        if success:
-            partner.webhook_success_count += 1
-        else:
-            partner.webhook_failure_count += 1
-        partner.last_webhook_at = datetime.now(timezone.utc)
-        db.commit()
-        
-        return {
-            "success": success,
-            "status_code": response.status_code,
-            "response": response.text[:500] if response.text else None
-        }
-        
-    except Exception as e:
-        partner.webhook_failure_count += 1
-        db.commit()
-        
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    # Serializar una vez y firmar los bytes exactos que se enviarán
+    body, signature = sign_body(payload, partner.shared_secret)
+    
+    # Encolar (las estadísticas del partner las actualiza el outbox)
+    delivery_id = await webhook_outbox.enqueue(
+        webhook_url=partner.webhook_url,
+        event_type=request.event_type,
+        body=body,
+        headers={
+            "Content-Type": "application/json",
+            "X-HMAC-Signature": signature,
+            "X-Webhook-Source": "chuwue-grill"
+        },
+        partner_id=partner.partner_id
+    )
+    
+    return {
+        "success": True,
+        "queued": True,
+        "delivery_id": delivery_id,
+        "status": "pending"
+    }
+
+
+@router.get("/deliveries/{delivery_id}")
+async def get_delivery(delivery_id: str, db: Session = Depends(get_db)):
+    """Estado de una entrega de webhook encolada"""
+    
+    pending = webhook_outbox.status(delivery_id)
+    if pending:
+        return pending
+    
+    delivery = db.query(WebhookDelivery).filter(WebhookDelivery.delivery_id == delivery_id).first()
+    
+    if not delivery:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Entrega no encontrada"
+        )
+    
+    return {
+        "delivery_id": delivery.delivery_id,
+        "partner_id": delivery.partner_id,
+        "event_type": delivery.event_type,
+        "status": delivery.status,
+        "attempts": delivery.attempts,
+        "next_attempt_at": delivery.next_attempt_at.isoformat() if delivery.next_attempt_at else None,
+        "last_status_code": delivery.last_status_code,
+        "last_error": delivery.last_error,
+        "delivered_at": delivery.delivered_at.isoformat() if delivery.delivered_at else None
+    }
+
+
+@router.get("/outbox/stats")
+async def outbox_stats():
+    """Métricas del outbox de webhooks: cola, reintentos y entregas"""
+    return webhook_outbox.summary()
+
+
+@router.get("/transport/stats")
+async def transport_stats():
+    """Pools de conexiones por host de partner: reutilización, HTTP/2 y DNS"""
+    return partner_transports.summary()
 
 
 @router.delete("/{partner_id}")
@@ -364,7 +391,7 @@ async def notify_findyourwork_event(
     """
     Notificar a FindyourWork sobre un evento corporativo
     
-    Envía webhook con los datos de la reserva para que FindyourWork
+    Encola un webhook con los datos de la reserva para que FindyourWork
     pueda ofrecer servicios adicionales (DJ, decoración, fotografía, etc.)
     """
     from utils.partner_notifier import PartnerNotifier
@@ -401,26 +428,21 @@ async def notify_findyourwork_event(
         }
     }
     
-    # Enviar webhook
+    # Encolar webhook
     notifier = PartnerNotifier()
-    success = await notifier.notify_findyourwork(
+    delivery_id = await notifier.notify_findyourwork(
         event_type="event.reservation_confirmed",
         data=event_data,
         shared_secret=partner.shared_secret,
-        webhook_url=partner.webhook_url
+        webhook_url=partner.webhook_url,
+        target_partner_id=partner.partner_id
     )
     
-    if success:
-        partner.webhook_success_count += 1
-        partner.last_webhook_at = datetime.now(timezone.utc)
-    else:
-        partner.webhook_failure_count += 1
-    
-    db.commit()
-    
     return {
-        "success": success,
-        "message": "Webhook enviado a FindyourWork" if success else "Error enviando webhook",
+        "success": True,
+        "queued": True,
+        "delivery_id": delivery_id,
+        "message": "Webhook encolado para FindyourWork",
         "event_type": "event.reservation_confirmed",
         "reservation_id": request.reservation_id,
         "webhook_url": partner.webhook_url
@@ -553,7 +575,7 @@ async def notify_findyourwork_event(
     """
     Notifica a FindyourWork sobre un evento corporativo
     
-    Envía un webhook con la información del evento para que
+    Encola un webhook con la información del evento para que
     FindyourWork pueda ofrecer servicios adicionales.
     """
     from utils.partner_notifier import notify_event_reservation
@@ -585,27 +607,22 @@ async def notify_findyourwork_event(
         "source_restaurant": "Chuwue Grill"
     }
     
-    # Enviar webhook
-    success = await notify_event_reservation(
+    # Encolar webhook
+    delivery_id = await notify_event_reservation(
         reservation_data=reservation_data,
         shared_secret=partner.shared_secret,
-        webhook_url=partner.webhook_url
+        webhook_url=partner.webhook_url,
+        target_partner_id=partner.partner_id
     )
     
-    # Actualizar estadísticas
-    if success:
-        partner.webhook_success_count += 1
-    else:
-        partner.webhook_failure_count += 1
-    partner.last_webhook_at = datetime.now(timezone.utc)
-    db.commit()
-    
     return {
-        "success": success,
+        "success": True,
+        "queued": True,
+        "delivery_id": delivery_id,
         "event_type": "event.reservation_confirmed",
         "reservation_id": request.reservation_id,
         "sent_to": partner.webhook_url,
-        "message": "Webhook enviado a FindyourWork" if success else "Error enviando webhook"
+        "message": "Webhook encolado para FindyourWork"
     }
 
 
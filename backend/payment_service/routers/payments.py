@@ -12,11 +12,10 @@ from pydantic import BaseModel
 
 from database import get_db
 from models.payment import Payment, PaymentStatus
-from adapters import MockAdapter, StripeAdapter, PaymentProvider
+from adapters import PaymentProvider, ProviderUnavailableError, provider_registry
 from config import get_settings
 
 router = APIRouter(prefix="/payments", tags=["Pagos"])
-settings = get_settings()
 
 
 # ============================================
@@ -24,10 +23,23 @@ settings = get_settings()
 # ============================================
 
 def get_payment_provider() -> PaymentProvider:
-    """Factory para obtener el provider configurado"""
-    if settings.payment_provider == "stripe" and settings.stripe_secret_key:
-        return StripeAdapter()
-    return MockAdapter()
+    """Provider configurado (instancia de larga vida del registro)"""
+    return provider_registry.get()
+
+
+def provider_unavailable(e: ProviderUnavailableError) -> HTTPException:
+    """503 inmediato cuando el proveedor falla o su circuito está abierto"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail={
+            "status": 503,
+            "error": "SERVICE_UNAVAILABLE",
+            "message": "Proveedor de pagos no disponible",
+            "details": [{"code": "PAY_PROVIDER_UNAVAILABLE", "message": str(e)}]
+        },
+        # get_settings() en cada llamada: SIGHUP puede haber cambiado el intervalo
+        headers={"Retry-After": str(int(get_settings().circuit_reset_seconds))}
+    )
 
 
 # ============================================
@@ -79,12 +91,15 @@ async def create_payment(
     provider = get_payment_provider()
     
     # Crear pago en el provider
-    result = await provider.create_payment(
-        amount=request.amount,
-        currency=request.currency,
-        description=request.description,
-        metadata=request.metadata
-    )
+    try:
+        result = await provider.create_payment(
+            amount=request.amount,
+            currency=request.currency,
+            description=request.description,
+            metadata=request.metadata
+        )
+    except ProviderUnavailableError as e:
+        raise provider_unavailable(e)
     
     # Guardar en BD
     payment = Payment(
@@ -116,6 +131,12 @@ async def create_payment(
     )
 
 
+@router.get("/providers/health")
+async def providers_health():
+    """Estado de cada proveedor: circuito, llamadas en curso y último error"""
+    return provider_registry.summary()
+
+
 @router.get("/{payment_id}", response_model=PaymentResponse)
 async def get_payment(payment_id: str, db: Session = Depends(get_db)):
     """Obtener estado de un pago"""
@@ -163,7 +184,10 @@ async def refund_payment(payment_id: str, db: Session = Depends(get_db)):
         )
     
     provider = get_payment_provider()
-    result = await provider.refund_payment(payment.provider_payment_id or payment.payment_id)
+    try:
+        result = await provider.refund_payment(payment.provider_payment_id or payment.payment_id)
+    except ProviderUnavailableError as e:
+        raise provider_unavailable(e)
     
     if result.success:
         payment.status = PaymentStatus.REFUNDED.value
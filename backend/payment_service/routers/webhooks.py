@@ -11,7 +11,7 @@ from typing import Optional
 from database import get_db
 from models.payment import Payment, PaymentStatus
 from models.partner import Partner
-from adapters import MockAdapter, StripeAdapter
+from adapters import provider_registry
 from utils.hmac_signer import verify_signature
 from utils.event_normalizer import normalize_event
 from config import get_settings
@@ -37,7 +37,7 @@ async def stripe_webhook(
     """
     payload = await request.body()
     
-    adapter = StripeAdapter()
+    adapter = provider_registry.get("stripe")
     
     # Verificar firma
     if stripe_signature:
@@ -80,7 +80,7 @@ async def mock_webhook(
     """
     payload = await request.body()
     
-    adapter = MockAdapter()
+    adapter = provider_registry.get("mock")
     
     # Verificar firma si existe
     if x_mock_signature:
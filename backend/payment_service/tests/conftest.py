@@ -0,0 +1,26 @@
+"""
+conftest.py
+Fixtures compartidos para los tests del Payment Service
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Agregar el directorio del servicio al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Base de datos temporal por ejecución (antes de importar la app)
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_payments.db"
+
+from main import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    """Cliente de test con el ciclo de vida de la app"""
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,131 @@
+"""
+test_hmac_signer.py
+Tests de la firma HMAC: JSON canónico, bytes enviados y clave en caché
+"""
+
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from database import init_db
+from utils.hmac_signer import _hmac_key, canonical_json, sign_body, sign_payload, verify_signature
+from utils.partner_notifier import PartnerNotifier
+from utils.webhook_outbox import WebhookOutbox
+
+SECRET = "secreto-del-partner"
+URL = "https://partner.test/firmas"
+
+
+class CapturingTransports:
+    """Guarda los bytes que el outbox postea; con block=True el partner no responde"""
+
+    def __init__(self, block: bool = False):
+        self.block = block
+        self.sent = []
+
+    async def post(self, url, content, headers):
+        if self.block:
+            await asyncio.Event().wait()
+        self.sent.append((content, headers))
+        return httpx.Response(200, text="ok")
+
+
+@pytest.fixture(autouse=True)
+def tablas():
+    init_db()
+
+
+def _outbox(transports):
+    return WebhookOutbox(transports=transports, workers=1, max_attempts=3, backoff_base=0.01,
+                         backoff_max=0.02, flush_interval=0.01)
+
+
+async def _esperar(condicion, segundos=3.0):
+    for _ in range(int(segundos / 0.01)):
+        if condicion():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+class TestCanonicalJson:
+    """Serialización única: se firman exactamente los bytes que se envían"""
+
+    def test_claves_ordenadas_sin_espacios(self):
+        assert canonical_json({"b": 1, "a": {"d": 2, "c": 3}}) == b'{"a":{"c":3,"d":2},"b":1}'
+
+    def test_no_ascii_en_utf8(self):
+        body = canonical_json({"nombre": "María", "plato": "Ñoquis"})
+        assert body == '{"nombre":"María","plato":"Ñoquis"}'.encode("utf-8")
+        assert orjson.loads(body) == {"nombre": "María", "plato": "Ñoquis"}
+
+    def test_el_dict_y_sus_bytes_firman_igual(self):
+        payload = {"cliente": "María", "total": 12.5}
+        body, firma = sign_body(payload, SECRET)
+        assert sign_payload(payload, SECRET) == firma
+        assert verify_signature(body, firma, SECRET)
+        assert not verify_signature(body.replace(b"12.5", b"13.5"), firma, SECRET)
+
+
+class TestClaveEnCache:
+    """_hmac_key guarda un HMAC por secret y se firma sobre copias"""
+
+    def test_mismo_digest_en_llamadas_repetidas(self):
+        firmas = {sign_payload(b'{"a":1}', SECRET) for _ in range(5)}
+        assert len(firmas) == 1
+        # copy() no deja estado en el HMAC compartido
+        assert _hmac_key(SECRET).copy().hexdigest() == _hmac_key(SECRET).copy().hexdigest()
+
+    def test_cada_secret_su_clave(self):
+        body = canonical_json({"cliente": "María"})
+        a = sign_payload(body, "secret-a")
+        b = sign_payload(body, "secret-b")
+        assert a != b
+        assert sign_payload(body, "secret-a") == a  # Intercalar secrets no mezcla claves
+        assert verify_signature(body, b, "secret-b")
+        assert not verify_signature(body, a, "secret-b")
+
+
+class TestBytesDelOutbox:
+    """El receptor verifica contra el body crudo que recibe"""
+
+    def test_lo_enviado_es_lo_firmado(self):
+        transports = CapturingTransports()
+
+        async def escenario():
+            outbox = _outbox(transports)
+            await PartnerNotifier(outbox).send_webhook(URL, "event.test", {"cliente": "María", "mesa": 4}, SECRET)
+            assert await _esperar(lambda: transports.sent)
+            await outbox.stop()
+
+        asyncio.run(escenario())
+        raw_body, headers = transports.sent[0]
+        assert verify_signature(raw_body, headers["X-HMAC-Signature"], SECRET)
+        assert orjson.loads(raw_body)["data"]["cliente"] == "María"
+
+    def test_lo_recuperado_tras_reiniciar_es_lo_firmado(self):
+        """El body pasa por la base (texto) y vuelve a bytes idénticos"""
+        url = f"{URL}/reinicio"
+
+        async def caida():
+            outbox = _outbox(CapturingTransports(block=True))
+            delivery_id = await PartnerNotifier(outbox).send_webhook(url, "event.test", {"cliente": "María"}, SECRET)
+            for task in outbox._tasks:
+                task.cancel()
+            await asyncio.gather(*outbox._tasks, return_exceptions=True)
+            return delivery_id
+
+        delivery_id = asyncio.run(caida())
+        transports = CapturingTransports()
+
+        async def reinicio():
+            outbox = _outbox(transports)
+            await outbox.start()
+            assert await _esperar(lambda: delivery_id not in outbox._live)
+            await outbox.stop()
+
+        asyncio.run(reinicio())
+        raw_body, headers = next((c, h) for c, h in transports.sent if h["X-Webhook-ID"] == delivery_id)
+        assert verify_signature(raw_body, headers["X-HMAC-Signature"], SECRET)
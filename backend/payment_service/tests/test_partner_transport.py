@@ -0,0 +1,149 @@
+"""
+test_partner_transport.py
+Tests del transporte keep-alive hacia partners: reutilización, DNS y errores
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from utils.partner_transport import DNSCache, PartnerTransportManager
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = self.headers.get("Host", "").encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def partner():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+class FakeDNS(DNSCache):
+    """Resuelve con una tabla fija (o lanza el OSError dado) y cuenta consultas"""
+
+    def __init__(self, table, ttl=60.0):
+        super().__init__(ttl)
+        self.table = table
+        self.lookups = 0
+
+    async def _lookup(self, host, port):
+        self.lookups += 1
+        result = self.table[host]
+        if isinstance(result, Exception):
+            raise result
+        return list(result)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_reutiliza_la_conexion_por_host(partner):
+    async def escenario():
+        manager = PartnerTransportManager(http2=False)
+        try:
+            for _ in range(5):
+                response = await manager.post(f"http://127.0.0.1:{partner}/hook", b"{}", {})
+                assert response.status_code == 200
+            await manager.post(f"http://localhost:{partner}/hook", b"{}", {})
+            return manager.summary()
+        finally:
+            await manager.aclose()
+
+    summary = run(escenario())
+    host = summary["hosts"][f"http://127.0.0.1:{partner}"]
+    assert host["requests"] == 5
+    assert host["connections_opened"] == 1
+    assert host["open_connections"] == 1
+    assert host["reuse_ratio"] == 0.8
+    assert host["http_versions"] == {"HTTP/1.1": 5}
+    assert summary["pools_created"] == 2  # un pool por origen
+
+
+def test_dns_con_ttl():
+    dns = FakeDNS({"partner.test": ["10.0.0.1", "10.0.0.2"]}, ttl=0.05)
+
+    async def escenario():
+        assert await dns.resolve("partner.test", 443) == ["10.0.0.1", "10.0.0.2"]
+        assert await dns.resolve("partner.test", 443) == ["10.0.0.1", "10.0.0.2"]
+        time.sleep(0.06)
+        await dns.resolve("partner.test", 443)
+        dns.invalidate("partner.test", 443)
+        await dns.resolve("partner.test", 443)
+
+    run(escenario())
+    assert dns.metrics == {"hits": 1, "misses": 3}
+    assert dns.lookups == 3
+
+
+def test_prueba_cada_direccion(partner):
+    # 127.0.0.2 es loopback pero el servidor solo escucha en 127.0.0.1: rechaza la conexión
+    dns = FakeDNS({"partner.test": ["127.0.0.2", "127.0.0.1"]})
+
+    async def escenario():
+        manager = PartnerTransportManager(http2=False, dns=dns)
+        try:
+            response = await manager.post(f"http://partner.test:{partner}/hook", b"{}", {})
+            assert response.text == f"partner.test:{partner}"  # Host sigue siendo el nombre
+            await manager.post(f"http://partner.test:{partner}/hook", b"{}", {})
+        finally:
+            await manager.aclose()
+
+    run(escenario())
+    assert dns.lookups == 1  # la entrada se conserva: una dirección respondió
+
+
+def test_errores_de_red_como_connect_error(partner):
+    dns = FakeDNS({
+        "caido.test": ["127.0.0.2", "127.0.0.3"],
+        "inexistente.test": socket.gaierror(socket.EAI_NONAME, "Name or service not known"),
+        "vacio.test": []
+    })
+
+    async def escenario():
+        manager = PartnerTransportManager(http2=False, dns=dns)
+        try:
+            for host in ("caido.test", "inexistente.test", "vacio.test"):
+                with pytest.raises(httpx.ConnectError):
+                    await manager.post(f"http://{host}:{partner}/hook", b"{}", {})
+            # Sin ninguna dirección útil la entrada se descarta y se vuelve a resolver
+            with pytest.raises(httpx.ConnectError):
+                await manager.post(f"http://caido.test:{partner}/hook", b"{}", {})
+        finally:
+            await manager.aclose()
+
+    run(escenario())
+    assert dns.metrics["hits"] == 0
+
+
+def test_evict_idle_cierra_el_pool(partner):
+    async def escenario():
+        manager = PartnerTransportManager(http2=False, idle_seconds=0)
+        await manager.post(f"http://127.0.0.1:{partner}/hook", b"{}", {})
+        client = manager.client_for(f"http://127.0.0.1:{partner}/")
+        assert await manager.evict_idle() == 1
+        assert client.is_closed
+        await manager.aclose()
+
+    run(escenario())
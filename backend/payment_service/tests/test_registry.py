@@ -0,0 +1,159 @@
+"""
+test_registry.py
+Tests del circuit breaker y de la recarga en caliente de providers
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from adapters import ProviderUnavailableError
+from adapters.registry import CircuitBreaker, GuardedProvider, ProviderRegistry
+from config import Settings
+
+
+class FlakyAdapter:
+    """Adapter mínimo: falla mientras 'down' sea True"""
+
+    provider_name = "flaky"
+
+    def __init__(self):
+        self.down = True
+        self.calls = 0
+
+    async def get_payment_status(self, payment_id):
+        self.calls += 1
+        if self.down:
+            raise ProviderUnavailableError("caído")
+        return payment_id
+
+
+class TestCircuitBreaker:
+    """closed -> open -> half_open -> closed/open"""
+
+    def test_abre_tras_fallos_seguidos(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_success()  # un éxito reinicia la cuenta
+        for _ in range(3):
+            breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+        assert breaker.summary()["rejected"] == 1 and breaker.summary()["opened"] == 1
+
+    def test_half_open_deja_pasar_una_prueba(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        assert not breaker.allow()
+        time.sleep(0.06)
+
+        assert breaker.allow()
+        assert breaker.state == "half_open"
+        assert not breaker.allow()  # solo una llamada de prueba a la vez
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.allow() and breaker.allow()
+
+    def test_prueba_fallida_vuelve_a_abrir(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.05)
+        for _ in range(5):
+            breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_failure()  # basta un fallo en half_open
+        assert breaker.state == "open"
+        assert not breaker.allow()
+        assert breaker.summary()["opened"] == 2
+
+    def test_prueba_cancelada_libera_el_turno(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+    def test_guarded_provider_no_llama_con_el_circuito_abierto(self):
+        adapter = FlakyAdapter()
+        provider = GuardedProvider(adapter, CircuitBreaker(failure_threshold=2, reset_timeout=0.05))
+
+        async def escenario():
+            for _ in range(3):
+                with pytest.raises(ProviderUnavailableError):
+                    await provider.get_payment_status("pi_1")
+            assert adapter.calls == 2  # la tercera se rechazó sin tocar el proveedor
+            await asyncio.sleep(0.06)
+            adapter.down = False
+            assert await provider.get_payment_status("pi_1") == "pi_1"
+
+        asyncio.run(escenario())
+        assert provider.breaker.state == "closed"
+        assert provider.last_error == "caído"
+
+
+class TestRecarga:
+    """reload() cambia adapters y configuración sin cortar requests en curso"""
+
+    def test_reload_aplica_reintentos_y_backoff(self):
+        registry = ProviderRegistry()
+
+        async def escenario():
+            registry.start(Settings(stripe_max_retries=1, circuit_failure_threshold=5))
+            viejo = registry.get("stripe")
+            mock = registry.get("mock").adapter
+            assert viejo.adapter._max_retries == 1
+
+            viejo.in_flight = 1  # un request todavía usa el adapter viejo
+            registry.reload(Settings(stripe_max_retries=4, stripe_backoff_base=0.5, stripe_backoff_max=8,
+                                     circuit_failure_threshold=2))
+            nuevo = registry.get("stripe")
+            assert nuevo is not viejo
+            assert (nuevo.adapter._max_retries, nuevo.adapter._backoff_base, nuevo.adapter._backoff_max) == (4, 0.5, 8)
+            assert nuevo.breaker._threshold == 2
+            assert registry.get("mock").adapter is mock  # los pagos del mock se conservan
+
+            await asyncio.sleep(0.15)
+            assert not viejo.client.is_closed
+            viejo.in_flight = 0
+            await asyncio.sleep(0.15)
+            assert viejo.client.is_closed
+            await registry.aclose()
+
+        asyncio.run(escenario())
+        assert registry.reloads == 1
+
+    def test_reload_conserva_el_circuito_abierto(self):
+        registry = ProviderRegistry()
+
+        async def escenario():
+            registry.start(Settings(circuit_failure_threshold=1, circuit_reset_seconds=30))
+            registry.get("stripe").breaker.record_failure()
+            registry.reload(Settings(circuit_failure_threshold=3, circuit_reset_seconds=60))
+            breaker = registry.get("stripe").breaker
+            assert breaker.state == "open"
+            assert not breaker.allow()
+            assert (breaker._threshold, breaker._reset_timeout) == (3, 60)
+            assert registry.get("mock").breaker.state == "closed"
+            await registry.aclose()
+
+        asyncio.run(escenario())
+
+    def test_retry_after_con_la_configuracion_actual(self, monkeypatch):
+        from adapters import ProviderUnavailableError
+        from routers import payments
+
+        monkeypatch.setattr(payments, "get_settings", lambda: Settings(circuit_reset_seconds=45))
+        error = payments.provider_unavailable(ProviderUnavailableError("caído"))
+        assert error.headers["Retry-After"] == "45"
+
+    def test_activo_segun_configuracion(self):
+        registry = ProviderRegistry()
+        registry.start(Settings(payment_provider="stripe", stripe_secret_key=""))
+        assert registry.get().provider_name == "mock"  # sin clave no se activa Stripe
+        registry.start(Settings(payment_provider="stripe", stripe_secret_key="sk_test"))
+        assert registry.get().provider_name == "stripe"
+        asyncio.run(registry.aclose())
@@ -0,0 +1,141 @@
+"""
+test_stripe_adapter.py
+Tests del adapter de Stripe contra un transporte httpx simulado
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import routers.payments as payments_router
+from adapters import ProviderUnavailableError, StripeAdapter, StripeUnavailableError
+from adapters.registry import CircuitBreaker, GuardedProvider
+
+
+class FakeStripe:
+    """Responde con la lista 'responses' en orden (la última se repite) y guarda los requests"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def adapter(self) -> StripeAdapter:
+        client = httpx.AsyncClient(base_url="https://stripe.test", transport=httpx.MockTransport(self))
+        # Backoff en cero para que los reintentos no demoren el test
+        return StripeAdapter(client=client, api_key="sk_test", webhook_secret="whsec_test", max_retries=2,
+                             backoff_base=0.0)
+
+
+def _intent(status="requires_payment_method"):
+    return httpx.Response(200, json={"id": "pi_123", "status": status, "client_secret": "pi_123_secret"})
+
+
+def _error(code, message="error", headers=None):
+    return httpx.Response(code, json={"error": {"message": message}}, headers=headers)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestReintentos:
+    """Backoff ante errores transitorios e Idempotency-Key"""
+
+    def test_reintenta_5xx_con_la_misma_idempotency_key(self):
+        fake = FakeStripe(_error(500), _error(503), _intent())
+        result = run(fake.adapter().create_payment(10.5, "USD", "Cena"))
+
+        assert result.success and result.payment_id == "pi_123"
+        assert len(fake.requests) == 3
+        keys = {r.headers["Idempotency-Key"] for r in fake.requests}
+        assert len(keys) == 1
+        assert b"amount=1050" in fake.requests[0].content
+
+    def test_cada_operacion_tiene_su_propia_key(self):
+        fake = FakeStripe(_intent())
+        adapter = fake.adapter()
+        run(adapter.create_payment(1, "USD", "a"))
+        run(adapter.create_payment(1, "USD", "b"))
+        assert fake.requests[0].headers["Idempotency-Key"] != fake.requests[1].headers["Idempotency-Key"]
+
+    def test_get_sin_idempotency_key(self):
+        fake = FakeStripe(_error(502), _intent("succeeded"))
+        result = run(fake.adapter().get_payment_status("pi_123"))
+        assert result.success and result.status.value == "completed"
+        assert "Idempotency-Key" not in fake.requests[0].headers
+        assert len(fake.requests) == 2
+
+    def test_stripe_should_retry_false(self):
+        fake = FakeStripe(_error(500, headers={"Stripe-Should-Retry": "false"}), _intent())
+        with pytest.raises(StripeUnavailableError):
+            run(fake.adapter().create_payment(1, "USD", "a"))
+        assert len(fake.requests) == 1
+
+    def test_error_de_red_tras_los_reintentos(self):
+        fake = FakeStripe(httpx.ConnectError("sin ruta"))
+        adapter = fake.adapter()
+        with pytest.raises(ProviderUnavailableError):
+            run(adapter.refund_payment("pi_123"))
+        assert len(fake.requests) == 3  # 1 + max_retries
+
+    def test_se_recupera_de_un_timeout(self):
+        fake = FakeStripe(httpx.ReadTimeout("lento"), _intent())
+        assert run(fake.adapter().create_payment(1, "USD", "a")).success
+
+
+class TestMapeoDeErrores:
+    """Rechazos de Stripe vs Stripe no disponible"""
+
+    def test_rechazo_4xx_es_un_resultado_fallido(self):
+        fake = FakeStripe(_error(402, "Your card was declined."))
+        result = run(fake.adapter().create_payment(1, "USD", "a"))
+        assert not result.success
+        assert result.message == "Your card was declined."
+        assert len(fake.requests) == 1  # no se reintenta
+
+    def test_4xx_sin_json(self):
+        fake = FakeStripe(httpx.Response(400, text="Bad Request"))
+        result = run(fake.adapter().refund_payment("pi_123"))
+        assert not result.success and result.message == "Stripe respondió 400"
+
+    def test_2xx_ilegible(self):
+        fake = FakeStripe(httpx.Response(200, text="<html>proxy</html>"))
+        with pytest.raises(StripeUnavailableError) as info:
+            run(fake.adapter().create_payment(1, "USD", "a"))
+        assert isinstance(info.value, ProviderUnavailableError)
+        assert info.value.status_code == 200
+
+    def test_2xx_que_no_es_objeto(self):
+        fake = FakeStripe(httpx.Response(200, content=json.dumps(["pi_123"]).encode()), _intent())
+        assert run(fake.adapter().create_payment(1, "USD", "a")).success
+        assert len(fake.requests) == 2
+
+    def test_429_agotado(self):
+        fake = FakeStripe(_error(429))
+        with pytest.raises(StripeUnavailableError):
+            run(fake.adapter().get_payment_status("pi_123"))
+
+    def test_abre_el_circuito(self):
+        fake = FakeStripe(httpx.Response(200, text="no es json"))
+        provider = GuardedProvider(fake.adapter(), CircuitBreaker(failure_threshold=1, reset_timeout=30))
+        with pytest.raises(ProviderUnavailableError):
+            run(provider.create_payment(1, "USD", "a"))
+        assert provider.breaker.state == "open"
+
+    def test_router_responde_503(self, client, monkeypatch):
+        fake = FakeStripe(httpx.Response(200, text="no es json"))
+        provider = GuardedProvider(fake.adapter(), CircuitBreaker())
+        monkeypatch.setattr(payments_router, "get_payment_provider", lambda: provider)
+
+        response = client.post("/payments/create", json={"amount": 10, "description": "Cena", "user_id": 1})
+        assert response.status_code == 503
+        assert response.json()["detail"]["details"][0]["code"] == "PAY_PROVIDER_UNAVAILABLE"
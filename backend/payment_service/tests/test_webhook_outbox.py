@@ -0,0 +1,162 @@
+"""
+test_webhook_outbox.py
+Tests del outbox de webhooks: persistencia, reintentos y recuperación al reiniciar
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import insert, select
+
+from database import engine, init_db
+from models.partner import Partner
+from models.webhook_delivery import DeliveryStatus, WebhookDelivery
+from utils.webhook_outbox import WebhookOutbox
+
+URL = "https://partner.test/webhooks"
+
+
+class FakeTransports:
+    """Reemplaza a PartnerTransportManager: responde con 'codes' en orden (el último se repite)"""
+
+    def __init__(self, *codes, block: bool = False):
+        self.codes = list(codes) or [200]
+        self.block = block
+        self.sent = []
+
+    async def post(self, url, content, headers):
+        self.sent.append(headers)
+        if self.block:
+            await asyncio.Event().wait()  # partner colgado
+        code = self.codes.pop(0) if len(self.codes) > 1 else self.codes[0]
+        if isinstance(code, Exception):
+            raise code
+        return httpx.Response(code, text="ok")
+
+
+@pytest.fixture(autouse=True)
+def tablas():
+    init_db()
+
+
+def _outbox(transports, **kwargs):
+    kwargs = {"workers": 2, "max_attempts": 3, "backoff_base": 0.01, "backoff_max": 0.02,
+              "flush_interval": 0.01, **kwargs}
+    return WebhookOutbox(transports=transports, **kwargs)
+
+
+def _fila(delivery_id):
+    with engine.connect() as conn:
+        return conn.execute(select(WebhookDelivery).where(WebhookDelivery.delivery_id == delivery_id)).one()
+
+
+async def _esperar(condicion, segundos=3.0):
+    for _ in range(int(segundos / 0.01)):
+        if condicion():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+async def _enqueue(outbox, url=URL):
+    return await outbox.enqueue(url, "event.test", b'{"ok":true}', {"X-HMAC-Signature": "firma"})
+
+
+def test_la_fila_existe_al_volver_enqueue():
+    async def escenario():
+        outbox = _outbox(FakeTransports(block=True))
+        delivery_id = await _enqueue(outbox)
+        # Antes de cualquier flush
+        fila = _fila(delivery_id)
+        assert fila.status == DeliveryStatus.PENDING.value
+        assert fila.body == '{"ok":true}'
+        assert outbox.summary()["flushes"] == 0
+        await outbox.stop(grace=0)
+
+    asyncio.run(escenario())
+
+
+def test_reintenta_hasta_entregar():
+    transports = FakeTransports(503, httpx.ConnectError("caído"), 200)
+
+    async def escenario():
+        outbox = _outbox(transports)
+        delivery_id = await _enqueue(outbox)
+        assert await _esperar(lambda: outbox.metrics["delivered"] == 1)
+        await outbox.stop()
+        return delivery_id
+
+    delivery_id = asyncio.run(escenario())
+    fila = _fila(delivery_id)
+    assert fila.status == DeliveryStatus.DELIVERED.value
+    assert fila.attempts == 3
+    assert [h["X-Webhook-Attempt"] for h in transports.sent] == ["1", "2", "3"]
+    assert {h["X-Webhook-ID"] for h in transports.sent} == {delivery_id}
+
+
+def test_contadores_del_partner_por_resultado_final():
+    """Una entrega cuenta una vez; los intentos fallidos solo van a las métricas"""
+    with engine.begin() as conn:
+        conn.execute(insert(Partner).values(partner_id="contadores", partner_name="Contadores", webhook_url=URL,
+                                            shared_secret="s", subscribed_events="[]"))
+
+    async def escenario():
+        outbox = _outbox(FakeTransports(503, 503, 200, 500))
+        await outbox.enqueue(URL, "event.test", b"{}", {}, partner_id="contadores")
+        assert await _esperar(lambda: outbox.metrics["delivered"] == 1)
+        await outbox.enqueue(URL, "event.test", b"{}", {}, partner_id="contadores")
+        assert await _esperar(lambda: outbox.metrics["dead"] == 1)
+        await outbox.stop()
+        return outbox.summary()
+
+    summary = asyncio.run(escenario())
+    with engine.connect() as conn:
+        partner = conn.execute(select(Partner).where(Partner.partner_id == "contadores")).one()
+    assert (partner.webhook_success_count, partner.webhook_failure_count) == (1, 1)
+    assert summary["failed_attempts"] == 5
+    assert summary["failed_attempts_by_partner"] == {"contadores": 5}
+
+
+def test_reintentos_agotados_y_4xx_definitivo():
+    async def escenario():
+        agotado = _outbox(FakeTransports(500))
+        rechazado = _outbox(FakeTransports(400))
+        ids = await _enqueue(agotado), await _enqueue(rechazado)
+        assert await _esperar(lambda: agotado.metrics["dead"] == 1 and rechazado.metrics["dead"] == 1)
+        await agotado.stop()
+        await rechazado.stop()
+        return ids
+
+    agotado, rechazado = asyncio.run(escenario())
+    assert (_fila(agotado).status, _fila(agotado).attempts) == (DeliveryStatus.FAILED.value, 3)
+    assert (_fila(rechazado).status, _fila(rechazado).attempts) == (DeliveryStatus.FAILED.value, 1)
+    assert _fila(agotado).last_status_code == 500
+
+
+def test_recupera_pendientes_tras_reiniciar():
+    url = f"{URL}/reinicio"
+
+    async def caida():
+        outbox = _outbox(FakeTransports(block=True))
+        delivery_id = await _enqueue(outbox, url)
+        # El proceso muere sin stop(): nada más se escribe
+        for task in outbox._tasks:
+            task.cancel()
+        await asyncio.gather(*outbox._tasks, return_exceptions=True)
+        return delivery_id
+
+    delivery_id = asyncio.run(caida())
+    assert _fila(delivery_id).status == DeliveryStatus.PENDING.value
+
+    transports = FakeTransports(200)
+
+    async def reinicio():
+        outbox = _outbox(transports)
+        await outbox.start()
+        assert await _esperar(lambda: delivery_id not in outbox._live)
+        await outbox.stop()
+
+    asyncio.run(reinicio())
+    assert _fila(delivery_id).status == DeliveryStatus.DELIVERED.value
+    assert delivery_id in {h["X-Webhook-ID"] for h in transports.sent}
@@ -1,7 +1,7 @@
 """
 Utilidades del Payment Service
 """
-from .hmac_signer import sign_payload, verify_signature
+from .hmac_signer import sign_payload, sign_body, verify_signature
 from .event_normalizer import normalize_event
 
-__all__ = ["sign_payload", "verify_signature", "normalize_event"]
+__all__ = ["sign_payload", "sign_body", "verify_signature", "normalize_event"]
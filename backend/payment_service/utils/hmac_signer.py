@@ -1,35 +1,65 @@
 """
 Firma HMAC-SHA256 para webhooks
+
+El payload se serializa una sola vez a JSON canónico (orjson, claves
+ordenadas) y se firman y envían exactamente esos bytes. El receptor
+debe verificar contra el body crudo que recibe.
 """
 import hmac
 import hashlib
-import json
-from typing import Union
+from functools import lru_cache
+from typing import Tuple, Union
+
+import orjson
+
+
+def canonical_json(payload: dict) -> bytes:
+    """JSON canónico: claves ordenadas, sin espacios, UTF-8"""
+    return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
 
 
-def sign_payload(payload: Union[dict, bytes], secret: str) -> str:
+@lru_cache(maxsize=256)
+def _hmac_key(secret: str) -> "hmac.HMAC":
+    """HMAC con la clave ya preparada (un objeto por secret de partner)"""
+    return hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+
+def sign_payload(payload: Union[dict, str, bytes], secret: str) -> str:
     """
     Firma un payload con HMAC-SHA256
     
     Args:
-        payload: Datos a firmar (dict o bytes)
+        payload: Datos a firmar (dict, str o bytes)
         secret: Clave secreta compartida
         
     Returns:
         Firma hexadecimal
     """
     if isinstance(payload, dict):
-        payload = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+        payload = canonical_json(payload)
     elif isinstance(payload, str):
         payload = payload.encode()
     
-    signature = hmac.new(
-        secret.encode(),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
+    # copy() reutiliza la clave ya procesada en lugar de rehacerla por firma
+    signature = _hmac_key(secret).copy()
+    signature.update(payload)
     
-    return signature
+    return signature.hexdigest()
+
+
+def sign_body(payload: dict, secret: str) -> Tuple[bytes, str]:
+    """
+    Serializa y firma en un paso
+    
+    Args:
+        payload: Datos del webhook
+        secret: Clave secreta del partner
+        
+    Returns:
+        Tuple de (body, firma): el body es lo que debe enviarse tal cual
+    """
+    body = canonical_json(payload)
+    return body, sign_payload(body, secret)
 
 
 def verify_signature(payload: Union[dict, bytes], signature: str, secret: str) -> bool:
@@ -37,7 +67,7 @@ def verify_signature(payload: Union[dict, bytes], signature: str, secret: str) -
     Verifica una firma HMAC-SHA256
     
     Args:
-        payload: Datos firmados
+        payload: Datos firmados (idealmente el body crudo recibido)
         signature: Firma a verificar
         secret: Clave secreta compartida
         
@@ -62,7 +92,8 @@ def create_signed_webhook(
         secret: Clave secreta del partner
         
     Returns:
-        Tuple de (payload_dict, signature)
+        Tuple de (payload_dict, signature). El dict debe enviarse como
+        canonical_json(payload_dict); para eso es más directo sign_body().
     """
     from datetime import datetime, timezone
     
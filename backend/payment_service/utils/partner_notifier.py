@@ -4,14 +4,16 @@ Partner Notifier - Envía webhooks a partners B2B
 
 Módulo para notificar eventos a partners externos como FindyourWork.
 Implementa firma HMAC-SHA256 para autenticación.
+
+Los webhooks no se envían dentro del request: se encolan en el outbox
+(utils/webhook_outbox.py), que los entrega en segundo plano con reintentos.
 """
-import json
 import logging
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any
-import httpx
 
-from .hmac_signer import sign_payload
+from .hmac_signer import sign_body
+from .webhook_outbox import WebhookOutbox, webhook_outbox
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +23,8 @@ class PartnerNotifier:
     Servicio para enviar webhooks firmados a partners B2B
     """
     
-    def __init__(self, timeout: float = 30.0):
-        self.timeout = timeout
+    def __init__(self, outbox: Optional[WebhookOutbox] = None):
+        self.outbox = outbox or webhook_outbox
     
     async def send_webhook(
         self,
@@ -30,10 +32,11 @@ class PartnerNotifier:
         event_type: str,
         data: Dict[str, Any],
         shared_secret: str,
-        partner_id: str = "chuwue-grill"
-    ) -> bool:
+        partner_id: str = "chuwue-grill",
+        target_partner_id: Optional[str] = None
+    ) -> str:
         """
-        Envía un webhook firmado a un partner
+        Encola un webhook firmado para un partner
         
         Args:
             webhook_url: URL del endpoint del partner
@@ -41,9 +44,10 @@ class PartnerNotifier:
             data: Datos del evento
             shared_secret: Secret compartido para firma HMAC
             partner_id: ID de nuestro sistema como partner
+            target_partner_id: partner_id del destino (para sus estadísticas)
             
         Returns:
-            True si el webhook fue recibido exitosamente
+            delivery_id de la entrega encolada
         """
         payload = {
             "event_type": event_type,
@@ -53,8 +57,8 @@ class PartnerNotifier:
             "data": data
         }
         
-        # Firmar payload
-        signature = sign_payload(payload, shared_secret)
+        # Serializar una vez y firmar exactamente los bytes que se envían
+        body, signature = sign_body(payload, shared_secret)
         
         headers = {
             "Content-Type": "application/json",
@@ -64,39 +68,26 @@ class PartnerNotifier:
             "X-Webhook-Source": "chuwue-grill"
         }
         
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    webhook_url,
-                    json=payload,
-                    headers=headers
-                )
-            
-            success = response.status_code < 400
-            
-            if success:
-                logger.info(f"✅ Webhook enviado a {webhook_url}: {event_type}")
-            else:
-                logger.warning(f"⚠️ Webhook falló ({response.status_code}): {response.text[:200]}")
-            
-            return success
-            
-        except httpx.TimeoutException:
-            logger.error(f"❌ Timeout enviando webhook a {webhook_url}")
-            return False
-        except Exception as e:
-            logger.error(f"❌ Error enviando webhook: {e}")
-            return False
+        delivery_id = await self.outbox.enqueue(
+            webhook_url=webhook_url,
+            event_type=event_type,
+            body=body,
+            headers=headers,
+            partner_id=target_partner_id
+        )
+        logger.info(f"📬 Webhook {event_type} encolado para {webhook_url} ({delivery_id})")
+        return delivery_id
     
     async def notify_findyourwork(
         self,
         event_type: str,
         data: Dict[str, Any],
         shared_secret: str,
-        webhook_url: str = "http://localhost:8000/webhooks/partner/"
-    ) -> bool:
+        webhook_url: str = "http://localhost:8000/webhooks/partner/",
+        target_partner_id: Optional[str] = None
+    ) -> str:
         """
-        Envía un webhook específico a FindyourWork
+        Encola un webhook específico a FindyourWork
         
         Eventos soportados:
         - event.reservation_confirmed: Reserva de evento corporativo confirmada
@@ -109,7 +100,8 @@ class PartnerNotifier:
             event_type=event_type,
             data=data,
             shared_secret=shared_secret,
-            partner_id="chuwue-grill"
+            partner_id="chuwue-grill",
+            target_partner_id=target_partner_id
         )
 
 
@@ -120,8 +112,9 @@ class PartnerNotifier:
 async def notify_event_reservation(
     reservation_data: Dict[str, Any],
     shared_secret: str,
-    webhook_url: str = "http://localhost:8000/webhooks/partner/"
-) -> bool:
+    webhook_url: str = "http://localhost:8000/webhooks/partner/",
+    target_partner_id: Optional[str] = None
+) -> str:
     """
     Notifica a FindyourWork sobre una reserva de evento corporativo
     
@@ -137,13 +130,18 @@ async def notify_event_reservation(
             - contact_email: Email
             - services_requested: Lista de servicios solicitados ["dj", "decoracion", "fotografia"]
             - notes: Notas adicionales
+        target_partner_id: partner_id de FindyourWork (para sus estadísticas)
+    
+    Returns:
+        delivery_id de la entrega encolada
     """
     notifier = PartnerNotifier()
     return await notifier.notify_findyourwork(
         event_type="event.reservation_confirmed",
         data=reservation_data,
         shared_secret=shared_secret,
-        webhook_url=webhook_url
+        webhook_url=webhook_url,
+        target_partner_id=target_partner_id
     )
 
 
@@ -151,8 +149,9 @@ async def notify_event_updated(
     reservation_id: str,
     updates: Dict[str, Any],
     shared_secret: str,
-    webhook_url: str = "http://localhost:8000/webhooks/partner/"
-) -> bool:
+    webhook_url: str = "http://localhost:8000/webhooks/partner/",
+    target_partner_id: Optional[str] = None
+) -> str:
     """
     Notifica a FindyourWork sobre actualización de un evento
     
@@ -168,7 +167,8 @@ async def notify_event_updated(
             "updates": updates
         },
         shared_secret=shared_secret,
-        webhook_url=webhook_url
+        webhook_url=webhook_url,
+        target_partner_id=target_partner_id
     )
 
 
@@ -176,8 +176,9 @@ async def notify_event_cancelled(
     reservation_id: str,
     reason: str,
     shared_secret: str,
-    webhook_url: str = "http://localhost:8000/webhooks/partner/"
-) -> bool:
+    webhook_url: str = "http://localhost:8000/webhooks/partner/",
+    target_partner_id: Optional[str] = None
+) -> str:
     """
     Notifica a FindyourWork sobre cancelación de un evento
     """
@@ -189,7 +190,8 @@ async def notify_event_cancelled(
             "reason": reason
         },
         shared_secret=shared_secret,
-        webhook_url=webhook_url
+        webhook_url=webhook_url,
+        target_partner_id=target_partner_id
     )
 
 
@@ -197,8 +199,9 @@ async def notify_payment_success(
     reservation_id: str,
     payment_data: Dict[str, Any],
     shared_secret: str,
-    webhook_url: str = "http://localhost:8000/webhooks/partner/"
-) -> bool:
+    webhook_url: str = "http://localhost:8000/webhooks/partner/",
+    target_partner_id: Optional[str] = None
+) -> str:
     """
     Notifica a FindyourWork sobre pago exitoso de un evento
     """
@@ -210,7 +213,8 @@ async def notify_payment_success(
             **payment_data
         },
         shared_secret=shared_secret,
-        webhook_url=webhook_url
+        webhook_url=webhook_url,
+        target_partner_id=target_partner_id
     )
 
 
@@ -241,12 +245,13 @@ reservation = {
 # Obtener el secret del partner FindyourWork desde la BD
 partner = db.query(Partner).filter(Partner.partner_name == "FindyourWork").first()
 
-success = await notify_event_reservation(
+delivery_id = await notify_event_reservation(
     reservation_data=reservation,
     shared_secret=partner.shared_secret,
-    webhook_url=partner.webhook_url
+    webhook_url=partner.webhook_url,
+    target_partner_id=partner.partner_id
 )
 
-if success:
-    print("FindyourWork notificado exitosamente")
+# La entrega sigue en segundo plano: GET /partners/deliveries/{delivery_id}
+print(f"Webhook encolado para FindyourWork: {delivery_id}")
 """
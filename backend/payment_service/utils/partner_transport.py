@@ -0,0 +1,350 @@
+"""
+Transporte HTTP hacia Partners
+==============================
+
+Un cliente httpx keep-alive por host de partner: las conexiones TCP/TLS
+se reutilizan entre webhooks en lugar de abrirse en cada envío.
+"""
+import asyncio
+import logging
+import socket
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class DNSCache:
+    """
+    Resoluciones de nombres con TTL
+
+    getaddrinfo no informa el TTL real del registro, así que se usa uno
+    fijo. Se guardan todas las direcciones del nombre; si no se puede
+    conectar a ninguna, la entrada se descarta y el próximo intento
+    vuelve a resolver.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self._ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self.metrics = {"hits": 0, "misses": 0}
+
+    async def resolve(self, host: str, port: int) -> List[str]:
+        """Direcciones de 'host' en el orden de getaddrinfo (OSError si no resuelve)"""
+        key = (host, port)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.metrics["hits"] += 1
+            return entry[1]
+        self.metrics["misses"] += 1
+        addresses = await self._lookup(host, port)
+        if not addresses:
+            raise socket.gaierror(f"{host} no tiene direcciones")
+        self._entries[key] = (time.monotonic() + self._ttl, addresses)
+        return addresses
+
+    async def _lookup(self, host: str, port: int) -> List[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+    def invalidate(self, host: str, port: int):
+        self._entries.pop((host, port), None)
+
+
+class _CachedDNSBackend(httpcore.AsyncNetworkBackend):
+    """Backend de red que resuelve con el DNSCache y cuenta conexiones nuevas"""
+
+    def __init__(self, dns: DNSCache):
+        self._dns = dns
+        self._backend = httpcore.AnyIOBackend()
+        self.connections = 0
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options=None) -> httpcore.AsyncNetworkStream:
+        try:
+            addresses = await self._dns.resolve(host, port)
+        except OSError as e:
+            # Como error de conexión de httpx (reintentable), no como excepción suelta
+            raise httpcore.ConnectError(str(e)) from e
+        error: Exception = httpcore.ConnectError(f"Sin direcciones para {host}")
+        for address in addresses:
+            try:
+                # El SNI/verificación TLS siguen usando el nombre del host, no la IP
+                stream = await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout, OSError) as e:
+                error = e
+                continue
+            self.connections += 1
+            return stream
+        self._dns.invalidate(host, port)
+        if isinstance(error, OSError):
+            raise httpcore.ConnectError(str(error)) from error
+        raise error
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None,
+                                  socket_options=None) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+# Excepciones de httpcore -> httpx (la más específica primero)
+_HTTPCORE_ERRORS: Tuple[Tuple[type, type], ...] = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextmanager
+def _httpx_errors() -> Iterator[None]:
+    try:
+        yield
+    except Exception as e:
+        for source, target in _HTTPCORE_ERRORS:
+            if isinstance(e, source):
+                raise target(str(e)) from e
+        raise
+
+
+class _PoolStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any):
+        self._stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with _httpx_errors():
+            async for chunk in self._stream:
+                yield chunk
+
+    async def aclose(self):
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+
+class _PoolTransport(httpx.AsyncBaseTransport):
+    """Transporte httpx sobre un httpcore.AsyncConnectionPool propio (con el DNS cacheado)"""
+
+    def __init__(self, pool: httpcore.AsyncConnectionPool):
+        self._pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions  # timeouts del cliente
+        )
+        with _httpx_errors():
+            response = await self._pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_PoolStream(response.stream),
+            extensions=response.extensions
+        )
+
+    async def aclose(self):
+        await self._pool.aclose()
+
+
+class _HostPool:
+    """Cliente de un host con sus estadísticas de uso"""
+
+    def __init__(self, origin: str, client: httpx.AsyncClient, pool: httpcore.AsyncConnectionPool,
+                 backend: _CachedDNSBackend):
+        self.origin = origin
+        self.client = client
+        self.pool = pool
+        self.backend = backend
+        self.requests = 0
+        self.http_versions: Dict[str, int] = {}
+        self.last_used = time.monotonic()
+
+    async def on_request(self, request: httpx.Request):
+        self.requests += 1
+        self.last_used = time.monotonic()
+
+    async def on_response(self, response: httpx.Response):
+        version = response.http_version
+        self.http_versions[version] = self.http_versions.get(version, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        connections = self.backend.connections
+        return {
+            "requests": self.requests,
+            "connections_opened": connections,
+            "open_connections": len(self.pool.connections),
+            # Fracción de requests que viajaron por una conexión ya abierta
+            "reuse_ratio": round(1 - connections / self.requests, 3) if self.requests else None,
+            "http_versions": self.http_versions,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1)
+        }
+
+
+class PartnerTransportManager:
+    """
+    Clientes HTTP por host de partner
+
+    Cada origen (esquema, host y puerto) tiene su propio pool keep-alive
+    con a lo sumo 'max_connections' conexiones, así un partner con mucho
+    tráfico no consume las conexiones de los demás. Con httpx[http2]
+    instalado se negocia HTTP/2 por ALPN en los partners https que lo
+    soporten y los envíos se multiplexan sobre una conexión; los demás
+    siguen en HTTP/1.1 keep-alive. Los nombres se resuelven una vez por
+    'dns_ttl' segundos y los pools sin uso por 'idle_seconds' se cierran.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 10,
+        keepalive_expiry: float = 120.0,
+        idle_seconds: float = 300.0,
+        dns_ttl: float = 60.0,
+        timeout: float = 10.0,
+        http2: bool = True,
+        dns: Optional[DNSCache] = None
+    ):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._idle_seconds = idle_seconds
+        self._timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        self._http2 = http2 and HTTP2_AVAILABLE
+        self._ssl_context = httpx.create_ssl_context()
+        self._dns = dns or DNSCache(dns_ttl)
+        self._hosts: Dict[str, _HostPool] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {"pools_created": 0, "pools_evicted": 0}
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def _build(self, origin: str) -> _HostPool:
+        backend = _CachedDNSBackend(self._dns)
+        pool = httpcore.AsyncConnectionPool(
+            ssl_context=self._ssl_context,
+            max_connections=self._limits.max_connections,
+            max_keepalive_connections=self._limits.max_keepalive_connections,
+            keepalive_expiry=self._limits.keepalive_expiry,
+            http1=True,
+            http2=self._http2,
+            network_backend=backend
+        )
+        host = _HostPool(origin, None, pool, backend)
+        host.client = httpx.AsyncClient(
+            transport=_PoolTransport(pool),
+            timeout=self._timeout,
+            event_hooks={"request": [host.on_request], "response": [host.on_response]}
+        )
+        self.metrics["pools_created"] += 1
+        return host
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """Cliente keep-alive del host de 'url' (se crea la primera vez)"""
+        origin = self._origin(url)
+        host = self._hosts.get(origin)
+        if host is None:
+            host = self._hosts[origin] = self._build(origin)
+            self._ensure_evictor()
+        return host.client
+
+    async def post(self, url: str, content: bytes, headers: Dict[str, str]) -> httpx.Response:
+        return await self.client_for(url).post(url, content=content, headers=headers)
+
+    # ===== Desalojo de pools inactivos =====
+
+    async def evict_idle(self) -> int:
+        """Cierra los pools sin uso en 'idle_seconds'; devuelve cuántos"""
+        now = time.monotonic()
+        idle = [h for h in self._hosts.values() if now - h.last_used >= self._idle_seconds]
+        for host in idle:
+            del self._hosts[host.origin]
+            await host.client.aclose()
+        self.metrics["pools_evicted"] += len(idle)
+        return len(idle)
+
+    def _ensure_evictor(self):
+        if self._task is not None and not self._task.done():
+            return
+
+        async def loop():
+            while True:
+                await asyncio.sleep(max(self._idle_seconds / 2, 1.0))
+                try:
+                    await self.evict_idle()
+                except Exception as e:
+                    logger.error(f"❌ Error cerrando pools inactivos: {e}")
+
+        self._task = asyncio.create_task(loop())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        hosts, self._hosts = list(self._hosts.values()), {}
+        for host in hosts:
+            await host.client.aclose()
+
+    def summary(self) -> Dict[str, Any]:
+        requests = sum(h.requests for h in self._hosts.values())
+        connections = sum(h.backend.connections for h in self._hosts.values())
+        return {
+            **self.metrics,
+            "http2_enabled": self._http2,
+            "reuse_ratio": round(1 - connections / requests, 3) if requests else None,
+            "dns": self._dns.metrics,
+            "hosts": {origin: h.summary() for origin, h in self._hosts.items()}
+        }
+
+
+# Instancia única (compartida por el outbox de webhooks)
+partner_transports = PartnerTransportManager(
+    max_connections=settings.partner_max_connections,
+    keepalive_expiry=settings.partner_keepalive_seconds,
+    idle_seconds=settings.partner_idle_seconds,
+    dns_ttl=settings.partner_dns_ttl,
+    timeout=settings.webhook_timeout,
+    http2=settings.partner_http2
+)
@@ -0,0 +1,454 @@
+"""
+Outbox de Webhooks Salientes
+============================
+
+Los webhooks a partners se encolan y se entregan en segundo plano:
+el request que los dispara no espera al partner. Cada entrega queda
+en la tabla webhook_deliveries y se reintenta con backoff exponencial
+hasta entregarse o agotar los intentos.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import random
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy import bindparam, func, insert, select, update
+
+from config import get_settings
+from database import engine
+from models.partner import Partner
+from models.webhook_delivery import DeliveryStatus, WebhookDelivery
+from .partner_transport import PartnerTransportManager, partner_transports
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _to_datetime(ts: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(ts, timezone.utc) if ts is not None else None
+
+
+def _to_timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:  # SQLite devuelve fechas sin zona (guardadas en UTC)
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+@dataclass
+class Delivery:
+    """Entrega en memoria (espejo de una fila de webhook_deliveries)"""
+    delivery_id: str
+    partner_id: Optional[str]
+    webhook_url: str
+    event_type: str
+    body: bytes
+    headers: Dict[str, str]
+    attempts: int = 0
+    next_attempt_at: float = 0.0
+    last_error: Optional[str] = None
+
+    @property
+    def partner_key(self) -> str:
+        """Clave para el límite de concurrencia: el partner, o el host si no está registrado"""
+        return self.partner_id or urlsplit(self.webhook_url).netloc
+
+
+class WebhookOutbox:
+    """
+    Cola persistente de webhooks con un pool de workers
+
+    enqueue() inserta la fila 'pending' (en un hilo, fuera del event
+    loop) antes de volver: una entrega aceptada sobrevive a una caída
+    del proceso. Un ciclo de fondo escribe cada 'flush_interval'
+    segundos, en una sola transacción, los resultados y los contadores
+    webhook_success_count / webhook_failure_count de cada partner (uno
+    por entrega, con su resultado final; los intentos fallidos quedan en
+    las métricas failed_attempts). Si el
+    proceso muere antes de escribir un resultado, la entrega se retoma
+    al arrancar y puede llegar dos veces (el partner la reconoce por
+    X-Webhook-ID).
+
+    Los workers toman entregas por partner en ronda, con a lo sumo
+    'partner_concurrency' envíos simultáneos al mismo partner: uno lento
+    no acapara el pool. Red caída, timeouts, 408, 429 y 5xx se reintentan
+    con backoff exponencial y jitter; el resto de 4xx es definitivo.
+
+    Al arrancar se retoman las entregas pendientes de la BD. Asume un
+    solo proceso dueño de la cola (el servicio corre con un worker).
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        partner_concurrency: int = 2,
+        max_attempts: int = 6,
+        transports: Optional[PartnerTransportManager] = None,
+        backoff_base: float = 2.0,
+        backoff_max: float = 600.0,
+        flush_interval: float = 0.2
+    ):
+        self._workers = workers
+        self._partner_limit = partner_concurrency
+        self._max_attempts = max_attempts
+        self._transports = transports or partner_transports
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._flush_interval = flush_interval
+
+        self._live: Dict[str, Delivery] = {}            # entregas sin resultado final
+        self._ready: Dict[str, Deque[Delivery]] = {}    # listas para enviar, por partner
+        self._active: Dict[str, int] = {}               # envíos en curso por partner
+        self._delayed: List[Tuple[float, str]] = []     # heap (próximo intento, delivery_id)
+        self._work = asyncio.Event()
+
+        self._updates: List[Dict[str, Any]] = []        # resultados por escribir
+        self._stats: Dict[str, List[Any]] = {}          # partner_id -> [entregadas, descartadas, último resultado]
+        self._failed_attempts: Counter = Counter()      # intentos fallidos por partner (o host)
+
+        self._tasks: List[asyncio.Task] = []
+        self.metrics = {
+            "enqueued": 0, "delivered": 0, "failed_attempts": 0,
+            "retries": 0, "dead": 0, "flushes": 0, "flush_errors": 0
+        }
+
+    # ===== Encolado =====
+
+    async def enqueue(
+        self,
+        webhook_url: str,
+        event_type: str,
+        body: bytes,
+        headers: Dict[str, str],
+        partner_id: Optional[str] = None
+    ) -> str:
+        """
+        Guarda y encola un webhook ya firmado
+
+        Args:
+            webhook_url: URL del partner
+            event_type: Tipo de evento
+            body: JSON exacto a enviar (el que se firmó)
+            headers: Headers del envío (firma incluida)
+            partner_id: Partner destino; sus estadísticas se actualizan con el resultado
+
+        Returns:
+            delivery_id para consultar el estado de la entrega
+        """
+        delivery_id = f"whd_{uuid.uuid4().hex[:20]}"
+        delivery = Delivery(
+            delivery_id=delivery_id,
+            partner_id=partner_id,
+            webhook_url=webhook_url,
+            event_type=event_type,
+            body=body,
+            # El partner puede descartar duplicados con este ID
+            headers={**headers, "X-Webhook-ID": delivery_id},
+            next_attempt_at=time.time()
+        )
+        await asyncio.to_thread(self._insert, delivery)
+        self._live[delivery_id] = delivery
+        self._push(delivery)
+        self.metrics["enqueued"] += 1
+        self._ensure_running()
+        return delivery_id
+
+    def _push(self, delivery: Delivery):
+        self._ready.setdefault(delivery.partner_key, deque()).append(delivery)
+        self._work.set()
+
+    def status(self, delivery_id: str) -> Optional[Dict[str, Any]]:
+        """Estado en memoria de una entrega aún sin resultado final"""
+        delivery = self._live.get(delivery_id)
+        if delivery is None:
+            return None
+        return {
+            "delivery_id": delivery_id,
+            "partner_id": delivery.partner_id,
+            "event_type": delivery.event_type,
+            "status": DeliveryStatus.PENDING.value,
+            "attempts": delivery.attempts,
+            "next_attempt_at": _to_datetime(delivery.next_attempt_at).isoformat(),
+            "last_error": delivery.last_error
+        }
+
+    # ===== Workers =====
+
+    def _next_ready(self) -> Optional[Delivery]:
+        """Siguiente entrega de un partner con cupo (en ronda entre partners)"""
+        for key in list(self._ready):
+            if self._active.get(key, 0) >= self._partner_limit:
+                continue
+            queue = self._ready.pop(key)
+            delivery = queue.popleft()
+            if queue:
+                self._ready[key] = queue  # vuelve al final de la ronda
+            self._active[key] = self._active.get(key, 0) + 1
+            return delivery
+        return None
+
+    async def _worker(self):
+        while True:
+            delivery = self._next_ready()
+            if delivery is None:
+                self._work.clear()
+                await self._work.wait()
+                continue
+            key = delivery.partner_key
+            try:
+                await self._attempt(delivery)
+            except Exception as e:
+                logger.error(f"❌ Error inesperado entregando {delivery.delivery_id}: {e}")
+                self._failed_attempt(delivery)
+                self._schedule_retry(delivery, str(e), None)
+            finally:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+                self._work.set()
+
+    async def _attempt(self, delivery: Delivery):
+        delivery.attempts += 1
+        headers = {**delivery.headers, "X-Webhook-Attempt": str(delivery.attempts)}
+        try:
+            response = await self._transports.post(delivery.webhook_url, delivery.body, headers)
+        except httpx.HTTPError as e:
+            self._failed_attempt(delivery)
+            self._schedule_retry(delivery, f"{type(e).__name__}: {e}", None)
+            return
+
+        if response.status_code < 400:
+            self._finish(delivery, DeliveryStatus.DELIVERED, response.status_code, None)
+            logger.info(f"✅ Webhook {delivery.event_type} entregado a {delivery.webhook_url}")
+            return
+
+        self._failed_attempt(delivery)
+        error = f"HTTP {response.status_code}: {response.text[:200]}"
+        if response.status_code in (408, 425, 429) or response.status_code >= 500:
+            self._schedule_retry(delivery, error, response.status_code)
+        else:
+            self._finish(delivery, DeliveryStatus.FAILED, response.status_code, error)
+
+    def _schedule_retry(self, delivery: Delivery, error: str, status_code: Optional[int]):
+        delivery.last_error = error
+        if delivery.attempts >= self._max_attempts:
+            self._finish(delivery, DeliveryStatus.FAILED, status_code, error)
+            return
+        # Backoff exponencial con jitter completo
+        delay = random.uniform(0, min(self._backoff_max, self._backoff_base * 2 ** delivery.attempts))
+        delivery.next_attempt_at = time.time() + delay
+        heapq.heappush(self._delayed, (delivery.next_attempt_at, delivery.delivery_id))
+        self.metrics["retries"] += 1
+        logger.warning(f"⚠️ Webhook {delivery.delivery_id} falló ({error}); reintento en {delay:.1f}s")
+        self._updates.append({
+            "b_delivery_id": delivery.delivery_id,
+            "status": DeliveryStatus.PENDING.value,
+            "attempts": delivery.attempts,
+            "next_attempt_at": _to_datetime(delivery.next_attempt_at),
+            "last_status_code": status_code,
+            "last_error": error[:500],
+            "delivered_at": None
+        })
+
+    def _finish(self, delivery: Delivery, result: DeliveryStatus, status_code: Optional[int], error: Optional[str]):
+        self._live.pop(delivery.delivery_id, None)
+        if result == DeliveryStatus.DELIVERED:
+            self.metrics["delivered"] += 1
+        else:
+            self.metrics["dead"] += 1
+            logger.error(f"❌ Webhook {delivery.delivery_id} descartado tras {delivery.attempts} intentos: {error}")
+        self._record(delivery, result == DeliveryStatus.DELIVERED)
+        self._updates.append({
+            "b_delivery_id": delivery.delivery_id,
+            "status": result.value,
+            "attempts": delivery.attempts,
+            "next_attempt_at": None,
+            "last_status_code": status_code,
+            "last_error": error[:500] if error else None,
+            "delivered_at": datetime.now(timezone.utc) if result == DeliveryStatus.DELIVERED else None
+        })
+
+    def _failed_attempt(self, delivery: Delivery):
+        """Intento fallido (se reintente o no): solo métricas en memoria"""
+        self.metrics["failed_attempts"] += 1
+        self._failed_attempts[delivery.partner_key] += 1
+
+    def _record(self, delivery: Delivery, ok: bool):
+        """Acumula el resultado final en las estadísticas del partner (se escriben en lote)"""
+        if delivery.partner_id is None:
+            return
+        stats = self._stats.setdefault(delivery.partner_id, [0, 0, None])
+        stats[0 if ok else 1] += 1
+        stats[2] = datetime.now(timezone.utc)
+
+    # ===== Persistencia =====
+
+    def _insert(self, delivery: Delivery):
+        """Fila 'pending' de una entrega nueva"""
+        with engine.begin() as conn:
+            conn.execute(insert(WebhookDelivery).values(
+                delivery_id=delivery.delivery_id,
+                partner_id=delivery.partner_id,
+                webhook_url=delivery.webhook_url,
+                event_type=delivery.event_type,
+                body=delivery.body.decode(),
+                headers_json=json.dumps(delivery.headers),
+                status=DeliveryStatus.PENDING.value,
+                attempts=0,
+                next_attempt_at=_to_datetime(delivery.next_attempt_at)
+            ))
+
+    def _write(self, updates: List[Dict[str, Any]], stats: Dict[str, List[Any]]):
+        """Resultados y contadores en una sola transacción"""
+        with engine.begin() as conn:
+            if updates:
+                conn.execute(
+                    update(WebhookDelivery)
+                    .where(WebhookDelivery.delivery_id == bindparam("b_delivery_id"))
+                    .values(
+                        status=bindparam("status"),
+                        attempts=bindparam("attempts"),
+                        next_attempt_at=bindparam("next_attempt_at"),
+                        last_status_code=bindparam("last_status_code"),
+                        last_error=bindparam("last_error"),
+                        delivered_at=bindparam("delivered_at")
+                    ),
+                    updates
+                )
+            if stats:
+                conn.execute(
+                    update(Partner)
+                    .where(Partner.partner_id == bindparam("b_partner_id"))
+                    .values(
+                        webhook_success_count=func.coalesce(Partner.webhook_success_count, 0) + bindparam("ok"),
+                        webhook_failure_count=func.coalesce(Partner.webhook_failure_count, 0) + bindparam("failed"),
+                        last_webhook_at=bindparam("last")
+                    ),
+                    [
+                        {"b_partner_id": partner_id, "ok": ok, "failed": failed, "last": last}
+                        for partner_id, (ok, failed, last) in stats.items()
+                    ]
+                )
+
+    async def flush(self):
+        """Escribe lo acumulado; si la BD falla se reintenta en el próximo ciclo"""
+        if not (self._updates or self._stats):
+            return
+        updates, stats = self._updates, self._stats
+        self._updates, self._stats = [], {}
+        try:
+            await asyncio.to_thread(self._write, updates, stats)
+            self.metrics["flushes"] += 1
+        except Exception as e:
+            self.metrics["flush_errors"] += 1
+            logger.error(f"❌ Error guardando el outbox de webhooks: {e}")
+            self._updates = updates + self._updates
+            for partner_id, (ok, failed, last) in stats.items():
+                current = self._stats.setdefault(partner_id, [0, 0, last])
+                current[0] += ok
+                current[1] += failed
+                current[2] = current[2] or last
+
+    def _load_pending(self) -> List[Delivery]:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(WebhookDelivery)
+                .where(WebhookDelivery.status == DeliveryStatus.PENDING.value)
+                .order_by(WebhookDelivery.next_attempt_at)
+            ).all()
+        return [
+            Delivery(
+                delivery_id=row.delivery_id,
+                partner_id=row.partner_id,
+                webhook_url=row.webhook_url,
+                event_type=row.event_type,
+                body=row.body.encode(),
+                headers=json.loads(row.headers_json),
+                attempts=row.attempts or 0,
+                next_attempt_at=_to_timestamp(row.next_attempt_at),
+                last_error=row.last_error
+            )
+            for row in rows
+        ]
+
+    async def _housekeeping(self):
+        """Pasa a la cola los reintentos que vencieron y escribe en la BD"""
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            now = time.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, delivery_id = heapq.heappop(self._delayed)
+                delivery = self._live.get(delivery_id)
+                if delivery is not None:
+                    self._push(delivery)
+            await self.flush()
+
+    # ===== Ciclo de vida =====
+
+    def _ensure_running(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+        self._tasks.append(asyncio.create_task(self._housekeeping()))
+
+    async def start(self):
+        """Retoma las entregas pendientes de la BD y arranca los workers"""
+        pending = await asyncio.to_thread(self._load_pending)
+        now = time.time()
+        for delivery in pending:
+            if delivery.delivery_id in self._live:
+                continue
+            self._live[delivery.delivery_id] = delivery
+            if delivery.next_attempt_at <= now:
+                self._push(delivery)
+            else:
+                heapq.heappush(self._delayed, (delivery.next_attempt_at, delivery.delivery_id))
+        if pending:
+            logger.info(f"📬 {len(pending)} webhooks pendientes retomados")
+        self._ensure_running()
+
+    async def stop(self, grace: float = 5.0):
+        """Deja terminar los envíos en curso y guarda lo pendiente"""
+        deadline = time.monotonic() + grace
+        while self._active and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Lo que quedó sin enviar sigue 'pending' en la BD y se retoma al arrancar
+        await self.flush()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "pending": len(self._live),
+            "ready": sum(len(q) for q in self._ready.values()),
+            "scheduled": len(self._delayed),
+            "in_flight": sum(self._active.values()),
+            "failed_attempts_by_partner": dict(self._failed_attempts),
+            "unflushed": len(self._updates),
+            "workers": self._workers,
+            "partner_concurrency": self._partner_limit
+        }
+
+
+# Instancia única (workers arrancados en el lifespan)
+webhook_outbox = WebhookOutbox(
+    workers=settings.webhook_workers,
+    partner_concurrency=settings.webhook_partner_concurrency,
+    max_attempts=settings.webhook_retry_count + 1,
+    backoff_base=settings.webhook_backoff_base,
+    backoff_max=settings.webhook_backoff_max,
+    flush_interval=settings.webhook_flush_interval
+)
@@ -2,6 +2,11 @@
 Shared - Módulos compartidos entre microservicios
 """
 from .error_handler import APIError, ErrorDetail, create_error_response
-from .jwt_validator import validate_jwt_local
+from .jwt_validator import validate_jwt_local, jwks_cache
+from .jwks import JWKSCache
+from .password_hasher import PasswordHasher, HashSaturado
 
-__all__ = ["APIError", "ErrorDetail", "create_error_response", "validate_jwt_local"]
+__all__ = [
+    "APIError", "ErrorDetail", "create_error_response", "validate_jwt_local", "jwks_cache", "JWKSCache",
+    "PasswordHasher", "HashSaturado"
+]
@@ -0,0 +1,119 @@
+"""
+Caché de claves JWKS
+Claves públicas del Auth Service parseadas una vez por kid y refrescadas en segundo plano
+"""
+import json
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, Optional
+
+from jose import jwk
+from jose.backends.base import Key
+
+
+class JWKSCache:
+    """
+    Claves de verificación por kid, sin red ni parseo en el request
+
+    Un hilo de fondo descarga el JWKS cada 'refresh_seconds' y construye
+    las claves nuevas (las ya conocidas se reutilizan). get(kid) es un
+    lookup en un dict y nunca hace red: la primera descarga se hace en
+    start() al arrancar el servicio o, si nadie lo llamó, en el hilo. El Auth Service publica la próxima clave antes de
+    firmar con ella, así que una rotación no produce kids desconocidos;
+    si aun así llega uno, se adelanta el refresco (como mucho uno cada
+    'min_refresh_seconds') y ese token se rechaza.
+    """
+
+    def __init__(self, url: str, refresh_seconds: float = 300, min_refresh_seconds: float = 5,
+                 timeout: float = 2.0):
+        self.url = url
+        self._refresh_seconds = refresh_seconds
+        self._min_refresh_seconds = min_refresh_seconds
+        self._timeout = timeout
+        self._keys: Dict[str, Key] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        self.metrics = {"refreshes": 0, "errors": 0, "unknown_kid": 0}
+
+    def refresh(self) -> int:
+        """
+        Descarga el JWKS y reemplaza el dict de claves de una vez
+
+        Returns:
+            Cantidad de claves publicadas
+        """
+        self._last_refresh = time.monotonic()
+        with urllib.request.urlopen(self.url, timeout=self._timeout) as response:
+            data = json.loads(response.read())
+        current = self._keys
+        keys = {}
+        for entry in data.get("keys", []):
+            kid = entry.get("kid")
+            if not kid or entry.get("kty") != "RSA":
+                continue
+            keys[kid] = current.get(kid) or jwk.construct(entry, entry.get("alg", "RS256"))
+        self._keys = keys
+        self.metrics["refreshes"] += 1
+        return len(keys)
+
+    def start(self, wait: bool = True):
+        """
+        Arranca el hilo de refresco (una sola vez)
+
+        Args:
+            wait: True = primera descarga aquí, en el arranque del servicio;
+                  False = la hace el hilo y esta llamada no bloquea
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            if wait:
+                self._safe_refresh()
+            self._thread = threading.Thread(target=self._loop, args=(not wait,), name="jwks-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopped = True
+            self._wake.set()
+        if thread is not None:
+            thread.join(timeout=self._timeout + self._min_refresh_seconds)
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            self.metrics["errors"] += 1
+            print(f"⚠️ Error descargando el JWKS de {self.url}: {e}")
+
+    def _loop(self, first: bool):
+        if first:
+            self._safe_refresh()
+        while True:
+            self._wake.wait(self._refresh_seconds)
+            self._wake.clear()
+            if self._stopped:
+                return
+            wait = self._min_refresh_seconds - (time.monotonic() - self._last_refresh)
+            if wait > 0:
+                time.sleep(wait)
+            self._safe_refresh()
+
+    def get(self, kid: Optional[str]) -> Optional[Key]:
+        """Clave ya construida para 'kid' (None si no se conoce); no bloquea"""
+        if self._thread is None:
+            self.start(wait=False)
+        key = self._keys.get(kid) if kid else None
+        if key is None:
+            self.metrics["unknown_kid"] += 1
+            self._wake.set()
+        return key
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.metrics, "kids": list(self._keys), "url": self.url}
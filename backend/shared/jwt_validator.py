@@ -7,10 +7,48 @@ from datetime import datetime, timezone
 from typing import Optional, Tuple
 from jose import jwt, JWTError
 
+from .jwks import JWKSCache
+
 
 # Configuración compartida - DEBE coincidir con Auth Service
 JWT_SECRET = os.getenv("JWT_SECRET", "chuwue_grill_secret_key_cambiar_en_produccion")
-JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "RS256")
+AUTH_JWKS_URL = os.getenv("AUTH_JWKS_URL", "http://auth_service:8001/auth/jwks.json")
+
+
+def _parse_cutoff(value: str) -> Optional[datetime]:
+    """'2026-12-01T00:00:00' (UTC si no trae zona) -> datetime; vacío -> None"""
+    if not value:
+        return None
+    cutoff = datetime.fromisoformat(value)
+    return cutoff if cutoff.tzinfo else cutoff.replace(tzinfo=timezone.utc)
+
+
+# Tokens HS256 sin kid (anteriores a RS256): se aceptan hasta esta fecha; sin configurar, nunca
+HS256_FALLBACK_UNTIL = _parse_cutoff(os.getenv("JWT_HS256_FALLBACK_UNTIL", ""))
+
+# Claves RS256 del Auth Service por kid. Cada servicio llama a jwks_cache.start()
+# en su arranque; si no, la primera descarga la hace el hilo de fondo (nunca el request)
+jwks_cache = JWKSCache(AUTH_JWKS_URL)
+
+
+def _hs256_allowed() -> bool:
+    if JWT_ALGORITHM == "HS256":
+        return True
+    return HS256_FALLBACK_UNTIL is not None and datetime.now(timezone.utc) < HS256_FALLBACK_UNTIL
+
+
+def _decode(token: str) -> dict:
+    """RS256 con la clave cacheada del kid; sin kid, HS256 con el secret solo si está habilitado"""
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        if not _hs256_allowed():
+            raise JWTError("Token sin kid: HS256 no admitido")
+        return jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    key = jwks_cache.get(kid)
+    if key is None:
+        raise JWTError("Clave de firma desconocida")
+    return jwt.decode(token, key, algorithms=["RS256"])
 
 
 def validate_jwt_local(token: str) -> Tuple[bool, Optional[dict], Optional[str]]:
@@ -34,11 +72,7 @@ def validate_jwt_local(token: str) -> Tuple[bool, Optional[dict], Optional[str]]
     """
     try:
         # Decodificar y verificar
-        payload = jwt.decode(
-            token,
-            JWT_SECRET,
-            algorithms=[JWT_ALGORITHM]
-        )
+        payload = _decode(token)
         
         # Verificar tipo de token
         if payload.get("type") != "access":
@@ -0,0 +1,154 @@
+"""
+Hash de Contraseñas
+bcrypt en un pool de hilos acotado, compartido por Core API y Auth Service
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import bcrypt
+
+# bcrypt solo usa los primeros 72 bytes (bcrypt 5 rechaza más); se recortan explícitamente
+MAX_BCRYPT_BYTES = 72
+
+
+class HashSaturado(Exception):
+    """Demasiadas operaciones de bcrypt esperando un hilo libre"""
+
+
+def bcrypt_cost(hashed: str) -> Optional[int]:
+    """'$2b$12$...' -> 12 (None si no es un hash bcrypt)"""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def _bytes(text: str) -> bytes:
+    return text.encode("utf-8")[:MAX_BCRYPT_BYTES]
+
+
+class PasswordHasher:
+    """
+    Hash y verificación bcrypt fuera del event loop
+
+    Cada operación (~250 ms con costo 12) corre en un ThreadPoolExecutor
+    propio de 'max_workers' hilos: una ráfaga de logins ocupa esos hilos
+    y no frena al resto de endpoints. Con 'max_queue' operaciones
+    pendientes se rechaza de inmediato (HashSaturado) en lugar de
+    acumular esperas sin límite.
+
+    Métricas por resultado: 'completed' (terminó bien), 'failed' (lanzó
+    una excepción), 'cancelled' (el request se canceló esperando) y
+    'rejected' (cola llena, nunca entró al pool).
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 2, max_queue: int = 64):
+        self.rounds = rounds
+        self._max_workers = max_workers
+        self._max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()  # Las métricas de espera se escriben desde los hilos del pool
+        self.metrics = {
+            "pending": 0,
+            "running": 0,
+            "started": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "rejected": 0,
+            "rehashed": 0,
+            "wait_ms_max": 0.0,
+            "wait_ms_total": 0.0
+        }
+
+    # ===== Operaciones síncronas (se ejecutan en el pool) =====
+
+    def hash_sync(self, password: str) -> str:
+        return bcrypt.hashpw(_bytes(password), bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    def verify_sync(self, password: str, hashed: str) -> bool:
+        try:
+            return bcrypt.checkpw(_bytes(password), hashed.encode("utf-8"))
+        except (ValueError, TypeError):
+            return False
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return bcrypt_cost(hashed) != self.rounds
+
+    def _verify_and_rehash_sync(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        if not self.verify_sync(password, hashed):
+            return False, None
+        if self.needs_rehash(hashed):
+            return True, self.hash_sync(password)
+        return True, None
+
+    # ===== API async =====
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hash_sync, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.verify_sync, password, hashed)
+
+    async def verify_and_rehash(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verifica y, si el hash guardado tiene otro costo que el configurado,
+        devuelve también el hash nuevo para reemplazarlo (si no, None).
+        """
+        valid, new_hash = await self._run(self._verify_and_rehash_sync, password, hashed)
+        if new_hash is not None:
+            self.metrics["rehashed"] += 1
+        return valid, new_hash
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        if self.metrics["pending"] >= self._max_queue:
+            self.metrics["rejected"] += 1
+            raise HashSaturado(f"{self.metrics['pending']} operaciones de bcrypt en espera")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="bcrypt")
+
+        queued_at = time.perf_counter()
+
+        def task():
+            wait_ms = (time.perf_counter() - queued_at) * 1000
+            with self._lock:
+                self.metrics["started"] += 1
+                self.metrics["wait_ms_total"] += wait_ms
+                self.metrics["wait_ms_max"] = max(self.metrics["wait_ms_max"], wait_ms)
+                self.metrics["running"] += 1
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.metrics["running"] -= 1
+
+        self.metrics["pending"] += 1
+        outcome = "failed"
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, task)
+            outcome = "completed"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self.metrics["pending"] -= 1
+            self.metrics[outcome] += 1
+
+    def shutdown(self):
+        """Espera las operaciones en curso y libera los hilos"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def summary(self) -> Dict[str, Any]:
+        started = self.metrics["started"]
+        return {
+            **{k: v for k, v in self.metrics.items() if k != "wait_ms_total"},
+            "wait_ms_avg": round(self.metrics["wait_ms_total"] / started, 2) if started else 0.0,
+            "workers": self._max_workers,
+            "rounds": self.rounds
+        }
@@ -35,7 +35,8 @@ module EMHTTPHandler
     if method == 'POST' && path == '/broadcast'
       begin
         payload = JSON.parse(body[0, content_length])
-        ConnectionManager.broadcast(payload)
+        # El Core API puede enviar un lote de eventos como arreglo
+        payload.is_a?(Array) ? payload.each { |msg| ConnectionManager.broadcast(msg) } : ConnectionManager.broadcast(payload)
         response_body = { status: 'ok' }.to_json
         response = "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: #{response_body.bytesize}\r\n\r\n#{response_body}"
         send_data(response)
@@ -1,17 +1,97 @@
 import os
+import threading
+import time
 import jwt
 import logging
+import requests
+from functools import lru_cache
+from cryptography.hazmat.primitives import serialization
+from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=1)
+def _static_public_key():
+    """JWT_PUBLIC_KEY parseada una sola vez (settings ya normaliza los \\n)"""
+    return serialization.load_pem_public_key(settings.JWT_PUBLIC_KEY.encode('utf-8'))
+
+
+class JWKSKeys:
+    """
+    Claves públicas del Auth Service por kid (AUTH_JWKS_URL)
+
+    Un hilo de fondo descarga el JWKS cada `refresh_seconds` y parsea solo
+    los kid nuevos; autenticar un request es un lookup en un dict. Un kid
+    desconocido adelanta el refresco (máximo uno cada 5 s) y se rechaza.
+    """
+
+    def __init__(self, url, refresh_seconds=300, timeout=2):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+        self._keys = {}
+        self._wake = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        data = requests.get(self.url, timeout=self.timeout).json()
+        current = self._keys
+        self._keys = {
+            entry['kid']: current.get(entry['kid']) or jwt.PyJWK(entry).key
+            for entry in data.get('keys', [])
+            if entry.get('kid') and entry.get('kty') == 'RSA'
+        }
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning('Error refrescando JWKS: %s', e)
+            time.sleep(5)
+
+    def get(self, kid):
+        if not self._started:
+            with self._lock:
+                if not self._started:
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        logger.warning('No se pudo descargar el JWKS de %s: %s', self.url, e)
+                    threading.Thread(target=self._loop, name='jwks-refresh', daemon=True).start()
+                    self._started = True
+        key = self._keys.get(kid)
+        if key is None:
+            self._wake.set()
+        return key
+
+
+_jwks_url = getattr(settings, 'AUTH_JWKS_URL', '') or os.environ.get('AUTH_JWKS_URL', '')
+jwks_keys = JWKSKeys(_jwks_url) if _jwks_url else None
+
+
 class JWTAuthentication(BaseAuthentication):
     """
     Autenticación JWT local (RS256)
-    NO consulta al Auth Service
+    NO consulta al Auth Service: la clave sale del JWKS cacheado (por kid)
+    o de JWT_PUBLIC_KEY, ya parseada
     """
 
+    def _key_for(self, token):
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid and jwks_keys is not None:
+            key = jwks_keys.get(kid)
+            if key is None:
+                raise AuthenticationFailed('Token inválido: clave de firma desconocida')
+            return key
+        return _static_public_key()
+
     def authenticate(self, request):
         auth_header = request.headers.get('Authorization')
 
@@ -23,30 +103,19 @@ class JWTAuthentication(BaseAuthentication):
 
         token = auth_header.split(' ')[1]
 
-        public_key = os.environ.get('JWT_PUBLIC_KEY')
-        if not public_key:
-            raise AuthenticationFailed('JWT_PUBLIC_KEY no configurada')
-        
-        # Reemplazar \n literal por saltos de línea reales (necesario para PEM)
-        public_key = public_key.replace('\\n', '\n')
-        
-        logger.info(f"Public key starts with: {public_key[:50]}...")
-        logger.info(f"Token (first 50 chars): {token[:50]}...")
-
         try:
             payload = jwt.decode(
                 token,
-                public_key,
+                self._key_for(token),
                 algorithms=['RS256'],
                 options={
                     'require': ['sub']  # Solo requerir 'sub', exp/iat son opcionales
                 }
             )
-            logger.info(f"Token decoded successfully. Payload keys: {list(payload.keys())}")
         except jwt.ExpiredSignatureError:
             raise AuthenticationFailed('Token expirado')
         except jwt.InvalidTokenError as e:
-            logger.error(f"JWT decode error: {type(e).__name__}: {e}")
+            logger.debug('JWT decode error: %s', type(e).__name__)
             raise AuthenticationFailed(f'Token inválido: {type(e).__name__}')
 
         # Guardamos el payload para usarlo en permisos / vistas
@@ -225,3 +225,6 @@ if not JWT_PUBLIC_KEY:
     raise RuntimeError("JWT_PUBLIC_KEY no está definida en el entorno. Verifica el archivo .env")
 JWT_PUBLIC_KEY = JWT_PUBLIC_KEY.replace("\\n", "\n")
 
+# JWKS del Auth Service (opcional): tokens con 'kid' se validan con la clave publicada
+AUTH_JWKS_URL = os.environ.get("AUTH_JWKS_URL", "")
+